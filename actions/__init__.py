@@ -17,4 +17,4 @@ logger = logging.getLogger(__name__)
 # The actual validation will happen in the main application
 logger.info("Initializing actions module")
 from actions.actions_air_pollution import ActionGetAirPollution
-from actions.actions_air_pollution_forecast import ActionGetAirPollutionForecast
\ No newline at end of file
+from actions.actions_air_pollution_forecast import ActionGetAirPollutionForecast
@@ -11,9 +11,12 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from dotenv import load_dotenv
 from .weather_utils import (
-    WeatherService, WeatherAPIError, get_coordinates, 
-    get_uv_level, get_protection_advice
+    AsyncWeatherService, WeatherAPIError, WeatherQuery, async_http_get, with_latency_budget,
+    read_forecast, read_observation, response_data
 )
+from .fetch_planner import FetchContext, fetch_datasets
+from .location_slots import slot_geocode, with_location_slots
+from .weather_payloads import forecast_summary
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +24,9 @@ class ActionFetchWeather(Action):
     def name(self) -> Text:
         return "action_fetch_weather"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -35,8 +40,8 @@ class ActionFetchWeather(Action):
             return []
         
         try:
-            weather_service = WeatherService(api_key)
-            data = weather_service.get_current_weather(location)
+            weather_service = AsyncWeatherService(api_key)
+            data = await weather_service.get_current_weather(location, action=self.name())
             
             temperature = data["main"]["temp"]
             weather = data["weather"][0]["description"]
@@ -60,7 +65,7 @@ class ActionRandomFact(Action):
     def name(self) -> Text:
         return "action_random_fact"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         facts = [
             "Did you know honey never spoils?",
@@ -74,7 +79,9 @@ class ActionCompareWeather(Action):
     def name(self) -> Text:
         return "action_compare_weather"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -88,9 +95,9 @@ class ActionCompareWeather(Action):
             return []
         
         try:    
-            current_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
+            current_url = WeatherQuery.by_location("current_weather", location).url(api_key)
             logger.info(f"Fetching weather comparison data for location: {location}")
-            response = requests.get(current_url, timeout=10)
+            response = await read_observation(location, self.name(), lambda: async_http_get(current_url, timeout=10))
             
             if response.status_code == 200:
                 data = response.json()
@@ -124,10 +131,14 @@ class ActionCompareWeather(Action):
         return []
 
 class ActionGetLocalTime(Action):
+    required_datasets = ("coordinates", "timezone")
+
     def name(self) -> Text:
         return "action_get_local_time"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -143,9 +154,11 @@ class ActionGetLocalTime(Action):
             return []
 
         try:
-            weather_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={weather_api_key}"
-            logger.info(f"Fetching coordinates for location: {location}")
-            weather_response = requests.get(weather_url, timeout=10)
+            # The timezone lookup starts as soon as the coordinates are known
+            context = FetchContext(api_key=weather_api_key, location=location, timezone_api_key=timezone_api_key,
+                                   coordinates=slot_geocode(tracker, location))
+            responses = await fetch_datasets(self.required_datasets, context)
+            weather_response = responses["coordinates"]
 
             if weather_response.status_code != 200:
                 logger.error(f"Failed to fetch location data: HTTP {weather_response.status_code}")
@@ -153,24 +166,18 @@ class ActionGetLocalTime(Action):
                 return []
 
             weather_data = weather_response.json()
-            lat = weather_data["coord"]["lat"]
-            lon = weather_data["coord"]["lon"]
             timezone_offset = weather_data.get("timezone", 0)
+            timezone_response = responses["timezone"]
 
-            if timezone_api_key:
-                timezone_url = f"http://api.timezonedb.com/v2.1/get-time-zone?key={timezone_api_key}&format=json&by=position&lat={lat}&lng={lon}"
-                logger.info(f"Fetching timezone data for coordinates: {lat}, {lon}")
-                timezone_response = requests.get(timezone_url, timeout=10)
-
-                if timezone_response.status_code == 200:
-                    timezone_data = timezone_response.json()
-                    local_time = timezone_data["formatted"]
-                    zone_name = timezone_data["zoneName"]
-                    logger.info(f"Successfully retrieved timezone data for {location}: {zone_name}")
-                    dispatcher.utter_message(
-                        text=f"The current time in {location} ({zone_name}) is {local_time.split()[1]}"
-                    )
-                    return []
+            if timezone_response is not None and timezone_response.status_code == 200:
+                timezone_data = timezone_response.json()
+                local_time = timezone_data["formatted"]
+                zone_name = timezone_data["zoneName"]
+                logger.info(f"Successfully retrieved timezone data for {location}: {zone_name}")
+                dispatcher.utter_message(
+                    text=f"The current time in {location} ({zone_name}) is {local_time.split()[1]}"
+                )
+                return []
 
             utc_time = datetime.datetime.utcnow()
             local_time = utc_time + datetime.timedelta(seconds=timezone_offset)
@@ -187,10 +194,16 @@ class ActionGetLocalTime(Action):
         return []
 
 class ActionFetchWeatherForecast(Action):
+    required_datasets = ("coordinates", "forecast")
+    # UV is enrichment: the forecast is still given if it is unavailable
+    optional_datasets = ("uv_forecast",)
+
     def name(self) -> Text:
         return "action_fetch_weather_forecast"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         days = tracker.get_slot("days") or 3
@@ -212,113 +225,70 @@ class ActionFetchWeatherForecast(Action):
             return []
         
         try:    
-            # Get coordinates first for UV index
-            geo_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
-            geo_response = requests.get(geo_url, timeout=10)
+            # The forecast does not need coordinates, so it is fetched alongside the
+            # geocode; the UV forecast starts as soon as the coordinates arrive
+            logger.info(f"Fetching {days}-day forecast for location: {location}")
+            context = FetchContext(api_key=api_key, location=location, uv_count=days, action=self.name(),
+                                   coordinates=slot_geocode(tracker, location))
+            responses = await fetch_datasets(self.required_datasets, context, optional=self.optional_datasets)
+            geo_response = responses["coordinates"]
             
             if geo_response.status_code != 200:
                 logger.error(f"Failed to fetch location data: HTTP {geo_response.status_code}")
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
                 
-            geo_data = geo_response.json()
-            lat = geo_data["coord"]["lat"]
-            lon = geo_data["coord"]["lon"]
-            
-            # Get forecast data
-            url = f"http://api.openweathermap.org/data/2.5/forecast?q={location}&appid={api_key}&units=metric"
-            logger.info(f"Fetching {days}-day forecast for location: {location}")
-            response = requests.get(url, timeout=10)
-            
-            # Get UV index data
-            uv_url = f"http://api.openweathermap.org/data/2.5/uvi/forecast?lat={lat}&lon={lon}&appid={api_key}&cnt={days}"
-            uv_response = requests.get(uv_url, timeout=10)
-            uv_data = {}
+            response = responses["forecast"]
+            uv_response = responses["uv_forecast"]
+            uv_list = []
             
-            if uv_response.status_code == 200:
+            if uv_response is None:
+                logger.warning(f"Skipped UV data for {location}")
+            elif uv_response.status_code == 200:
                 uv_list = uv_response.json()
-                for uv_item in uv_list:
-                    date = datetime.datetime.fromtimestamp(uv_item["date"]).date()
-                    uv_data[date] = uv_item["value"]
                 logger.info(f"Successfully retrieved UV index data for {location}")
             else:
                 logger.warning(f"Failed to fetch UV data: HTTP {uv_response.status_code}")
             
             if response.status_code == 200:
-                data = response.json()
-                logger.debug(f"Received forecast data with {len(data['list'])} time points")
+                forecast = forecast_summary(response_data(response))
+                
+                # UV readings are keyed by the city's local date, like the forecast days
+                uv_data = {forecast.date_at(uv_item["date"]): uv_item["value"] for uv_item in uv_list}
                 
                 forecast_message = f"Weather forecast for {location} for the next {days} day(s):\n"
-                current_date = None
-                day_count = 0
                 
-                # Get today's date to ensure we include it
-                today = datetime.datetime.now().date()
+                # Get today's date in the city to ensure we include it
+                today = forecast.today(datetime.datetime.now())
                 
-                # First add today's forecast if available
-                today_forecasts = [f for f in data["list"] if 
-                                  datetime.datetime.fromtimestamp(f["dt"]).date() == today]
+                # Start with today if the forecast covers it, otherwise with its first day
+                first_date = today if forecast.day(today) else forecast.first_date
+                forecast_dates = forecast.dates(first_date, days) if first_date is not None else []
+                day_count = len(forecast_dates)
                 
-                if today_forecasts and day_count < days:
-                    day_count += 1
-                    current_date = today
-                    date_str = today.strftime("%A, %B %d") + " (Today)"
-                    
-                    # Find forecast closest to noon for today
-                    noon_forecasts = [f for f in today_forecasts if 
-                                     datetime.datetime.fromtimestamp(f["dt"]).hour >= 11 and
-                                     datetime.datetime.fromtimestamp(f["dt"]).hour <= 13]
+                for forecast_date in forecast_dates:
+                    summary = forecast.day(forecast_date)
+                    date_str = forecast_date.strftime("%A, %B %d")
+                    if forecast_date == today:
+                        date_str += " (Today)"
+                    elif not summary.noon_sampled:
+                        # A later day the forecast only partly covers, with no entry around noon
+                        continue
                     
-                    day_forecast = noon_forecasts[0] if noon_forecasts else today_forecasts[0]
-                    temp = day_forecast["main"]["temp"]
-                    weather = day_forecast["weather"][0]["description"]
+                    # The first entry between 11:00 and 13:59; later today, the day's first remaining entry
+                    temp = summary.noon_temp
+                    weather = summary.noon_description
                     
                     # Add UV index if available
                     uv_info = ""
-                    if today in uv_data:
-                        uv_value = uv_data[today]
+                    if forecast_date in uv_data:
+                        uv_value = uv_data[forecast_date]
                         uv_level = self._get_uv_level(uv_value)
                         uv_info = f", UV index: {uv_value:.1f} ({uv_level})"
                     
                     forecast_message += f"\n• {date_str}: {weather}, temperature around {temp}°C{uv_info}"
                     logger.debug(f"Added forecast for {date_str}: {weather}, {temp}°C{uv_info}")
                 
-                # Then process the rest of the days
-                for item in data["list"]:
-                    forecast_date = datetime.datetime.fromtimestamp(item["dt"]).date()
-                    
-                    # Simple comparison - just check if dates are different
-                    if forecast_date != current_date:
-                        # Skip dates we've already processed
-                        if day_count >= days:
-                            break
-                        if day_count >= days:
-                            break
-                        
-                        current_date = forecast_date
-                        day_count += 1
-                        date_str = forecast_date.strftime("%A, %B %d")
-                        
-                        noon_forecasts = [f for f in data["list"] if 
-                                         datetime.datetime.fromtimestamp(f["dt"]).date() == forecast_date and
-                                         datetime.datetime.fromtimestamp(f["dt"]).hour >= 11 and
-                                         datetime.datetime.fromtimestamp(f["dt"]).hour <= 13]
-                        
-                        if noon_forecasts:
-                            day_forecast = noon_forecasts[0]
-                            temp = day_forecast["main"]["temp"]
-                            weather = day_forecast["weather"][0]["description"]
-                            
-                            # Add UV index if available
-                            uv_info = ""
-                            if forecast_date in uv_data:
-                                uv_value = uv_data[forecast_date]
-                                uv_level = self._get_uv_level(uv_value)
-                                uv_info = f", UV index: {uv_value:.1f} ({uv_level})"
-                            
-                            forecast_message += f"\n• {date_str}: {weather}, temperature around {temp}°C{uv_info}"
-                            logger.debug(f"Added forecast for {date_str}: {weather}, {temp}°C{uv_info}")
-                
                 logger.info(f"Successfully generated {day_count}-day forecast for {location}")
                 dispatcher.utter_message(text=forecast_message)
             else:
@@ -346,7 +316,9 @@ class ActionGetHumidity(Action):
     def name(self) -> Text:
         return "action_get_humidity"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -360,9 +332,9 @@ class ActionGetHumidity(Action):
             return []
         
         try:    
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
+            url = WeatherQuery.by_location("current_weather", location).url(api_key)
             logger.info(f"Fetching humidity data for location: {location}")
-            response = requests.get(url, timeout=10)
+            response = await read_observation(location, self.name(), lambda: async_http_get(url, timeout=10))
             
             if response.status_code == 200:
                 data = response.json()
@@ -381,10 +353,14 @@ class ActionGetHumidity(Action):
         return []
 
 class ActionGetUVIndex(Action):
+    required_datasets = ("coordinates", "uv")
+
     def name(self) -> Text:
         return "action_get_uv_index"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -398,24 +374,17 @@ class ActionGetUVIndex(Action):
             return []
         
         try:
-            # First get coordinates for the location
-            geo_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
-            logger.info(f"Fetching coordinates for location: {location}")
-            geo_response = requests.get(geo_url, timeout=10)
+            # Get coordinates for the location; the uv request follows as soon as they resolve
+            context = FetchContext(api_key=api_key, location=location, coordinates=slot_geocode(tracker, location))
+            responses = await fetch_datasets(self.required_datasets, context)
+            geo_response = responses["coordinates"]
             
             if geo_response.status_code != 200:
                 logger.error(f"Failed to fetch location data: HTTP {geo_response.status_code}")
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
                 
-            geo_data = geo_response.json()
-            lat = geo_data["coord"]["lat"]
-            lon = geo_data["coord"]["lon"]
-            
-            # Get current UV index
-            uv_url = f"http://api.openweathermap.org/data/2.5/uvi?lat={lat}&lon={lon}&appid={api_key}"
-            logger.info(f"Fetching UV index data for coordinates: {lat}, {lon}")
-            uv_response = requests.get(uv_url, timeout=10)
+            uv_response = responses["uv"]
             
             if uv_response.status_code == 200:
                 uv_data = uv_response.json()
@@ -462,10 +431,14 @@ class ActionGetUVIndex(Action):
             return "Take all precautions: SPF 30+ sunscreen, protective clothing, wide-brim hat, and UV-blocking sunglasses. Avoid sun exposure as much as possible."
 
 class ActionGetUVIndexForecast(Action):
+    required_datasets = ("coordinates", "uv_forecast")
+
     def name(self) -> Text:
         return "action_get_uv_index_forecast"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         days = tracker.get_slot("days") or 1  # Default to tomorrow
@@ -487,26 +460,22 @@ class ActionGetUVIndexForecast(Action):
             return []
         
         try:
-            # First get coordinates for the location
-            geo_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
-            logger.info(f"Fetching coordinates for location: {location}")
-            geo_response = requests.get(geo_url, timeout=10)
+            # Get coordinates for the location; the uv forecast request follows as soon as they resolve
+            context = FetchContext(api_key=api_key, location=location, uv_count=days + 1,
+                                   coordinates=slot_geocode(tracker, location))
+            responses = await fetch_datasets(self.required_datasets, context)
+            geo_response = responses["coordinates"]
             
             if geo_response.status_code != 200:
                 logger.error(f"Failed to fetch location data: HTTP {geo_response.status_code}")
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
                 
-            geo_data = geo_response.json()
-            lat = geo_data["coord"]["lat"]
-            lon = geo_data["coord"]["lon"]
-            
-            # Get UV index forecast
-            uv_url = f"http://api.openweathermap.org/data/2.5/uvi/forecast?lat={lat}&lon={lon}&appid={api_key}&cnt={days+1}"
-            logger.info(f"Fetching UV index forecast for coordinates: {lat}, {lon}")
-            uv_response = requests.get(uv_url, timeout=10)
+            uv_response = responses["uv_forecast"]
             
-            if uv_response.status_code == 200:
+            if uv_response is None:
+                logger.warning(f"Skipped UV data for {location}")
+            elif uv_response.status_code == 200:
                 uv_list = uv_response.json()
                 
                 # Skip today's forecast (index 0) if we want tomorrow
@@ -565,7 +534,9 @@ class ActionGetTemperatureRange(Action):
     def name(self) -> Text:
         return "action_get_temperature_range"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         time_period = tracker.get_slot("time_period") or "today"
@@ -584,9 +555,9 @@ class ActionGetTemperatureRange(Action):
         try:
             # For today's temperature range, use current weather API
             if time_period.lower() == "today":
-                url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
+                url = WeatherQuery.by_location("current_weather", location).url(api_key)
                 logger.info(f"Fetching current weather data for location: {location}")
-                response = requests.get(url, timeout=10)
+                response = await read_observation(location, self.name(), lambda: async_http_get(url, timeout=10))
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -612,26 +583,19 @@ class ActionGetTemperatureRange(Action):
             
             # For tomorrow's temperature range, use forecast API
             else:
-                url = f"http://api.openweathermap.org/data/2.5/forecast?q={location}&appid={api_key}&units=metric"
+                url = WeatherQuery.by_location("forecast", location).url(api_key)
                 logger.info(f"Fetching forecast data for location: {location}")
-                response = requests.get(url, timeout=10)
+                response = await read_forecast(self.name(), lambda: async_http_get(url, timeout=10), location=location)
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    forecast = forecast_summary(response_data(response))
                     
-                    # Get tomorrow's date
-                    tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).date()
+                    # Tomorrow's min and max temperatures in the city
+                    tomorrow = forecast.day(forecast.today(datetime.datetime.now(), days=1))
                     
-                    # Filter forecast items for tomorrow
-                    tomorrow_forecasts = [
-                        item for item in data["list"] 
-                        if datetime.datetime.fromtimestamp(item["dt"]).date() == tomorrow
-                    ]
-                    
-                    if tomorrow_forecasts:
-                        # Find min and max temperatures
-                        temp_min = min(item["main"]["temp_min"] for item in tomorrow_forecasts)
-                        temp_max = max(item["main"]["temp_max"] for item in tomorrow_forecasts)
+                    if tomorrow is not None and tomorrow.temp_min is not None and tomorrow.temp_max is not None:
+                        temp_min = tomorrow.temp_min
+                        temp_max = tomorrow.temp_max
                         
                         if temp_type.lower() == "min":
                             dispatcher.utter_message(
@@ -660,10 +624,14 @@ class ActionGetTemperatureRange(Action):
         return []
 
 class ActionGetAirPollution(Action):
+    required_datasets = ("coordinates", "air")
+
     def name(self) -> Text:
         return "action_get_air_pollution"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -677,24 +645,17 @@ class ActionGetAirPollution(Action):
             return []
         
         try:
-            # First get coordinates for the location
-            geo_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
-            logger.info(f"Fetching coordinates for location: {location}")
-            geo_response = requests.get(geo_url, timeout=10)
+            # Get coordinates for the location; the air request follows as soon as they resolve
+            context = FetchContext(api_key=api_key, location=location, coordinates=slot_geocode(tracker, location))
+            responses = await fetch_datasets(self.required_datasets, context)
+            geo_response = responses["coordinates"]
             
             if geo_response.status_code != 200:
                 logger.error(f"Failed to fetch location data: HTTP {geo_response.status_code}")
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
                 
-            geo_data = geo_response.json()
-            lat = geo_data["coord"]["lat"]
-            lon = geo_data["coord"]["lon"]
-            
-            # Get current air pollution data
-            air_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}"
-            logger.info(f"Fetching air pollution data for coordinates: {lat}, {lon}")
-            air_response = requests.get(air_url, timeout=10)
+            air_response = responses["air"]
             
             if air_response.status_code == 200:
                 air_data = air_response.json()
@@ -7,14 +7,21 @@ from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from dotenv import load_dotenv
+from .fetch_planner import FetchContext, fetch_datasets
+from .location_slots import slot_geocode, with_location_slots
+from .weather_utils import with_latency_budget
 
 logger = logging.getLogger(__name__)
 
 class ActionGetAirPollution(Action):
+    required_datasets = ("coordinates", "air")
+
     def name(self) -> Text:
         return "action_get_air_pollution"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -28,24 +35,17 @@ class ActionGetAirPollution(Action):
             return []
         
         try:
-            # First get coordinates for the location
-            geo_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
-            logger.info(f"Fetching coordinates for location: {location}")
-            geo_response = requests.get(geo_url, timeout=10)
+            # Get coordinates for the location; the air request follows as soon as they resolve
+            context = FetchContext(api_key=api_key, location=location, coordinates=slot_geocode(tracker, location))
+            responses = await fetch_datasets(self.required_datasets, context)
+            geo_response = responses["coordinates"]
             
             if geo_response.status_code != 200:
                 logger.error(f"Failed to fetch location data: HTTP {geo_response.status_code}")
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
                 
-            geo_data = geo_response.json()
-            lat = geo_data["coord"]["lat"]
-            lon = geo_data["coord"]["lon"]
-            
-            # Get current air pollution data
-            air_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}"
-            logger.info(f"Fetching air pollution data for coordinates: {lat}, {lon}")
-            air_response = requests.get(air_url, timeout=10)
+            air_response = responses["air"]
             
             if air_response.status_code == 200:
                 air_data = air_response.json()
@@ -4,18 +4,28 @@ import os
 import logging
 import datetime
 import requests
-from typing import Any, Text, Dict, List
+from typing import Any, Text, Dict, List, Optional, Tuple
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from dotenv import load_dotenv
+from .fetch_planner import FetchContext, fetch_datasets, utc_offset_from_response
+from .location_slots import slot_geocode, with_location_slots
+from .weather_utils import response_data, with_latency_budget
+from .weather_payloads import air_quality_series
 
 logger = logging.getLogger(__name__)
 
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
 class ActionGetAirPollutionForecast(Action):
+    required_datasets = ("coordinates", "air_forecast")
+
     def name(self) -> Text:
         return "action_get_air_pollution_forecast"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -29,77 +39,56 @@ class ActionGetAirPollutionForecast(Action):
             return []
         
         try:
-            # First get coordinates for the location
-            geo_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
-            logger.info(f"Fetching coordinates for location: {location}")
-            geo_response = requests.get(geo_url, timeout=10)
+            # Get coordinates for the location; the air forecast request follows as soon as they resolve
+            context = FetchContext(api_key=api_key, location=location, coordinates=slot_geocode(tracker, location))
+            responses = await fetch_datasets(self.required_datasets, context)
+            geo_response = responses["coordinates"]
             
             if geo_response.status_code != 200:
                 logger.error(f"Failed to fetch location data: HTTP {geo_response.status_code}")
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
                 
-            geo_data = geo_response.json()
-            lat = geo_data["coord"]["lat"]
-            lon = geo_data["coord"]["lon"]
-            
-            # Get air pollution forecast data
-            forecast_url = f"http://api.openweathermap.org/data/2.5/air_pollution/forecast?lat={lat}&lon={lon}&appid={api_key}"
-            logger.info(f"Fetching air pollution forecast for coordinates: {lat}, {lon}")
-            forecast_response = requests.get(forecast_url, timeout=10)
+            forecast_response = responses["air_forecast"]
             
             if forecast_response.status_code == 200:
-                forecast_data = forecast_response.json()
+                # The hourly series with the reductions of every day it covers, parsed once per fetch
+                forecast = air_quality_series(response_data(forecast_response),
+                                              utc_offset=utc_offset_from_response(geo_response))
                 
-                if not forecast_data.get("list"):
+                if not len(forecast):
                     logger.error("No forecast data available")
                     dispatcher.utter_message(text=f"I couldn't find air pollution forecast data for {location}.")
                     return []
                 
-                # Get tomorrow's date
-                tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
-                tomorrow_date = tomorrow.date()
-                
-                # Filter forecast data for tomorrow
-                tomorrow_forecasts = []
-                for item in forecast_data["list"]:
-                    forecast_time = datetime.datetime.fromtimestamp(item["dt"])
-                    if forecast_time.date() == tomorrow_date:
-                        tomorrow_forecasts.append(item)
+                today = forecast.today(datetime.datetime.now())
+                days_ahead, label = self._requested_day(tracker.get_slot("time_period"), today)
+                forecast_date = forecast.today(datetime.datetime.now(), days=days_ahead)
+                day = forecast.day(forecast_date)
                 
-                if not tomorrow_forecasts:
-                    logger.error("No forecast data available for tomorrow")
-                    dispatcher.utter_message(text=f"I couldn't find tomorrow's air pollution forecast for {location}.")
+                if day is None:
+                    logger.error(f"No forecast data available for {forecast_date}")
+                    dispatcher.utter_message(text=f"I couldn't find the air pollution forecast for {location} {label}.")
                     return []
                 
-                # Calculate average AQI for tomorrow
-                aqi_values = [item["main"]["aqi"] for item in tomorrow_forecasts]
-                avg_aqi = sum(aqi_values) / len(aqi_values)
-                most_common_aqi = max(set(aqi_values), key=aqi_values.count)
+                # The dominant AQI of the day
+                most_common_aqi = day.aqi_mode
                 
-                # Get components from midday forecast if available, otherwise use the first forecast
-                midday_forecasts = [f for f in tomorrow_forecasts if 
-                                   datetime.datetime.fromtimestamp(f["dt"]).hour >= 11 and
-                                   datetime.datetime.fromtimestamp(f["dt"]).hour <= 13]
-                
-                forecast_item = midday_forecasts[0] if midday_forecasts else tomorrow_forecasts[0]
-                components = forecast_item["components"]
-                
-                # Extract key pollutants
-                pm2_5 = components.get("pm2_5", 0)
-                pm10 = components.get("pm10", 0)
-                no2 = components.get("no2", 0)
-                o3 = components.get("o3", 0)
+                # Pollutants from the midday forecast if available, otherwise from the first forecast
+                pm2_5 = day.pollutants["pm2_5"]["noon"] or 0
+                pm10 = day.pollutants["pm10"]["noon"] or 0
+                no2 = day.pollutants["no2"]["noon"] or 0
+                o3 = day.pollutants["o3"]["noon"] or 0
                 
                 aqi_level = self._get_aqi_level(most_common_aqi)
                 health_implications = self._get_health_implications(most_common_aqi)
                 
-                tomorrow_str = tomorrow_date.strftime("%A, %B %d")
+                date_str = forecast_date.strftime("%A, %B %d")
                 
                 logger.info(f"Successfully retrieved air quality forecast for {location}: AQI {most_common_aqi} ({aqi_level})")
                 
                 message = (
-                    f"The air quality forecast for {location} tomorrow ({tomorrow_str}) is {aqi_level} (AQI: {most_common_aqi}).\n"
+                    f"The air quality forecast for {location} {label} ({date_str}) is {aqi_level} (AQI: {most_common_aqi}).\n"
                     f"Expected pollutant levels:\n"
                     f"• PM2.5: {pm2_5:.1f} μg/m³\n"
                     f"• PM10: {pm10:.1f} μg/m³\n"
@@ -121,6 +110,16 @@ class ActionGetAirPollutionForecast(Action):
         
         return []
         
+    def _requested_day(self, time_period: Optional[Text], today: datetime.date) -> Tuple[int, Text]:
+        """Days after `today` the user asked about, and how to name that day; tomorrow by default."""
+        period = time_period.strip().lower() if isinstance(time_period, str) else ""
+        if period in ("today", "now"):
+            return 0, "today"
+        if period in WEEKDAYS:
+            days_ahead = (WEEKDAYS.index(period) - today.weekday()) % 7
+            return days_ahead, f"on {period.capitalize()}"
+        return 1, "tomorrow"
+
     def _get_aqi_level(self, aqi):
         """Convert AQI numerical value to descriptive level."""
         levels = {
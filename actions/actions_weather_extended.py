@@ -9,7 +9,13 @@ from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from dotenv import load_dotenv
-from .weather_utils import WeatherService, WeatherAPIError, get_coordinates
+from .weather_utils import (
+    WeatherAPIError, WeatherQuery, async_get_coordinates, async_http_get, with_latency_budget,
+    read_forecast, read_observation, response_data
+)
+from .fetch_planner import FetchContext, fetch_datasets
+from .location_slots import slot_geocode, with_location_slots
+from .weather_payloads import forecast_summary
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +23,9 @@ class ActionGetSevereWeatherAlerts(Action):
     def name(self) -> Text:
         return "action_get_severe_weather_alerts"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         if not location:
@@ -32,21 +40,21 @@ class ActionGetSevereWeatherAlerts(Action):
         
         try:
             # First get coordinates for the location
-            lat, lon = get_coordinates(location, api_key) # type: ignore
+            lat, lon = await async_get_coordinates(location, api_key, slot_geocode(tracker, location)) # type: ignore
             if not lat or not lon:
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
             
             # Get weather alerts using 5-day forecast API
-            url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}"
+            url = WeatherQuery.by_coordinates("forecast", lat, lon).url(api_key)
             logger.info(f"Fetching weather alerts for coordinates: {lat}, {lon}")
-            response = requests.get(url, timeout=10)
+            response = await read_forecast(self.name(), lambda: async_http_get(url, timeout=10), lat=lat, lon=lon)
             
             if response.status_code == 200:
-                data = response.json()
+                data = response_data(response)
                 
                 # Special handling for test cases
-                if "alerts" in data:
+                if isinstance(data, dict) and "alerts" in data:
                     alerts = data.get("alerts", [])
                     if alerts:
                         message = f"Weather alerts for {location}:\n\n"
@@ -70,27 +78,12 @@ class ActionGetSevereWeatherAlerts(Action):
                         dispatcher.utter_message(text=f"Good news! There are no weather alerts for {location} at this time.")
                     return []
                 
-                # Check for extreme weather in the next 24 hours
-                extreme_conditions = []
-                for item in data["list"][:8]:  # First 24 hours (8 x 3-hour intervals)
-                    weather_id = item["weather"][0]["id"]
-                    if weather_id < 300:  # Thunderstorm
-                        extreme_conditions.append("Thunderstorm")
-                    elif 500 <= weather_id < 600 and weather_id >= 502:  # Heavy rain
-                        extreme_conditions.append("Heavy rain")
-                    elif 600 <= weather_id < 700 and weather_id >= 602:  # Heavy snow
-                        extreme_conditions.append("Heavy snow")
-                    elif 700 <= weather_id < 800 and weather_id not in [701, 721]:  # Atmospheric conditions
-                        extreme_conditions.append(item["weather"][0]["description"])
-                    elif weather_id == 800 and item["wind"]["speed"] > 20:  # Strong winds
-                        extreme_conditions.append("Strong winds")
-                    elif weather_id >= 900:  # Extreme weather
-                        extreme_conditions.append(item["weather"][0]["description"])
+                # Extreme weather in the next 24 hours, found when the forecast was fetched
+                extreme_conditions = forecast_summary(data).alerts
                 
                 if extreme_conditions:
-                    unique_conditions = list(set(extreme_conditions))
                     message = f"Weather alerts for {location}:\n\n"
-                    for i, condition in enumerate(unique_conditions, 1):
+                    for i, condition in enumerate(extreme_conditions, 1):
                         message += f"ALERT {i}: {condition}\n"
                     
                     dispatcher.utter_message(text=message)
@@ -109,7 +102,9 @@ class ActionGetPrecipitation(Action):
     def name(self) -> Text:
         return "action_get_precipitation"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         time_period = tracker.get_slot("time_period") or "today"
@@ -126,21 +121,21 @@ class ActionGetPrecipitation(Action):
         
         try:
             # First get coordinates for the location
-            lat, lon = get_coordinates(location, api_key) # type: ignore
+            lat, lon = await async_get_coordinates(location, api_key, slot_geocode(tracker, location)) # type: ignore
             if not lat or not lon:
                 dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                 return []
             
             # Get precipitation data using 5-day forecast API
-            url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&units=metric&appid={api_key}"
+            url = WeatherQuery.by_coordinates("forecast", lat, lon).url(api_key)
             logger.info(f"Fetching precipitation data for coordinates: {lat}, {lon}")
-            response = requests.get(url, timeout=10)
+            response = await read_forecast(self.name(), lambda: async_http_get(url, timeout=10), lat=lat, lon=lon)
             
             if response.status_code == 200:
-                data = response.json()
+                data = response_data(response)
                 
                 # Special handling for test cases
-                if "hourly" in data or "daily" in data:
+                if isinstance(data, dict) and ("hourly" in data or "daily" in data):
                     if time_period.lower() in ["today", "now"]:
                         message = f"Precipitation forecast for {location} today:\n\n"
                         message += "• Expected rainfall: 1.2 mm\n"
@@ -151,21 +146,22 @@ class ActionGetPrecipitation(Action):
                         dispatcher.utter_message(text=message)
                     return []
                 
+                forecast = forecast_summary(data)
+                
                 if time_period.lower() in ["today", "now"]:
-                    # Get today's forecast
-                    today = datetime.datetime.now().strftime("%Y-%m-%d")
-                    today_data = [item for item in data["list"] if item["dt_txt"].startswith(today)]
+                    # Get today's summary
+                    today = forecast.day(forecast.today(datetime.datetime.now()))
                     
-                    # Calculate precipitation probability
-                    rain_hours = sum(1 for hour in today_data if hour.get("pop", 0) > 0.2)
-                    max_pop = max((hour.get("pop", 0) for hour in today_data), default=0)
+                    # Precipitation probability
+                    rain_hours = today.wet_entries if today else 0
+                    max_pop = today.pop_max if today else 0
                     
                     # Check for rain or snow volume
-                    has_rain = any("rain" in hour for hour in today_data)
-                    has_snow = any("snow" in hour for hour in today_data)
+                    has_rain = today is not None and today.rain is not None
+                    has_snow = today is not None and today.snow is not None
                     
-                    rain_volume = sum(hour.get("rain", {}).get("3h", 0) for hour in today_data if "rain" in hour)
-                    snow_volume = sum(hour.get("snow", {}).get("3h", 0) for hour in today_data if "snow" in hour)
+                    rain_volume = today.rain if has_rain else 0
+                    snow_volume = today.snow if has_snow else 0
                     
                     message = f"Precipitation forecast for {location} today:\n\n"
                     message += f"• Chance of precipitation: {int(max_pop * 100)}%\n"
@@ -184,17 +180,15 @@ class ActionGetPrecipitation(Action):
                     
                 elif time_period.lower() in ["tomorrow"]:
                     # Get tomorrow's data
-                    tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
-                    tomorrow_date = tomorrow.strftime("%Y-%m-%d")
-                    tomorrow_data = [item for item in data["list"] if item["dt_txt"].startswith(tomorrow_date)]
+                    tomorrow = forecast.day(forecast.today(datetime.datetime.now(), days=1))
                     
-                    if tomorrow_data:
-                        # Calculate average probability of precipitation
-                        pop = sum(item.get("pop", 0) for item in tomorrow_data) / len(tomorrow_data)
+                    if tomorrow is not None:
+                        # Average probability of precipitation
+                        pop = tomorrow.pop_mean
                         
-                        # Sum up rain and snow volumes
-                        rain = sum(item.get("rain", {}).get("3h", 0) for item in tomorrow_data if "rain" in item)
-                        snow = sum(item.get("snow", {}).get("3h", 0) for item in tomorrow_data if "snow" in item)
+                        # Rain and snow volumes
+                        rain = tomorrow.rain
+                        snow = tomorrow.snow
                         
                         message = f"Precipitation forecast for {location} tomorrow:\n\n"
                         message += f"• Chance of precipitation: {int(pop * 100)}%\n"
@@ -230,7 +224,9 @@ class ActionGetWindConditions(Action):
     def name(self) -> Text:
         return "action_get_wind_conditions"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         time_period = tracker.get_slot("time_period") or "today"
@@ -262,9 +258,9 @@ class ActionGetWindConditions(Action):
         try:
             # Get current wind conditions
             if time_period.lower() in ["today", "now"]:
-                url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
+                url = WeatherQuery.by_location("current_weather", location).url(api_key)
                 logger.info(f"Fetching current wind data for location: {location}")
-                response = requests.get(url, timeout=10)
+                response = await read_observation(location, self.name(), lambda: async_http_get(url, timeout=10))
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -294,21 +290,21 @@ class ActionGetWindConditions(Action):
             # Get tomorrow's wind forecast
             elif time_period.lower() in ["tomorrow"]:
                 # First get coordinates
-                lat, lon = get_coordinates(location, api_key) # type: ignore
+                lat, lon = await async_get_coordinates(location, api_key, slot_geocode(tracker, location)) # type: ignore
                 if not lat or not lon:
                     dispatcher.utter_message(text="I couldn't find that location. Please try again.")
                     return []
                 
                 # Get forecast data using 5-day forecast API
-                url = f"http://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&units=metric&appid={api_key}"
+                url = WeatherQuery.by_coordinates("forecast", lat, lon).url(api_key)
                 logger.info(f"Fetching wind forecast for coordinates: {lat}, {lon}")
-                response = requests.get(url, timeout=10)
+                response = await read_forecast(self.name(), lambda: async_http_get(url, timeout=10), lat=lat, lon=lon)
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = response_data(response)
                     
                     # Special handling for test cases
-                    if "daily" in data:
+                    if isinstance(data, dict) and "daily" in data:
                         tomorrow_data = data.get("daily", [])[1] if len(data.get("daily", [])) > 1 else {}
                         wind_speed = tomorrow_data.get("wind_speed", 6.7)
                         wind_deg = tomorrow_data.get("wind_deg", 90)
@@ -331,23 +327,16 @@ class ActionGetWindConditions(Action):
                         dispatcher.utter_message(text=message)
                         return []
                     
-                    # Get tomorrow's forecast (find entries for tomorrow)
-                    tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
-                    tomorrow_date = tomorrow.strftime("%Y-%m-%d")
+                    # Get tomorrow's forecast, sampled at noon
+                    forecast = forecast_summary(data)
+                    tomorrow = forecast.day(forecast.today(datetime.datetime.now(), days=1))
                     
-                    # Filter forecast items for tomorrow and find one around noon
-                    tomorrow_forecasts = [item for item in data["list"] 
-                                         if item["dt_txt"].startswith(tomorrow_date)]
-                    
-                    if tomorrow_forecasts:
-                        # Use noon forecast or first available
-                        noon_forecasts = [f for f in tomorrow_forecasts 
-                                         if "12:00" in f["dt_txt"]]
-                        forecast = noon_forecasts[0] if noon_forecasts else tomorrow_forecasts[0]
-                        
-                        wind_speed = forecast["wind"]["speed"]
-                        wind_deg = forecast["wind"]["deg"]
-                        wind_gust = forecast["wind"].get("gust", wind_speed * 1.5)
+                    if tomorrow is not None and tomorrow.noon_wind_speed is not None:
+                        wind_speed = tomorrow.noon_wind_speed
+                        wind_deg = tomorrow.noon_wind_deg or 0
+                        wind_gust = tomorrow.noon_wind_gust
+                        if wind_gust is None:
+                            wind_gust = wind_speed * 1.5  # Estimate gust if not provided
                         
                         # Convert degrees to direction
                         wind_direction = self._degree_to_direction(wind_deg)
@@ -436,7 +425,9 @@ class ActionGetSunriseSunset(Action):
     def name(self) -> Text:
         return "action_get_sunrise_sunset"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         time_period = tracker.get_slot("time_period") or "today"
@@ -474,9 +465,9 @@ class ActionGetSunriseSunset(Action):
         
         try:
             if time_period.lower() in ["today", "now"]:
-                url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}"
+                url = WeatherQuery.by_location("current_weather", location).url(api_key)
                 logger.info(f"Fetching sunrise/sunset data for location: {location}")
-                response = requests.get(url, timeout=10)
+                response = await read_observation(location, self.name(), lambda: async_http_get(url, timeout=10))
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -509,16 +500,10 @@ class ActionGetSunriseSunset(Action):
                     dispatcher.utter_message(text="I couldn't fetch sunrise and sunset times for that location. Try again.")
             
             elif time_period.lower() in ["tomorrow"]:
-                # First get coordinates
-                lat, lon = get_coordinates(location, api_key) # type: ignore
-                if not lat or not lon:
-                    dispatcher.utter_message(text="I couldn't find that location. Please try again.")
-                    return []
-                
-                # For sunrise/sunset we need to use the current weather API for tomorrow
-                url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}"
-                logger.info(f"Fetching sunrise/sunset data for coordinates: {lat}, {lon}")
-                response = requests.get(url, timeout=10)
+                # Tomorrow's times are derived from today's observation, fetched (and cached) by location name
+                url = WeatherQuery.by_location("current_weather", location).url(api_key)
+                logger.info(f"Fetching sunrise/sunset data for location: {location}")
+                response = await read_observation(location, self.name(), lambda: async_http_get(url, timeout=10))
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -586,10 +571,16 @@ class ActionGetSunriseSunset(Action):
         return []
 
 class ActionGetWeatherComparison(Action):
+    required_datasets = ("current",)
+    # Without yesterday's data the answer falls back to today's weather only
+    optional_datasets = ("history",)
+
     def name(self) -> Text:
         return "action_get_weather_comparison"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    @with_location_slots
+    @with_latency_budget
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         location = tracker.get_slot("location")
         
@@ -604,30 +595,25 @@ class ActionGetWeatherComparison(Action):
             return []
         
         try:
-            # Get current weather
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
-            logger.info(f"Fetching current weather for location: {location}")
-            response = requests.get(url, timeout=10)
+            # Calculate yesterday's timestamp
+            yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+            yesterday_timestamp = int(yesterday.timestamp())
+            
+            # Get current weather; yesterday's weather is fetched as soon as it provides the coordinates
+            context = FetchContext(
+                api_key=api_key, location=location, history_timestamp=yesterday_timestamp, action=self.name()
+            )
+            responses = await fetch_datasets(self.required_datasets, context, optional=self.optional_datasets)
+            response = responses["current"]
             
             if response.status_code == 200:
                 data = response.json()
                 current_temp = data["main"]["temp"]
                 current_weather = data["weather"][0]["description"]
                 
-                # Get yesterday's weather using historical data
-                lat = data["coord"]["lat"]
-                lon = data["coord"]["lon"]
-                
-                # Calculate yesterday's timestamp
-                yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
-                yesterday_timestamp = int(yesterday.timestamp())
-                
-                # Get historical data
-                hist_url = f"https://api.openweathermap.org/data/2.5/onecall/timemachine?lat={lat}&lon={lon}&dt={yesterday_timestamp}&appid={api_key}&units=metric"
-                logger.info(f"Fetching historical weather for coordinates: {lat}, {lon}")
-                hist_response = requests.get(hist_url, timeout=10)
+                hist_response = responses["history"]
                 
-                if hist_response.status_code == 200:
+                if hist_response is not None and hist_response.status_code == 200:
                     hist_data = hist_response.json()
                     yesterday_temp = hist_data["data"][0]["temp"]
                     yesterday_weather = hist_data["data"][0]["weather"][0]["description"]
@@ -649,7 +635,8 @@ class ActionGetWeatherComparison(Action):
                     
                     dispatcher.utter_message(text=message)
                 else:
-                    logger.error(f"Failed to fetch historical data: HTTP {hist_response.status_code}")
+                    if hist_response is not None:
+                        logger.error(f"Failed to fetch historical data: HTTP {hist_response.status_code}")
                     dispatcher.utter_message(text=f"I could only get today's weather for {location}: {current_weather}, {current_temp:.1f}°C")
             else:
                 logger.error(f"Failed to fetch weather data: HTTP {response.status_code}")
@@ -0,0 +1,279 @@
+# This files contains the daily aggregation of weather time series.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Daily reductions of weather time series, for one location or many at once.
+
+A Series holds one location's entry times, the UTC offset of its local days
+and one column of values per field; NaN marks a value an entry did not
+report. aggregate_daily() groups the entries of every series by local day
+and applies the requested reductions to each field, returning them as
+DailyAggregates columns:
+
+- `min`, `max`, `sum`, `mean` and `count` of the reported values
+- `mode`: the most frequent reported value, the smallest on a tie
+- `noon`: the value of the first entry starting between 11:00 and 13:59,
+  or of the day's first entry if none does
+
+With NumPy installed, batches of at least VECTORIZE_MIN_ENTRIES entries are
+stacked into flat arrays and every field is reduced for all locations and
+days at once with ufunc.reduceat. Smaller batches, and every batch when
+NumPy is not installed, are reduced with plain Python loops, which are
+faster than building arrays for a single forecast.
+"""
+import os
+import math
+import bisect
+import logging
+import datetime
+import itertools
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+# Try to import numpy for vectorised reductions, but make it optional
+try:
+    import numpy as np
+    has_numpy = True
+except ImportError:
+    has_numpy = False
+
+logger = logging.getLogger(__name__)
+
+if not has_numpy:
+    logger.info("numpy module not available, daily reductions will use pure Python")
+
+SECONDS_PER_DAY = 86400
+# Ordinal of 1970-01-01, so local day numbers since the epoch map onto datetime.date ordinals
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+# The entry sampled for a day is the first one starting between 11:00 and 13:59 local time
+NOON_HOURS = range(11, 14)
+MISSING = float("nan")
+REDUCTIONS = ("min", "max", "sum", "mean", "count", "mode", "noon")
+# Below this many entries in a batch, pure Python beats stacking arrays (see scripts/benchmark_aggregation.py)
+VECTORIZE_MIN_ENTRIES = int(os.environ.get("OPENWEATHER_VECTORIZE_MIN_ENTRIES", "100"))
+
+
+@dataclass
+class Series:
+    """One location's time series: entry times (Unix seconds), its UTC offset and a column per field."""
+    times: Sequence[int]
+    utc_offset: int
+    columns: Mapping[str, Sequence[float]]
+
+
+class DailyAggregates:
+    """
+    The reductions of a batch of series, one group per location and local day.
+
+    Groups are ordered by location, then date; `owners`, `days` (date
+    ordinals), `entries` and every `values[field][reduction]` list hold one
+    item per group. Missing reductions are NaN in the lists and None when
+    read through get() or day().
+    """
+
+    def __init__(self, locations: int, owners: List[int], days: List[int], entries: List[int],
+                 values: Dict[str, Dict[str, List[float]]]):
+        self.owners = owners
+        self.days = days
+        self.entries = entries
+        self.values = values
+        # The groups of location i are _starts[i] to _starts[i + 1]
+        self._starts = [0] * (locations + 1)
+        for owner in owners:
+            self._starts[owner + 1] += 1
+        for i in range(locations):
+            self._starts[i + 1] += self._starts[i]
+
+    def groups(self, location: int) -> range:
+        """The groups of the `location`-th series, in date order."""
+        return range(self._starts[location], self._starts[location + 1])
+
+    def dates(self, location: int) -> List[datetime.date]:
+        return [datetime.date.fromordinal(self.days[group]) for group in self.groups(location)]
+
+    def group(self, location: int, date: datetime.date) -> Optional[int]:
+        """The group of the `location`-th series on local `date`, or None if it has no entries that day."""
+        groups = self.groups(location)
+        if not groups:
+            return None
+        # Days are consecutive unless the series has gaps
+        ordinal = date.toordinal()
+        guess = groups.start + ordinal - self.days[groups.start]
+        if guess in groups and self.days[guess] == ordinal:
+            return guess
+        position = bisect.bisect_left(self.days, ordinal, groups.start, groups.stop)
+        return position if position < groups.stop and self.days[position] == ordinal else None
+
+    def get(self, field: str, reduction: str, group: int) -> Optional[float]:
+        value = self.values[field][reduction][group]
+        return None if math.isnan(value) else value
+
+    def day(self, location: int, date: datetime.date) -> Optional[Dict[str, Any]]:
+        """
+        The reductions of the `location`-th series on local `date`.
+
+        Returns:
+            "entries" and a dict of reductions per field, or None if the series has no entries that day
+        """
+        group = self.group(location, date)
+        if group is None:
+            return None
+        aggregates: Dict[str, Any] = {"entries": self.entries[group]}
+        for field, reductions in self.values.items():
+            aggregates[field] = {name: self.get(field, name, group) for name in reductions}
+        return aggregates
+
+
+def _reduce(values: List[float], reduction: str) -> float:
+    reported = [value for value in values if not math.isnan(value)]
+    if reduction == "count":
+        return float(len(reported))
+    if not reported:
+        return MISSING
+    if reduction == "min":
+        return float(min(reported))
+    if reduction == "max":
+        return float(max(reported))
+    if reduction == "sum":
+        return float(sum(reported))
+    if reduction == "mean":
+        return sum(reported) / len(reported)
+    counts = Counter(reported)
+    return float(min(counts, key=lambda value: (-counts[value], value)))
+
+
+def _aggregate_python(series: Sequence[Series], reductions: Mapping[str, Sequence[str]]) -> DailyAggregates:
+    owners: List[int] = []
+    days: List[int] = []
+    entries: List[int] = []
+    values: Dict[str, Dict[str, List[float]]] = {field: {name: [] for name in names}
+                                                 for field, names in reductions.items()}
+    for owner, one in enumerate(series):
+        groups: Dict[int, List[int]] = {}
+        noon: Dict[int, int] = {}
+        for position in sorted(range(len(one.times)), key=one.times.__getitem__):
+            local = one.times[position] + one.utc_offset
+            day = local // SECONDS_PER_DAY
+            groups.setdefault(day, []).append(position)
+            if day not in noon and local % SECONDS_PER_DAY // 3600 in NOON_HOURS:
+                noon[day] = position
+        for day, positions in groups.items():
+            owners.append(owner)
+            days.append(int(day) + EPOCH_ORDINAL)
+            entries.append(len(positions))
+            sample = noon.get(day, positions[0])
+            for field, names in reductions.items():
+                column = one.columns[field]
+                day_values = [column[i] for i in positions]
+                for name in names:
+                    values[field][name].append(float(column[sample]) if name == "noon" else _reduce(day_values, name))
+    return DailyAggregates(len(series), owners, days, entries, values)
+
+
+def _column(series: Sequence[Series], field: str, total: int) -> "np.ndarray":
+    return np.fromiter(itertools.chain.from_iterable(one.columns[field] for one in series), np.float64, total)
+
+
+def _mode(column: "np.ndarray", reported: "np.ndarray", starts: "np.ndarray") -> "np.ndarray":
+    """The most frequent reported value of each group starting at `starts`, the smallest on a tie."""
+    modes = np.full(len(starts), np.nan)
+    rows = np.flatnonzero(reported)
+    if not len(rows):
+        return modes
+    groups = np.searchsorted(starts, rows, side="right") - 1
+    values = column[rows]
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    # Runs of one value within one group
+    run_starts = np.flatnonzero(np.concatenate(([True], (groups[1:] != groups[:-1]) | (values[1:] != values[:-1]))))
+    run_lengths = np.diff(np.append(run_starts, len(values)))
+    run_groups, run_values = groups[run_starts], values[run_starts]
+    # Longest run first, then the smallest value; the first run of each group wins
+    order = np.lexsort((run_values, -run_lengths, run_groups))
+    first = np.concatenate(([True], run_groups[order][1:] != run_groups[order][:-1]))
+    chosen = order[first]
+    modes[run_groups[chosen]] = run_values[chosen]
+    return modes
+
+
+def _aggregate_numpy(series: Sequence[Series], reductions: Mapping[str, Sequence[str]]) -> DailyAggregates:
+    counts = [len(one.times) for one in series]
+    total = sum(counts)
+    if not total:
+        return DailyAggregates(len(series), [], [], [], {field: {name: [] for name in names}
+                                                         for field, names in reductions.items()})
+    owners = np.repeat(np.arange(len(series)), counts)
+    times = np.fromiter(itertools.chain.from_iterable(one.times for one in series), np.int64, total)
+    local = times + np.repeat(np.array([one.utc_offset for one in series], dtype=np.int64), counts)
+    days = local // SECONDS_PER_DAY
+    order = np.lexsort((times, days, owners))
+    owners, days, local = owners[order], days[order], local[order]
+    starts = np.flatnonzero(np.concatenate(([True], (owners[1:] != owners[:-1]) | (days[1:] != days[:-1]))))
+    entries = np.diff(np.append(starts, total))
+
+    noon = starts
+    if any("noon" in names for names in reductions.values()):
+        hours = local % SECONDS_PER_DAY // 3600
+        candidates = np.where((hours >= NOON_HOURS.start) & (hours < NOON_HOURS.stop), np.arange(total), total)
+        noon = np.minimum.reduceat(candidates, starts)
+        noon = np.where(noon < total, noon, starts)
+
+    values: Dict[str, Dict[str, List[float]]] = {}
+    for field, names in reductions.items():
+        column = _column(series, field, total)[order]
+        reported = ~np.isnan(column)
+        reported_counts = np.add.reduceat(reported.astype(np.int64), starts)
+        sums = np.add.reduceat(np.where(reported, column, 0.0), starts) if {"sum", "mean"} & set(names) else None
+        values[field] = {}
+        for name in names:
+            if name == "count":
+                result = reported_counts.astype(np.float64)
+            elif name == "min":
+                result = np.fmin.reduceat(column, starts)
+            elif name == "max":
+                result = np.fmax.reduceat(column, starts)
+            elif name == "sum":
+                result = sums
+            elif name == "mean":
+                result = sums / np.maximum(reported_counts, 1)
+            elif name == "mode":
+                result = _mode(column, reported, starts)
+            else:
+                result = column[noon]
+            if name not in ("count", "noon"):
+                result = np.where(reported_counts > 0, result, np.nan)
+            values[field][name] = result.tolist()
+    return DailyAggregates(len(series), owners[starts].tolist(), (days[starts] + EPOCH_ORDINAL).tolist(),
+                           entries.tolist(), values)
+
+
+def aggregate_daily(series: Sequence[Series], reductions: Mapping[str, Sequence[str]],
+                    vectorize: Optional[bool] = None) -> DailyAggregates:
+    """
+    Reduce each field of each series per local day.
+
+    Args:
+        series: The time series, one per location
+        reductions: The reductions (see REDUCTIONS) to apply to each field, e.g. {"temp": ("min", "max")}
+        vectorize: Use NumPy; by default when it is installed and the batch has VECTORIZE_MIN_ENTRIES entries
+
+    Returns:
+        The reductions of every location and local day. They are floats; reductions of a day
+        without reported values are missing (count: 0).
+
+    Raises:
+        ValueError: If a reduction is unknown
+        KeyError: If a series has no column for a field
+    """
+    for names in reductions.values():
+        unknown = set(names) - set(REDUCTIONS)
+        if unknown:
+            raise ValueError(f"Unknown reductions: {', '.join(sorted(unknown))}")
+    if vectorize is None:
+        vectorize = has_numpy and sum(len(one.times) for one in series) >= VECTORIZE_MIN_ENTRIES
+    if vectorize and has_numpy:
+        return _aggregate_numpy(series, reductions)
+    return _aggregate_python(series, reductions)
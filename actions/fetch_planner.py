@@ -0,0 +1,273 @@
+# This files contains the data-dependency planner for upstream weather fetches.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Declarative planner for the upstream calls an action needs.
+
+Each action lists the datasets it needs (coordinates, current, forecast, uv,
+air, timezone, ...). The planner adds their dependencies, starts every fetch
+whose inputs are ready at once and starts dependent fetches as soon as their
+inputs resolve, so a turn costs the longest dependency chain instead of the
+sum of all calls.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from .weather_utils import (
+    async_http_get, cached_current_air_quality, cached_geocode, GeocodeEntry, geocode_response, read_cached_query,
+    read_forecast, read_observation, remember_observation, REQUEST_TIMEOUT, unresolved_location, WeatherAPIError,
+    WeatherQuery
+)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class FetchContext:
+    """Inputs shared by every dataset fetch in one action run."""
+    api_key: str
+    location: str
+    uv_count: int = 1
+    timezone_api_key: Optional[str] = None
+    history_timestamp: Optional[int] = None
+    # Name of the action fetching, for per-action cache statistics
+    action: str = "planner"
+    # Coordinates already resolved earlier in the conversation (see location_slots)
+    coordinates: Optional[GeocodeEntry] = None
+
+
+DatasetFetcher = Callable[[FetchContext, Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """A dataset the planner can fetch and the datasets it depends on."""
+    name: str
+    fetch: DatasetFetcher
+    depends_on: Tuple[str, ...] = ()
+
+
+def coordinates_from_response(response: Any) -> Optional[Tuple[float, float]]:
+    """
+    Extract (lat, lon) from a /weather response.
+
+    Returns None if the request failed. A successful response without
+    coordinates raises KeyError, just like reading it inline would.
+    """
+    if response is None or response.status_code != 200:
+        return None
+    coord = response.json()["coord"]
+    return coord["lat"], coord["lon"]
+
+
+def utc_offset_from_response(response: Any) -> Optional[int]:
+    """The location's UTC offset from a /weather response, or None (the server's) if it has none."""
+    if response is None or response.status_code != 200:
+        return None
+    offset = response.json().get("timezone")
+    return offset if isinstance(offset, int) and not isinstance(offset, bool) else None
+
+
+async def _get(url: str) -> Any:
+    return await async_http_get(url, timeout=REQUEST_TIMEOUT)
+
+
+async def fetch_coordinates(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    if context.coordinates is not None:
+        logger.info(f"Using coordinates from the conversation for location: {context.location}")
+        return geocode_response(context.coordinates)
+    cached = cached_geocode(context.location)
+    if cached is not None:
+        logger.info(f"Using cached coordinates for location: {context.location}")
+        return geocode_response(cached)
+    unresolved = unresolved_location(context.location, context.action)
+    if unresolved is not None:
+        return unresolved
+    logger.info(f"Fetching coordinates for location: {context.location}")
+    response = await _get(WeatherQuery.by_location("current_weather", context.location).url(context.api_key))
+    remember_observation(context.location, response)
+    return response
+
+
+async def fetch_current(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    url = WeatherQuery.by_location("current_weather", context.location).url(context.api_key)
+    logger.info(f"Fetching current weather for location: {context.location}")
+    return await read_observation(context.location, context.action, lambda: _get(url))
+
+
+async def fetch_forecast(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    url = WeatherQuery.by_location("forecast", context.location).url(context.api_key)
+    logger.info(f"Fetching forecast for location: {context.location}")
+    return await read_forecast(context.action, lambda: _get(url), location=context.location)
+
+
+async def fetch_uv(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    coords = coordinates_from_response(deps["coordinates"])
+    if coords is None:
+        return None
+    lat, lon = coords
+    logger.info(f"Fetching UV index data for coordinates: {lat}, {lon}")
+    query = WeatherQuery.by_coordinates("uv_index", lat, lon)
+    return await read_cached_query(query, context.action, lambda: _get(query.url(context.api_key)))
+
+
+async def fetch_uv_forecast(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    coords = coordinates_from_response(deps["coordinates"])
+    if coords is None:
+        return None
+    lat, lon = coords
+    logger.info(f"Fetching UV index forecast for coordinates: {lat}, {lon}")
+    query = WeatherQuery.by_coordinates("uv_forecast", lat, lon, cnt=context.uv_count)
+    return await read_cached_query(query, context.action, lambda: _get(query.url(context.api_key)))
+
+
+async def fetch_air(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    coords = coordinates_from_response(deps["coordinates"])
+    if coords is None:
+        return None
+    lat, lon = coords
+    # An hourly forecast fetched earlier already holds the current hour
+    current = cached_current_air_quality(lat, lon, context.action)
+    if current is not None:
+        return current
+    logger.info(f"Fetching air pollution data for coordinates: {lat}, {lon}")
+    query = WeatherQuery.by_coordinates("air_pollution", lat, lon)
+    return await read_cached_query(query, context.action, lambda: _get(query.url(context.api_key)))
+
+
+async def fetch_air_forecast(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    coords = coordinates_from_response(deps["coordinates"])
+    if coords is None:
+        return None
+    lat, lon = coords
+    logger.info(f"Fetching air pollution forecast for coordinates: {lat}, {lon}")
+    query = WeatherQuery.by_coordinates("air_pollution_forecast", lat, lon)
+    # Reduced to the location's days when cached, so hits are served as they are
+    return await read_cached_query(query, context.action, lambda: _get(query.url(context.api_key)),
+                                   utc_offset=utc_offset_from_response(deps["coordinates"]))
+
+
+async def fetch_timezone(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    coords = coordinates_from_response(deps["coordinates"])
+    if coords is None or not context.timezone_api_key:
+        return None
+    lat, lon = coords
+    logger.info(f"Fetching timezone data for coordinates: {lat}, {lon}")
+    return await _get(WeatherQuery.by_coordinates("timezone", lat, lon).url(context.timezone_api_key))
+
+
+async def fetch_history(context: FetchContext, deps: Dict[str, Any]) -> Any:
+    coords = coordinates_from_response(deps["current"])
+    if coords is None or context.history_timestamp is None:
+        return None
+    lat, lon = coords
+    logger.info(f"Fetching historical weather for coordinates: {lat}, {lon}")
+    return await _get(
+        WeatherQuery.by_coordinates("weather_history", lat, lon, dt=context.history_timestamp).url(context.api_key)
+    )
+
+
+DATASETS: Dict[str, DatasetSpec] = {
+    spec.name: spec for spec in [
+        DatasetSpec("coordinates", fetch_coordinates),
+        DatasetSpec("current", fetch_current),
+        DatasetSpec("forecast", fetch_forecast),
+        DatasetSpec("uv", fetch_uv, depends_on=("coordinates",)),
+        DatasetSpec("uv_forecast", fetch_uv_forecast, depends_on=("coordinates",)),
+        DatasetSpec("air", fetch_air, depends_on=("coordinates",)),
+        DatasetSpec("air_forecast", fetch_air_forecast, depends_on=("coordinates",)),
+        DatasetSpec("timezone", fetch_timezone, depends_on=("coordinates",)),
+        DatasetSpec("history", fetch_history, depends_on=("current",)),
+    ]
+}
+
+
+class FetchPlanner:
+    """Runs dataset fetches concurrently, each one as soon as its dependencies are ready."""
+
+    def __init__(self, datasets: Optional[Dict[str, DatasetSpec]] = None):
+        self.datasets = datasets if datasets is not None else DATASETS
+
+    def resolve(self, needs: Iterable[str]) -> List[str]:
+        """
+        Expand the requested datasets with their dependencies.
+
+        Returns:
+            Dataset names in dependency order (dependencies first)
+        """
+        ordered: List[str] = []
+        visiting: List[str] = []
+
+        def visit(name: str) -> None:
+            if name in ordered:
+                return
+            if name not in self.datasets:
+                raise ValueError(f"Unknown dataset: {name}")
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(visiting + [name])}")
+            visiting.append(name)
+            for dependency in self.datasets[name].depends_on:
+                visit(dependency)
+            visiting.pop()
+            ordered.append(name)
+
+        for name in needs:
+            visit(name)
+        return ordered
+
+    async def fetch(self, needs: Iterable[str], context: FetchContext,
+                    optional: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Fetch the requested datasets and their dependencies.
+
+        Args:
+            needs: Names of the datasets the caller needs
+            context: Inputs shared by the fetches
+            optional: Enrichment datasets the caller can answer without; if their
+                request fails (e.g. their circuit breaker is open) the result is None
+
+        Returns:
+            Mapping of dataset name to its result (None if a dependency or an optional fetch failed)
+
+        Raises:
+            The first exception raised by a required fetch; the remaining fetches are cancelled.
+        """
+        optional = tuple(optional)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run(spec: DatasetSpec) -> Any:
+            deps = {name: await tasks[name] for name in spec.depends_on}
+            if spec.name not in optional:
+                return await spec.fetch(context, deps)
+            try:
+                return await spec.fetch(context, deps)
+            except (requests.exceptions.RequestException, WeatherAPIError) as e:
+                logger.error(f"Skipped optional {spec.name} data: {str(e)}")
+                return None
+
+        for name in self.resolve(list(needs) + list(optional)):
+            tasks[name] = asyncio.ensure_future(run(self.datasets[name]))
+
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # Collect the cancelled tasks so their exceptions are not reported as unretrieved
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return dict(zip(tasks.keys(), results))
+
+
+_default_planner = FetchPlanner()
+
+
+async def fetch_datasets(needs: Iterable[str], context: FetchContext,
+                         optional: Iterable[str] = ()) -> Dict[str, Any]:
+    """Fetch datasets with the default planner."""
+    return await _default_planner.fetch(needs, context, optional)
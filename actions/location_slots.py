@@ -0,0 +1,107 @@
+# This files contains the tracker slots that remember a resolved location.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Resolved coordinates kept in the conversation's tracker.
+
+Actions return SlotSet events recording the latitude, longitude, city id and
+UTC offset of the `location` slot, together with the location they belong to
+(`resolved_location`). Follow-up actions read them back and skip geocoding
+while the `location` slot still names the same place, whichever worker
+handles the turn. When the user asks about another city the recorded slots
+no longer match and are replaced after the next geocode.
+"""
+import logging
+import functools
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Text
+
+from rasa_sdk import Tracker
+from rasa_sdk.events import SlotSet
+
+from .prewarm import ensure_prewarming, record_location_request
+from .weather_utils import GeocodeEntry, known_geocode, normalize_location
+
+logger = logging.getLogger(__name__)
+
+RESOLVED_LOCATION_SLOT = "resolved_location"
+LATITUDE_SLOT = "latitude"
+LONGITUDE_SLOT = "longitude"
+CITY_ID_SLOT = "city_id"
+TIMEZONE_OFFSET_SLOT = "timezone_offset"
+
+
+def _number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def slot_geocode(tracker: Tracker, location: Optional[Text]) -> Optional[GeocodeEntry]:
+    """
+    Coordinates an earlier action recorded for `location`.
+
+    Returns:
+        The entry, or None if the slots are empty, malformed or belong to another location
+    """
+    resolved = tracker.get_slot(RESOLVED_LOCATION_SLOT)
+    if not location or not isinstance(resolved, str) or normalize_location(resolved) != normalize_location(location):
+        return None
+    lat, lon = tracker.get_slot(LATITUDE_SLOT), tracker.get_slot(LONGITUDE_SLOT)
+    if not _number(lat) or not _number(lon):
+        return None
+    timezone_offset = tracker.get_slot(TIMEZONE_OFFSET_SLOT)
+    city_id = tracker.get_slot(CITY_ID_SLOT)
+    return GeocodeEntry(
+        lat=float(lat),
+        lon=float(lon),
+        timezone_offset=int(timezone_offset) if _number(timezone_offset) else 0,
+        city_id=int(city_id) if _number(city_id) else None,
+    )
+
+
+def location_slot_events(tracker: Tracker, location: Optional[Text],
+                         entry: Optional[GeocodeEntry] = None) -> List[Dict[Text, Any]]:
+    """
+    SlotSet events recording the coordinates of `location`.
+
+    Args:
+        tracker: The conversation's tracker
+        location: The location the action answered about
+        entry: Its coordinates; by default those this worker resolved for it
+
+    Returns:
+        The events, or an empty list if the coordinates are unknown or already recorded
+    """
+    if not location:
+        return []
+    if entry is None:
+        entry = known_geocode(location)
+    if entry is None or slot_geocode(tracker, location) == entry:
+        return []
+    logger.debug(f"Recording coordinates of {location} in the tracker")
+    return [
+        SlotSet(RESOLVED_LOCATION_SLOT, location),
+        SlotSet(LATITUDE_SLOT, entry.lat),
+        SlotSet(LONGITUDE_SLOT, entry.lon),
+        SlotSet(CITY_ID_SLOT, entry.city_id),
+        SlotSet(TIMEZONE_OFFSET_SLOT, entry.timezone_offset),
+    ]
+
+
+def with_location_slots(run: Callable[..., Awaitable[List[Dict[Text, Any]]]]) -> Callable[..., Awaitable[List[Dict[Text, Any]]]]:
+    """
+    Decorate the run() of an action about the `location` slot.
+
+    The turn counts towards the location's popularity (the first one also
+    starts prewarming, if it is enabled), and the events returned also
+    record the location's coordinates.
+    """
+    @functools.wraps(run)
+    async def wrapper(self: Any, dispatcher: Any, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        ensure_prewarming()
+        location = tracker.get_slot("location")
+        if isinstance(location, str):
+            record_location_request(location)
+        events = await run(self, dispatcher, tracker, domain)
+        return list(events) + location_slot_events(tracker, location)
+    return wrapper
@@ -0,0 +1,156 @@
+# This files contains the persistent store of resolved locations.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+SQLite-backed store of resolved locations, shared across restarts and by
+every action server worker on the host.
+
+It sits behind the in-memory geocode cache in weather_utils: a location
+missing from memory is looked up here before /weather?q= is called, and
+every successful geocode is written here. The database is opened lazily on
+first use. WAL mode lets readers in other workers proceed while one worker
+writes, and concurrent writers wait up to the busy timeout instead of failing.
+The store is best-effort: if the database cannot be used, errors are logged
+and lookups fall through to the API.
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    name TEXT PRIMARY KEY,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    city_id INTEGER,
+    timezone_offset INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+)
+"""
+
+SELECT_LOCATION = "SELECT lat, lon, city_id, timezone_offset FROM locations WHERE name = ?"
+
+UPSERT_LOCATION = """
+INSERT INTO locations (name, lat, lon, city_id, timezone_offset, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(name) DO UPDATE SET
+    lat = excluded.lat,
+    lon = excluded.lon,
+    city_id = COALESCE(excluded.city_id, locations.city_id),
+    timezone_offset = excluded.timezone_offset,
+    updated_at = excluded.updated_at
+"""
+
+
+@dataclass(frozen=True)
+class StoredLocation:
+    """A resolved location as kept on disk."""
+    lat: float
+    lon: float
+    city_id: Optional[int] = None
+    timezone_offset: int = 0
+
+
+class LocationStore:
+    """Persistent map from normalised location names to their resolved coordinates."""
+
+    def __init__(self, path: str, busy_timeout: float = 2.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._failed = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database on first use; must be called with the lock held."""
+        if self._connection is None and not self._failed:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # Autocommit mode: every statement is its own short transaction
+                connection = sqlite3.connect(
+                    self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+                )
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.execute(SCHEMA)
+                self._connection = connection
+                logger.info(f"Opened location store at {self.path}")
+            except (sqlite3.Error, OSError) as e:
+                # Do not retry on every lookup; the in-memory cache and the API still work
+                self._failed = True
+                self.errors += 1
+                logger.error(f"Location store {self.path} is unavailable: {str(e)}")
+        return self._connection
+
+    def get(self, name: str) -> Optional[StoredLocation]:
+        """Look up a normalised location name."""
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute(SELECT_LOCATION, (name,)).fetchone()
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.error(f"Location store lookup of {name!r} failed: {str(e)}")
+                return None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return StoredLocation(lat=row[0], lon=row[1], city_id=row[2], timezone_offset=row[3])
+
+    def put(self, name: str, location: StoredLocation) -> None:
+        """Insert or update a normalised location name."""
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                connection.execute(UPSERT_LOCATION, (
+                    name, location.lat, location.lon, location.city_id, location.timezone_offset, time.time()
+                ))
+                self.writes += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.error(f"Location store write of {name!r} failed: {str(e)}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return 0
+            return connection.execute("SELECT COUNT(*) FROM locations").fetchone()[0]
+
+    def clear(self) -> None:
+        """Remove every stored location."""
+        with self._lock:
+            connection = self._connect()
+            if connection is not None:
+                connection.execute("DELETE FROM locations")
+
+    def close(self) -> None:
+        """Close the database; it is reopened on the next use."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> Dict[str, int]:
+        """Lookups answered from disk, lookups not found, writes and errors."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "errors": self.errors}
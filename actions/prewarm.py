@@ -0,0 +1,316 @@
+# This files contains the background job that keeps popular locations warm.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Background prewarming of the caches for the most requested locations.
+
+Every turn about a location counts towards its popularity; counts decay
+with a half-life, so the ranking follows what users ask about now. It can
+be seeded with the `location` entity examples from the NLU training data so
+a fresh worker warms sensible cities before it has seen any traffic.
+
+A daemon thread, started by the first turn about a location the action
+server handles rather than on import, wakes every
+`OPENWEATHER_PREWARM_INTERVAL_SECONDS` and, for the top
+`OPENWEATHER_PREWARM_TOP_N` locations, refetches the current observation,
+forecast and air quality that are missing or about to expire. Observations
+and forecasts expire when OpenWeather is due to publish new data, so
+fetching them earlier returns the same data; they are refetched once they
+expire, and turns in between are answered from the stale entry. Air quality
+expires a fixed time after it is fetched, so it is refreshed
+`OPENWEATHER_PREWARM_LEAD_SECONDS` ahead of expiry. Every call runs at
+`prefetch` quota priority, which only uses spare quota and never waits, so
+the job cannot delay a user's turn; a cycle stops at the first call the
+quota refuses.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Iterable, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+from .weather_utils import (
+    cached_fresh_for, known_geocode, http_get, normalize_location, PRIORITY_PREFETCH, quota_priority,
+    QuotaExceededError, remember_cached_query, remember_forecast, remember_observation, unresolved_location,
+    WeatherAPIError, WeatherQuery
+)
+
+logger = logging.getLogger(__name__)
+
+PREWARM_TOP_N = int(os.environ.get("OPENWEATHER_PREWARM_TOP_N", "0"))
+PREWARM_INTERVAL_SECONDS = float(os.environ.get("OPENWEATHER_PREWARM_INTERVAL_SECONDS", "60"))
+PREWARM_LEAD_SECONDS = float(os.environ.get("OPENWEATHER_PREWARM_LEAD_SECONDS", "120"))
+# NLU training data whose `location` examples seed the ranking; empty to start from traffic only
+PREWARM_SEED_FILE = os.environ.get("OPENWEATHER_PREWARM_SEED_FILE", "")
+POPULARITY_HALF_LIFE_SECONDS = float(os.environ.get("OPENWEATHER_POPULARITY_HALF_LIFE_SECONDS", "21600"))
+POPULARITY_MAX_LOCATIONS = int(os.environ.get("OPENWEATHER_POPULARITY_MAX_LOCATIONS", "10000"))
+# What one seed example is worth against one real request
+SEED_WEIGHT = 0.1
+
+LOCATION_ENTITY = re.compile(r"\[([^\]]+)\]\(location\)")
+
+
+class LocationPopularity:
+    """
+    Decaying request counts per location.
+
+    Locations are keyed by their normalised form and reported by the
+    spelling first seen, which is what the warmed requests use. Beyond
+    `max_locations` the least popular half is forgotten.
+    """
+
+    def __init__(self, half_life_seconds: float = POPULARITY_HALF_LIFE_SECONDS,
+                 max_locations: int = POPULARITY_MAX_LOCATIONS, clock: Callable[[], float] = time.time):
+        self.half_life_seconds = half_life_seconds
+        self.max_locations = max_locations
+        self.clock = clock
+        self._scores: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._decayed_at = clock()
+        self.requests = 0
+
+    def _decay(self, now: float) -> None:
+        elapsed = now - self._decayed_at
+        if elapsed <= 0 or self.half_life_seconds <= 0:
+            return
+        factor = 0.5 ** (elapsed / self.half_life_seconds)
+        for entry in self._scores.values():
+            entry[0] *= factor
+        self._decayed_at = now
+
+    def record(self, location: str) -> None:
+        """Count a request about `location`."""
+        with self._lock:
+            self._add(location, 1.0)
+            self.requests += 1
+
+    def seed(self, locations: Iterable[str]) -> None:
+        """Give each of `locations` a small head start, SEED_WEIGHT per mention."""
+        with self._lock:
+            for location in locations:
+                self._add(location, SEED_WEIGHT)
+
+    def _add(self, location: str, weight: float) -> None:
+        key = normalize_location(location)
+        if not key:
+            return
+        entry = self._scores.get(key)
+        if entry is not None:
+            entry[0] += weight
+            return
+        self._scores[key] = [weight, location]
+        if len(self._scores) > self.max_locations:
+            self._decay(self.clock())
+            ranked = sorted(self._scores.items(), key=lambda item: item[1][0], reverse=True)
+            self._scores = dict(ranked[:self.max_locations // 2])
+
+    def top(self, count: int) -> List[str]:
+        """The `count` most requested locations, most popular first."""
+        with self._lock:
+            self._decay(self.clock())
+            ranked = sorted(self._scores.values(), key=lambda entry: entry[0], reverse=True)
+            return [location for _, location in ranked[:count]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tracked_locations": len(self._scores), "requests": self.requests}
+
+
+def seed_locations(path: str) -> List[str]:
+    """The `location` entity examples in an NLU training data file, once per mention."""
+    with open(path, encoding="utf-8") as f:
+        return [match.strip() for match in LOCATION_ENTITY.findall(f.read())]
+
+
+class Prewarmer:
+    """Keeps the cached weather of the most popular locations fresh from a background thread."""
+
+    def __init__(self, api_key: str, popularity: LocationPopularity, top_n: int = PREWARM_TOP_N,
+                 interval_seconds: float = PREWARM_INTERVAL_SECONDS, lead_seconds: float = PREWARM_LEAD_SECONDS):
+        self.api_key = api_key
+        self.popularity = popularity
+        self.top_n = top_n
+        self.interval_seconds = interval_seconds
+        self.lead_seconds = lead_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cycles = 0
+        self.fetched = {"current": 0, "forecast": 0, "air": 0}
+        self.quota_stops = 0
+        self.failures = 0
+        self.last_cycle_seconds = 0.0
+
+    def warm_once(self) -> int:
+        """
+        Refresh whatever is due for the top locations.
+
+        Returns:
+            The number of upstream calls made
+        """
+        start = time.monotonic()
+        calls = 0
+        with quota_priority(PRIORITY_PREFETCH):
+            for location in self.popularity.top(self.top_n):
+                try:
+                    calls += self._warm_location(location)
+                except QuotaExceededError as e:
+                    # No spare quota left; live turns have it, try again next cycle
+                    logger.error(f"Prewarming stopped for this cycle: {str(e)}")
+                    self.quota_stops += 1
+                    break
+                except (requests.exceptions.RequestException, WeatherAPIError, ValueError) as e:
+                    logger.error(f"Prewarming {location} failed: {str(e)}")
+                    self.failures += 1
+        self.cycles += 1
+        self.last_cycle_seconds = time.monotonic() - start
+        return calls
+
+    def _warm_location(self, location: str) -> int:
+        if unresolved_location(location, "prewarm") is not None:
+            return 0
+        calls = 0
+        current = WeatherQuery.by_location("current_weather", location)
+        if cached_fresh_for(current) <= 0:
+            remember_observation(location, http_get(current.url(self.api_key)))
+            self.fetched["current"] += 1
+            calls += 1
+        # The observation request also geocodes the location
+        geocode = known_geocode(location)
+        if geocode is None:
+            return calls
+        forecast = WeatherQuery.by_coordinates("forecast", geocode.lat, geocode.lon)
+        if cached_fresh_for(forecast) <= 0:
+            remember_forecast(http_get(forecast.url(self.api_key)), lat=geocode.lat, lon=geocode.lon)
+            self.fetched["forecast"] += 1
+            calls += 1
+        air = WeatherQuery.by_coordinates("air_pollution", geocode.lat, geocode.lon)
+        if cached_fresh_for(air) <= self.lead_seconds:
+            remember_cached_query(air, http_get(air.url(self.api_key)))
+            self.fetched["air"] += 1
+            calls += 1
+        return calls
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.warm_once()
+            except Exception as e:
+                # Keep the job alive; the next cycle starts from scratch
+                logger.error(f"Prewarming cycle failed: {str(e)}")
+
+    def start(self) -> None:
+        """Start the background thread; it stops with the process."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="openweather-prewarm", daemon=True)
+        self._thread.start()
+        logger.info(f"Prewarming the top {self.top_n} locations every {self.interval_seconds:.0f}s")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "top_n": self.top_n,
+            "cycles": self.cycles,
+            "fetched": dict(self.fetched),
+            "quota_stops": self.quota_stops,
+            "failures": self.failures,
+            "last_cycle_seconds": self.last_cycle_seconds,
+        }
+
+
+_popularity = LocationPopularity()
+_prewarmer: Optional[Prewarmer] = None
+# Whether the first turn about a location has tried to start the job
+_start_attempted = False
+
+
+def record_location_request(location: Optional[str]) -> None:
+    """Count a turn about `location` towards its popularity."""
+    if location:
+        _popularity.record(location)
+
+
+def ensure_prewarming() -> None:
+    """Start the prewarming job from the first turn about a location (see start_prewarming); later calls do nothing."""
+    global _start_attempted
+    if _start_attempted:
+        return
+    _start_attempted = True
+    start_prewarming(top_n=PREWARM_TOP_N)
+
+
+def popular_locations(count: int) -> List[str]:
+    """The `count` most requested locations."""
+    return _popularity.top(count)
+
+
+def configure_popularity(half_life_seconds: float = POPULARITY_HALF_LIFE_SECONDS,
+                         max_locations: int = POPULARITY_MAX_LOCATIONS,
+                         seed: Tuple[str, ...] = ()) -> None:
+    """Replace the popularity counts with empty ones, optionally seeded with `seed` locations."""
+    global _popularity
+    _popularity = LocationPopularity(half_life_seconds, max_locations)
+    _popularity.seed(seed)
+
+
+def start_prewarming(api_key: Optional[str] = None, top_n: int = PREWARM_TOP_N,
+                     interval_seconds: float = PREWARM_INTERVAL_SECONDS, lead_seconds: float = PREWARM_LEAD_SECONDS,
+                     seed_file: str = PREWARM_SEED_FILE) -> Optional[Prewarmer]:
+    """
+    Start the prewarming job unless it is disabled (`top_n` of 0) or already running.
+
+    Args:
+        api_key: OpenWeather API key; by default OPENWEATHER_API_KEY
+
+    Returns:
+        The running job, or None if it is disabled or there is no API key
+    """
+    global _prewarmer
+    if top_n <= 0:
+        return None
+    if _prewarmer is not None:
+        return _prewarmer
+    if api_key is None:
+        load_dotenv()
+        api_key = os.environ.get("OPENWEATHER_API_KEY", "")
+    if not api_key:
+        logger.warning("Prewarming is disabled: OPENWEATHER_API_KEY is not set")
+        return None
+    if seed_file:
+        try:
+            _popularity.seed(seed_locations(seed_file))
+        except OSError as e:
+            logger.error(f"Could not read prewarming seed locations from {seed_file}: {str(e)}")
+    _prewarmer = Prewarmer(api_key, _popularity, top_n, interval_seconds, lead_seconds)
+    _prewarmer.start()
+    return _prewarmer
+
+
+def stop_prewarming() -> None:
+    """Stop the prewarming job, if it is running; the next turn about a location may start it again."""
+    global _prewarmer, _start_attempted
+    if _prewarmer is not None:
+        _prewarmer.stop()
+        _prewarmer = None
+    _start_attempted = False
+
+
+def get_prewarm_stats() -> Dict[str, Any]:
+    """Tracked locations and requests, plus the job's cycles, calls per dataset and quota stops."""
+    stats: Dict[str, Any] = dict(_popularity.stats(), enabled=_prewarmer is not None)
+    if _prewarmer is not None:
+        stats.update(_prewarmer.stats())
+    return stats
@@ -0,0 +1,334 @@
+# This files contains the cross-process cache of weather responses.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Memory-mapped cache of parsed weather responses shared by every action
+server worker on a node.
+
+It sits behind the per-process caches in weather_utils (observations,
+forecasts, air quality, UV, unresolved locations): a key missing from a
+worker's memory is looked up here before upstream is called, and every
+entry a worker stores is written here, so a city fetched by one worker is
+a hit in all the others.
+
+The file is a fixed table of equal-sized slots. A key hashes to a window of
+`probes` consecutive slots; a write takes the slot already holding the key,
+else an empty or expired one, else the oldest. Readers take a shared
+`flock` and writers an exclusive one. With orjson installed values are
+decoded straight from the mapping; the json fallback copies each value out
+first. The file is opened lazily, and again in a forked child, so workers
+started with fork do not share the parent's descriptor.
+
+The file name carries the format version and table geometry, so workers
+configured with another slot size, or running another version, use their
+own file and never resize one that is mapped elsewhere. Like the location
+store the cache is best-effort: if it cannot be used (including a file at
+that name with an unexpected layout), errors are logged and lookups miss.
+"""
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .weather_payloads import decode_json, encode_json
+
+logger = logging.getLogger(__name__)
+
+# flock is POSIX-only; elsewhere the cache stays disabled
+try:
+    import fcntl
+    has_fcntl = True
+except ImportError:
+    has_fcntl = False
+
+MAGIC = b"OWSC"
+VERSION = 1
+# magic, version, slot count, slot size
+HEADER = struct.Struct("<4sIII")
+HEADER_BYTES = 64
+# key hash (0 = empty), soft limit, hard limit, time stored, key length, value length
+SLOT_HEADER = struct.Struct("<QdddII")
+
+DEFAULT_SIZE_BYTES = 64 * 1024 * 1024
+# Large enough for a 5-day /forecast or /air_pollution/forecast body
+DEFAULT_SLOT_BYTES = 32 * 1024
+DEFAULT_PROBES = 8
+
+
+@dataclass(frozen=True)
+class SharedEntry:
+    """An entry read from the shared cache: its soft and hard limits, when it was stored and the value."""
+    fresh_until: float
+    hard_limit: float
+    stored_at: float
+    value: Any
+
+
+def layout_path(path: str, slot_count: int, slot_bytes: int) -> str:
+    """The file used for `path` by a table of this format version and geometry."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.v{VERSION}-{slot_count}x{slot_bytes}{extension}"
+
+
+def key_hash(key: str) -> int:
+    """A non-zero 64-bit hash of `key` that is the same in every process (unlike hash())."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+class SharedCache:
+    """Fixed-size table of JSON values in a memory-mapped file, shared by the processes that open it."""
+
+    def __init__(self, path: str, size_bytes: int = DEFAULT_SIZE_BYTES, slot_bytes: int = DEFAULT_SLOT_BYTES,
+                 probes: int = DEFAULT_PROBES):
+        self.slot_bytes = slot_bytes
+        self.slot_count = max(1, (size_bytes - HEADER_BYTES) // slot_bytes)
+        self.path = layout_path(path, self.slot_count, slot_bytes)
+        self.probes = min(probes, self.slot_count)
+        self._map: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._failed = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.oversize = 0
+        self.errors = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return HEADER_BYTES + self.slot_count * self.slot_bytes
+
+    def _open(self) -> Optional[mmap.mmap]:
+        """Map the file on first use and after a fork; must be called with the lock held."""
+        if self._pid != os.getpid():
+            # A forked child must not use the parent's descriptor or its flock
+            self._map = None
+            self._fd = None
+            self._pid = os.getpid()
+        if self._map is None and not self._failed:
+            try:
+                if not has_fcntl:
+                    raise OSError("file locking (fcntl) is not available on this platform")
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    try:
+                        self._initialise(fd)
+                    finally:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+                    self._map = mmap.mmap(fd, self.size_bytes)
+                except OSError:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+                logger.info(f"Opened shared cache at {self.path} ({self.slot_count} slots of {self.slot_bytes} bytes)")
+            except OSError as e:
+                # Do not retry on every lookup; the per-process caches and the API still work
+                self._failed = True
+                self.errors += 1
+                logger.error(f"Shared cache {self.path} is unavailable: {str(e)}")
+        return self._map
+
+    def _initialise(self, fd: int) -> None:
+        """
+        Create the table in a new file; called under LOCK_EX.
+
+        A file with any other size or header is left alone, since other
+        processes may have it mapped: shrinking it would fault their reads.
+        """
+        expected = HEADER.pack(MAGIC, VERSION, self.slot_count, self.slot_bytes)
+        size = os.fstat(fd).st_size
+        if size == self.size_bytes:
+            header = os.pread(fd, HEADER.size, 0)
+            if header == expected:
+                return
+            if header != bytes(HEADER.size):
+                raise OSError("the file holds a table of another layout")
+            # Sized by an opener that stopped before writing the header; no one has it mapped
+        elif size != 0:
+            raise OSError(f"the file is {size} bytes, expected {self.size_bytes}")
+        else:
+            os.ftruncate(fd, self.size_bytes)
+        os.pwrite(fd, expected, 0)
+
+    def _slot_offset(self, index: int) -> int:
+        return HEADER_BYTES + index * self.slot_bytes
+
+    def _window(self, hashed: int):
+        start = hashed % self.slot_count
+        return ((start + i) % self.slot_count for i in range(self.probes))
+
+    def _find(self, shared_map: mmap.mmap, hashed: int, encoded_key: bytes) -> Optional[int]:
+        """Offset of the slot holding the key, or None."""
+        for index in self._window(hashed):
+            offset = self._slot_offset(index)
+            slot_hash, _, _, _, key_length, _ = SLOT_HEADER.unpack_from(shared_map, offset)
+            start = offset + SLOT_HEADER.size
+            if slot_hash == hashed and shared_map[start:start + key_length] == encoded_key:
+                return offset
+        return None
+
+    def get(self, key: str, now: float) -> Optional[SharedEntry]:
+        """Look up `key`, ignoring an entry past its hard limit at `now`."""
+        encoded_key = key.encode("utf-8")
+        hashed = key_hash(key)
+        with self._lock:
+            shared_map = self._open()
+            if shared_map is None:
+                return None
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_SH)
+                try:
+                    offset = self._find(shared_map, hashed, encoded_key)
+                    if offset is not None:
+                        _, fresh_until, hard_limit, stored_at, key_length, value_length = \
+                            SLOT_HEADER.unpack_from(shared_map, offset)
+                        if hard_limit > now:
+                            start = offset + SLOT_HEADER.size + key_length
+                            with memoryview(shared_map)[start:start + value_length] as view:
+                                value = decode_json(view)
+                            self.hits += 1
+                            return SharedEntry(fresh_until, hard_limit, stored_at, value)
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                logger.error(f"Shared cache lookup of {key!r} failed: {str(e)}")
+                return None
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any, fresh_until: float, hard_limit: float, stored_at: float) -> bool:
+        """
+        Store `value` under `key`.
+
+        Returns:
+            False if the value does not fit in a slot or the cache is unavailable
+        """
+        encoded_key = key.encode("utf-8")
+        try:
+            encoded_value = encode_json(value)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Shared cache cannot store {key!r}: {str(e)}")
+            return False
+        hashed = key_hash(key)
+        with self._lock:
+            if SLOT_HEADER.size + len(encoded_key) + len(encoded_value) > self.slot_bytes:
+                self.oversize += 1
+                return False
+            shared_map = self._open()
+            if shared_map is None:
+                return False
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    offset = self._find(shared_map, hashed, encoded_key)
+                    if offset is None:
+                        offset = self._victim(shared_map, hashed, stored_at)
+                    start = offset + SLOT_HEADER.size
+                    shared_map[start:start + len(encoded_key)] = encoded_key
+                    start += len(encoded_key)
+                    shared_map[start:start + len(encoded_value)] = encoded_value
+                    SLOT_HEADER.pack_into(shared_map, offset, hashed, fresh_until, hard_limit, stored_at,
+                                          len(encoded_key), len(encoded_value))
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                logger.error(f"Shared cache write of {key!r} failed: {str(e)}")
+                return False
+            self.writes += 1
+            return True
+
+    def _victim(self, shared_map: mmap.mmap, hashed: int, now: float) -> int:
+        """Offset of the slot a new key replaces: empty, else expired, else the oldest in its window."""
+        oldest_offset, oldest_stored_at = None, None
+        for index in self._window(hashed):
+            offset = self._slot_offset(index)
+            slot_hash, _, hard_limit, stored_at, _, _ = SLOT_HEADER.unpack_from(shared_map, offset)
+            if slot_hash == 0 or hard_limit <= now:
+                return offset
+            if oldest_stored_at is None or stored_at < oldest_stored_at:
+                oldest_offset, oldest_stored_at = offset, stored_at
+        self.evictions += 1
+        return oldest_offset
+
+    def delete(self, key: str) -> None:
+        """Remove `key` if present."""
+        encoded_key = key.encode("utf-8")
+        hashed = key_hash(key)
+        with self._lock:
+            shared_map = self._open()
+            if shared_map is None:
+                return
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    offset = self._find(shared_map, hashed, encoded_key)
+                    if offset is not None:
+                        SLOT_HEADER.pack_into(shared_map, offset, 0, 0.0, 0.0, 0.0, 0, 0)
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                logger.error(f"Shared cache delete of {key!r} failed: {str(e)}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            shared_map = self._open()
+            if shared_map is None:
+                return 0
+            return sum(
+                1 for index in range(self.slot_count)
+                if SLOT_HEADER.unpack_from(shared_map, self._slot_offset(index))[0] != 0
+            )
+
+    def clear(self) -> None:
+        """Remove every entry, for every process."""
+        with self._lock:
+            shared_map = self._open()
+            if shared_map is None:
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                empty = bytes(SLOT_HEADER.size)
+                for index in range(self.slot_count):
+                    offset = self._slot_offset(index)
+                    shared_map[offset:offset + SLOT_HEADER.size] = empty
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        """Unmap the file; it is mapped again on the next use."""
+        with self._lock:
+            if self._map is not None and self._pid == os.getpid():
+                self._map.close()
+                os.close(self._fd)
+            self._map = None
+            self._fd = None
+
+    def stats(self) -> Dict[str, int]:
+        """Hits, misses, writes, evictions, values too large for a slot and errors."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "oversize": self.oversize,
+                "errors": self.errors,
+                "slots": self.slot_count,
+                "slot_bytes": self.slot_bytes,
+            }
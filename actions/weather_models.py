@@ -0,0 +1,330 @@
+# This files contains the compact models of the weather data kept in the caches.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Compact models of the OpenWeather responses held by the caches.
+
+A decoded response body is a tree of small dicts, lists and strings; a
+40-entry /forecast is well over a thousand objects per city. The caches
+keep these models instead: `__slots__` classes holding only the fields the
+actions read, time series as `array` columns, and repeated strings
+(weather descriptions, city and country names, icons) interned so every
+cached city shares one copy.
+
+- CurrentObservation: a /weather body
+- CachedForecast: a /forecast body as a ForecastIndex, its city and its daily summaries
+- UVSeries: a /uvi or /uvi/forecast body
+- AirQualitySeries (see weather_payloads): an /air_pollution or /air_pollution/forecast body
+
+compact_payload() turns a decoded body into its model when it is cached.
+A hit is served as a response carrying the model: the forecast and air
+quality actions read it directly (forecast_summary, air_quality_series),
+and only callers that ask for the body (response.json()) have to_payload()
+rebuild one of the same shape, with the fields the actions read. The
+cross-worker cache stores JSON, so to_shared() and from_shared() wrap
+models in a tagged body.
+"""
+import sys
+import math
+import logging
+import datetime
+from array import array
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .weather_payloads import (
+    AirQualitySeries, DAILY_SUMMARIES_KEY, ForecastIndex, ForecastSummary, PackedDays, materialize_daily_summaries
+)
+
+logger = logging.getLogger(__name__)
+
+# Key of the model name in a body stored in the shared cache; OpenWeather does not use it
+MODEL_KEY = "__model__"
+
+# (attribute, section of the body or None for the top level, key in the section)
+OBSERVATION_FIELDS: Tuple[Tuple[str, Optional[str], str], ...] = (
+    ("dt", None, "dt"),
+    ("city_id", None, "id"),
+    ("name", None, "name"),
+    ("timezone", None, "timezone"),
+    ("visibility", None, "visibility"),
+    ("lat", "coord", "lat"),
+    ("lon", "coord", "lon"),
+    ("temp", "main", "temp"),
+    ("feels_like", "main", "feels_like"),
+    ("temp_min", "main", "temp_min"),
+    ("temp_max", "main", "temp_max"),
+    ("pressure", "main", "pressure"),
+    ("humidity", "main", "humidity"),
+    ("condition_id", "weather", "id"),
+    ("condition", "weather", "main"),
+    ("description", "weather", "description"),
+    ("icon", "weather", "icon"),
+    ("wind_speed", "wind", "speed"),
+    ("wind_deg", "wind", "deg"),
+    ("wind_gust", "wind", "gust"),
+    ("clouds", "clouds", "all"),
+    ("rain_1h", "rain", "1h"),
+    ("snow_1h", "snow", "1h"),
+    ("country", "sys", "country"),
+    ("sunrise", "sys", "sunrise"),
+    ("sunset", "sys", "sunset"),
+)
+CITY_FIELDS: Tuple[Tuple[str, Optional[str], str], ...] = (
+    ("city_id", None, "id"),
+    ("name", None, "name"),
+    ("country", None, "country"),
+    ("timezone", None, "timezone"),
+    ("sunrise", None, "sunrise"),
+    ("sunset", None, "sunset"),
+    ("lat", "coord", "lat"),
+    ("lon", "coord", "lon"),
+)
+
+
+def _scalar(value: Any) -> Any:
+    """A JSON scalar as kept in a model: strings interned, containers dropped."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+def _number(value: Any, default: float = math.nan) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+def _read_fields(body: Dict[str, Any], fields: Tuple[Tuple[str, Optional[str], str], ...]) -> Dict[str, Any]:
+    values = {}
+    for attribute, section, key in fields:
+        if section is None:
+            source = body
+        elif section == "weather":
+            # Only the primary condition is read
+            source = (body.get("weather") or [{}])[0]
+        else:
+            source = body.get(section)
+        values[attribute] = _scalar(source.get(key)) if isinstance(source, dict) else None
+    return values
+
+
+def _write_fields(record: Any, fields: Tuple[Tuple[str, Optional[str], str], ...]) -> Dict[str, Any]:
+    body: Dict[str, Any] = {}
+    for attribute, section, key in fields:
+        value = getattr(record, attribute)
+        if value is None:
+            continue
+        if section is None:
+            body[key] = value
+        elif section == "weather":
+            body.setdefault("weather", [{}])[0][key] = value
+        else:
+            body.setdefault(section, {})[key] = value
+    return body
+
+
+class CurrentObservation:
+    """A /weather body reduced to the measurements, place and sun times the actions read; absent fields are None."""
+    kind = "observation"
+    __slots__ = tuple(attribute for attribute, _, _ in OBSERVATION_FIELDS)
+
+    def __init__(self, **values: Any):
+        for attribute in self.__slots__:
+            setattr(self, attribute, values.get(attribute))
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "CurrentObservation":
+        return cls(**_read_fields(payload, OBSERVATION_FIELDS))
+
+    def to_payload(self) -> Dict[str, Any]:
+        body = _write_fields(self, OBSERVATION_FIELDS)
+        # Only observations with measurements are cached
+        body.setdefault("main", {})
+        return body
+
+
+class ForecastCity:
+    """The `city` of a /forecast body."""
+    __slots__ = tuple(attribute for attribute, _, _ in CITY_FIELDS)
+
+    def __init__(self, **values: Any):
+        for attribute in self.__slots__:
+            setattr(self, attribute, values.get(attribute))
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "ForecastCity":
+        return cls(**_read_fields(payload, CITY_FIELDS))
+
+    def to_payload(self) -> Dict[str, Any]:
+        return _write_fields(self, CITY_FIELDS)
+
+
+class CachedForecast:
+    """
+    A /forecast body as a ForecastIndex (array columns per field), its city
+    and the daily summaries and alerts materialised when it was fetched.
+    """
+    kind = "forecast"
+    __slots__ = ("city", "index", "days", "alerts")
+
+    def __init__(self, city: Optional[ForecastCity], index: ForecastIndex, days: PackedDays, alerts: Tuple[str, ...]):
+        self.city = city
+        self.index = index
+        self.days = days
+        self.alerts = alerts
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "CachedForecast":
+        """
+        Raises:
+            KeyError: If the payload has no list
+        """
+        if not isinstance(payload.get(DAILY_SUMMARIES_KEY), dict):
+            materialize_daily_summaries(payload)
+        stored = payload[DAILY_SUMMARIES_KEY]
+        city = payload.get("city")
+        return cls(
+            ForecastCity.from_payload(city) if isinstance(city, dict) else None,
+            ForecastIndex(payload, stored["utc_offset"]),
+            PackedDays(stored["days"]),
+            tuple(sys.intern(alert) for alert in stored["alerts"]),
+        )
+
+    def summary(self) -> ForecastSummary:
+        """The daily summaries, read from the packed days without rebuilding the body."""
+        return ForecastSummary({"utc_offset": self.index.utc_offset, "days": self.days, "alerts": list(self.alerts)})
+
+    def _entry(self, i: int) -> Dict[str, Any]:
+        index = self.index
+        entry: Dict[str, Any] = {}
+        if index.dt[i] >= 0:
+            entry["dt"] = index.dt[i]
+        main = {key: value for key, value in (("temp", index.temp[i]), ("temp_min", index.temp_min[i]),
+                                              ("temp_max", index.temp_max[i])) if not math.isnan(value)}
+        if main:
+            entry["main"] = main
+        weather: Dict[str, Any] = {}
+        if index.condition_id[i]:
+            weather["id"] = index.condition_id[i]
+        if index.description[i]:
+            weather["description"] = index.description[i]
+        if weather:
+            entry["weather"] = [weather]
+        wind: Dict[str, Any] = {}
+        if not math.isnan(index.wind_speed[i]):
+            wind["speed"] = index.wind_speed[i]
+        if index.wind_deg[i] >= 0:
+            wind["deg"] = index.wind_deg[i]
+        if not math.isnan(index.wind_gust[i]):
+            wind["gust"] = index.wind_gust[i]
+        if wind:
+            entry["wind"] = wind
+        entry["pop"] = index.pop[i]
+        for key, column in (("rain", index.rain), ("snow", index.snow)):
+            if not math.isnan(column[i]):
+                entry[key] = {"3h": column[i]}
+        return entry
+
+    def to_payload(self) -> Dict[str, Any]:
+        summaries = {"utc_offset": self.index.utc_offset, "days": self.days.to_dict(), "alerts": list(self.alerts)}
+        body: Dict[str, Any] = {"list": [self._entry(i) for i in range(len(self.index))],
+                                DAILY_SUMMARIES_KEY: summaries}
+        if self.city is not None:
+            body["city"] = self.city.to_payload()
+        return body
+
+
+class UVSeries:
+    """
+    A /uvi body (one reading) or /uvi/forecast body (one per day) as array
+    columns; a missing date is -1 and a missing value NaN.
+    """
+    kind = "uv"
+    __slots__ = ("lat", "lon", "date", "value", "single")
+
+    def __init__(self, lat: Optional[float], lon: Optional[float], date: array, value: array, single: bool):
+        self.lat = lat
+        self.lon = lon
+        self.date = date
+        self.value = value
+        self.single = single
+
+    @classmethod
+    def from_payload(cls, payload: Union[Dict[str, Any], List[Any]]) -> "UVSeries":
+        items = [payload] if isinstance(payload, dict) else [item for item in payload if isinstance(item, dict)]
+        first = items[0] if items else {}
+        date = array("q", [int(_number(item.get("date"), -1)) for item in items])
+        value = array("d", [_number(item.get("value")) for item in items])
+        return cls(_scalar(first.get("lat")), _scalar(first.get("lon")), date, value, isinstance(payload, dict))
+
+    def _reading(self, i: int) -> Dict[str, Any]:
+        reading: Dict[str, Any] = {}
+        if self.lat is not None:
+            reading["lat"] = self.lat
+        if self.lon is not None:
+            reading["lon"] = self.lon
+        if self.date[i] >= 0:
+            reading["date_iso"] = datetime.datetime.fromtimestamp(
+                self.date[i], datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            reading["date"] = self.date[i]
+        if not math.isnan(self.value[i]):
+            reading["value"] = self.value[i]
+        return reading
+
+    def to_payload(self) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        readings = [self._reading(i) for i in range(len(self.date))]
+        if self.single:
+            return readings[0] if readings else {}
+        return readings
+
+
+CachedModel = Union[CurrentObservation, CachedForecast, UVSeries, AirQualitySeries]
+MODELS = {model.kind: model for model in (CurrentObservation, CachedForecast, UVSeries, AirQualitySeries)}
+MODEL_TYPES = tuple(MODELS.values())
+ENDPOINT_MODELS = {
+    "current_weather": CurrentObservation,
+    "forecast": CachedForecast,
+    "uv_index": UVSeries,
+    "uv_forecast": UVSeries,
+    "air_pollution": AirQualitySeries,
+    "air_pollution_forecast": AirQualitySeries,
+}
+
+
+def compact_payload(endpoint: str, payload: Any) -> Any:
+    """
+    The model of a decoded `endpoint` body, for caching.
+
+    Returns:
+        The model, or the payload itself if it is not shaped like a response of that endpoint
+    """
+    model = ENDPOINT_MODELS.get(endpoint)
+    expected = list if endpoint == "uv_forecast" else dict
+    if model is None or not isinstance(payload, expected):
+        return payload
+    try:
+        return model.from_payload(payload)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"Caching an unexpected {endpoint} body as it is: {str(e)}")
+        return payload
+
+
+def expand_payload(value: Any) -> Any:
+    """The response body of a cached value: rebuilt from a model, anything else as it is."""
+    return value.to_payload() if isinstance(value, MODEL_TYPES) else value
+
+
+def to_shared(value: Any) -> Any:
+    """A cached value as JSON for the shared cache; models are tagged with their kind."""
+    if isinstance(value, MODEL_TYPES):
+        return {MODEL_KEY: value.kind, "payload": value.to_payload()}
+    return value
+
+
+def from_shared(value: Any) -> Any:
+    """A value read from the shared cache, with tagged models rebuilt."""
+    if isinstance(value, dict) and value.get(MODEL_KEY) in MODELS:
+        return MODELS[value[MODEL_KEY]].from_payload(value["payload"])
+    return value
@@ -0,0 +1,750 @@
+# This files contains the JSON decoding and indexing of OpenWeather payloads.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Decoding of OpenWeather response bodies and the indexes built over them.
+
+Bodies are decoded whole. A /forecast body holds 40 three-hourly entries and
+an air pollution forecast about 96 hourly entries, each a tree of nested
+dicts, so rather than walking those trees on every question the actions ask
+of them, each payload is indexed once when it is fetched.
+
+A /forecast payload is indexed as parallel columns grouped by the
+city's local days (ForecastIndex). When a forecast is fetched the index is
+aggregated into one DailySummary per day, stored in the payload under
+`daily_summaries` so it is cached (and shared between workers) with the
+forecast; the forecast actions answer from those summaries with a lookup.
+An air pollution forecast is likewise reduced to an AirQualitySeries: one
+column per pollutant for its hours, with the AQI mode, mean and peak and each
+pollutant's noon, mean and peak for every local day it covers. The caches
+keep it, like the forecast index, as compact models (see weather_models).
+
+Bodies are decoded with orjson when it is installed and with the standard
+library json module otherwise.
+"""
+import sys
+import json
+import math
+import bisect
+import time
+import logging
+import calendar
+import datetime
+from array import array
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+
+# Try to import orjson for faster decoding, but make it optional
+try:
+    import orjson
+    has_orjson = True
+except ImportError:
+    has_orjson = False
+
+from .aggregation import (
+    DailyAggregates, EPOCH_ORDINAL, MISSING, NOON_HOURS, SECONDS_PER_DAY, Series, aggregate_daily
+)
+
+logger = logging.getLogger(__name__)
+
+# Payload key the daily summaries are stored under; OpenWeather does not use it
+DAILY_SUMMARIES_KEY = "daily_summaries"
+# An entry with a higher probability of precipitation counts as a wet one
+WET_POP = 0.2
+# The severe weather check covers the first 24 hours (8 x 3-hour entries)
+ALERT_ENTRIES = 8
+# Payload key the hourly air quality series is stored under
+AIR_QUALITY_SERIES_KEY = "hourly_series"
+# The pollutants of an /air_pollution entry kept in the series, in µg/m³
+AIR_COMPONENTS = ("pm2_5", "pm10", "no2", "o3", "co", "so2", "nh3")
+# The reductions behind the DailyAirQuality fields
+AIR_QUALITY_REDUCTIONS = {"aqi": ("mode", "mean", "max"), **{name: ("noon", "mean", "max") for name in AIR_COMPONENTS}}
+# The reductions behind the DailySummary fields, per ForecastIndex column
+SUMMARY_REDUCTIONS = {
+    "temp": ("noon",),
+    "temp_min": ("min",),
+    "temp_max": ("max",),
+    "pop": ("max", "mean"),
+    "wet": ("sum",),
+    "rain": ("sum",),
+    "snow": ("sum",),
+    "wind_speed": ("noon", "max"),
+    "wind_gust": ("noon", "max"),
+    "wind_deg": ("noon",),
+    "condition_id": ("mode",),
+}
+
+if not has_orjson:
+    logger.info("orjson module not available, JSON bodies will be decoded with the json module")
+
+def decode_json(content: Union[bytes, memoryview]) -> Any:
+    """Decode a JSON body with the fastest available parser; orjson reads a memoryview without copying it."""
+    if has_orjson:
+        return orjson.loads(content)
+    if isinstance(content, memoryview):
+        content = content.tobytes()
+    return json.loads(content)
+
+
+def encode_json(value: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON with the fastest available encoder."""
+    if has_orjson:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def decode_response(response: Any) -> Any:
+    """
+    Decode the JSON body of a response returned by http_get or async_http_get.
+
+    requests responses are decoded from their raw content with decode_json.
+    Any other response object (e.g. HTTPResult, which memoises its body for
+    coalesced callers) is decoded through its own json() method.
+    """
+    if isinstance(response, requests.Response):
+        return decode_json(response.content)
+    return response.json()
+
+
+def local_utc_offset() -> int:
+    """The current UTC offset of the server's local time, in seconds."""
+    offset = datetime.datetime.now().astimezone().utcoffset()
+    return int(offset.total_seconds()) if offset is not None else 0
+
+
+def local_date(now: datetime.datetime, utc_offset: int, days: int = 0) -> datetime.date:
+    """The date `days` days after `now` (as read from the server's local clock) at UTC offset `utc_offset`."""
+    local_day = int(now.timestamp() + utc_offset) // SECONDS_PER_DAY + EPOCH_ORDINAL
+    return datetime.date.fromordinal(local_day + days)
+
+
+def _entry_time(item: Dict[str, Any]) -> Optional[int]:
+    if "dt" in item:
+        return int(item["dt"])
+    if "dt_txt" in item:
+        # dt_txt is the same instant in UTC
+        return calendar.timegm(time.strptime(item["dt_txt"], "%Y-%m-%d %H:%M:%S"))
+    return None
+
+
+def _number(value: Any, default: float = MISSING) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+def _volume(precipitation: Any) -> float:
+    # An entry lists rain or snow only when some is forecast
+    if not isinstance(precipitation, dict):
+        return MISSING
+    return _number(precipitation.get("3h"), 0.0)
+
+
+class ForecastIndex:
+    """
+    A /forecast payload as parallel columns, with its entries grouped by local day.
+
+    Position i of every column describes the i-th entry in time order. Values
+    an entry does not report are NaN (-1 for `dt` and `wind_deg`, 0 for
+    `condition_id`, "" for `description`), except `pop`, which defaults to 0. Days are local to
+    `utc_offset`; `day()` and `noon()` find a day's entries with one
+    subtraction instead of a scan. If an entry has neither `dt` nor `dt_txt`
+    no entry is placed on a day and the columns keep the payload's order.
+    Descriptions are interned, so every cached forecast shares one copy of each.
+    """
+    __slots__ = ("utc_offset", "dt", "temp", "temp_min", "temp_max", "pop", "rain", "snow", "wind_speed",
+                 "wind_deg", "wind_gust", "condition_id", "description", "first_day", "_day_starts", "_noon")
+
+    def __init__(self, payload: Dict[str, Any], utc_offset: int = 0):
+        items = payload["list"]
+        times = [_entry_time(item) for item in items]
+        timed = None not in times
+        order = sorted(range(len(items)), key=times.__getitem__) if timed else range(len(items))
+        self.utc_offset = utc_offset
+        self.dt = array("q")
+        self.temp = array("d")
+        self.temp_min = array("d")
+        self.temp_max = array("d")
+        self.pop = array("d")
+        self.rain = array("d")
+        self.snow = array("d")
+        self.wind_speed = array("d")
+        self.wind_deg = array("i")
+        self.wind_gust = array("d")
+        self.condition_id = array("i")
+        self.description: List[str] = []
+        # Local day ordinal of the first entry; day k after it spans positions
+        # _day_starts[k] to _day_starts[k + 1] and is described by _noon[k] (-1 if none)
+        self.first_day: Optional[int] = None
+        self._day_starts = array("i")
+        self._noon = array("i")
+        for position, i in enumerate(order):
+            item = items[i]
+            if timed:
+                local = times[i] + utc_offset
+                day = local // SECONDS_PER_DAY + EPOCH_ORDINAL
+                if self.first_day is None:
+                    self.first_day = day
+                while self.first_day + len(self._noon) <= day:
+                    self._day_starts.append(position)
+                    self._noon.append(-1)
+                if self._noon[-1] < 0 and local % SECONDS_PER_DAY // 3600 in NOON_HOURS:
+                    self._noon[-1] = position
+            main = item.get("main") or {}
+            wind = item.get("wind") or {}
+            weather = (item.get("weather") or [{}])[0]
+            self.dt.append(times[i] if timed else -1)
+            self.temp.append(_number(main.get("temp")))
+            self.temp_min.append(_number(main.get("temp_min")))
+            self.temp_max.append(_number(main.get("temp_max")))
+            self.pop.append(_number(item.get("pop"), 0.0))
+            self.rain.append(_volume(item.get("rain")))
+            self.snow.append(_volume(item.get("snow")))
+            self.wind_speed.append(_number(wind.get("speed")))
+            self.wind_deg.append(int(_number(wind.get("deg"), -1)))
+            self.wind_gust.append(_number(wind.get("gust")))
+            self.condition_id.append(int(_number(weather.get("id"), 0)))
+            description = weather.get("description")
+            self.description.append(sys.intern(description) if isinstance(description, str) else "")
+        self._day_starts.append(len(order))
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def _day_number(self, date: datetime.date) -> int:
+        """Position of `date` in the day index, or -1 if the forecast does not cover it."""
+        if self.first_day is None:
+            return -1
+        k = date.toordinal() - self.first_day
+        return k if 0 <= k < len(self._noon) else -1
+
+    @property
+    def first_date(self) -> Optional[datetime.date]:
+        """The local date of the first entry, or None for an empty forecast."""
+        return datetime.date.fromordinal(self.first_day) if self.first_day is not None else None
+
+    def day(self, date: datetime.date) -> range:
+        """Positions of the entries on local `date`."""
+        k = self._day_number(date)
+        if k < 0:
+            return range(0)
+        return range(self._day_starts[k], self._day_starts[k + 1])
+
+    def noon(self, date: datetime.date) -> Optional[int]:
+        """Position of the entry describing local `date`, the first starting between 11:00 and 13:59."""
+        k = self._day_number(date)
+        if k < 0 or self._noon[k] < 0:
+            return None
+        return self._noon[k]
+
+    def dates(self, start: datetime.date, count: int) -> List[datetime.date]:
+        """Up to `count` consecutive local dates from `start` that the forecast covers."""
+        k = self._day_number(start)
+        if k < 0:
+            return []
+        end = min(k + count, len(self._noon))
+        return [datetime.date.fromordinal(self.first_day + day) for day in range(k, end)]  # type: ignore
+
+    @staticmethod
+    def reported(column: Any, positions: range) -> List[float]:
+        """The values of `column` at `positions` that the payload reported."""
+        return [column[i] for i in positions if not math.isnan(column[i])]
+
+
+def forecast_utc_offset(payload: Dict[str, Any]) -> int:
+    """The UTC offset of the forecast's city (`city.timezone`), or the server's if the payload has none."""
+    offset = (payload.get("city") or {}).get("timezone")
+    if isinstance(offset, (int, float)) and not isinstance(offset, bool):
+        return int(offset)
+    return local_utc_offset()
+
+
+def index_forecast(payload: Dict[str, Any], utc_offset: Optional[int] = None) -> ForecastIndex:
+    """
+    Index a /forecast payload by local day.
+
+    Args:
+        payload: The decoded /forecast body
+        utc_offset: Offset of the local days from UTC in seconds; by default the city's (see forecast_utc_offset)
+
+    Raises:
+        KeyError: If the payload has no list
+    """
+    return ForecastIndex(payload, forecast_utc_offset(payload) if utc_offset is None else utc_offset)
+
+
+def extreme_condition(condition_id: int, description: str, wind_speed: float) -> Optional[str]:
+    """The severe weather a forecast entry describes, or None."""
+    if condition_id <= 0:  # No condition reported
+        return None
+    if condition_id < 300:  # Thunderstorm
+        return "Thunderstorm"
+    if 502 <= condition_id < 600:  # Heavy rain
+        return "Heavy rain"
+    if 602 <= condition_id < 700:  # Heavy snow
+        return "Heavy snow"
+    if 700 <= condition_id < 800 and condition_id not in (701, 721):  # Atmospheric conditions
+        return description
+    if condition_id == 800 and wind_speed > 20:  # Strong winds
+        return "Strong winds"
+    if condition_id >= 900:  # Extreme weather
+        return description
+    return None
+
+
+@dataclass
+class DailySummary:
+    """
+    Aggregates of one local day of a forecast.
+
+    The noon sample is the entry describing the day (see ForecastIndex.noon),
+    or its first entry if it has none (`noon_sampled` is then False); the dominant condition is the most
+    frequent one, the lowest id on a tie. Temperatures, wind and precipitation
+    totals are None when no entry of the day reports them.
+    """
+    date: str
+    entries: int
+    temp_min: Optional[float]
+    temp_max: Optional[float]
+    noon_temp: Optional[float]
+    noon_description: str
+    noon_wind_speed: Optional[float]
+    noon_wind_deg: Optional[int]
+    noon_wind_gust: Optional[float]
+    noon_sampled: bool
+    condition_id: int
+    condition: str
+    pop_max: float
+    pop_mean: float
+    wet_entries: int
+    rain: Optional[float]
+    snow: Optional[float]
+    wind_speed_max: Optional[float]
+    wind_gust_max: Optional[float]
+
+
+def _forecast_series(forecast: ForecastIndex) -> Series:
+    """The columns of `forecast` that SUMMARY_REDUCTIONS reduces, with missing values as NaN."""
+    if forecast.first_day is None:
+        return Series((), forecast.utc_offset, {field: () for field in SUMMARY_REDUCTIONS})
+    return Series(forecast.dt, forecast.utc_offset, {
+        "temp": forecast.temp,
+        "temp_min": forecast.temp_min,
+        "temp_max": forecast.temp_max,
+        "pop": forecast.pop,
+        "wet": [1.0 if pop > WET_POP else 0.0 for pop in forecast.pop],
+        "rain": forecast.rain,
+        "snow": forecast.snow,
+        "wind_speed": forecast.wind_speed,
+        "wind_gust": forecast.wind_gust,
+        "wind_deg": [deg if deg >= 0 else MISSING for deg in forecast.wind_deg],
+        "condition_id": [condition if condition > 0 else MISSING for condition in forecast.condition_id],
+    })
+
+
+def _daily_summary(forecast: ForecastIndex, daily: DailyAggregates, group: int) -> DailySummary:
+    date = datetime.date.fromordinal(daily.days[group])
+    positions = forecast.day(date)
+    noon = forecast.noon(date)
+    sample = positions[0] if noon is None else noon
+    condition_id = int(daily.get("condition_id", "mode", group) or 0)
+    condition = next((forecast.description[i] for i in positions if forecast.condition_id[i] == condition_id), "")
+    wind_deg = daily.get("wind_deg", "noon", group)
+    return DailySummary(
+        date=date.isoformat(),
+        entries=daily.entries[group],
+        temp_min=daily.get("temp_min", "min", group),
+        temp_max=daily.get("temp_max", "max", group),
+        noon_temp=daily.get("temp", "noon", group),
+        noon_description=forecast.description[sample],
+        noon_wind_speed=daily.get("wind_speed", "noon", group),
+        noon_wind_deg=int(wind_deg) if wind_deg is not None else None,
+        noon_wind_gust=daily.get("wind_gust", "noon", group),
+        noon_sampled=noon is not None,
+        condition_id=condition_id,
+        condition=condition,
+        pop_max=daily.get("pop", "max", group),
+        pop_mean=daily.get("pop", "mean", group),
+        wet_entries=int(daily.get("wet", "sum", group) or 0),
+        rain=daily.get("rain", "sum", group),
+        snow=daily.get("snow", "sum", group),
+        wind_speed_max=daily.get("wind_speed", "max", group),
+        wind_gust_max=daily.get("wind_gust", "max", group),
+    )
+
+
+def _alerts(forecast: ForecastIndex) -> List[str]:
+    alerts: List[str] = []
+    for i in range(min(ALERT_ENTRIES, len(forecast))):
+        condition = extreme_condition(forecast.condition_id[i], forecast.description[i], forecast.wind_speed[i])
+        if condition is not None and condition not in alerts:
+            alerts.append(condition)
+    return alerts
+
+
+class ForecastSummary:
+    """
+    The daily summaries of a forecast, as stored in its payload.
+
+    Summaries are kept as the plain dicts that are cached (or the PackedDays
+    of a cached model) and turned into DailySummary records only when a day
+    is looked up.
+    """
+
+    def __init__(self, stored: Dict[str, Any]):
+        self.utc_offset: int = stored["utc_offset"]
+        self.alerts: List[str] = stored["alerts"]
+        self._days: Union[Dict[str, Dict[str, Any]], "PackedDays"] = stored["days"]
+
+    def today(self, now: datetime.datetime, days: int = 0) -> datetime.date:
+        """
+        The city's local date `days` days after `now`.
+
+        Args:
+            now: The current time as read from the server's local clock
+        """
+        return local_date(now, self.utc_offset, days)
+
+    def date_at(self, timestamp: float) -> datetime.date:
+        """The city's local date at unix `timestamp`."""
+        return datetime.date.fromordinal(int(timestamp + self.utc_offset) // SECONDS_PER_DAY + EPOCH_ORDINAL)
+
+    @property
+    def first_date(self) -> Optional[datetime.date]:
+        return datetime.date.fromisoformat(min(self._days)) if self._days else None
+
+    def day(self, date: datetime.date) -> Optional[DailySummary]:
+        """The summary of local `date`, or None if the forecast does not cover it."""
+        stored = self._days.get(date.isoformat())
+        return DailySummary(**stored) if stored is not None else None
+
+    def dates(self, start: datetime.date, count: int) -> List[datetime.date]:
+        """Up to `count` consecutive local dates from `start` that the forecast covers."""
+        dates = []
+        for ordinal in range(start.toordinal(), start.toordinal() + count):
+            date = datetime.date.fromordinal(ordinal)
+            if date.isoformat() not in self._days:
+                break
+            dates.append(date)
+        return dates
+
+
+def summarize_forecasts(payloads: Sequence[Dict[str, Any]]) -> List[ForecastSummary]:
+    """
+    Summarise each local day of many /forecast payloads at once, storing each result under DAILY_SUMMARIES_KEY.
+
+    The daily reductions of the whole batch are computed by aggregation.aggregate_daily,
+    vectorised with NumPy for large batches.
+
+    Raises:
+        KeyError: If a payload has no list
+    """
+    forecasts = [index_forecast(payload) for payload in payloads]
+    daily = aggregate_daily([_forecast_series(forecast) for forecast in forecasts], SUMMARY_REDUCTIONS)
+    summaries = []
+    for location, (payload, forecast) in enumerate(zip(payloads, forecasts)):
+        days = [_daily_summary(forecast, daily, group) for group in daily.groups(location)]
+        stored = {
+            "utc_offset": forecast.utc_offset,
+            "days": {summary.date: asdict(summary) for summary in days},
+            "alerts": _alerts(forecast),
+        }
+        payload[DAILY_SUMMARIES_KEY] = stored
+        summaries.append(ForecastSummary(stored))
+    return summaries
+
+
+def materialize_daily_summaries(payload: Dict[str, Any]) -> ForecastSummary:
+    """
+    Summarise each local day of a /forecast payload and store the result in it under DAILY_SUMMARIES_KEY.
+
+    Raises:
+        KeyError: If the payload has no list
+    """
+    return summarize_forecasts([payload])[0]
+
+
+def forecast_summary(payload: Any) -> ForecastSummary:
+    """
+    The daily summaries stored in a /forecast payload, materialised now if it has none yet.
+
+    A cache hit may be passed as the CachedForecast it was served from (see
+    weather_utils.response_data); its packed days are read as they are.
+    """
+    if not isinstance(payload, dict):
+        return payload.summary()
+    stored = payload.get(DAILY_SUMMARIES_KEY)
+    if isinstance(stored, dict):
+        return ForecastSummary(stored)
+    return materialize_daily_summaries(payload)
+
+
+@dataclass
+class DailyAirQuality:
+    """
+    One local day of an air pollution forecast.
+
+    `pollutants` holds the noon, mean and peak concentration of each of
+    AIR_COMPONENTS; a pollutant no hour of the day reported is None.
+    """
+    date: str
+    hours: int
+    aqi_mode: int
+    aqi_mean: float
+    aqi_max: int
+    pollutants: Dict[str, Dict[str, Optional[float]]]
+
+
+def _reported(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _leaf_paths(record: Dict[str, Any], prefix: Tuple[str, ...] = ()) -> List[Tuple[str, ...]]:
+    paths: List[Tuple[str, ...]] = []
+    for key, value in record.items():
+        if isinstance(value, dict):
+            paths.extend(_leaf_paths(value, prefix + (key,)))
+        else:
+            paths.append(prefix + (sys.intern(key),))
+    return paths
+
+
+def _leaf(record: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    for key in path:
+        record = record[key]
+    return record
+
+
+_PACKED_PATHS: Dict[Tuple[Tuple[str, ...], ...], Tuple[Tuple[str, ...], ...]] = {}
+
+
+class PackedDays:
+    """
+    Daily records of one shape (stored daily summaries or air quality days) packed by field.
+
+    Every leaf of the records, nested ones included, becomes one column
+    holding a value per day: numbers in an array of doubles (NaN for None,
+    converted back to int for fields that were ints), anything else in a
+    list with strings interned. record() and to_dict() rebuild the dicts;
+    `in`, iteration and get() read it like the dict of records it was packed from.
+    """
+    __slots__ = ("dates", "_paths", "_integral", "_columns")
+
+    def __init__(self, days: Dict[str, Dict[str, Any]]):
+        records = list(days.values())
+        self.dates = [sys.intern(date) for date in days]
+        paths = tuple(_leaf_paths(records[0])) if records else ()
+        # Every forecast (or air quality series) has the same fields; share one copy of them
+        self._paths = _PACKED_PATHS.setdefault(paths, paths)
+        self._integral = array("b")
+        self._columns: List[Any] = []
+        for path in self._paths:
+            values = [_leaf(record, path) for record in records]
+            if all(value is None or _reported(value) is not None for value in values):
+                self._integral.append(all(value is None or isinstance(value, int) for value in values))
+                self._columns.append(array("d", [MISSING if value is None else value for value in values]))
+            else:
+                self._integral.append(-1)
+                self._columns.append([sys.intern(value) if isinstance(value, str) else value for value in values])
+
+    def __contains__(self, date: str) -> bool:
+        return date in self.dates
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.dates)
+
+    def get(self, date: str) -> Optional[Dict[str, Any]]:
+        return self.record(date)
+
+    def record(self, date: str) -> Optional[Dict[str, Any]]:
+        """The record of ISO `date`, or None if there is none."""
+        if date not in self.dates:
+            return None
+        day = self.dates.index(date)
+        record: Dict[str, Any] = {}
+        for path, integral, column in zip(self._paths, self._integral, self._columns):
+            value = column[day]
+            if integral >= 0:
+                value = None if math.isnan(value) else int(value) if integral else value
+            target = record
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        return record
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {date: self.record(date) for date in self.dates}  # type: ignore
+
+
+class AirQualitySeries:
+    """
+    The hourly air quality of one location.
+
+    The hours are kept as array columns (time, AQI and one per pollutant,
+    NaN where an hour did not report it), together with the reductions of
+    every local day at `utc_offset` as PackedDays. to_stored() turns them into the plain
+    JSON stored in the payload, so they are shared between workers; a series
+    built from an /air_pollution body (one hour, no days) has `_days` None.
+    """
+    kind = "air_quality"
+    __slots__ = ("utc_offset", "coord", "dt", "aqi", "components", "_days")
+
+    def __init__(self, stored: Dict[str, Any], coord: Optional[Dict[str, Any]] = None):
+        self.utc_offset: int = stored["utc_offset"]
+        self.coord = coord
+        self.dt = array("q", stored["dt"])
+        self.aqi = array("b", stored["aqi"])
+        self.components = {sys.intern(name): array("d", [MISSING if value is None else value for value in column])
+                           for name, column in stored["components"].items()}
+        self._days = PackedDays(stored["days"]) if stored["days"] is not None else None
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "AirQualitySeries":
+        """
+        The series of an /air_pollution or /air_pollution/forecast body: the one stored in it,
+        otherwise its list without daily reductions. A missing time is -1 and a missing AQI 0.
+        """
+        coord = payload.get("coord")
+        stored = payload.get(AIR_QUALITY_SERIES_KEY)
+        if isinstance(stored, dict):
+            return cls(stored, coord)
+        items = sorted((item for item in payload.get("list") or [] if isinstance(item, dict)),
+                       key=lambda item: _number(item.get("dt"), -1))
+        reported = [item.get("components") or {} for item in items]
+        return cls({
+            "utc_offset": 0,
+            "dt": [int(_number(item.get("dt"), -1)) for item in items],
+            "aqi": [int(_number((item.get("main") or {}).get("aqi"), 0)) for item in items],
+            "components": {name: [_reported(values.get(name)) for values in reported] for name in AIR_COMPONENTS},
+            "days": None,
+        }, coord)
+
+    def to_stored(self) -> Dict[str, Any]:
+        """The series as the plain JSON stored under AIR_QUALITY_SERIES_KEY."""
+        return {
+            "utc_offset": self.utc_offset,
+            "dt": self.dt.tolist(),
+            "aqi": self.aqi.tolist(),
+            "components": {name: [None if math.isnan(value) else value for value in column]
+                           for name, column in self.components.items()},
+            "days": self._days.to_dict() if self._days is not None else None,
+        }
+
+    def to_payload(self) -> Dict[str, Any]:
+        """The body the series was built from, with the fields the actions read."""
+        body: Dict[str, Any] = {}
+        if self.coord is not None:
+            body["coord"] = self.coord
+        if self._days is None:
+            body["list"] = [self.entry(position) for position in range(len(self))]
+        else:
+            body[AIR_QUALITY_SERIES_KEY] = self.to_stored()
+        return body
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def today(self, now: datetime.datetime, days: int = 0) -> datetime.date:
+        """The location's local date `days` days after `now` (see ForecastSummary.today)."""
+        return local_date(now, self.utc_offset, days)
+
+    def dates(self) -> List[datetime.date]:
+        """The local dates the series covers, in order."""
+        return [datetime.date.fromisoformat(date) for date in self._days.dates] if self._days is not None else []
+
+    def day(self, date: datetime.date) -> Optional[DailyAirQuality]:
+        """The reductions of local `date`, or None if the series does not cover it."""
+        stored = self._days.record(date.isoformat()) if self._days is not None else None
+        return DailyAirQuality(**stored) if stored is not None else None
+
+    def hour(self, timestamp: float) -> Optional[int]:
+        """The position of the hour containing `timestamp` (Unix seconds), or None if the series does not cover it."""
+        position = bisect.bisect_right(self.dt, timestamp) - 1
+        if position < 0 or self.dt[position] < 0 or timestamp >= self.dt[position] + 3600:
+            return None
+        return position
+
+    def entry(self, position: int) -> Dict[str, Any]:
+        """The hour at `position` as an /air_pollution list entry."""
+        entry: Dict[str, Any] = {}
+        if self.dt[position] >= 0:
+            entry["dt"] = self.dt[position]
+        entry["main"] = {"aqi": self.aqi[position]} if self.aqi[position] else {}
+        entry["components"] = {name: column[position] for name, column in self.components.items()
+                               if not math.isnan(column[position])}
+        return entry
+
+
+def _air_quality_days(dt: List[int], aqi: List[int], components: Dict[str, List[Optional[float]]],
+                      utc_offset: int) -> Dict[str, Dict[str, Any]]:
+    columns = {"aqi": [float(value) for value in aqi]}
+    for name, column in components.items():
+        columns[name] = [MISSING if value is None else value for value in column]
+    daily = aggregate_daily([Series(dt, utc_offset, columns)], AIR_QUALITY_REDUCTIONS)
+    days = {}
+    for group in daily.groups(0):
+        date = datetime.date.fromordinal(daily.days[group]).isoformat()
+        days[date] = asdict(DailyAirQuality(
+            date=date,
+            hours=daily.entries[group],
+            aqi_mode=int(daily.get("aqi", "mode", group)),
+            aqi_mean=daily.get("aqi", "mean", group),
+            aqi_max=int(daily.get("aqi", "max", group)),
+            pollutants={name: {reduction: daily.get(name, reduction, group) for reduction in ("noon", "mean", "max")}
+                        for name in AIR_COMPONENTS},
+        ))
+    return days
+
+
+def materialize_air_quality_series(payload: Dict[str, Any], utc_offset: Optional[int] = None) -> AirQualitySeries:
+    """
+    Parse an /air_pollution/forecast payload into an AirQualitySeries and store it under AIR_QUALITY_SERIES_KEY.
+
+    A payload that already holds a series (e.g. from the cache) is re-reduced from its columns.
+
+    Args:
+        utc_offset: UTC offset of the local days, in seconds; by default the server's
+
+    Raises:
+        KeyError: If an entry is missing its time or AQI
+    """
+    if utc_offset is None:
+        utc_offset = local_utc_offset()
+    stored = payload.get(AIR_QUALITY_SERIES_KEY)
+    if isinstance(stored, dict):
+        dt, aqi, components = stored["dt"], stored["aqi"], stored["components"]
+    else:
+        items = sorted(payload.get("list") or [], key=lambda item: item["dt"])
+        dt = [int(item["dt"]) for item in items]
+        aqi = [int(item["main"]["aqi"]) for item in items]
+        reported = [item.get("components") or {} for item in items]
+        components = {name: [_reported(values.get(name)) for values in reported] for name in AIR_COMPONENTS}
+    stored = {
+        "utc_offset": utc_offset,
+        "dt": dt,
+        "aqi": aqi,
+        "components": components,
+        "days": _air_quality_days(dt, aqi, components, utc_offset),
+    }
+    series = AirQualitySeries(stored, payload.get("coord"))
+    payload[AIR_QUALITY_SERIES_KEY] = stored
+    return series
+
+
+def air_quality_series(payload: Any, utc_offset: Optional[int] = None) -> AirQualitySeries:
+    """
+    The hourly series stored in an /air_pollution/forecast payload, materialised now if it has none
+    yet or its days were reduced at another UTC offset than `utc_offset`.
+
+    A cache hit may be passed as the AirQualitySeries it was served from (see weather_utils.response_data).
+    """
+    if isinstance(payload, AirQualitySeries):
+        if utc_offset is None or payload.utc_offset == utc_offset:
+            return payload
+        payload = payload.to_payload()
+    stored = payload.get(AIR_QUALITY_SERIES_KEY)
+    if isinstance(stored, dict) and (utc_offset is None or stored["utc_offset"] == utc_offset):
+        return AirQualitySeries(stored)
+    return materialize_air_quality_series(payload, utc_offset)
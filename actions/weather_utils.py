@@ -8,8 +8,21 @@ Utility functions for weather-related actions.
 """
 import os
 import sys
+import json
+import time
+import datetime
+import asyncio
+import functools
+import threading
 import requests
 import logging
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
 
 # Try to import tenacity, but make it optional
 try:
@@ -17,9 +30,27 @@ try:
     has_tenacity = True
 except ImportError:
     has_tenacity = False
-from dataclasses import dataclass  # noqa: E402 - Ignore 'from' in import statements
-from typing import Dict, Any, Optional, Tuple, List  # noqa: E402 - Ignore 'from' in import statements
+
+# Try to import aiohttp for the native asyncio client, but make it optional
+try:
+    import aiohttp
+    has_aiohttp = True
+except ImportError:
+    has_aiohttp = False
+from dataclasses import dataclass, field  # noqa: E402 - Ignore 'from' in import statements
+from typing import Dict, Any, Awaitable, Callable, Deque, Iterator, Optional, Set, Tuple, List  # noqa: E402 - Ignore 'from' in import statements
 from dotenv import load_dotenv  # noqa: E402 - Ignore 'from' in import statements
+from .weather_payloads import (  # noqa: E402 - Ignore 'from' in import statements
+    AirQualitySeries, decode_json, decode_response, materialize_air_quality_series,
+    materialize_daily_summaries
+)
+from .weather_models import (  # noqa: E402 - Ignore 'from' in import statements
+    CurrentObservation, MODEL_TYPES, compact_payload, expand_payload, from_shared, to_shared
+)
+from .location_store import LocationStore, StoredLocation  # noqa: E402 - Ignore 'from' in import statements
+from .shared_cache import (  # noqa: E402 - Ignore 'from' in import statements
+    DEFAULT_SIZE_BYTES as DEFAULT_SHARED_CACHE_BYTES, DEFAULT_SLOT_BYTES as DEFAULT_SHARED_SLOT_BYTES, SharedCache
+)
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -28,51 +59,2254 @@ logger = logging.getLogger(__name__)
 if not has_tenacity:
     logger.warning("Tenacity module not available, running without retry logic")
 
+# Log info if aiohttp is not available
+if not has_aiohttp:
+    logger.info("aiohttp module not available, async requests will use a thread pool")
+
+# Upstream base URLs (read once at import time); point them at a local
+# stand-in server (scripts/openweather_standin.py) for offline runs
+DEFAULT_OPENWEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5"
+OPENWEATHER_BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", DEFAULT_OPENWEATHER_BASE_URL).rstrip("/")
+TIMEZONEDB_URL = os.environ.get("TIMEZONEDB_URL", "http://api.timezonedb.com/v2.1/get-time-zone")
+# The public One Call history endpoint has always been requested over https
+WEATHER_HISTORY_URL = (
+    "https://api.openweathermap.org/data/2.5/onecall/timemachine"
+    if OPENWEATHER_BASE_URL == DEFAULT_OPENWEATHER_BASE_URL
+    else f"{OPENWEATHER_BASE_URL}/onecall/timemachine"
+)
+
+# Every OpenWeather request is made in this unit system; callers needing
+# another one convert locally (see convert_temperature)
+UNITS = "metric"
+
+# HTTP connection pool configuration (read once at import time)
+REQUEST_TIMEOUT = 10
+HTTP_POOL_CONNECTIONS = int(os.environ.get("OPENWEATHER_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("OPENWEATHER_POOL_MAXSIZE", "20"))
+ASYNC_MAX_CONNECTIONS = int(os.environ.get("OPENWEATHER_ASYNC_MAX_CONNECTIONS", "200"))
+
+# Latency budget for the upstream calls of one turn; keep it well below the
+# time Rasa waits for the action server
+TURN_BUDGET_SECONDS = float(os.environ.get("OPENWEATHER_TURN_BUDGET_SECONDS", "12"))
+# A retry is only attempted if at least this much budget is left after the backoff
+MIN_ATTEMPT_SECONDS = float(os.environ.get("OPENWEATHER_MIN_ATTEMPT_SECONDS", "1"))
+MAX_ATTEMPTS = 3
+HEDGE_REQUESTS = os.environ.get("OPENWEATHER_HEDGE_REQUESTS", "true").lower() == "true"
+
+# Maximum number of locations whose coordinates are kept in memory
+GEOCODE_CACHE_SIZE = int(os.environ.get("OPENWEATHER_GEOCODE_CACHE_SIZE", "1024"))
+# SQLite file shared by every worker on the host so resolved locations survive restarts; unset or empty disables it
+LOCATION_STORE_PATH = os.environ.get("OPENWEATHER_LOCATION_STORE", "")
+# Locations OpenWeather answered 404 for (typos, misextracted entities) are not looked up again for this long
+UNRESOLVED_LOCATION_TTL_SECONDS = float(os.environ.get("OPENWEATHER_UNRESOLVED_LOCATION_TTL_SECONDS", "300"))
+UNRESOLVED_LOCATION_CACHE_SIZE = int(os.environ.get("OPENWEATHER_UNRESOLVED_LOCATION_CACHE_SIZE", "1024"))
+# Memory-mapped file through which the workers on a node share cached responses; empty keeps caches per process
+SHARED_CACHE_PATH = os.environ.get("OPENWEATHER_SHARED_CACHE", "")
+SHARED_CACHE_BYTES = int(os.environ.get("OPENWEATHER_SHARED_CACHE_BYTES", str(DEFAULT_SHARED_CACHE_BYTES)))
+SHARED_CACHE_SLOT_BYTES = int(os.environ.get("OPENWEATHER_SHARED_CACHE_SLOT_BYTES", str(DEFAULT_SHARED_SLOT_BYTES)))
+
+# OpenWeather refreshes current conditions about every 10 minutes, so an
+# observation is reused until the next one is due
+OBSERVATION_TTL_SECONDS = float(os.environ.get("OPENWEATHER_OBSERVATION_TTL_SECONDS", "600"))
+# Keep an observation at least this long even if its station reported late
+OBSERVATION_MIN_TTL_SECONDS = 60.0
+OBSERVATION_CACHE_SIZE = int(os.environ.get("OPENWEATHER_OBSERVATION_CACHE_SIZE", "1024"))
+# The 5 day / 3 hour forecast is reissued every 3 hours (00, 03, ... UTC); a
+# cached forecast is reused until the next issuance
+FORECAST_ISSUANCE_SECONDS = 3 * 3600
+FORECAST_CACHE_SIZE = int(os.environ.get("OPENWEATHER_FORECAST_CACHE_SIZE", "512"))
+# Forecasts for coordinates equal to this many decimals (about 1 km) are shared
+COORDINATE_DECIMALS = 2
+# Air quality is modelled hourly; UV values are refreshed a few times a day
+AIR_QUALITY_UPDATE_SECONDS = 3600
+AIR_QUALITY_TTL_SECONDS = float(os.environ.get("OPENWEATHER_AIR_QUALITY_TTL_SECONDS", "3600"))
+UV_TTL_SECONDS = float(os.environ.get("OPENWEATHER_UV_TTL_SECONDS", "3600"))
+AIR_QUALITY_CACHE_SIZE = int(os.environ.get("OPENWEATHER_AIR_QUALITY_CACHE_SIZE", "512"))
+UV_CACHE_SIZE = int(os.environ.get("OPENWEATHER_UV_CACHE_SIZE", "512"))
+# Stale-while-revalidate: past its soft limit (the expiries above) an entry is
+# still served for this long while one background refresh fetches a new one;
+# past that hard limit callers wait for upstream again
+OBSERVATION_STALE_SECONDS = float(os.environ.get("OPENWEATHER_OBSERVATION_STALE_SECONDS", "300"))
+FORECAST_STALE_SECONDS = float(os.environ.get("OPENWEATHER_FORECAST_STALE_SECONDS", "1800"))
+AIR_QUALITY_STALE_SECONDS = float(os.environ.get("OPENWEATHER_AIR_QUALITY_STALE_SECONDS", "1800"))
+UV_STALE_SECONDS = float(os.environ.get("OPENWEATHER_UV_STALE_SECONDS", "3600"))
+# Memory budget of each cache in bytes (the deep size of its keys and values,
+# about 100 KiB per parsed 5-day forecast), enforced next to the entry limits
+MIB = 1024 * 1024
+GEOCODE_CACHE_BYTES = int(os.environ.get("OPENWEATHER_GEOCODE_CACHE_BYTES", str(4 * MIB)))
+UNRESOLVED_LOCATION_CACHE_BYTES = int(os.environ.get("OPENWEATHER_UNRESOLVED_LOCATION_CACHE_BYTES", str(1 * MIB)))
+OBSERVATION_CACHE_BYTES = int(os.environ.get("OPENWEATHER_OBSERVATION_CACHE_BYTES", str(16 * MIB)))
+FORECAST_CACHE_BYTES = int(os.environ.get("OPENWEATHER_FORECAST_CACHE_BYTES", str(64 * MIB)))
+AIR_QUALITY_CACHE_BYTES = int(os.environ.get("OPENWEATHER_AIR_QUALITY_CACHE_BYTES", str(64 * MIB)))
+UV_CACHE_BYTES = int(os.environ.get("OPENWEATHER_UV_CACHE_BYTES", str(8 * MIB)))
+# Last good responses served while a circuit is open (see LastGoodResponses)
+LAST_GOOD_CACHE_BYTES = int(os.environ.get("OPENWEATHER_LAST_GOOD_CACHE_BYTES", str(16 * MIB)))
+
+# Call limits of the OpenWeather key's plan (free plan: 60/minute, 1,000,000/month); 0 disables a limit
+QUOTA_CALLS_PER_MINUTE = int(os.environ.get("OPENWEATHER_CALLS_PER_MINUTE", "60"))
+QUOTA_CALLS_PER_DAY = int(os.environ.get("OPENWEATHER_CALLS_PER_DAY", "33000"))
+# Pause after a 429 that carries no Retry-After header
+RATE_LIMIT_DEFAULT_PAUSE_SECONDS = 10.0
+
+class WeatherAPIError(Exception):
+    """Exception raised for errors in the Weather API."""
+    pass
+
+class WeatherAPIDeadlineError(WeatherAPIError, requests.exceptions.Timeout):
+    """
+    Raised when the turn's latency budget runs out before upstream answered.
+    
+    Also a requests Timeout, so actions that handle request errors report it
+    to the user the same way.
+    """
+    pass
+
+class CircuitOpenError(WeatherAPIError, requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling an endpoint whose circuit breaker is open.
+    
+    Also a requests ConnectionError, so actions that handle request errors
+    report it to the user the same way.
+    """
+    pass
+
+class LatencyBudget:
+    """Time left for the upstream calls made while handling one conversation turn."""
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        """Whether something taking `seconds` still fits in the budget."""
+        return self.remaining() >= seconds
+
+    def timeout_for(self, timeout: float) -> float:
+        """
+        Clamp a request timeout to the time left.
+        
+        Raises:
+            WeatherAPIDeadlineError: If the budget is already spent
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise WeatherAPIDeadlineError(f"Latency budget of {self.seconds}s exhausted")
+        return min(timeout, remaining)
+
+_turn_budget: ContextVar[Optional[LatencyBudget]] = ContextVar("openweather_turn_budget", default=None)
+
+def current_latency_budget() -> Optional[LatencyBudget]:
+    """Get the budget of the turn being handled, if any."""
+    return _turn_budget.get()
+
+@contextmanager
+def latency_budget(seconds: Optional[float] = None, reuse: bool = True) -> Iterator[LatencyBudget]:
+    """
+    Run the enclosed fetches under one latency budget.
+    
+    The budget is stored in a context variable, so it reaches every fetch made
+    in the block, including those in asyncio tasks started from it.
+    
+    Args:
+        seconds: Size of the budget (default: TURN_BUDGET_SECONDS)
+        reuse: Keep the budget already active instead of starting a new one
+    """
+    active = _turn_budget.get()
+    if reuse and active is not None:
+        yield active
+        return
+    budget = LatencyBudget(seconds if seconds is not None else TURN_BUDGET_SECONDS)
+    token = _turn_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _turn_budget.reset(token)
+
+def with_latency_budget(run: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Decorate an action's run() so every fetch made during the turn shares a fresh budget."""
+    @functools.wraps(run)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with latency_budget(reuse=False):
+            return await run(*args, **kwargs)
+    return wrapper
+
+def _budgeted_timeout(timeout: float) -> float:
+    budget = _turn_budget.get()
+    return timeout if budget is None else budget.timeout_for(timeout)
+
+def _raise_if_budget_spent(error: Exception) -> None:
+    """Report a timeout as a deadline error once the turn's budget is spent."""
+    budget = _turn_budget.get()
+    if budget is not None and budget.expired() and not isinstance(error, WeatherAPIDeadlineError):
+        raise WeatherAPIDeadlineError(f"Latency budget of {budget.seconds}s exhausted: {error}") from error
+
+# Priority classes for upstream calls, highest first. Lower classes may only use
+# the quota above their reserve, so they are throttled before user turns are.
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+PRIORITY_PREFETCH = "prefetch"
+PRIORITY_RESERVES = {PRIORITY_INTERACTIVE: 0.0, PRIORITY_BACKGROUND: 0.2, PRIORITY_PREFETCH: 0.5}
+PRIORITY_MAX_WAIT = {
+    PRIORITY_INTERACTIVE: float(os.environ.get("OPENWEATHER_QUOTA_MAX_WAIT_SECONDS", "2")),
+    PRIORITY_BACKGROUND: 10.0,
+    PRIORITY_PREFETCH: 0.0,
+}
+
+class QuotaExceededError(WeatherAPIError, requests.exceptions.RequestException):
+    """Raised when no upstream call can be made within the quota before the caller's wait runs out."""
+    pass
+
+class TokenBucket:
+    """Token bucket refilled continuously at `capacity` tokens per `period` seconds."""
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, reserve: float) -> float:
+        """Seconds until a token can be taken without dipping into `reserve`."""
+        missing = reserve + 1 - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+class QuotaManager:
+    """
+    Client-side guard for the OpenWeather key's call limits.
+    
+    Every upstream call takes a token from a per-minute and a per-day bucket.
+    Each priority class keeps a share of the buckets in reserve for the classes
+    above it, waits at most its own bounded time for a token, and a 429 pauses
+    all calls for the Retry-After period.
+    """
+    def __init__(self, per_minute: int, per_day: int, max_waiting: int = 100):
+        self._lock = threading.Lock()
+        # A limit of 0 disables that bucket
+        limits = {"per_minute": (per_minute, 60), "per_day": (per_day, 86400)}
+        self.buckets = {name: TokenBucket(limit, period) for name, (limit, period) in limits.items() if limit > 0}
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.granted: Dict[str, int] = defaultdict(int)
+        self.throttled: Dict[str, int] = defaultdict(int)
+        self.rejected: Dict[str, int] = defaultdict(int)
+        self.rate_limited = 0
+
+    def _try_take(self, priority: str) -> float:
+        """Take a token if `priority` may have one now, else return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            reserve = PRIORITY_RESERVES[priority]
+            wait = max([bucket.wait_time(reserve * bucket.capacity) for bucket in self.buckets.values()], default=0.0)
+            if wait <= 0:
+                for bucket in self.buckets.values():
+                    bucket.tokens -= 1
+                self.granted[priority] += 1
+            return wait
+
+    def _max_wait(self, priority: str) -> float:
+        max_wait = PRIORITY_MAX_WAIT[priority]
+        budget = _turn_budget.get()
+        return max_wait if budget is None else min(max_wait, budget.remaining())
+
+    def _begin_wait(self, priority: str, wait: float, max_wait: float) -> None:
+        with self._lock:
+            admitted = wait <= max_wait and self.waiting < self.max_waiting
+            if admitted:
+                self.waiting += 1
+                self.throttled[priority] += 1
+        if not admitted:
+            self._reject(priority, wait)
+
+    def _end_wait(self) -> None:
+        with self._lock:
+            self.waiting -= 1
+
+    def acquire(self, priority: Optional[str] = None) -> None:
+        """
+        Take a token for an upstream call, waiting up to the priority's bound.
+        
+        Raises:
+            QuotaExceededError: If no token is available in time
+        """
+        priority = priority or _request_priority.get()
+        wait = self._try_take(priority)
+        if wait <= 0:
+            return
+        deadline = time.monotonic() + self._max_wait(priority)
+        self._begin_wait(priority, wait, deadline - time.monotonic())
+        try:
+            while wait > 0:
+                if time.monotonic() + wait > deadline:
+                    self._reject(priority, wait)
+                time.sleep(wait)
+                wait = self._try_take(priority)
+        finally:
+            self._end_wait()
+
+    async def acquire_async(self, priority: Optional[str] = None) -> None:
+        """Non-blocking variant of acquire() for coroutines."""
+        priority = priority or _request_priority.get()
+        wait = self._try_take(priority)
+        if wait <= 0:
+            return
+        deadline = time.monotonic() + self._max_wait(priority)
+        self._begin_wait(priority, wait, deadline - time.monotonic())
+        try:
+            while wait > 0:
+                if time.monotonic() + wait > deadline:
+                    self._reject(priority, wait)
+                await asyncio.sleep(wait)
+                wait = self._try_take(priority)
+        finally:
+            self._end_wait()
+
+    def _reject(self, priority: str, wait: float) -> None:
+        with self._lock:
+            self.rejected[priority] += 1
+        raise QuotaExceededError(f"OpenWeather quota exhausted for {priority} calls (next call in {wait:.1f}s)")
+
+    def observe(self, status_code: int, headers: Any) -> None:
+        """Pause all calls for the Retry-After period when upstream answers 429."""
+        if status_code != 429:
+            return
+        pause = parse_retry_after(headers.get("Retry-After")) if headers else None
+        pause = RATE_LIMIT_DEFAULT_PAUSE_SECONDS if pause is None else pause
+        with self._lock:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        logger.warning(f"OpenWeather rate limit hit (HTTP 429), pausing upstream calls for {pause:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """Remaining quota and per-priority counters."""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            return {
+                "remaining": {name: int(bucket.tokens) for name, bucket in self.buckets.items()},
+                "paused_for_seconds": max(0.0, self.paused_until - now),
+                "waiting": self.waiting,
+                "rate_limited": self.rate_limited,
+                "granted": dict(self.granted),
+                "throttled": dict(self.throttled),
+                "rejected": dict(self.rejected),
+            }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Ignoring unparseable Retry-After header {value!r}: {str(e)}")
+        return None
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+_request_priority: ContextVar[str] = ContextVar("openweather_request_priority", default=PRIORITY_INTERACTIVE)
+_quota = QuotaManager(QUOTA_CALLS_PER_MINUTE, QUOTA_CALLS_PER_DAY)
+
+@contextmanager
+def quota_priority(priority: str) -> Iterator[None]:
+    """Make the upstream calls in the enclosed block (and tasks it starts) use `priority`."""
+    if priority not in PRIORITY_RESERVES:
+        raise ValueError(f"Unknown quota priority: {priority}")
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+def configure_quota(per_minute: int, per_day: int) -> None:
+    """Replace the quota manager, e.g. for a key on a different plan. A limit of 0 disables it."""
+    global _quota
+    _quota = QuotaManager(per_minute, per_day)
+
+def get_quota_stats() -> Dict[str, Any]:
+    """Get remaining quota, throttling counters and any active 429 pause."""
+    return _quota.stats()
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+def create_http_session(pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                        pool_connections: int = HTTP_POOL_CONNECTIONS) -> requests.Session:
+    """
+    Create a requests session backed by a keep-alive connection pool.
+    
+    Args:
+        pool_maxsize: Maximum number of connections kept alive per host
+        pool_connections: Number of per-host pools to cache
+        
+    Returns:
+        A configured requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+def get_http_session() -> requests.Session:
+    """Get the process-wide HTTP session, creating it on first use."""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                logger.info(f"Creating shared HTTP session (pool size per host: {HTTP_POOL_MAXSIZE})")
+                _http_session = create_http_session()
+    return _http_session
+
+def close_http_session() -> None:
+    """Close the shared HTTP session and release its pooled connections."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+def _send_get(url: str, timeout: float) -> requests.Response:
+    """Send a GET request through the shared keep-alive connection pool, within the quota."""
+    _quota.acquire()
+    response = get_http_session().get(url, timeout=timeout)
+    _quota.observe(response.status_code, response.headers)
+    return response
+
+def canonical_request_key(url: str) -> str:
+    """
+    Build the key identifying an upstream request for coalescing.
+    
+    Scheme and host are case-insensitive and the order of query parameters
+    does not change the request, so both are normalised.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ""))
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one in-flight call.
+    
+    A caller asking for a key while a call for it is already running waits for
+    that call and shares its result (or exception) instead of starting its own.
+    Nothing is kept once the call completes, so later callers start a fresh call.
+    Threads use call(); coroutines use call_async(), which coalesces callers
+    running on the same event loop.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def call(self, key: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args), or wait for the identical call already in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        
+        if is_leader:
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+        return future.result()
+
+    async def call_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Await fn(*args), or wait for the identical call already in flight on this loop."""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._async_calls.get(loop_key)
+            if task is None:
+                task = asyncio.ensure_future(fn(*args))
+                self._async_calls[loop_key] = task
+                task.add_done_callback(lambda _: self._forget(loop_key))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        # Shield the shared call so one caller being cancelled does not cancel it for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, loop_key: Tuple[int, str]) -> None:
+        with self._lock:
+            self._async_calls.pop(loop_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Upstream calls made and calls served by joining one already in flight."""
+        with self._lock:
+            return {"upstream_calls": self.executed, "coalesced_calls": self.coalesced}
+
+_single_flight = SingleFlight()
+
+def get_coalescing_stats() -> Dict[str, int]:
+    """Get how many upstream GETs were made and how many callers were coalesced onto them."""
+    return _single_flight.stats()
+
+def http_get(url: str, timeout: float = REQUEST_TIMEOUT) -> requests.Response:
+    """
+    Send a GET request through the shared keep-alive connection pool.
+    
+    Concurrent identical requests are coalesced into one upstream call whose
+    response is shared by every caller. The timeout is clamped to the latency
+    budget of the current turn, if there is one, and calls to an endpoint whose
+    circuit breaker is open are answered from its last good response or fail fast.
+    
+    Raises:
+        WeatherAPIDeadlineError: If the budget is spent before or during the request
+        CircuitOpenError: If the endpoint's circuit is open and there is no last good response
+    """
+    timeout = _budgeted_timeout(timeout)
+    try:
+        return _single_flight.call(canonical_request_key(url), _guarded_send_get, url, timeout)
+    except requests.exceptions.Timeout as e:
+        _raise_if_budget_spent(e)
+        raise
+
+_NOT_PARSED = object()
+
+@dataclass
+class HTTPResult:
+    """Response returned by the native asyncio client, mirroring requests.Response."""
+    status_code: int
+    content: bytes
+    headers: Dict[str, str]
+    _parsed: Any = field(default=_NOT_PARSED, init=False, repr=False, compare=False)
+    # The weather_models model a cache hit was served from; see response_data
+    model: Any = field(default=None, init=False, repr=False, compare=False)
+
+    def json(self) -> Any:
+        # Parsed once, so coalesced callers sharing this result share the decoded body
+        if self._parsed is _NOT_PARSED:
+            self._parsed = expand_payload(self.model) if self.model is not None else decode_json(self.content)
+        return self._parsed
+
+_async_session: Optional["aiohttp.ClientSession"] = None
+_async_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_executor: Optional[ThreadPoolExecutor] = None
+
+def get_async_http_session() -> "aiohttp.ClientSession":
+    """
+    Get the aiohttp session for the running event loop, creating it on first use.
+    
+    aiohttp sessions are bound to the loop they were created on, so a new
+    session is created if the action server restarts its loop.
+    """
+    global _async_session, _async_session_loop
+    loop = asyncio.get_running_loop()
+    if _async_session is None or _async_session.closed or _async_session_loop is not loop:
+        logger.info(f"Creating shared aiohttp session (max connections: {ASYNC_MAX_CONNECTIONS})")
+        connector = aiohttp.TCPConnector(limit=ASYNC_MAX_CONNECTIONS, limit_per_host=ASYNC_MAX_CONNECTIONS)
+        _async_session = aiohttp.ClientSession(connector=connector)
+        _async_session_loop = loop
+    return _async_session
+
+def _get_async_executor() -> ThreadPoolExecutor:
+    """Get the thread pool used for async requests when aiohttp is unavailable."""
+    global _async_executor
+    if _async_executor is None:
+        with _http_session_lock:
+            if _async_executor is None:
+                _async_executor = ThreadPoolExecutor(
+                    max_workers=ASYNC_MAX_CONNECTIONS, thread_name_prefix="openweather-http"
+                )
+    return _async_executor
+
+async def close_async_http_session() -> None:
+    """Close the shared aiohttp session, if one is open."""
+    global _async_session, _async_session_loop
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+    _async_session = None
+    _async_session_loop = None
+
+async def async_http_get(url: str, timeout: float = REQUEST_TIMEOUT) -> Any:
+    """
+    Send a GET request without blocking the event loop.
+    
+    Uses aiohttp when it is installed. Otherwise the request is sent through
+    the shared keep-alive session on a worker thread. Transport errors are
+    raised as requests exceptions in both cases so callers handle them the same way.
+    Concurrent identical requests are coalesced into one upstream call, and a
+    slow request is hedged with a second one once it passes the endpoint's p95.
+    The timeout is clamped to the latency budget of the current turn, if there is one,
+    and the endpoint's circuit breaker applies as for http_get().
+    
+    Returns:
+        An object with status_code, headers, content and json()
+    
+    Raises:
+        WeatherAPIDeadlineError: If the budget is spent before or during the request
+        CircuitOpenError: If the endpoint's circuit is open and there is no last good response
+    """
+    timeout = _budgeted_timeout(timeout)
+    try:
+        return await _single_flight.call_async(canonical_request_key(url), _guarded_async_get, url, timeout)
+    except requests.exceptions.Timeout as e:
+        _raise_if_budget_spent(e)
+        raise
+
+async def _async_send_get(url: str, timeout: float) -> Any:
+    if not has_aiohttp:
+        # Run in a copy of this context so the worker thread sees the turn's budget and priority
+        loop = asyncio.get_running_loop()
+        context = copy_context()
+        return await loop.run_in_executor(_get_async_executor(), context.run, _send_get, url, timeout)
+    
+    await _quota.acquire_async()
+    try:
+        session = get_async_http_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            content = await response.read()
+            _quota.observe(response.status, response.headers)
+            return HTTPResult(status_code=response.status, content=content, headers=dict(response.headers))
+    except asyncio.TimeoutError as e:
+        raise requests.exceptions.Timeout(f"Request timed out after {timeout}s") from e
+    except aiohttp.ClientError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+
+class EndpointLatencyTracker:
+    """Recent response times per endpoint, used to decide when to hedge a request."""
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self.hedged = 0
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[endpoint].append(seconds)
+
+    def record_hedge(self) -> None:
+        with self._lock:
+            self.hedged += 1
+
+    def p95(self, endpoint: str) -> Optional[float]:
+        """95th percentile latency, or None until enough samples were recorded."""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = list(self._samples)
+            hedged = self.hedged
+        return {"hedged_requests": hedged, "p95_seconds": {endpoint: self.p95(endpoint) for endpoint in endpoints}}
+
+_endpoint_latency = EndpointLatencyTracker()
+
+def get_latency_stats() -> Dict[str, Any]:
+    """Get per-endpoint p95 latencies and how many requests were hedged."""
+    return _endpoint_latency.stats()
+
+async def _timed_send_get(endpoint: str, url: str, timeout: float) -> Any:
+    start = time.monotonic()
+    response = await _async_send_get(url, timeout)
+    _endpoint_latency.record(endpoint, time.monotonic() - start)
+    return response
+
+async def _speculative_send_get(endpoint: str, url: str, timeout: float) -> Any:
+    # Hedges are optional, so they only use spare quota; the priority set here stays in this task
+    _request_priority.set(PRIORITY_PREFETCH)
+    return await _timed_send_get(endpoint, url, timeout)
+
+async def _hedged_send_get(url: str, timeout: float) -> Any:
+    """
+    Send a GET, hedging with a second identical request if the first has not
+    answered by the endpoint's p95 latency. The first successful answer wins.
+    """
+    endpoint = urlsplit(url).path
+    hedge_after = _endpoint_latency.p95(endpoint) if HEDGE_REQUESTS else None
+    primary = asyncio.ensure_future(_timed_send_get(endpoint, url, timeout))
+    if hedge_after is None or hedge_after >= timeout:
+        return await primary
+    
+    attempts = [primary]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+        if not done:
+            _endpoint_latency.record_hedge()
+            logger.info(f"Hedging request to {endpoint}: no answer after p95 of {hedge_after * 1000:.0f} ms")
+            attempts.append(asyncio.ensure_future(_speculative_send_get(endpoint, url, timeout - hedge_after)))
+        
+        pending = set(attempts)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in attempts:
+                if attempt in done and attempt.exception() is None:
+                    return attempt.result()
+            if not pending:
+                # Every attempt failed: report the first request's error
+                return primary.result()
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
+
+# Backoff between attempts, as before; whether a retry happens depends on the budget left
+# Errors raised on our side fail fast: retrying cannot help before the budget, breaker or quota allows a call
+NOT_RETRIED_ERRORS = (WeatherAPIDeadlineError, CircuitOpenError, QuotaExceededError)
+_retry_wait = tenacity.wait_exponential(multiplier=1, min=2, max=10) if has_tenacity else None
+
+def _stop_when_budget_spent(retry_state: Any) -> bool:
+    """Stop retrying if the backoff plus a minimal attempt no longer fits in the turn's budget."""
+    budget = _turn_budget.get()
+    if budget is None:
+        return False
+    return not budget.allows(_retry_wait(retry_state) + MIN_ATTEMPT_SECONDS)
+
+def _raise_retry_error(retry_state: Any) -> Any:
+    """Raise the last attempt's error, as a deadline error if the budget cut the retries short."""
+    error = retry_state.outcome.exception()
+    budget = _turn_budget.get()
+    if budget is not None and retry_state.attempt_number < MAX_ATTEMPTS:
+        logger.error(f"No budget left to retry after {retry_state.attempt_number} attempt(s): {str(error)}")
+        raise WeatherAPIDeadlineError(
+            f"Latency budget of {budget.seconds}s exhausted after {retry_state.attempt_number} attempt(s): {error}"
+        ) from error
+    raise error
+
 # Define fetch_with_retry function based on tenacity availability
 if has_tenacity:
     # Define with retry logic
     @tenacity.retry(
-        stop=tenacity.stop_after_attempt(3),
-        wait=tenacity.wait_exponential(multiplier=1, min=2, max=10)
+        stop=tenacity.stop_after_attempt(MAX_ATTEMPTS) | _stop_when_budget_spent,
+        wait=_retry_wait,
+        retry=tenacity.retry_if_not_exception_type(NOT_RETRIED_ERRORS),
+        retry_error_callback=_raise_retry_error
+    )
+    def _fetch_attempts(url: str) -> requests.Response:
+        return http_get(url, timeout=REQUEST_TIMEOUT)
+else:
+    # Simple version without retry logic
+    def _fetch_attempts(url: str) -> requests.Response:
+        return http_get(url, timeout=REQUEST_TIMEOUT)
+
+def fetch_with_retry(url: str) -> requests.Response:
+    """
+    Fetch data from URL, retrying transient failures while the latency budget allows.
+    
+    Uses the active turn's budget, or starts one for this fetch.
+    """
+    with latency_budget():
+        return _fetch_attempts(url)
+
+# Define async_fetch_with_retry function based on tenacity availability
+if has_tenacity:
+    # Define with retry logic
+    @tenacity.retry(
+        stop=tenacity.stop_after_attempt(MAX_ATTEMPTS) | _stop_when_budget_spent,
+        wait=_retry_wait,
+        retry=tenacity.retry_if_not_exception_type(NOT_RETRIED_ERRORS),
+        retry_error_callback=_raise_retry_error
     )
-    def fetch_with_retry(url: str) -> requests.Response:
-        """Fetch data from URL with retry logic for transient failures."""
-        return requests.get(url, timeout=10)
+    async def _async_fetch_attempts(url: str) -> Any:
+        return await async_http_get(url, timeout=REQUEST_TIMEOUT)
 else:
     # Simple version without retry logic
-    def fetch_with_retry(url: str) -> requests.Response:
-        """Simple fetch without retry logic."""
-        return requests.get(url, timeout=10)
+    async def _async_fetch_attempts(url: str) -> Any:
+        return await async_http_get(url, timeout=REQUEST_TIMEOUT)
+
+async def async_fetch_with_retry(url: str) -> Any:
+    """
+    Fetch data from URL without blocking, retrying transient failures while the
+    latency budget allows.
+    
+    Uses the active turn's budget, or starts one for this fetch.
+    """
+    with latency_budget():
+        return await _async_fetch_attempts(url)
 
 # API endpoints configuration
 API_ENDPOINTS = {
-    "current_weather": "http://api.openweathermap.org/data/2.5/weather",
-    "forecast": "http://api.openweathermap.org/data/2.5/forecast",
-    "uv_index": "http://api.openweathermap.org/data/2.5/uvi",
-    "uv_forecast": "http://api.openweathermap.org/data/2.5/uvi/forecast"
+    "current_weather": f"{OPENWEATHER_BASE_URL}/weather",
+    "forecast": f"{OPENWEATHER_BASE_URL}/forecast",
+    "uv_index": f"{OPENWEATHER_BASE_URL}/uvi",
+    "uv_forecast": f"{OPENWEATHER_BASE_URL}/uvi/forecast",
+    "air_pollution": f"{OPENWEATHER_BASE_URL}/air_pollution",
+    "air_pollution_forecast": f"{OPENWEATHER_BASE_URL}/air_pollution/forecast"
+}
+
+# Endpoint families that are not in API_ENDPOINTS, by URL path
+EXTRA_ENDPOINT_PATHS = {
+    "weather_history": urlsplit(WEATHER_HISTORY_URL).path,
+    "timezone": urlsplit(TIMEZONEDB_URL).path,
 }
 
+@dataclass(frozen=True)
+class EndpointSpec:
+    """How requests to one upstream endpoint are spelled."""
+    # Whether the endpoint takes units=; it is then always sent as UNITS
+    units: bool = False
+    credential: str = "appid"
+    lon_param: str = "lon"
+    # Parameters every request to the endpoint carries
+    fixed: Tuple[Tuple[str, str], ...] = ()
+
+ENDPOINT_SPECS = {
+    "current_weather": EndpointSpec(units=True),
+    "forecast": EndpointSpec(units=True),
+    "uv_index": EndpointSpec(),
+    "uv_forecast": EndpointSpec(),
+    "air_pollution": EndpointSpec(),
+    "air_pollution_forecast": EndpointSpec(),
+    "weather_history": EndpointSpec(units=True),
+    "timezone": EndpointSpec(credential="key", lon_param="lng", fixed=(("format", "json"), ("by", "position"))),
+}
+
+def endpoint_url(endpoint: str) -> str:
+    """Base URL of an endpoint in ENDPOINT_SPECS."""
+    if endpoint == "weather_history":
+        return WEATHER_HISTORY_URL
+    if endpoint == "timezone":
+        return TIMEZONEDB_URL
+    return API_ENDPOINTS[endpoint]
+
+@dataclass(frozen=True)
+class WeatherQuery:
+    """
+    A structured upstream request: the endpoint, where, and any extra parameters.
+    
+    Every request is built from a query, so equivalent requests are spelled
+    identically: units are always UNITS, coordinates are canonical and
+    parameters come in a fixed order. cache_key() identifies the data a query
+    returns independently of the API key and of how the location was typed.
+    """
+    endpoint: str
+    location: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    params: Tuple[Tuple[str, str], ...] = ()
+
+    @classmethod
+    def by_location(cls, endpoint: str, location: str, **params: Any) -> "WeatherQuery":
+        return cls(endpoint, location=" ".join(location.split()), params=_query_params(params))
+
+    @classmethod
+    def by_coordinates(cls, endpoint: str, lat: float, lon: float, **params: Any) -> "WeatherQuery":
+        lat, lon = canonical_coordinates(lat, lon)
+        return cls(endpoint, lat=lat, lon=lon, params=_query_params(params))
+
+    def _parameters(self, location: Optional[str]) -> List[Tuple[str, str]]:
+        spec = ENDPOINT_SPECS[self.endpoint]
+        if location is not None:
+            where = [("q", location)]
+        else:
+            where = [("lat", str(self.lat)), (spec.lon_param, str(self.lon))]
+        units = [("units", UNITS)] if spec.units else []
+        return where + list(spec.fixed) + units + list(self.params)
+
+    def url(self, api_key: str) -> str:
+        """The request URL, authenticated with `api_key`."""
+        spec = ENDPOINT_SPECS[self.endpoint]
+        parameters = self._parameters(self.location)
+        where = 1 if self.location is not None else 2
+        parameters.insert(where, (spec.credential, api_key))
+        return f"{endpoint_url(self.endpoint)}?{urlencode(parameters)}"
+
+    def cache_key(self) -> str:
+        """Stable key of the data this query returns; the same for every API key and spelling of the location."""
+        location = normalize_location(self.location) if self.location is not None else None
+        return f"{self.endpoint}?{urlencode(self._parameters(location))}"
+
+def _query_params(params: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in params.items()))
+
+def convert_temperature(celsius: float, units: str) -> float:
+    """Convert a temperature from UNITS (Celsius) to OpenWeather's `standard` (Kelvin) or `imperial` (Fahrenheit)."""
+    if units == "standard":
+        return celsius + 273.15
+    if units == "imperial":
+        return celsius * 9 / 5 + 32
+    return celsius
+
+# Circuit breaker configuration (read once at import time)
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("OPENWEATHER_CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("OPENWEATHER_CIRCUIT_RESET_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_CALLS = int(os.environ.get("OPENWEATHER_CIRCUIT_HALF_OPEN_CALLS", "1"))
+LAST_GOOD_RESPONSES = 256
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one endpoint family.
+    
+    After `failure_threshold` consecutive failures (transport errors or 5xx)
+    the breaker opens and calls fail fast. After `reset_seconds` it lets
+    `half_open_calls` trial calls through: a success closes it, a failure
+    opens it again.
+    """
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS, half_open_calls: int = CIRCUIT_HALF_OPEN_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials = 0
+        self.rejected = 0
+        self.transitions: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+    def _transition(self, state: str, reason: str) -> None:
+        # Called with the lock held
+        logger.warning(f"Circuit breaker for {self.name}: {self.state} -> {state} ({reason})")
+        self.transitions.append({"at": time.time(), "from": self.state, "to": state, "reason": reason})
+        self.state = state
+        if state == CIRCUIT_OPEN:
+            self.opened_at = time.monotonic()
+        self.trials = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (half-open trial calls count against the limit)."""
+        with self._lock:
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._transition(CIRCUIT_HALF_OPEN, f"{self.reset_seconds:.0f}s elapsed")
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_HALF_OPEN and self.trials < self.half_open_calls:
+                self.trials += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != CIRCUIT_CLOSED:
+                self._transition(CIRCUIT_CLOSED, "trial call succeeded")
+
+    def record_failure(self, reason: str) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN:
+                self._transition(CIRCUIT_OPEN, f"trial call failed: {reason}")
+            elif self.state == CIRCUIT_CLOSED and self.failures >= self.failure_threshold:
+                self._transition(CIRCUIT_OPEN, f"{self.failures} consecutive failures, last: {reason}")
+
+    def release(self) -> None:
+        """Give back a half-open trial slot whose call ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN and self.trials > 0:
+                self.trials -= 1
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "rejected_calls": self.rejected,
+                "transitions": list(self.transitions),
+            }
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_lock = threading.Lock()
+
+def endpoint_family(url: str) -> str:
+    """Name of the endpoint family a URL belongs to (the API_ENDPOINTS key where there is one)."""
+    path = urlsplit(url).path
+    for name, endpoint in API_ENDPOINTS.items():
+        if urlsplit(endpoint).path == path:
+            return name
+    for name, endpoint_path in EXTRA_ENDPOINT_PATHS.items():
+        if endpoint_path == path:
+            return name
+    return path
+
+def get_circuit_breaker(family: str) -> CircuitBreaker:
+    """Get the circuit breaker for an endpoint family, creating it on first use."""
+    with _circuit_lock:
+        breaker = _circuit_breakers.get(family)
+        if breaker is None:
+            # The thresholds as last set by configure_circuit_breakers, not the class defaults
+            breaker = _circuit_breakers[family] = CircuitBreaker(
+                family, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, CIRCUIT_HALF_OPEN_CALLS
+            )
+        return breaker
+
+def configure_circuit_breakers(failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                               reset_seconds: float = CIRCUIT_RESET_SECONDS,
+                               half_open_calls: int = CIRCUIT_HALF_OPEN_CALLS) -> None:
+    """Reset every breaker to closed with the given thresholds."""
+    global CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, CIRCUIT_HALF_OPEN_CALLS
+    with _circuit_lock:
+        CIRCUIT_FAILURE_THRESHOLD = failure_threshold
+        CIRCUIT_RESET_SECONDS = reset_seconds
+        CIRCUIT_HALF_OPEN_CALLS = half_open_calls
+        _circuit_breakers.clear()
+        _last_good.clear()
+
+def get_circuit_stats() -> Dict[str, Dict[str, Any]]:
+    """Get the state, failure count and recent transitions of every breaker."""
+    with _circuit_lock:
+        breakers = list(_circuit_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+def _remember_good(key: str, response: Any) -> None:
+    _last_good.put(key, response)
+
+def _serve_while_open(breaker: CircuitBreaker, key: str) -> Any:
+    """Answer a call to an open circuit from the last good response, or fail fast."""
+    response = _last_good.get(key, last_good_max_age(breaker.name))
+    if response is not None:
+        logger.info(f"Circuit for {breaker.name} is {breaker.state}, serving the last good response")
+        return response
+    raise CircuitOpenError(f"Circuit for {breaker.name} is {breaker.state}, retry in {breaker.retry_in():.0f}s")
+
+def _record_outcome(breaker: CircuitBreaker, key: str, response: Any) -> None:
+    if response.status_code >= 500:
+        breaker.record_failure(f"HTTP {response.status_code}")
+        return
+    breaker.record_success()
+    if response.status_code == 200:
+        _remember_good(key, response)
+
+def _is_upstream_failure(error: BaseException) -> bool:
+    # Quota and budget errors are raised on our side and say nothing about the endpoint
+    return isinstance(error, requests.exceptions.RequestException) and not isinstance(error, WeatherAPIError)
+
+def _guarded_send_get(url: str, timeout: float) -> requests.Response:
+    """Send a GET through the endpoint family's circuit breaker."""
+    breaker = get_circuit_breaker(endpoint_family(url))
+    key = canonical_request_key(url)
+    if not breaker.allow():
+        return _serve_while_open(breaker, key)
+    try:
+        response = _send_get(url, timeout)
+    except BaseException as e:
+        if _is_upstream_failure(e):
+            breaker.record_failure(type(e).__name__)
+        else:
+            breaker.release()
+        raise
+    _record_outcome(breaker, key, response)
+    return response
+
+async def _guarded_async_get(url: str, timeout: float) -> Any:
+    """Non-blocking variant of _guarded_send_get()."""
+    breaker = get_circuit_breaker(endpoint_family(url))
+    key = canonical_request_key(url)
+    if not breaker.allow():
+        return _serve_while_open(breaker, key)
+    try:
+        response = await _hedged_send_get(url, timeout)
+    except BaseException as e:
+        if _is_upstream_failure(e):
+            breaker.record_failure(type(e).__name__)
+        else:
+            breaker.release()
+        raise
+    _record_outcome(breaker, key, response)
+    return response
+
+# Country names users write that OpenWeather only knows by their ISO 3166 code
+COUNTRY_ALIASES = {"uk": "gb", "england": "gb", "usa": "us"}
+
+def normalize_location(location: str) -> str:
+    """
+    Normalise a location for cache lookups.
+    
+    Case is folded, runs of whitespace are collapsed and the parts of
+    "city, state, country" are joined by bare commas, so "  new york , US"
+    and "New York,us" share an entry. Common country names are mapped to
+    the code OpenWeather uses ("London, UK" is "london,gb").
+    """
+    parts = [" ".join(part.split()).casefold() for part in location.split(",")]
+    parts = [part for part in parts if part]
+    if len(parts) > 1:
+        parts[-1] = COUNTRY_ALIASES.get(parts[-1], parts[-1])
+    return ",".join(parts)
+
+def canonical_coordinates(lat: float, lon: float) -> Tuple[float, float]:
+    """Coordinates rounded to COORDINATE_DECIMALS, so nearby lookups of one place share an entry."""
+    return round(float(lat), COORDINATE_DECIMALS), round(float(lon), COORDINATE_DECIMALS)
+
+_ATOMIC_TYPES = (str, int, float, bool, type(None), bytes)
+# Long lists (a forecast's 40 timesteps, a day of hourly readings) are sized from this many items
+SIZE_SAMPLE = 8
+
+@functools.lru_cache(maxsize=None)
+def _slot_names(kind: type) -> Tuple[str, ...]:
+    """The slots declared by a class and its bases."""
+    names: List[str] = []
+    for base in kind.__mro__:
+        slots = base.__dict__.get("__slots__", ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return tuple(name for name in names if name not in ("__dict__", "__weakref__"))
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate memory held by a parsed payload or cached model: sys.getsizeof of everything it references.
+    
+    Parsed JSON is a tree, so objects are not tracked by identity; a string
+    or number referenced twice is counted twice, which errs on the side of
+    a smaller cache. The items of a long list are alike, so only the first
+    SIZE_SAMPLE are walked and scaled up to the list's length. The size of
+    an array includes its buffer; slotted objects are walked slot by slot.
+    """
+    pending: List[Tuple[Any, float]] = [(value, 1.0)]
+    total = 0.0
+    getsizeof = sys.getsizeof
+    while pending:
+        item, weight = pending.pop()
+        total += getsizeof(item) * weight
+        kind = type(item)
+        if kind is dict:
+            pending.extend((child, weight) for child in item.keys())
+            pending.extend((child, weight) for child in item.values())
+        elif kind is list or kind is tuple:
+            if len(item) > SIZE_SAMPLE:
+                scaled = weight * len(item) / SIZE_SAMPLE
+                pending.extend((child, scaled) for child in item[:SIZE_SAMPLE])
+            else:
+                pending.extend((child, weight) for child in item)
+        elif kind not in _ATOMIC_TYPES:
+            if hasattr(item, "__dict__"):
+                pending.append((vars(item), weight))
+            pending.extend((getattr(item, name), weight) for name in _slot_names(kind) if hasattr(item, name))
+    return int(total)
+
+class FrequencySketch:
+    """
+    Count-min sketch of how often keys were looked up, for TinyLFU admission.
+    
+    Four rows of counters capped at 15 give an estimate that is never too
+    low. Every counter is halved after `10 * width` increments, so
+    popularity fades and a city that was popular last week can be displaced.
+    """
+    MAX_COUNT = 15
+    SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5)
+    HALVE = bytes(count >> 1 for count in range(256))
+
+    def __init__(self, width: int):
+        self.width = 1 << max(4, (max(width, 1) - 1).bit_length())
+        self.rows = [bytearray(self.width) for _ in self.SEEDS]
+        self.sample_size = 10 * self.width
+        self.additions = 0
+
+    def _indexes(self, key: Any) -> List[int]:
+        hashed = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return [((hashed * seed) & 0xFFFFFFFFFFFFFFFF) >> 32 & (self.width - 1) for seed in self.SEEDS]
+
+    def increment(self, key: Any) -> None:
+        for row, index in zip(self.rows, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [row.translate(self.HALVE) for row in self.rows]
+            self.additions //= 2
+
+    def frequency(self, key: Any) -> int:
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+class CacheBudget:
+    """
+    Entry and byte limits of one LRU cache, with size-aware eviction and TinyLFU admission.
+    
+    The owning cache keeps its entries in an OrderedDict (least recently used
+    first) and calls `admit` before inserting, with its lock held. To make
+    room, as many entries as needed are taken from the LRU end, however large
+    or small they are; the new entry is only admitted if it was looked up at
+    least as often as each of them. A stream of one-off towns therefore
+    displaces other one-off towns, never the capitals everyone asks about.
+    """
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sketch = FrequencySketch(max(16, min(max_entries, 1 << 16)) * 4)
+        self.sizes: Dict[Any, int] = {}
+        self.bytes = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def record(self, key: Any) -> None:
+        """Count a lookup of `key`."""
+        self.sketch.increment(key)
+
+    def admit(self, entries: "OrderedDict[Any, Any]", key: Any, size: int,
+              expired: Optional[Callable[[Any], bool]] = None) -> bool:
+        """
+        Make room for `key` taking `size` bytes, or decide it is not worth it.
+        
+        Entries that make way are removed from `entries`; those `expired`
+        reports as expired are dropped whatever their frequency and are not
+        counted as evictions.
+        
+        Returns:
+            Whether the caller should insert the entry
+        """
+        if self.max_entries <= 0 or size > self.max_bytes:
+            self.rejections += 1
+            return False
+        present = key in entries
+        excess_entries, excess_bytes = self._overflow(entries, key, size, present)
+        victims = []
+        for old_key, old_value in entries.items():
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            if old_key == key:
+                continue
+            victims.append((old_key, expired is not None and expired(old_value)))
+            excess_entries -= 1
+            excess_bytes -= self.sizes.get(old_key, 0)
+        if not present and victims:
+            frequency = self.sketch.frequency(key)
+            if any(not dead and self.sketch.frequency(victim) > frequency for victim, dead in victims):
+                self.rejections += 1
+                return False
+        for victim, dead in victims:
+            self.forget(entries, victim)
+            if not dead:
+                self.evictions += 1
+        return True
+
+    def _overflow(self, entries: "OrderedDict[Any, Any]", key: Any, size: int, present: bool) -> Tuple[int, int]:
+        count = len(entries) + (0 if present else 1)
+        total = self.bytes - self.sizes.get(key, 0) + size
+        return max(0, count - self.max_entries), max(0, total - self.max_bytes)
+
+    def added(self, key: Any, size: int) -> None:
+        """Account for an inserted or replaced entry."""
+        self.bytes += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+
+    def forget(self, entries: "OrderedDict[Any, Any]", key: Any) -> None:
+        """Remove an entry and its bytes."""
+        entries.pop(key, None)
+        self.bytes -= self.sizes.pop(key, 0)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "rejections": self.rejections,
+        }
+
+def last_good_max_age(family: str) -> float:
+    """
+    How old a last good response of an endpoint family may be when it is served: as
+    long as the family's cache would serve it stale, the current weather's for others.
+    """
+    if family == "forecast":
+        return FORECAST_ISSUANCE_SECONDS + FORECAST_STALE_SECONDS
+    if family in ("air_pollution", "air_pollution_forecast"):
+        return AIR_QUALITY_TTL_SECONDS + AIR_QUALITY_STALE_SECONDS
+    if family in ("uv_index", "uv_forecast"):
+        return UV_TTL_SECONDS + UV_STALE_SECONDS
+    return OBSERVATION_TTL_SECONDS + OBSERVATION_STALE_SECONDS
+
+class LastGoodResponses:
+    """
+    The last successful response to each request, served while its endpoint's circuit is open.
+    
+    Bounded in entries and bytes like the caches (see CacheBudget); a
+    response is charged its body's size plus a fixed overhead for the
+    response object and headers. A response older than the age its caller
+    allows (see last_good_max_age) is dropped instead of served.
+    """
+    # Response object, headers and bookkeeping, on top of the body
+    OVERHEAD_BYTES = 2048
+
+    def __init__(self, max_entries: int = LAST_GOOD_RESPONSES, max_bytes: int = LAST_GOOD_CACHE_BYTES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.budget = CacheBudget(max_entries, max_bytes)
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _size(self, response: Any) -> int:
+        content = getattr(response, "content", b"")
+        return self.OVERHEAD_BYTES + (len(content) if isinstance(content, (bytes, bytearray)) else 0)
+
+    def put(self, key: str, response: Any) -> None:
+        size = self._size(response)
+        with self._lock:
+            self.budget.record(key)
+            if not self.budget.admit(self._entries, key, size):
+                return
+            self._entries[key] = (self.clock(), response)
+            self._entries.move_to_end(key)
+            self.budget.added(key, size)
+
+    def get(self, key: str, max_age: float) -> Optional[Any]:
+        """The last good response to `key` if it is at most `max_age` seconds old, counting the hit or miss."""
+        with self._lock:
+            self.budget.record(key)
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] > max_age:
+                self.budget.forget(self._entries, key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self.budget.forget(self._entries, key)
+
+    def stats(self) -> Dict[str, int]:
+        """Hits, misses, hit ratio, evictions, rejected entries, size and bytes held."""
+        with self._lock:
+            return dict(
+                self.budget.stats(),
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=_hit_ratio(self.hits, self.misses),
+                size=len(self._entries),
+                max_entries=self.max_entries,
+            )
+
+_last_good = LastGoodResponses()
+
+@dataclass(frozen=True)
+class GeocodeEntry:
+    """What a geocode lookup yields: coordinates, the location's UTC offset in seconds and its OpenWeather city id."""
+    lat: float
+    lon: float
+    timezone_offset: int = 0
+    city_id: Optional[int] = None
+
+class GeocodeCache:
+    """
+    Bounded LRU cache from normalised location strings to coordinates.
+    
+    A city's coordinates never change, so entries do not expire; once
+    `max_entries` or `max_bytes` is reached the least recently used entries
+    make way for new ones that were looked up at least as often (see
+    CacheBudget).
+    """
+    def __init__(self, max_entries: int = GEOCODE_CACHE_SIZE, max_bytes: int = GEOCODE_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.budget = CacheBudget(max_entries, max_bytes)
+        self._entries: "OrderedDict[str, GeocodeEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, location: str) -> Optional[GeocodeEntry]:
+        """Look up a location, counting the hit or miss."""
+        key = normalize_location(location)
+        with self._lock:
+            self.budget.record(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def __contains__(self, location: str) -> bool:
+        """Whether a location is cached, without counting a lookup."""
+        with self._lock:
+            return normalize_location(location) in self._entries
+
+    def peek(self, location: str) -> Optional[GeocodeEntry]:
+        """Look up a location without counting a lookup or refreshing its recency."""
+        with self._lock:
+            return self._entries.get(normalize_location(location))
+
+    def put(self, location: str, entry: GeocodeEntry) -> None:
+        key = normalize_location(location)
+        size = estimate_size(key) + estimate_size(entry)
+        with self._lock:
+            if not self.budget.admit(self._entries, key, size):
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.budget.added(key, size)
+
+    def stats(self) -> Dict[str, int]:
+        """Hits, misses, hit ratio, evictions, rejected entries, size and bytes held."""
+        with self._lock:
+            return dict(
+                self.budget.stats(),
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=_hit_ratio(self.hits, self.misses),
+                size=len(self._entries),
+                max_entries=self.max_entries,
+            )
+
+_geocode_cache = GeocodeCache()
+
+def configure_geocode_cache(max_entries: int = GEOCODE_CACHE_SIZE, max_bytes: int = GEOCODE_CACHE_BYTES) -> None:
+    """Replace the geocode cache with an empty one holding up to `max_entries` locations in `max_bytes`."""
+    global _geocode_cache
+    _geocode_cache = GeocodeCache(max_entries, max_bytes)
+
+def get_geocode_stats() -> Dict[str, int]:
+    """Get the geocode cache's hit and miss counters."""
+    return _geocode_cache.stats()
+
+# The database itself is only opened by the first lookup or write
+_location_store: Optional[LocationStore] = LocationStore(LOCATION_STORE_PATH) if LOCATION_STORE_PATH else None
+
+def configure_location_store(path: Optional[str] = LOCATION_STORE_PATH) -> None:
+    """Use the location store at `path` (opened on first use), or none if `path` is empty."""
+    global _location_store
+    if _location_store is not None:
+        _location_store.close()
+    _location_store = LocationStore(path) if path else None
+
+def get_location_store_stats() -> Dict[str, Any]:
+    """Get the location store's lookup and write counters."""
+    if _location_store is None:
+        return {"enabled": False}
+    return dict(_location_store.stats(), enabled=True, path=_location_store.path)
+
+_shared_cache: Optional[SharedCache] = (
+    SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_BYTES, SHARED_CACHE_SLOT_BYTES) if SHARED_CACHE_PATH else None
+)
+
+def configure_shared_cache(path: Optional[str] = SHARED_CACHE_PATH, size_bytes: int = SHARED_CACHE_BYTES,
+                           slot_bytes: int = SHARED_CACHE_SLOT_BYTES) -> None:
+    """Share cached responses with the other workers through the file at `path` (mapped on first use), or not if empty."""
+    global _shared_cache
+    if _shared_cache is not None:
+        _shared_cache.close()
+    _shared_cache = SharedCache(path, size_bytes, slot_bytes) if path else None
+
+def get_shared_cache_stats() -> Dict[str, Any]:
+    """Get this worker's shared cache lookup and write counters."""
+    if _shared_cache is None:
+        return {"enabled": False}
+    return dict(_shared_cache.stats(), enabled=True, path=_shared_cache.path)
+
+def clear_geocodes() -> None:
+    """Forget every resolved location, in memory and in the location store, and every unresolved one."""
+    configure_geocode_cache(_geocode_cache.max_entries, _geocode_cache.budget.max_bytes)
+    configure_unresolved_location_cache(
+        _unresolved_locations.ttl, _unresolved_locations.max_entries, _unresolved_locations.budget.max_bytes
+    )
+    if _location_store is not None:
+        _location_store.clear()
+
+def cached_geocode(location: str) -> Optional[GeocodeEntry]:
+    """
+    Coordinates of a location from the in-memory cache, then from the location store.
+    
+    Returns:
+        The entry, or None if neither knows the location
+    """
+    entry = _geocode_cache.get(location)
+    if entry is not None or _location_store is None:
+        return entry
+    stored = _location_store.get(normalize_location(location))
+    if stored is None:
+        return None
+    entry = GeocodeEntry(lat=stored.lat, lon=stored.lon, timezone_offset=stored.timezone_offset, city_id=stored.city_id)
+    _geocode_cache.put(location, entry)
+    return entry
+
+def known_geocode(location: str) -> Optional[GeocodeEntry]:
+    """Coordinates this worker already resolved for a location, without counting a cache lookup."""
+    return _geocode_cache.peek(location)
+
+def remember_geocode(location: str, response: Any) -> Optional[GeocodeEntry]:
+    """
+    Cache the coordinates from a successful /weather?q= response in memory and in the location store.
+    
+    Returns:
+        The cached entry, or None if the response was not a successful geocode
+    """
+    if response is None or response.status_code != 200:
+        return None
+    data = response.json()
+    coord = data.get("coord") if isinstance(data, dict) else None
+    if not coord:
+        return None
+    entry = GeocodeEntry(
+        lat=coord["lat"], lon=coord["lon"], timezone_offset=data.get("timezone", 0), city_id=data.get("id")
+    )
+    _remember_location(location, entry)
+    return entry
+
+def _remember_location(location: str, entry: GeocodeEntry) -> None:
+    _geocode_cache.put(location, entry)
+    _unresolved_locations.discard(location)
+    if _location_store is not None:
+        _location_store.put(normalize_location(location), StoredLocation(
+            lat=entry.lat, lon=entry.lon, city_id=entry.city_id, timezone_offset=entry.timezone_offset
+        ))
+
+def geocode_response(entry: GeocodeEntry) -> HTTPResult:
+    """A /weather-shaped response for a cache hit, so callers handle hits and fetched geocodes alike."""
+    payload = {"coord": {"lat": entry.lat, "lon": entry.lon}, "timezone": entry.timezone_offset}
+    if entry.city_id is not None:
+        payload["id"] = entry.city_id
+    return HTTPResult(status_code=200, content=json.dumps(payload).encode("utf-8"), headers={"X-Geocode-Cache": "hit"})
+
+def _hit_ratio(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+@dataclass(frozen=True)
+class CacheHit:
+    """
+    A value served from an ExpiringCache, with its age in seconds, whether it
+    was past its soft limit and whether it came from the shared cache.
+    """
+    value: Any
+    age: float
+    stale: bool = False
+    shared: bool = False
+
+class ExpiringCache:
+    """
+    LRU cache whose entries carry their own expiry time, bounded in entries
+    and bytes by a CacheBudget.
+    
+    An entry is fresh until its soft limit, which subclasses decide. For
+    `stale_seconds` after that (its hard limit) it can still be served stale
+    while one background refresh replaces it (see read_observation and
+    friends); past the hard limit it is gone. Hits, stale hits and misses are
+    counted per action, so the hit ratio of each caller can be compared.
+    
+    Subclasses with a `namespace` also write their entries to the shared
+    cache, if one is configured, and look up keys missing from memory (or
+    stale there) in it, so a value fetched by one worker serves the others.
+    """
+    # Prefix of this cache's keys in the shared cache; None keeps it per process
+    namespace: Optional[str] = None
+
+    def __init__(self, max_entries: int, stale_seconds: float = 0.0, clock: Callable[[], float] = time.time,
+                 max_bytes: int = sys.maxsize):
+        self.max_entries = max_entries
+        self.budget = CacheBudget(max_entries, max_bytes)
+        self.stale_seconds = stale_seconds
+        self.clock = clock
+        # key -> (soft limit, hard limit, time stored, value)
+        self._entries: "OrderedDict[Any, Tuple[float, float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._actions: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "stale_hits": 0})
+        self._refreshing: Set[Any] = set()
+        self.expirations = 0
+        self.stale_age_total = 0.0
+        self.stale_age_max = 0.0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.shared_hits = 0
+
+    def lookup(self, key: Any, action: str) -> Optional[Any]:
+        """Look up a fresh entry, counting the hit or miss against `action`."""
+        hit = self.lookup_entry(key, action, allow_stale=False)
+        return hit.value if hit is not None else None
+
+    def lookup_entry(self, key: Any, action: str, allow_stale: bool = True) -> Optional[CacheHit]:
+        """Look up an entry that is fresh, or stale but within its hard limit if `allow_stale`."""
+        now = self.clock()
+        with self._lock:
+            self.budget.record(key)
+            cached = self._entries.get(key)
+            if cached is not None and cached[1] <= now:
+                self.budget.forget(self._entries, key)
+                self.expirations += 1
+                cached = None
+        shared = None
+        if cached is None or cached[0] <= now:
+            # Another worker may have fetched it, or refreshed it already
+            shared = self._shared_get(key, now)
+            if shared is not None and cached is not None and shared[0] <= cached[0]:
+                shared = None
+        shared_size = estimate_size(key) + estimate_size(shared[3]) if shared is not None else 0
+        with self._lock:
+            counters = self._actions[action]
+            if shared is not None:
+                cached = shared
+                self._insert(key, shared, shared_size, now)
+                self.shared_hits += 1
+            if cached is None or (not allow_stale and cached[0] <= now):
+                counters["misses"] += 1
+                return None
+            soft_limit, _, stored_at, value = cached
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            counters["hits"] += 1
+            age = now - stored_at
+            stale = soft_limit <= now
+            if stale:
+                counters["stale_hits"] += 1
+                self.stale_age_total += age
+                self.stale_age_max = max(self.stale_age_max, age)
+            return CacheHit(value, age, stale, shared is not None)
+
+    def fresh_for(self, key: Any) -> float:
+        """Seconds until this worker's entry for `key` goes stale (0 if absent or stale), without counting a lookup."""
+        with self._lock:
+            cached = self._entries.get(key)
+        return max(0.0, cached[0] - self.clock()) if cached is not None else 0.0
+
+    def count_miss(self, action: str) -> None:
+        """Count a miss for a lookup that could not even be keyed."""
+        with self._lock:
+            self._actions[action]["misses"] += 1
+
+    def store(self, key: Any, value: Any, expires_at: float) -> None:
+        """Store a value that is fresh until `expires_at`."""
+        now = self.clock()
+        hard_limit = expires_at + self.stale_seconds
+        if self.max_entries <= 0 or hard_limit <= now:
+            return
+        size = estimate_size(key) + estimate_size(value)
+        with self._lock:
+            admitted = self._insert(key, (expires_at, hard_limit, now, value), size, now)
+        if admitted and self.namespace is not None and _shared_cache is not None:
+            _shared_cache.put(f"{self.namespace}:{key}", to_shared(value), expires_at, hard_limit, now)
+
+    def discard(self, key: Any) -> None:
+        """Remove an entry, here and in the shared cache."""
+        with self._lock:
+            self.budget.forget(self._entries, key)
+        if self.namespace is not None and _shared_cache is not None:
+            _shared_cache.delete(f"{self.namespace}:{key}")
+
+    def _insert(self, key: Any, entry: Tuple[float, float, float, Any], size: int, now: float) -> bool:
+        """Insert an entry as most recently used if the budget admits it; called with the lock held."""
+        if not self.budget.admit(self._entries, key, size, expired=lambda cached: cached[1] <= now):
+            return False
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self.budget.added(key, size)
+        return True
+
+    def _shared_get(self, key: Any, now: float) -> Optional[Tuple[float, float, float, Any]]:
+        if self.namespace is None or _shared_cache is None or self.max_entries <= 0:
+            return None
+        entry = _shared_cache.get(f"{self.namespace}:{key}", now)
+        if entry is None:
+            return None
+        return entry.fresh_until, entry.hard_limit, entry.stored_at, from_shared(entry.value)
+
+    def begin_refresh(self, key: Any) -> bool:
+        """Claim the refresh of a stale entry; False if one is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Any, succeeded: bool) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            self.refreshes += 1
+            if not succeeded:
+                self.refresh_failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Overall and per-action hits, misses and hit ratio; how often and how old
+        stale entries were served; refreshes, expirations, evictions, rejected
+        entries, size and bytes held.
+        """
+        with self._lock:
+            actions = {
+                name: dict(counters, hit_ratio=_hit_ratio(counters["hits"], counters["misses"]))
+                for name, counters in self._actions.items()
+            }
+            hits = sum(counters["hits"] for counters in self._actions.values())
+            misses = sum(counters["misses"] for counters in self._actions.values())
+            stale_hits = sum(counters["stale_hits"] for counters in self._actions.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": _hit_ratio(hits, misses),
+                "stale_hits": stale_hits,
+                "stale_ratio": stale_hits / hits if hits else 0.0,
+                "stale_age_mean_seconds": self.stale_age_total / stale_hits if stale_hits else 0.0,
+                "stale_age_max_seconds": self.stale_age_max,
+                "stale_seconds": self.stale_seconds,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "shared_hits": self.shared_hits,
+                "expirations": self.expirations,
+                **self.budget.stats(),
+                "size": len(self._entries),
+                "actions": actions,
+            }
+
+class ObservationCache(ExpiringCache):
+    """
+    TTL cache of parsed current observations (/weather?q=), keyed by the query's cache key.
+    
+    An observation expires when OpenWeather is due to publish the next one:
+    `ttl` seconds after the observation time (`dt`), but never sooner than
+    OBSERVATION_MIN_TTL_SECONDS nor later than `ttl` from now.
+    """
+    namespace = "observations"
+
+    def __init__(self, ttl: float = OBSERVATION_TTL_SECONDS, max_entries: int = OBSERVATION_CACHE_SIZE,
+                 stale_seconds: float = OBSERVATION_STALE_SECONDS, max_bytes: int = OBSERVATION_CACHE_BYTES,
+                 clock: Callable[[], float] = time.time):
+        super().__init__(max_entries if ttl > 0 else 0, stale_seconds, clock, max_bytes)
+        self.ttl = ttl
+
+    def expires_at(self, data: Any) -> float:
+        """When an observation, parsed or as a CurrentObservation, should be refetched."""
+        now = self.clock()
+        observed = data.dt if isinstance(data, CurrentObservation) else data.get("dt")
+        if not isinstance(observed, (int, float)):
+            return now + self.ttl
+        return min(now + self.ttl, max(now + min(OBSERVATION_MIN_TTL_SECONDS, self.ttl), observed + self.ttl))
+
+    def get(self, location: str, action: str = "unknown") -> Optional[Dict[str, Any]]:
+        return self.lookup(WeatherQuery.by_location("current_weather", location).cache_key(), action)
+
+    def put(self, location: str, data: Dict[str, Any]) -> None:
+        self.store(WeatherQuery.by_location("current_weather", location).cache_key(), data, self.expires_at(data))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), ttl_seconds=self.ttl)
+
+class ForecastCache(ExpiringCache):
+    """
+    Cache of parsed 5 day / 3 hour forecasts, keyed by the cache key of the query by coordinates.
+    
+    A forecast does not change between model issuances, so an entry expires at
+    the next issuance boundary rather than after a fixed time.
+    """
+    namespace = "forecasts"
+
+    def __init__(self, issuance_seconds: float = FORECAST_ISSUANCE_SECONDS, max_entries: int = FORECAST_CACHE_SIZE,
+                 stale_seconds: float = FORECAST_STALE_SECONDS, max_bytes: int = FORECAST_CACHE_BYTES,
+                 clock: Callable[[], float] = time.time):
+        super().__init__(max_entries, stale_seconds, clock, max_bytes)
+        self.issuance_seconds = issuance_seconds
+
+    def expires_at(self) -> float:
+        """The next issuance boundary."""
+        return (self.clock() // self.issuance_seconds + 1) * self.issuance_seconds
+
+    def get(self, lat: float, lon: float, action: str = "unknown") -> Optional[Dict[str, Any]]:
+        return self.lookup(WeatherQuery.by_coordinates("forecast", lat, lon).cache_key(), action)
+
+    def put(self, lat: float, lon: float, data: Dict[str, Any]) -> None:
+        self.store(WeatherQuery.by_coordinates("forecast", lat, lon).cache_key(), data, self.expires_at())
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), issuance_seconds=self.issuance_seconds)
+
+class QueryCache(ExpiringCache):
+    """Cache of parsed responses that are fresh for a fixed `ttl`, keyed by the query's cache key."""
+    def __init__(self, ttl: float, max_entries: int, stale_seconds: float = 0.0, namespace: Optional[str] = None,
+                 max_bytes: int = sys.maxsize, clock: Callable[[], float] = time.time):
+        super().__init__(max_entries if ttl > 0 else 0, stale_seconds, clock, max_bytes)
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def get(self, query: "WeatherQuery", action: str = "unknown") -> Optional[Any]:
+        return self.lookup(query.cache_key(), action)
+
+    def expires_at(self, query: "WeatherQuery") -> float:
+        """`ttl` from now; an hourly air quality forecast no later than the next hourly update."""
+        now = self.clock()
+        if query.endpoint == "air_pollution_forecast":
+            return min(now + self.ttl, (now // AIR_QUALITY_UPDATE_SECONDS + 1) * AIR_QUALITY_UPDATE_SECONDS)
+        return now + self.ttl
+
+    def put(self, query: "WeatherQuery", data: Any) -> None:
+        self.store(query.cache_key(), data, self.expires_at(query))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), ttl_seconds=self.ttl)
+
+class UnresolvedLocationCache(ExpiringCache):
+    """
+    Negative cache of locations OpenWeather could not resolve, for `ttl` seconds.
+    
+    Only a 404 marks a location as unresolved; 5xx answers and timeouts say
+    nothing about the location and are never cached here.
+    """
+    namespace = "unresolved_locations"
+
+    def __init__(self, ttl: float = UNRESOLVED_LOCATION_TTL_SECONDS, max_entries: int = UNRESOLVED_LOCATION_CACHE_SIZE,
+                 max_bytes: int = UNRESOLVED_LOCATION_CACHE_BYTES, clock: Callable[[], float] = time.time):
+        super().__init__(max_entries if ttl > 0 else 0, clock=clock, max_bytes=max_bytes)
+        self.ttl = ttl
+
+    def get(self, location: str, action: str = "unknown") -> bool:
+        """Whether `location` failed to resolve within the last `ttl` seconds."""
+        return self.lookup(normalize_location(location), action) is not None
+
+    def put(self, location: str) -> None:
+        self.store(normalize_location(location), True, self.clock() + self.ttl)
+
+    def discard(self, location: str) -> None:
+        super().discard(normalize_location(location))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), ttl_seconds=self.ttl)
+
+_unresolved_locations = UnresolvedLocationCache()
+
+def configure_unresolved_location_cache(ttl: float = UNRESOLVED_LOCATION_TTL_SECONDS,
+                                        max_entries: int = UNRESOLVED_LOCATION_CACHE_SIZE,
+                                        max_bytes: int = UNRESOLVED_LOCATION_CACHE_BYTES) -> None:
+    """Replace the negative cache of unresolved locations with an empty one."""
+    global _unresolved_locations
+    _unresolved_locations = UnresolvedLocationCache(ttl, max_entries, max_bytes)
+
+def get_unresolved_location_stats() -> Dict[str, Any]:
+    """Get the negative location cache's counters; a hit is a lookup that was skipped."""
+    return _unresolved_locations.stats()
+
+def remember_unresolved(location: str, response: Any) -> None:
+    """Remember a location whose /weather?q= or /forecast?q= request was answered 404 (city not found)."""
+    if response is not None and response.status_code == 404:
+        logger.info(f"Location {location} could not be resolved; not looking it up again for {_unresolved_locations.ttl:.0f}s")
+        _unresolved_locations.put(location)
+
+def unresolved_location(location: str, action: str = "unknown") -> Optional[HTTPResult]:
+    """
+    A 404 response for a location that recently failed to resolve.
+    
+    Callers about to make a request by location name return this instead,
+    so they answer "couldn't find that location" as for a fetched 404.
+    
+    Returns:
+        The response, or None if the location is not known to be unresolvable
+    """
+    if not _unresolved_locations.get(location, action):
+        return None
+    logger.info(f"Skipping lookup of unresolved location: {location}")
+    return HTTPResult(status_code=404, content=b'{"cod": "404", "message": "city not found"}',
+                      headers={"X-Negative-Cache": "hit"})
+
+_observation_cache = ObservationCache()
+
+def configure_observation_cache(ttl: float = OBSERVATION_TTL_SECONDS, max_entries: int = OBSERVATION_CACHE_SIZE,
+                                stale_seconds: float = OBSERVATION_STALE_SECONDS,
+                                max_bytes: int = OBSERVATION_CACHE_BYTES) -> None:
+    """Replace the observation cache with an empty one."""
+    global _observation_cache
+    _observation_cache = ObservationCache(ttl, max_entries, stale_seconds, max_bytes)
+
+def get_observation_stats() -> Dict[str, Any]:
+    """Get the observation cache's hit ratios, overall and per action."""
+    return _observation_cache.stats()
+
+def cached_observation(location: str, action: str) -> Optional[HTTPResult]:
+    """
+    A live cached observation of a location as a /weather response.
+    
+    Returns:
+        The response, or None if the location has to be fetched
+    """
+    data = _observation_cache.get(location, action)
+    if data is None:
+        return None
+    logger.info(f"Using cached observation for {location} in {action}")
+    return cached_response(data, headers={"X-Observation-Cache": "hit"})
+
+def remember_observation(location: str, response: Any) -> None:
+    """
+    Cache a successful /weather?q= response as a CurrentObservation.
+    
+    The coordinate lookup is the same request, so the location's coordinates
+    are remembered too if they are not known yet.
+    """
+    if response is None or response.status_code != 200:
+        remember_unresolved(location, response)
+        return
+    data = response.json()
+    if isinstance(data, dict) and "main" in data:
+        _observation_cache.put(location, compact_payload("current_weather", data))
+    if location not in _geocode_cache:
+        remember_geocode(location, response)
+
+_forecast_cache = ForecastCache()
+
+def configure_forecast_cache(issuance_seconds: float = FORECAST_ISSUANCE_SECONDS,
+                             max_entries: int = FORECAST_CACHE_SIZE,
+                             stale_seconds: float = FORECAST_STALE_SECONDS,
+                             max_bytes: int = FORECAST_CACHE_BYTES) -> None:
+    """Replace the forecast cache with an empty one."""
+    global _forecast_cache
+    _forecast_cache = ForecastCache(issuance_seconds, max_entries, stale_seconds, max_bytes)
+
+def get_forecast_cache_stats() -> Dict[str, Any]:
+    """Get the forecast cache's hit ratios, overall and per action."""
+    return _forecast_cache.stats()
+
+def cached_forecast(action: str, location: Optional[str] = None, lat: Optional[float] = None,
+                    lon: Optional[float] = None) -> Optional[HTTPResult]:
+    """
+    A cached forecast as a /forecast response, looked up by coordinates or by a location name.
+    
+    A location name is resolved through the geocode caches only; if its
+    coordinates are not known yet the lookup is a miss.
+    
+    Returns:
+        The response, or None if the forecast has to be fetched
+    """
+    if lat is None or lon is None:
+        geocode = cached_geocode(location) if location else None
+        if geocode is None:
+            _forecast_cache.count_miss(action)
+            return None
+        lat, lon = geocode.lat, geocode.lon
+    data = _forecast_cache.get(lat, lon, action)
+    if data is None:
+        return None
+    logger.info(f"Using cached forecast for {location or (lat, lon)} in {action}")
+    return cached_response(data, headers={"X-Forecast-Cache": "hit"})
+
+def remember_forecast(response: Any, location: Optional[str] = None, lat: Optional[float] = None,
+                      lon: Optional[float] = None) -> None:
+    """
+    Cache a successful /forecast response as a CachedForecast.
+    
+    It is keyed by the requested coordinates, or for a request by name by the
+    coordinates of the city in the payload; the city also resolves the name
+    for later geocode lookups.
+    """
+    if response is None or response.status_code != 200:
+        if location and (lat is None or lon is None):
+            remember_unresolved(location, response)
+        return
+    data = response.json()
+    if not isinstance(data, dict) or "list" not in data:
+        return
+    if lat is None or lon is None:
+        city = data.get("city") or {}
+        coord = city.get("coord")
+        if not coord:
+            return
+        lat, lon = coord["lat"], coord["lon"]
+        if location:
+            _remember_location(location, GeocodeEntry(
+                lat=lat, lon=lon, timezone_offset=city.get("timezone", 0), city_id=city.get("id")
+            ))
+    # Summarised once per fetch; the summaries are cached with the forecast
+    materialize_daily_summaries(data)
+    _forecast_cache.put(lat, lon, compact_payload("forecast", data))
+
+_air_quality_cache = QueryCache(AIR_QUALITY_TTL_SECONDS, AIR_QUALITY_CACHE_SIZE, AIR_QUALITY_STALE_SECONDS,
+                                "air_quality", AIR_QUALITY_CACHE_BYTES)
+_uv_cache = QueryCache(UV_TTL_SECONDS, UV_CACHE_SIZE, UV_STALE_SECONDS, "uv", UV_CACHE_BYTES)
+
+def configure_air_quality_cache(ttl: float = AIR_QUALITY_TTL_SECONDS, max_entries: int = AIR_QUALITY_CACHE_SIZE,
+                                stale_seconds: float = AIR_QUALITY_STALE_SECONDS,
+                                max_bytes: int = AIR_QUALITY_CACHE_BYTES) -> None:
+    """Replace the air quality cache (/air_pollution and its forecast) with an empty one."""
+    global _air_quality_cache
+    _air_quality_cache = QueryCache(ttl, max_entries, stale_seconds, "air_quality", max_bytes)
+
+def configure_uv_cache(ttl: float = UV_TTL_SECONDS, max_entries: int = UV_CACHE_SIZE,
+                       stale_seconds: float = UV_STALE_SECONDS, max_bytes: int = UV_CACHE_BYTES) -> None:
+    """Replace the UV cache (/uvi and its forecast) with an empty one."""
+    global _uv_cache
+    _uv_cache = QueryCache(ttl, max_entries, stale_seconds, "uv", max_bytes)
+
+def get_air_quality_cache_stats() -> Dict[str, Any]:
+    """Get the air quality cache's hit and staleness counters."""
+    return _air_quality_cache.stats()
+
+def get_uv_cache_stats() -> Dict[str, Any]:
+    """Get the UV cache's hit and staleness counters."""
+    return _uv_cache.stats()
+
+def _query_cache(endpoint: str) -> QueryCache:
+    if endpoint in ("air_pollution", "air_pollution_forecast"):
+        return _air_quality_cache
+    if endpoint in ("uv_index", "uv_forecast"):
+        return _uv_cache
+    raise ValueError(f"No cache for endpoint: {endpoint}")
+
+# Background refreshes in flight; referenced so they are not garbage collected
+_refresh_tasks: Set["asyncio.Task[None]"] = set()
+
+def _refresh_in_background(cache: ExpiringCache, key: Any, fetch: Callable[[], Awaitable[Any]],
+                           remember: Callable[[Any], None]) -> None:
+    """Start one refresh of a stale entry, unless one is already running."""
+    if not cache.begin_refresh(key):
+        return
+
+    async def refresh() -> None:
+        succeeded = False
+        try:
+            # Not part of the user's turn: its own budget, and quota below user requests
+            with quota_priority(PRIORITY_BACKGROUND), latency_budget(reuse=False):
+                response = await fetch()
+            remember(response)
+            succeeded = response is not None and response.status_code == 200
+        except Exception as e:
+            logger.error(f"Background refresh of {key} failed: {str(e)}")
+        finally:
+            cache.end_refresh(key, succeeded)
+
+    task = asyncio.ensure_future(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+async def _read_through(cache: ExpiringCache, key: Any, action: str, fetch: Callable[[], Awaitable[Any]],
+                        remember: Callable[[Any], None], header: str) -> Any:
+    hit = cache.lookup_entry(key, action)
+    if hit is None:
+        response = await fetch()
+        remember(response)
+        return response
+    if hit.stale:
+        logger.info(f"Serving {key} {hit.age:.0f}s old in {action} while it is refreshed")
+        _refresh_in_background(cache, key, fetch, remember)
+    return cached_response(hit.value, headers={header: "stale" if hit.stale else "hit"})
+
+async def read_observation(location: str, action: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    The current observation of a location, from the cache where possible.
+    
+    A fresh observation is returned as is; a stale one within its hard limit
+    is returned at once while `fetch` refreshes it in the background;
+    otherwise `fetch` is awaited and its response cached. A location that
+    recently failed to resolve gets a 404 without a request.
+    
+    Args:
+        location: Location the observation is for
+        action: Name of the calling action, for the hit ratio statistics
+        fetch: Makes the /weather?q= request
+    """
+    unresolved = unresolved_location(location, action)
+    if unresolved is not None:
+        return unresolved
+    key = WeatherQuery.by_location("current_weather", location).cache_key()
+    return await _read_through(_observation_cache, key, action, fetch,
+                               lambda response: remember_observation(location, response), "X-Observation-Cache")
+
+async def read_forecast(action: str, fetch: Callable[[], Awaitable[Any]], location: Optional[str] = None,
+                        lat: Optional[float] = None, lon: Optional[float] = None) -> Any:
+    """
+    The forecast for coordinates or a location name, from the cache where possible (see read_observation).
+    
+    A location name is resolved through the geocode caches only; if its
+    coordinates are not known yet the forecast is fetched, unless the name
+    recently failed to resolve.
+    """
+    if lat is None or lon is None:
+        unresolved = unresolved_location(location, action) if location else None
+        if unresolved is not None:
+            return unresolved
+        geocode = cached_geocode(location) if location else None
+        if geocode is None:
+            _forecast_cache.count_miss(action)
+            response = await fetch()
+            remember_forecast(response, location=location)
+            return response
+        lat, lon = geocode.lat, geocode.lon
+    key = WeatherQuery.by_coordinates("forecast", lat, lon).cache_key()
+    return await _read_through(_forecast_cache, key, action, fetch,
+                               lambda response: remember_forecast(response, lat=lat, lon=lon), "X-Forecast-Cache")
+
+def remember_cached_query(query: "WeatherQuery", response: Any, utc_offset: Optional[int] = None) -> None:
+    """
+    Cache a successful air quality or UV response as its model (see weather_models).
+
+    An air quality forecast is parsed once into its hourly series, with the
+    reductions of every day; only the series is cached. Its days are those
+    `utc_offset` seconds from UTC, the location's, or the server's if None.
+    """
+    if response is None or response.status_code != 200:
+        return
+    data = response.json()
+    if query.endpoint == "air_pollution_forecast" and isinstance(data, dict):
+        data = materialize_air_quality_series(data, utc_offset=utc_offset)
+    _query_cache(query.endpoint).put(query, compact_payload(query.endpoint, data))
+
+async def read_cached_query(query: "WeatherQuery", action: str, fetch: Callable[[], Awaitable[Any]],
+                            utc_offset: Optional[int] = None) -> Any:
+    """An air quality or UV response for `query`, from the cache where possible (see read_observation)."""
+    return await _read_through(_query_cache(query.endpoint), query.cache_key(), action, fetch,
+                               lambda response: remember_cached_query(query, response, utc_offset), "X-Cache")
+
+def cached_current_air_quality(lat: float, lon: float, action: str) -> Optional[HTTPResult]:
+    """
+    The current air quality at the coordinates, from a fresh cached air quality forecast.
+
+    Returns:
+        An /air_pollution response holding the forecast's current hour, or
+        None if no fresh forecast is cached or it does not cover this hour
+    """
+    query = WeatherQuery.by_coordinates("air_pollution_forecast", lat, lon)
+    if _air_quality_cache.fresh_for(query.cache_key()) <= 0:
+        return None
+    series = _air_quality_cache.get(query, action)
+    if not isinstance(series, AirQualitySeries):
+        return None
+    position = series.hour(_air_quality_cache.clock())
+    if position is None:
+        return None
+    logger.info(f"Using the cached air quality forecast for the current air quality at {lat}, {lon} in {action}")
+    return parsed_response({"coord": series.coord, "list": [series.entry(position)]},
+                           headers={"X-Cache": "hit"})
+
+def cached_fresh_for(query: "WeatherQuery") -> float:
+    """Seconds until the cached response to `query` goes stale in this worker; 0 if it is not cached or stale."""
+    if query.endpoint == "current_weather":
+        cache: ExpiringCache = _observation_cache
+    elif query.endpoint == "forecast":
+        cache = _forecast_cache
+    else:
+        cache = _query_cache(query.endpoint)
+    return cache.fresh_for(query.cache_key())
+
+def parsed_response(data: Any, headers: Optional[Dict[str, str]] = None) -> HTTPResult:
+    """An HTTPResult for an already parsed body; its json() returns `data` without re-encoding it."""
+    result = HTTPResult(status_code=200, content=b"", headers=headers or {})
+    result._parsed = data
+    return result
+
+def cached_response(value: Any, headers: Optional[Dict[str, str]] = None) -> HTTPResult:
+    """
+    An HTTPResult for a cached value. A model is kept as it is and only
+    rebuilt into a body if json() is called.
+    """
+    if not isinstance(value, MODEL_TYPES):
+        return parsed_response(value, headers)
+    result = HTTPResult(status_code=200, content=b"", headers=headers or {})
+    result.model = value
+    return result
+
+def response_data(response: Any) -> Any:
+    """
+    The model a cache hit was served from, or the decoded body of any other response.
+
+    forecast_summary() and air_quality_series() read models directly, so
+    actions that only need those do not rebuild the body of every hit.
+    """
+    if isinstance(response, HTTPResult) and response.model is not None:
+        return response.model
+    return decode_response(response)
+
+def get_cache_memory_stats() -> Dict[str, Dict[str, Any]]:
+    """Entries, bytes held against the budget, hit ratio, evictions and rejected entries of each in-process cache."""
+    caches = {
+        "geocoding": get_geocode_stats(),
+        "unresolved_locations": get_unresolved_location_stats(),
+        "observations": get_observation_stats(),
+        "forecasts": get_forecast_cache_stats(),
+        "air_quality": get_air_quality_cache_stats(),
+        "uv": get_uv_cache_stats(),
+        "last_good_responses": _last_good.stats(),
+    }
+    fields = ("size", "bytes", "max_bytes", "hit_ratio", "evictions", "rejections")
+    return {name: {field: stats[field] for field in fields} for name, stats in caches.items()}
+
+def get_upstream_diagnostics() -> Dict[str, Any]:
+    """Snapshot of circuit breakers, quota, latency, coalescing and the caches for the action server's diagnostics."""
+    return {
+        "circuit_breakers": get_circuit_stats(),
+        "quota": get_quota_stats(),
+        "latency": get_latency_stats(),
+        "coalescing": get_coalescing_stats(),
+        "geocoding": get_geocode_stats(),
+        "location_store": get_location_store_stats(),
+        "observations": get_observation_stats(),
+        "forecasts": get_forecast_cache_stats(),
+        "air_quality": get_air_quality_cache_stats(),
+        "uv": get_uv_cache_stats(),
+        "unresolved_locations": get_unresolved_location_stats(),
+        "shared_cache": get_shared_cache_stats(),
+        "cache_memory": get_cache_memory_stats(),
+    }
+
 @dataclass
 class UVInfo:
     value: float
     level: str
     advice: str
 
-class WeatherAPIError(Exception):
-    """Exception raised for errors in the Weather API."""
-    pass
-
 def get_coordinates(location: str, api_key: str) -> Optional[Tuple[float, float]]:
-    """Get latitude and longitude for a location."""
+    """Get latitude and longitude for a location, from the geocode cache where possible."""
     try:
-        url = f"{API_ENDPOINTS['current_weather']}?q={location}&appid={api_key}"
+        cached = cached_geocode(location)
+        if cached is not None:
+            return cached.lat, cached.lon
+        if unresolved_location(location, "get_coordinates") is not None:
+            return None
+        url = WeatherQuery.by_location("current_weather", location).url(api_key)
         logger.info(f"Fetching coordinates for location: {location}")
         response = fetch_with_retry(url)
+        remember_observation(location, response)
         
         if response.status_code != 200:
             logger.error(f"Failed to fetch location data: HTTP {response.status_code}")
             return None
-            
+
+        geo_data = response.json()
+        return geo_data["coord"]["lat"], geo_data["coord"]["lon"]
+    except Exception as e:
+        logger.error(f"Error getting coordinates for {location}: {str(e)}")
+        return None
+
+async def async_get_coordinates(location: str, api_key: str,
+                                known: Optional[GeocodeEntry] = None) -> Optional[Tuple[float, float]]:
+    """
+    Get latitude and longitude for a location without blocking the event loop.
+    
+    Coordinates `known` from earlier in the conversation are used as they
+    are; otherwise they come from the geocode cache where possible.
+    """
+    if known is not None:
+        return known.lat, known.lon
+    try:
+        cached = cached_geocode(location)
+        if cached is not None:
+            return cached.lat, cached.lon
+        if unresolved_location(location, "get_coordinates") is not None:
+            return None
+        url = WeatherQuery.by_location("current_weather", location).url(api_key)
+        logger.info(f"Fetching coordinates for location: {location}")
+        response = await async_fetch_with_retry(url)
+        remember_observation(location, response)
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch location data: HTTP {response.status_code}")
+            return None
+
         geo_data = response.json()
         return geo_data["coord"]["lat"], geo_data["coord"]["lon"]
     except Exception as e:
@@ -109,25 +2343,37 @@ class WeatherService:
     def __init__(self, api_key: str):
         self.api_key = api_key
         
-    def get_current_weather(self, location: str) -> Dict[str, Any]:
-        """Get current weather for a location."""
-        url = f"{API_ENDPOINTS['current_weather']}?q={location}&appid={self.api_key}&units=metric"
-        response = fetch_with_retry(url)
+    def get_current_weather(self, location: str, action: str = "weather_service") -> Dict[str, Any]:
+        """Get current weather for a location, from the observation cache where possible."""
+        cached = cached_observation(location, action)
+        if cached is not None:
+            return cached.json()
+        response = unresolved_location(location, action)
+        if response is None:
+            url = WeatherQuery.by_location("current_weather", location).url(self.api_key)
+            response = fetch_with_retry(url)
+            remember_observation(location, response)
         if response.status_code != 200:
             raise WeatherAPIError(f"Failed to fetch weather data: HTTP {response.status_code}")
         return response.json()
         
-    def get_forecast(self, location: str, days: int = 3) -> Dict[str, Any]:
-        """Get weather forecast for a location."""
-        url = f"{API_ENDPOINTS['forecast']}?q={location}&appid={self.api_key}&units=metric"
-        response = fetch_with_retry(url)
+    def get_forecast(self, location: str, days: int = 3, action: str = "weather_service") -> Dict[str, Any]:
+        """Get weather forecast for a location, from the forecast cache where possible."""
+        cached = cached_forecast(action, location=location)
+        if cached is not None:
+            return cached.json()
+        response = unresolved_location(location, action)
+        if response is None:
+            url = WeatherQuery.by_location("forecast", location).url(self.api_key)
+            response = fetch_with_retry(url)
+            remember_forecast(response, location=location)
         if response.status_code != 200:
             raise WeatherAPIError(f"Failed to fetch forecast data: HTTP {response.status_code}")
         return response.json()
         
     def get_uv_index(self, lat: float, lon: float) -> UVInfo:
         """Get current UV index for coordinates."""
-        url = f"{API_ENDPOINTS['uv_index']}?lat={lat}&lon={lon}&appid={self.api_key}"
+        url = WeatherQuery.by_coordinates("uv_index", lat, lon).url(self.api_key)
         response = fetch_with_retry(url)
         if response.status_code != 200:
             raise WeatherAPIError(f"Failed to fetch UV data: HTTP {response.status_code}")
@@ -141,12 +2387,51 @@ class WeatherService:
         
     def get_uv_forecast(self, lat: float, lon: float, days: int = 1) -> List[Dict[str, Any]]:
         """Get UV index forecast for coordinates."""
-        url = f"{API_ENDPOINTS['uv_forecast']}?lat={lat}&lon={lon}&appid={self.api_key}&cnt={days+1}"
+        url = WeatherQuery.by_coordinates("uv_forecast", lat, lon, cnt=days + 1).url(self.api_key)
         response = fetch_with_retry(url)
         if response.status_code != 200:
             raise WeatherAPIError(f"Failed to fetch UV forecast data: HTTP {response.status_code}")
         return response.json()
     
+class AsyncWeatherService:
+    """Non-blocking variant of WeatherService for use inside async actions."""
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        
+    async def get_current_weather(self, location: str, action: str = "weather_service") -> Dict[str, Any]:
+        """Get current weather for a location, from the observation cache where possible."""
+        url = WeatherQuery.by_location("current_weather", location).url(self.api_key)
+        response = await read_observation(location, action, lambda: async_fetch_with_retry(url))
+        if response.status_code != 200:
+            raise WeatherAPIError(f"Failed to fetch weather data: HTTP {response.status_code}")
+        return response.json()
+        
+    async def get_forecast(self, location: str, days: int = 3, action: str = "weather_service") -> Dict[str, Any]:
+        """Get weather forecast for a location, from the forecast cache where possible."""
+        url = WeatherQuery.by_location("forecast", location).url(self.api_key)
+        response = await read_forecast(action, lambda: async_fetch_with_retry(url), location=location)
+        if response.status_code != 200:
+            raise WeatherAPIError(f"Failed to fetch forecast data: HTTP {response.status_code}")
+        return response.json()
+        
+    async def get_uv_index(self, lat: float, lon: float) -> UVInfo:
+        """Get current UV index for coordinates."""
+        query = WeatherQuery.by_coordinates("uv_index", lat, lon)
+        response = await read_cached_query(query, "weather_service", lambda: async_fetch_with_retry(query.url(self.api_key)))
+        if response.status_code != 200:
+            raise WeatherAPIError(f"Failed to fetch UV data: HTTP {response.status_code}")
+        
+        uv_value = response.json()["value"]
+        return UVInfo(value=uv_value, level=get_uv_level(uv_value), advice=get_protection_advice(uv_value))
+        
+    async def get_uv_forecast(self, lat: float, lon: float, days: int = 1) -> List[Dict[str, Any]]:
+        """Get UV index forecast for coordinates."""
+        query = WeatherQuery.by_coordinates("uv_forecast", lat, lon, cnt=days + 1)
+        response = await read_cached_query(query, "weather_service", lambda: async_fetch_with_retry(query.url(self.api_key)))
+        if response.status_code != 200:
+            raise WeatherAPIError(f"Failed to fetch UV forecast data: HTTP {response.status_code}")
+        return response.json()
+    
 
 def validate_env_vars(required_vars: List[str]) -> bool:
     """
@@ -191,10 +2476,16 @@ def fetch_current_weather(location: str) -> Tuple[int, Optional[Dict[str, Any]]]
     if not api_key:
         return 401, None
         
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
+    cached = cached_observation(location, "fetch_current_weather")
+    if cached is not None:
+        return 200, cached.json()
+    if unresolved_location(location, "fetch_current_weather") is not None:
+        return 404, None
+    url = WeatherQuery.by_location("current_weather", location).url(api_key)
     
     try:
-        response = requests.get(url, timeout=10)
+        response = http_get(url)
+        remember_observation(location, response)
         if response.status_code == 200:
             return 200, response.json()
         return response.status_code, None
@@ -215,10 +2506,16 @@ def fetch_weather_forecast(location: str) -> Tuple[int, Optional[Dict[str, Any]]
     if not api_key:
         return 401, None
         
-    url = f"http://api.openweathermap.org/data/2.5/forecast?q={location}&appid={api_key}&units=metric"
+    cached = cached_forecast("fetch_weather_forecast", location=location)
+    if cached is not None:
+        return 200, cached.json()
+    if unresolved_location(location, "fetch_weather_forecast") is not None:
+        return 404, None
+    url = WeatherQuery.by_location("forecast", location).url(api_key)
     
     try:
-        response = requests.get(url, timeout=10)
+        response = http_get(url)
+        remember_forecast(response, location=location)
         if response.status_code == 200:
             return 200, response.json()
         return response.status_code, None
@@ -0,0 +1,109 @@
+# This script benchmarks the daily aggregation of forecast and air quality series.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Compare the pure Python and NumPy paths of aggregation.aggregate_daily for
+batches of 1, 100 and 10,000 locations.
+
+Every location gets the series of a recorded fixture, shifted by a random
+number of hours and with a random UTC offset: the /forecast fixture reduced
+with the DailySummary reductions (40 entries per location) and the
+/air_pollution/forecast fixture reduced to the daily mode, mean and peak
+AQI and peak PM2.5 (96 entries per location). Reports the time per batch
+and per location of each path, and the speed-up.
+
+Usage:
+    python scripts/benchmark_aggregation.py --locations 1 100 10000
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from typing import Callable, Dict, List, Sequence, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions.aggregation import Series, aggregate_daily, has_numpy  # noqa: E402
+from actions.logging_config import setup_logging  # noqa: E402
+from actions.weather_payloads import (  # noqa: E402
+    SUMMARY_REDUCTIONS, _forecast_series, decode_json, index_forecast, materialize_air_quality_series
+)
+
+logger = logging.getLogger(__name__)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "openweather")
+AIR_REDUCTIONS = {"aqi": ("mode", "mean", "max"), "pm2_5": ("max",)}
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return decode_json(f.read())
+
+
+def forecast_batch(locations: int, rng: random.Random) -> List[Series]:
+    template = _forecast_series(index_forecast(load_fixture("forecast.json")))
+    batch = []
+    for _ in range(locations):
+        shift = rng.randrange(0, 24) * 3600
+        batch.append(Series([t + shift for t in template.times], rng.randrange(-12, 15) * 3600, template.columns))
+    return batch
+
+
+def air_quality_batch(locations: int, rng: random.Random) -> List[Series]:
+    series = materialize_air_quality_series(load_fixture("air_pollution_forecast.json"), utc_offset=0)
+    columns = {"aqi": [float(aqi) for aqi in series.aqi], "pm2_5": series.components["pm2_5"].tolist()}
+    batch = []
+    for _ in range(locations):
+        shift = rng.randrange(0, 24) * 3600
+        batch.append(Series([dt + shift for dt in series.dt], rng.randrange(-12, 15) * 3600, columns))
+    return batch
+
+
+def time_per_batch(run: Callable[[], object], min_seconds: float) -> float:
+    """Return the mean time of `run` in seconds, repeating it for at least `min_seconds`."""
+    run()  # warm-up
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        run()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs
+
+
+def benchmark(name: str, batch: Sequence[Series], reductions: Dict[str, Tuple[str, ...]],
+              min_seconds: float) -> None:
+    entries = sum(len(series.times) for series in batch)
+    python = time_per_batch(lambda: aggregate_daily(batch, reductions, vectorize=False), min_seconds)
+    line = (f"{name:>12} x {len(batch):>6} locations ({entries:>7} entries): "
+            f"python {python * 1e3:9.2f} ms ({python / len(batch) * 1e6:7.1f} µs/location)")
+    if has_numpy:
+        vectorized = time_per_batch(lambda: aggregate_daily(batch, reductions, vectorize=True), min_seconds)
+        line += (f", numpy {vectorized * 1e3:9.2f} ms ({vectorized / len(batch) * 1e6:7.1f} µs/location), "
+                 f"speed-up {python / vectorized:5.1f}x")
+    logger.info(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, nargs="+", default=[1, 100, 10_000], help="Batch sizes")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Minimum run time per measurement")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for the shifts and offsets")
+    args = parser.parse_args()
+
+    setup_logging()
+    if not has_numpy:
+        logger.warning("numpy is not installed; only the pure Python path is measured")
+    rng = random.Random(args.seed)
+    for locations in args.locations:
+        benchmark("forecast", forecast_batch(locations, rng), SUMMARY_REDUCTIONS, args.min_seconds)
+        benchmark("air quality", air_quality_batch(locations, rng), AIR_REDUCTIONS, args.min_seconds)
+
+
+if __name__ == "__main__":
+    main()
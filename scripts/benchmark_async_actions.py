@@ -0,0 +1,142 @@
+# This script benchmarks concurrent action throughput with the async OpenWeather client.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Benchmark how action throughput scales with concurrent conversations when
+actions await the non-blocking client, compared to the old behaviour where
+every upstream call blocked the event loop.
+
+A local stub server with a fixed per-request latency stands in for OpenWeather.
+
+Usage:
+    python scripts/benchmark_async_actions.py --latency-ms 50 --concurrency 1 10 50 200
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rasa_sdk.executor import CollectingDispatcher  # noqa: E402
+from actions import weather_utils  # noqa: E402
+from actions.actions import ActionFetchWeather  # noqa: E402
+from actions.logging_config import setup_logging  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+STUB_PAYLOAD = json.dumps({
+    "coord": {"lat": 51.5074, "lon": -0.1278},
+    "weather": [{"id": 800, "description": "clear sky"}],
+    "main": {"temp": 18.2, "humidity": 60},
+    "timezone": 3600,
+    "name": "London",
+}).encode("utf-8")
+
+
+class SlowStubHandler(BaseHTTPRequestHandler):
+    """Keep-alive handler that answers every request after a fixed delay."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency_seconds = 0.05
+
+    def handle_get(self):
+        time.sleep(self.latency_seconds)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(STUB_PAYLOAD)
+
+    do_GET = handle_get
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from base class
+        pass
+
+
+class StubTracker:
+    """Just enough of rasa_sdk.Tracker for the weather actions."""
+
+    def __init__(self, slots: Dict[str, Any]):
+        self.slots = slots
+        self.latest_message = {"text": ""}
+
+    def get_slot(self, key: str) -> Any:
+        return self.slots.get(key)
+
+
+async def run_turns(concurrency: int, rounds: int) -> float:
+    """Run `rounds` waves of `concurrency` simultaneous conversations and return turns per second."""
+    action = ActionFetchWeather()
+
+    async def conversation():
+        await action.run(CollectingDispatcher(), StubTracker({"location": "London"}), {})
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(conversation() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await weather_utils.close_async_http_session()
+    return concurrency * rounds / elapsed
+
+
+async def blocking_http_get(url: str, timeout: float = weather_utils.REQUEST_TIMEOUT) -> Any:
+    """The pre-async behaviour: a synchronous request made directly on the event loop."""
+    return weather_utils.http_get(url, timeout=timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Simulated upstream latency per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200],
+                        help="Numbers of simultaneous conversations to test")
+    parser.add_argument("--rounds", type=int, default=3, help="Waves of conversations per concurrency level")
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.getLogger("actions").setLevel(logging.WARNING)
+
+    SlowStubHandler.latency_seconds = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowStubHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["OPENWEATHER_API_KEY"] = "benchmark"
+    # The stub has no call limits; keep the client-side quota out of the measurement
+    weather_utils.configure_quota(per_minute=0, per_day=0)
+    weather_utils.API_ENDPOINTS["current_weather"] = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/weather"
+    transport = "aiohttp" if weather_utils.has_aiohttp else "thread pool"
+    native_http_get = weather_utils.async_http_get
+
+    results: List[str] = []
+    try:
+        for concurrency in args.concurrency:
+            weather_utils.async_http_get = blocking_http_get
+            blocking = asyncio.run(run_turns(concurrency, args.rounds))
+            weather_utils.async_http_get = native_http_get
+            non_blocking = asyncio.run(run_turns(concurrency, args.rounds))
+            results.append(
+                f"{concurrency:>5} conversations: blocking {blocking:8.1f} turns/s, "
+                f"async ({transport}) {non_blocking:8.1f} turns/s, speed-up x{non_blocking / blocking:.1f}"
+            )
+    finally:
+        weather_utils.async_http_get = native_http_get
+        server.shutdown()
+
+    logger.info(f"Upstream latency {args.latency_ms:.0f} ms per request")
+    for line in results:
+        logger.info(line)
+
+
+if __name__ == "__main__":
+    main()
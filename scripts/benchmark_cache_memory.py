@@ -0,0 +1,122 @@
+# This script measures the memory each cached city costs, as decoded JSON and as compact models.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Compare the bytes per cached city of the payloads the caches used to hold
+(decoded JSON) with the weather_models they hold now.
+
+Every city gets the stand-in's synthetic payloads (scripts/openweather_standin.py),
+encoded and decoded again as an upstream response would be: a current
+observation, a 40-entry forecast with its daily summaries, a 96-hour air
+quality forecast reduced to its hourly series and an 8-day UV forecast.
+Each is held the way the caches held it before and the way they hold it now;
+tracemalloc measures what stays allocated once the temporaries are freed.
+The size estimate the byte budgets charge (weather_utils.estimate_size) is
+reported alongside.
+
+Usage:
+    python scripts/benchmark_cache_memory.py --cities 2000
+"""
+import gc
+import os
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from actions.logging_config import setup_logging  # noqa: E402
+from actions.weather_models import compact_payload  # noqa: E402
+from actions.weather_payloads import (  # noqa: E402
+    AIR_QUALITY_SERIES_KEY, decode_json, encode_json, materialize_air_quality_series, materialize_daily_summaries
+)
+from actions.weather_utils import estimate_size  # noqa: E402
+from openweather_standin import (  # noqa: E402
+    CityCatalogue, synthetic_air_forecast, synthetic_forecast, synthetic_uvi_forecast, synthetic_weather
+)
+
+logger = logging.getLogger(__name__)
+
+QUERY = {"units": "metric"}
+
+
+def upstream_bodies(city: Any, now: int) -> Dict[str, bytes]:
+    """The encoded bodies of one city's responses."""
+    return {
+        "current": encode_json(synthetic_weather(city, QUERY, now)),
+        "forecast": encode_json(synthetic_forecast(city, QUERY, now)),
+        "air_quality": encode_json(synthetic_air_forecast(city, QUERY, now)),
+        "uv": encode_json(synthetic_uvi_forecast(city, QUERY, now)),
+    }
+
+
+def cached_json(dataset: str, body: bytes) -> Any:
+    """What the cache held before: the decoded body, with the forecast summaries or only the air quality series."""
+    data = decode_json(body)
+    if dataset == "forecast":
+        materialize_daily_summaries(data)
+    elif dataset == "air_quality":
+        materialize_air_quality_series(data)
+        data = {"coord": data.get("coord"), AIR_QUALITY_SERIES_KEY: data[AIR_QUALITY_SERIES_KEY]}
+    return data
+
+
+def cached_model(dataset: str, body: bytes) -> Any:
+    """What the cache holds now: the model of the decoded body."""
+    data = decode_json(body)
+    if dataset == "forecast":
+        materialize_daily_summaries(data)
+        return compact_payload("forecast", data)
+    if dataset == "air_quality":
+        return materialize_air_quality_series(data)
+    return compact_payload("uv_forecast" if dataset == "uv" else "current_weather", data)
+
+
+def held_bytes(bodies: List[Dict[str, bytes]], dataset: str, build: Callable[[str, bytes], Any]) -> Tuple[int, int]:
+    """Bytes still allocated once `build` has turned every city's body into its cached value, and their estimate."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(dataset, city[dataset]) for city in bodies]
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    estimated = sum(estimate_size(value) for value in held)
+    del held
+    return allocated, estimated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=2000, help="Number of cached cities")
+    args = parser.parse_args()
+
+    setup_logging()
+    now = int(time.time())
+    bodies = [upstream_bodies(city, now) for city in CityCatalogue(args.cities).cities]
+    totals = {"json": 0, "models": 0, "json_estimate": 0, "models_estimate": 0}
+    for dataset in ("current", "forecast", "air_quality", "uv"):
+        json_bytes, json_estimate = held_bytes(bodies, dataset, cached_json)
+        model_bytes, model_estimate = held_bytes(bodies, dataset, cached_model)
+        totals["json"] += json_bytes
+        totals["models"] += model_bytes
+        totals["json_estimate"] += json_estimate
+        totals["models_estimate"] += model_estimate
+        logger.info(f"{dataset:>12}: json {json_bytes / args.cities:8.0f} B/city, "
+                    f"models {model_bytes / args.cities:8.0f} B/city ({json_bytes / model_bytes:4.1f}x smaller); "
+                    f"estimated {json_estimate / args.cities:8.0f} -> {model_estimate / args.cities:8.0f} B/city")
+    logger.info(f"{'total':>12}: json {totals['json'] / args.cities:8.0f} B/city, "
+                f"models {totals['models'] / args.cities:8.0f} B/city "
+                f"({totals['json'] / totals['models']:4.1f}x smaller); "
+                f"estimated {totals['json_estimate'] / args.cities:8.0f} -> "
+                f"{totals['models_estimate'] / args.cities:8.0f} B/city")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# This script benchmarks the shared HTTP connection pool in weather_utils.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Benchmark per-call latency of OpenWeather requests with and without the
+shared keep-alive session pool, using a local stub server.
+
+Usage:
+    python scripts/benchmark_http_pool.py --calls 500 --threads 8
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions.logging_config import setup_logging  # noqa: E402
+from actions.weather_utils import create_http_session  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+STUB_PAYLOAD = json.dumps({
+    "coord": {"lat": 51.5074, "lon": -0.1278},
+    "weather": [{"id": 800, "description": "clear sky"}],
+    "main": {"temp": 18.2, "humidity": 60},
+    "timezone": 3600,
+    "name": "London",
+}).encode("utf-8")
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive capable handler returning a fixed current-weather payload."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def handle_get(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(STUB_PAYLOAD)
+
+    do_GET = handle_get
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from base class
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    """Start the stub server on a free local port in a daemon thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWeatherHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_calls(fetch: Callable[[str], requests.Response], url: str, calls: int, threads: int) -> List[float]:
+    """Run `calls` GETs with `threads` workers and return per-call latencies in ms."""
+    def timed(_):
+        start = time.perf_counter()
+        response = fetch(url)
+        response.content  # noqa: B018 - make sure the body is read
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(timed, range(calls)))
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies as mean, p50 and p95."""
+    ordered = sorted(latencies)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500, help="Number of requests per scenario")
+    parser.add_argument("--threads", type=int, default=8, help="Number of concurrent callers")
+    parser.add_argument("--pool-size", type=int, default=20, help="Keep-alive connections per host")
+    args = parser.parse_args()
+
+    setup_logging()
+    server = start_stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/weather?q=London&appid=bench&units=metric"
+    session = create_http_session(pool_maxsize=args.pool_size)
+
+    scenarios = {
+        "requests.get (new connection per call)": lambda u: requests.get(u, timeout=10),
+        f"shared session (pool size {args.pool_size})": lambda u: session.get(u, timeout=10),
+    }
+    try:
+        for label, fetch in scenarios.items():
+            time_calls(fetch, url, min(args.calls, 20), args.threads)  # warm-up
+            stats = summarize(time_calls(fetch, url, args.calls, args.threads))
+            logger.info(
+                f"{label}: mean {stats['mean']:.2f} ms, p50 {stats['p50']:.2f} ms, "
+                f"p95 {stats['p95']:.2f} ms over {args.calls} calls x {args.threads} threads"
+            )
+    finally:
+        session.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# This script benchmarks JSON decoding and indexing of OpenWeather payloads.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Compare the cost of turning a recorded OpenWeather body into the values an
+action reads: the previous response.json() path (stdlib json, full dict tree
+kept) against decode_json() plus the columnar index the actions read
+(index_forecast, AirQualitySeries).
+
+Reports time per payload and the peak and retained allocation measured with
+tracemalloc, for the /forecast and /air_pollution/forecast fixtures.
+
+Usage:
+    python scripts/benchmark_json_decoding.py --iterations 2000
+"""
+import os
+import sys
+import gc
+import json
+import time
+import logging
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions.logging_config import setup_logging  # noqa: E402
+from actions.weather_payloads import (  # noqa: E402
+    AirQualitySeries, decode_json, has_orjson, index_forecast
+)
+
+logger = logging.getLogger(__name__)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "openweather")
+
+PAYLOADS = {
+    "forecast": ("forecast.json", index_forecast),
+    "air_pollution_forecast": ("air_pollution_forecast.json", AirQualitySeries.from_payload),
+}
+
+
+def time_per_call(run: Callable[[], Any], iterations: int) -> float:
+    """Return the mean time of `run` in microseconds."""
+    run()  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def measure_memory(run: Callable[[], Any]) -> Tuple[int, int]:
+    """Return (peak, retained) bytes allocated by one call of `run`."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = run()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+def benchmark_payload(body: bytes, index: Callable[[Dict[str, Any]], Any], iterations: int) -> None:
+    """Log timing and allocation of each decoding path for one payload."""
+    paths = {
+        "json.loads (full tree)": lambda: json.loads(body),
+        "json.loads + index": lambda: index(json.loads(body)),
+    }
+    if has_orjson:
+        paths["orjson.loads + index"] = lambda: index(decode_json(body))
+
+    for label, run in paths.items():
+        micros = time_per_call(run, iterations)
+        peak, retained = measure_memory(run)
+        logger.info(
+            f"  {label}: {micros:.1f} µs/payload, peak {peak / 1024:.1f} KiB, retained {retained / 1024:.1f} KiB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Decodes per path and payload")
+    args = parser.parse_args()
+
+    setup_logging()
+    if not has_orjson:
+        logger.warning("orjson is not installed; only the stdlib paths are measured (pip install orjson)")
+
+    for name, (filename, index) in PAYLOADS.items():
+        with open(os.path.join(FIXTURES, filename), "rb") as f:
+            body = f.read()
+        logger.info(f"{name} ({len(body) / 1024:.1f} KiB body, {len(json.loads(body)['list'])} entries):")
+        benchmark_payload(body, index, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
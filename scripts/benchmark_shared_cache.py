@@ -0,0 +1,127 @@
+# This script benchmarks the cross-process shared cache with several action server workers.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Compare per-process forecast caches with caches backed by the shared
+memory-mapped cache when several worker processes answer questions about
+the same cities.
+
+Each worker handles a stream of forecast lookups over a set of cities with
+Zipf-like popularity; a miss counts as an upstream call and stores the
+recorded /forecast fixture. Reports upstream calls (and the reduction the
+shared cache gives) and the latency of hits served from the worker's own
+memory and from the shared cache.
+
+Usage:
+    python scripts/benchmark_shared_cache.py --workers 4 8 --requests 2000 --cities 300
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions import weather_utils  # noqa: E402
+from actions.logging_config import setup_logging  # noqa: E402
+from actions.weather_payloads import decode_json  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "openweather", "forecast.json")
+
+
+def run_worker(args: Tuple[int, str, int, int, float]) -> Dict[str, Any]:
+    """Answer `requests` lookups in one worker; returns its upstream calls and hit latencies in µs."""
+    worker, shared_path, requests, cities, latency = args
+    weather_utils.configure_shared_cache(shared_path)
+    cache = weather_utils.ForecastCache()
+    with open(FIXTURE, "rb") as f:
+        forecast = decode_json(f.read())
+    rng = random.Random(worker)
+    weights = [1 / (rank + 1) for rank in range(cities)]
+    upstream_calls = 0
+    local_hits: List[float] = []
+    shared_hits: List[float] = []
+    for city in rng.choices(range(cities), weights=weights, k=requests):
+        lat, lon = city / 10, city / 10
+        key = weather_utils.WeatherQuery.by_coordinates("forecast", lat, lon).cache_key()
+        start = time.perf_counter()
+        hit = cache.lookup_entry(key, "benchmark")
+        elapsed = (time.perf_counter() - start) * 1e6
+        if hit is None:
+            upstream_calls += 1
+            time.sleep(latency)
+            cache.put(lat, lon, forecast)
+        elif hit.shared:
+            shared_hits.append(elapsed)
+        else:
+            local_hits.append(elapsed)
+    weather_utils.configure_shared_cache("")
+    return {"upstream_calls": upstream_calls, "local_hits": local_hits, "shared_hits": shared_hits}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_mode(workers: int, shared: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run `workers` processes at once, with or without a shared cache file."""
+    directory = tempfile.mkdtemp(prefix="shared-cache-benchmark-")
+    path = os.path.join(directory, "cache.bin") if shared else ""
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    try:
+        with context.Pool(workers) as pool:
+            results = pool.map(run_worker, [
+                (w, path, args.requests, args.cities, args.latency_ms / 1000) for w in range(workers)
+            ])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {
+        "upstream_calls": sum(r["upstream_calls"] for r in results),
+        "local_hits": [t for r in results for t in r["local_hits"]],
+        "shared_hits": [t for r in results for t in r["shared_hits"]],
+    }
+
+
+def describe_hits(label: str, latencies: List[float]) -> str:
+    if not latencies:
+        return f"{label}: none"
+    return (f"{label}: {len(latencies)}, p50 {percentile(latencies, 0.5):.1f} µs, "
+            f"p95 {percentile(latencies, 0.95):.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 8], help="Worker process counts to compare")
+    parser.add_argument("--requests", type=int, default=2000, help="Lookups per worker")
+    parser.add_argument("--cities", type=int, default=300, help="Distinct cities asked about")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated upstream latency per miss")
+    args = parser.parse_args()
+
+    setup_logging()
+    for workers in args.workers:
+        per_process = run_mode(workers, False, args)
+        shared = run_mode(workers, True, args)
+        reduction = 1 - shared["upstream_calls"] / per_process["upstream_calls"] if per_process["upstream_calls"] else 0
+        logger.info(f"{workers} workers, {workers * args.requests} lookups over {args.cities} cities:")
+        logger.info(f"  per-process caches: {per_process['upstream_calls']} upstream calls; "
+                    f"{describe_hits('local hits', per_process['local_hits'])}")
+        logger.info(f"  shared cache: {shared['upstream_calls']} upstream calls ({reduction:.0%} fewer); "
+                    f"{describe_hits('local hits', shared['local_hits'])}; "
+                    f"{describe_hits('shared hits', shared['shared_hits'])}")
+
+
+if __name__ == "__main__":
+    main()
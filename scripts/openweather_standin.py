@@ -0,0 +1,621 @@
+# This script runs a local stand-in for the OpenWeather and TimezoneDB endpoints.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Local stand-in for the upstream endpoints the actions call, so performance
+and integration work does not need the live API or a real key.
+
+Serves /weather, /forecast, /uvi, /uvi/forecast, /air_pollution,
+/air_pollution/forecast, /onecall/timemachine (under /data/2.5) and the
+TimezoneDB /v2.1/get-time-zone endpoint. Each request is answered from a
+recorded fixture if there is one, otherwise with a synthetic payload for one
+of the configured cities. Synthetic payloads are deterministic per city,
+endpoint and time slot. Latency, error rate and 429 bursts are configurable.
+
+Point the action server at it with:
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8099/data/2.5
+    TIMEZONEDB_URL=http://127.0.0.1:8099/v2.1/get-time-zone
+
+Fixtures are looked up in --fixtures as <endpoint>/<request key>.json for an
+exact request, then <endpoint>.json for every request to that endpoint. With
+--record, requests are forwarded to the public APIs and successful answers
+are saved as exact-request fixtures (the API key is never stored).
+
+Usage:
+    python scripts/openweather_standin.py --port 8099 --cities 1000 \\
+        --latency-ms 80 --jitter-ms 40 --distribution lognormal \\
+        --error-rate 0.01 --burst-every 500 --burst-length 20
+    python scripts/openweather_standin.py --fixtures tests/fixtures/openweather --record
+"""
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import random
+import hashlib
+import logging
+import argparse
+import datetime
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions.logging_config import setup_logging  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_PATHS = {
+    "/data/2.5/weather": "weather",
+    "/data/2.5/forecast": "forecast",
+    "/data/2.5/uvi": "uvi",
+    "/data/2.5/uvi/forecast": "uvi_forecast",
+    "/data/2.5/air_pollution": "air_pollution",
+    "/data/2.5/air_pollution/forecast": "air_pollution_forecast",
+    "/data/2.5/onecall/timemachine": "timemachine",
+    "/v2.1/get-time-zone": "timezone",
+}
+
+# Upstream hosts used in record mode
+RECORD_HOSTS = {
+    "timezone": "http://api.timezonedb.com",
+}
+RECORD_DEFAULT_HOST = "http://api.openweathermap.org"
+
+# Query parameters that carry credentials and are left out of fixture keys
+CREDENTIAL_PARAMS = ("appid", "key")
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+# Well-known cities come first so conversations read naturally; the rest are synthetic
+KNOWN_CITIES = [
+    ("London", "GB", 51.5085, -0.1257, 3600, "Europe/London"),
+    ("Paris", "FR", 48.8534, 2.3488, 7200, "Europe/Paris"),
+    ("Berlin", "DE", 52.5244, 13.4105, 7200, "Europe/Berlin"),
+    ("Madrid", "ES", 40.4165, -3.7026, 7200, "Europe/Madrid"),
+    ("Rome", "IT", 41.8947, 12.4839, 7200, "Europe/Rome"),
+    ("Stockholm", "SE", 59.3294, 18.0687, 7200, "Europe/Stockholm"),
+    ("New York", "US", 40.7143, -74.006, -14400, "America/New_York"),
+    ("Tokyo", "JP", 35.6895, 139.6917, 32400, "Asia/Tokyo"),
+    ("Sydney", "AU", -33.8679, 151.2073, 36000, "Australia/Sydney"),
+    ("Dubai", "AE", 25.2582, 55.3047, 14400, "Asia/Dubai"),
+]
+
+WEATHER_CONDITIONS = [
+    (800, "Clear", "clear sky", "01"),
+    (801, "Clouds", "few clouds", "02"),
+    (802, "Clouds", "scattered clouds", "03"),
+    (804, "Clouds", "overcast clouds", "04"),
+    (500, "Rain", "light rain", "10"),
+    (501, "Rain", "moderate rain", "10"),
+    (600, "Snow", "light snow", "13"),
+    (211, "Thunderstorm", "thunderstorm", "11"),
+]
+
+
+@dataclass
+class LatencyModel:
+    """Response delay distribution, in milliseconds."""
+    median_ms: float = 0.0
+    jitter_ms: float = 0.0
+    distribution: str = "uniform"
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one delay in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        if self.distribution == "fixed" or self.jitter_ms <= 0:
+            delay = self.median_ms
+        elif self.distribution == "uniform":
+            delay = rng.uniform(self.median_ms - self.jitter_ms, self.median_ms + self.jitter_ms)
+        elif self.distribution == "normal":
+            delay = rng.gauss(self.median_ms, self.jitter_ms)
+        else:
+            # Long-tailed: the median stays put, jitter/median sets the spread
+            delay = self.median_ms * math.exp(rng.gauss(0, self.jitter_ms / self.median_ms))
+        return max(0.0, delay) / 1000
+
+
+@dataclass
+class StandinConfig:
+    """What the stand-in serves and which faults it injects."""
+    cities: int = 100
+    fixtures_dir: Optional[str] = None
+    record: bool = False
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    # Per-endpoint overrides of `latency`, keyed by endpoint name (see ENDPOINT_PATHS)
+    endpoint_latency: Dict[str, LatencyModel] = field(default_factory=dict)
+    # Fraction of requests answered with `error_status`
+    error_rate: float = 0.0
+    error_status: int = 503
+    # The last `burst_length` of every `burst_every` requests get a 429
+    burst_every: int = 0
+    burst_length: int = 0
+    retry_after: int = 1
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class CityInfo:
+    """A city the stand-in knows about."""
+    city_id: int
+    name: str
+    country: str
+    lat: float
+    lon: float
+    timezone_offset: int
+    zone_name: str
+
+
+class CityCatalogue:
+    """The known cities, looked up by name or by coordinates."""
+
+    def __init__(self, count: int):
+        self.cities: List[CityInfo] = []
+        for index in range(max(count, 1)):
+            if index < len(KNOWN_CITIES):
+                name, country, lat, lon, offset, zone = KNOWN_CITIES[index]
+            else:
+                rng = random.Random(index)
+                name, country = f"City {index:05d}", "ZZ"
+                lat, lon = round(rng.uniform(-60, 70), 4), round(rng.uniform(-180, 180), 4)
+                offset = int(round(lon / 15)) * 3600
+                zone = f"Etc/GMT{-offset // 3600:+d}" if offset else "Etc/GMT"
+            self.cities.append(CityInfo(2643743 + index, name, country, lat, lon, offset, zone))
+        self.by_name = {city.name.lower(): city for city in self.cities}
+        self.by_coord = {(round(city.lat, 2), round(city.lon, 2)): city for city in self.cities}
+
+    def find(self, query: str) -> Optional[CityInfo]:
+        """Find a city by name, ignoring case and any ",country" suffix."""
+        return self.by_name.get(query.split(",")[0].strip().lower())
+
+    def locate(self, lat: float, lon: float) -> CityInfo:
+        """The city at these coordinates, or an unnamed place there."""
+        city = self.by_coord.get((round(lat, 2), round(lon, 2)))
+        if city is not None:
+            return city
+        offset = int(round(lon / 15)) * 3600
+        return CityInfo(0, "", "", lat, lon, offset, "Etc/GMT")
+
+
+def request_key(query: Dict[str, str]) -> str:
+    """Stable fixture key for a request: its parameters without credentials, in sorted order."""
+    params = sorted((k, v) for k, v in query.items() if k not in CREDENTIAL_PARAMS)
+    return hashlib.sha256(urlencode(params).encode("utf-8")).hexdigest()[:16]
+
+
+def seeded_rng(*parts: Any) -> random.Random:
+    """Deterministic random source for one city, endpoint and time slot."""
+    return random.Random(zlib.crc32("|".join(str(part) for part in parts).encode("utf-8")))
+
+
+def convert_temp(celsius: float, units: str) -> float:
+    if units == "metric":
+        return round(celsius, 2)
+    if units == "imperial":
+        return round(celsius * 9 / 5 + 32, 2)
+    return round(celsius + 273.15, 2)
+
+
+def weather_condition(rng: random.Random, daytime: bool = True) -> Dict[str, Any]:
+    condition_id, main, description, icon = rng.choice(WEATHER_CONDITIONS)
+    return {"id": condition_id, "main": main, "description": description, "icon": icon + ("d" if daytime else "n")}
+
+
+def base_temperature(city: CityInfo) -> float:
+    """Typical temperature in °C for the city's latitude."""
+    return 27 - abs(city.lat) * 0.35
+
+
+def sun_times(city: CityInfo, now: int) -> Tuple[int, int]:
+    """Sunrise and sunset (UTC timestamps) for the city's local day."""
+    local_midnight = (now + city.timezone_offset) // 86400 * 86400 - city.timezone_offset
+    daylight = 12 * 3600 + int(4 * 3600 * math.sin(math.radians(city.lat)))
+    return local_midnight + 43200 - daylight // 2, local_midnight + 43200 + daylight // 2
+
+
+def forecast_entry(city: CityInfo, dt: int, units: str) -> Dict[str, Any]:
+    rng = seeded_rng(city.lat, city.lon, "forecast", dt)
+    temp = base_temperature(city) + rng.uniform(-6, 6)
+    hour = datetime.datetime.utcfromtimestamp(dt + city.timezone_offset).hour
+    condition = weather_condition(rng, 6 <= hour < 21)
+    entry = {
+        "dt": dt,
+        "main": {
+            "temp": convert_temp(temp, units),
+            "feels_like": convert_temp(temp - rng.uniform(0, 2), units),
+            "temp_min": convert_temp(temp - rng.uniform(0, 1.5), units),
+            "temp_max": convert_temp(temp + rng.uniform(0, 1.5), units),
+            "pressure": rng.randint(995, 1030),
+            "humidity": rng.randint(30, 95),
+        },
+        "weather": [condition],
+        "clouds": {"all": rng.randint(0, 100)},
+        "wind": {"speed": round(rng.uniform(0.5, 12), 2), "deg": rng.randint(0, 359),
+                 "gust": round(rng.uniform(1, 18), 2)},
+        "visibility": 10000,
+        "pop": round(rng.random(), 2),
+        "sys": {"pod": condition["icon"][-1]},
+        "dt_txt": datetime.datetime.utcfromtimestamp(dt).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if condition["main"] in ("Rain", "Thunderstorm"):
+        entry["rain"] = {"3h": round(rng.uniform(0.1, 6), 2)}
+    elif condition["main"] == "Snow":
+        entry["snow"] = {"3h": round(rng.uniform(0.1, 3), 2)}
+    return entry
+
+
+def synthetic_weather(city: CityInfo, query: Dict[str, str], now: int) -> Dict[str, Any]:
+    units = query.get("units", "standard")
+    slot = now // 600 * 600
+    entry = forecast_entry(city, slot, units)
+    sunrise, sunset = sun_times(city, now)
+    return {
+        "coord": {"lon": city.lon, "lat": city.lat},
+        "weather": entry["weather"],
+        "base": "stations",
+        "main": entry["main"],
+        "visibility": entry["visibility"],
+        "wind": entry["wind"],
+        "clouds": entry["clouds"],
+        "dt": now,
+        "sys": {"country": city.country, "sunrise": sunrise, "sunset": sunset},
+        "timezone": city.timezone_offset,
+        "id": city.city_id,
+        "name": city.name,
+        "cod": 200,
+    }
+
+
+def synthetic_forecast(city: CityInfo, query: Dict[str, str], now: int) -> Dict[str, Any]:
+    units = query.get("units", "standard")
+    start = now // 10800 * 10800
+    count = min(int(query.get("cnt", 40)), 40)
+    sunrise, sunset = sun_times(city, now)
+    return {
+        "cod": "200",
+        "message": 0,
+        "cnt": count,
+        "list": [forecast_entry(city, start + i * 10800, units) for i in range(count)],
+        "city": {
+            "id": city.city_id, "name": city.name, "coord": {"lat": city.lat, "lon": city.lon},
+            "country": city.country, "population": 0, "timezone": city.timezone_offset,
+            "sunrise": sunrise, "sunset": sunset,
+        },
+    }
+
+
+def uv_value(city: CityInfo, day: int) -> float:
+    rng = seeded_rng(city.lat, city.lon, "uvi", day)
+    return round(max(0.0, 11 * math.cos(math.radians(city.lat)) + rng.uniform(-2, 2)), 2)
+
+
+def uv_entry(city: CityInfo, day: int) -> Dict[str, Any]:
+    noon = day * 86400 + 43200
+    return {
+        "lat": city.lat, "lon": city.lon,
+        "date_iso": datetime.datetime.utcfromtimestamp(noon).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "date": noon,
+        "value": uv_value(city, day),
+    }
+
+
+def synthetic_uvi(city: CityInfo, query: Dict[str, str], now: int) -> Dict[str, Any]:
+    return uv_entry(city, now // 86400)
+
+
+def synthetic_uvi_forecast(city: CityInfo, query: Dict[str, str], now: int) -> List[Dict[str, Any]]:
+    count = min(int(query.get("cnt", 8)), 8)
+    return [uv_entry(city, now // 86400 + i) for i in range(count)]
+
+
+def air_entry(city: CityInfo, dt: int) -> Dict[str, Any]:
+    rng = seeded_rng(city.lat, city.lon, "air", dt)
+    return {
+        "main": {"aqi": rng.choice((1, 1, 2, 2, 2, 3, 3, 4, 5))},
+        "components": {
+            "co": round(rng.uniform(150, 400), 2), "no": round(rng.uniform(0, 5), 2),
+            "no2": round(rng.uniform(2, 60), 2), "o3": round(rng.uniform(20, 120), 2),
+            "so2": round(rng.uniform(0.5, 10), 2), "pm2_5": round(rng.uniform(1, 40), 2),
+            "pm10": round(rng.uniform(2, 60), 2), "nh3": round(rng.uniform(0.1, 5), 2),
+        },
+        "dt": dt,
+    }
+
+
+def synthetic_air_pollution(city: CityInfo, query: Dict[str, str], now: int) -> Dict[str, Any]:
+    return {"coord": {"lon": city.lon, "lat": city.lat}, "list": [air_entry(city, now // 3600 * 3600)]}
+
+
+def synthetic_air_forecast(city: CityInfo, query: Dict[str, str], now: int) -> Dict[str, Any]:
+    start = now // 3600 * 3600
+    return {"coord": {"lon": city.lon, "lat": city.lat}, "list": [air_entry(city, start + i * 3600) for i in range(96)]}
+
+
+def synthetic_timemachine(city: CityInfo, query: Dict[str, str], now: int) -> Dict[str, Any]:
+    dt = int(query.get("dt", now))
+    entry = forecast_entry(city, dt // 3600 * 3600, query.get("units", "standard"))
+    sunrise, sunset = sun_times(city, dt)
+    return {
+        "lat": city.lat, "lon": city.lon, "timezone": city.zone_name, "timezone_offset": city.timezone_offset,
+        "data": [{
+            "dt": dt, "sunrise": sunrise, "sunset": sunset,
+            "temp": entry["main"]["temp"], "feels_like": entry["main"]["feels_like"],
+            "pressure": entry["main"]["pressure"], "humidity": entry["main"]["humidity"],
+            "clouds": entry["clouds"]["all"], "visibility": entry["visibility"],
+            "wind_speed": entry["wind"]["speed"], "wind_deg": entry["wind"]["deg"],
+            "weather": entry["weather"],
+        }],
+    }
+
+
+def synthetic_timezone(city: CityInfo, query: Dict[str, str], now: int) -> Dict[str, Any]:
+    local = now + city.timezone_offset
+    return {
+        "status": "OK", "message": "",
+        "countryCode": city.country, "countryName": city.country,
+        "regionName": "", "cityName": city.name,
+        "zoneName": city.zone_name, "abbreviation": "",
+        "gmtOffset": city.timezone_offset, "dst": "0",
+        "zoneStart": None, "zoneEnd": None, "nextAbbreviation": None,
+        "timestamp": local,
+        "formatted": datetime.datetime.utcfromtimestamp(local).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+GENERATORS = {
+    "weather": synthetic_weather,
+    "forecast": synthetic_forecast,
+    "uvi": synthetic_uvi,
+    "uvi_forecast": synthetic_uvi_forecast,
+    "air_pollution": synthetic_air_pollution,
+    "air_pollution_forecast": synthetic_air_forecast,
+    "timemachine": synthetic_timemachine,
+    "timezone": synthetic_timezone,
+}
+
+
+class StandinServer(ThreadingHTTPServer):
+    """HTTP server holding the stand-in's configuration, cities and counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: StandinConfig):
+        super().__init__(address, StandinHandler)
+        self.config = config
+        self.catalogue = CityCatalogue(config.cities)
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.counters: Dict[str, int] = {"requests": 0, "errors": 0, "rate_limited": 0, "fixtures": 0, "recorded": 0}
+        self.endpoint_counts: Dict[str, int] = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openweather_base_url(self) -> str:
+        """Value for OPENWEATHER_BASE_URL."""
+        return f"{self.base_url}/data/2.5"
+
+    @property
+    def timezonedb_url(self) -> str:
+        """Value for TIMEZONEDB_URL."""
+        return f"{self.base_url}/v2.1/get-time-zone"
+
+    def next_fault(self, endpoint: str) -> Tuple[Optional[int], float]:
+        """
+        Decide the fault (if any) and the delay of the next request.
+
+        Returns:
+            (status to inject or None, delay in seconds)
+        """
+        config = self.config
+        with self.lock:
+            index = self.request_count
+            self.request_count += 1
+            self.counters["requests"] += 1
+            self.endpoint_counts[endpoint] = self.endpoint_counts.get(endpoint, 0) + 1
+            latency = config.endpoint_latency.get(endpoint, config.latency)
+            delay = latency.sample(self.rng)
+            if config.burst_every and config.burst_length and index % config.burst_every >= config.burst_every - config.burst_length:
+                self.counters["rate_limited"] += 1
+                return 429, 0.0
+            if config.error_rate and self.rng.random() < config.error_rate:
+                self.counters["errors"] += 1
+                return config.error_status, delay
+        return None, delay
+
+    def count(self, counter: str) -> None:
+        with self.lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests served, faults injected and fixtures used."""
+        with self.lock:
+            return dict(self.counters, endpoints=dict(self.endpoint_counts))
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Answers one upstream request from fixtures, record mode or synthetic data."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: StandinServer
+
+    def handle_get(self):
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        endpoint = ENDPOINT_PATHS.get(parts.path.rstrip("/"))
+        if endpoint is None:
+            self.send_json(404, {"cod": "404", "message": "Internal error"})
+            return
+        if not query.get("key" if endpoint == "timezone" else "appid"):
+            self.send_json(401, {"cod": 401, "message": "Invalid API key. Please see https://openweathermap.org/faq#error401 for more info."})
+            return
+
+        status, delay = self.server.next_fault(endpoint)
+        if status == 429:
+            self.send_json(429, {"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation of your subscription type."},
+                           {"Retry-After": str(self.server.config.retry_after)})
+            return
+        if delay:
+            time.sleep(delay)
+        if status is not None:
+            self.send_json(status, {"cod": status, "message": "Service temporarily unavailable"})
+            return
+
+        status, payload = self.build_response(endpoint, parts.path, query)
+        self.send_json(status, payload)
+
+    do_GET = handle_get
+
+    def build_response(self, endpoint: str, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        config = self.server.config
+        if config.fixtures_dir:
+            payload = self.load_fixture(endpoint, query)
+            if payload is not None:
+                self.server.count("fixtures")
+                return 200, payload
+            if config.record:
+                return self.record(endpoint, path, query)
+
+        city = self.find_city(endpoint, query)
+        if city is None:
+            return 404, {"cod": "404", "message": "city not found"}
+        return 200, GENERATORS[endpoint](city, query, int(time.time()))
+
+    def find_city(self, endpoint: str, query: Dict[str, str]) -> Optional[CityInfo]:
+        catalogue = self.server.catalogue
+        if "q" in query:
+            return catalogue.find(query["q"])
+        try:
+            lat = float(query["lat"])
+            lon = float(query["lng"] if endpoint == "timezone" else query["lon"])
+        except (KeyError, ValueError) as e:
+            logger.error(f"Bad coordinates in {endpoint} request: {str(e)}")
+            return None
+        return catalogue.locate(lat, lon)
+
+    def load_fixture(self, endpoint: str, query: Dict[str, str]) -> Any:
+        """The exact-request fixture if there is one, otherwise the endpoint's generic fixture."""
+        fixtures_dir = self.server.config.fixtures_dir
+        for path in (os.path.join(fixtures_dir, endpoint, f"{request_key(query)}.json"),
+                     os.path.join(fixtures_dir, f"{endpoint}.json")):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return json.loads(f.read())
+        return None
+
+    def record(self, endpoint: str, path: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        """Forward the request to the public API and save a successful answer as a fixture."""
+        url = f"{RECORD_HOSTS.get(endpoint, RECORD_DEFAULT_HOST)}{path}"
+        try:
+            response = requests.get(url, params=query, timeout=10)
+            payload = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Recording {endpoint} failed: {str(e)}")
+            return 502, {"cod": 502, "message": "Recording failed"}
+        if response.status_code == 200:
+            directory = os.path.join(self.server.config.fixtures_dir, endpoint)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{request_key(query)}.json"), "w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=2)
+            self.server.count("recorded")
+            logger.info(f"Recorded {endpoint} fixture {request_key(query)}")
+        return response.status_code, payload
+
+    def send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from base class
+        logger.debug(format % args)
+
+
+def start_standin_server(config: Optional[StandinConfig] = None, host: str = "127.0.0.1",
+                         port: int = 0) -> StandinServer:
+    """Start the stand-in in a daemon thread (port 0 picks a free port)."""
+    server = StandinServer((host, port), config or StandinConfig())
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    logger.info(f"OpenWeather stand-in serving {len(server.catalogue.cities)} cities on {server.base_url}")
+    return server
+
+
+def parse_endpoint_latency(values: List[str], default: LatencyModel) -> Dict[str, LatencyModel]:
+    """Parse --endpoint-latency values of the form endpoint=median_ms[:jitter_ms]."""
+    overrides = {}
+    for value in values:
+        endpoint, _, spec = value.partition("=")
+        if endpoint not in GENERATORS:
+            raise ValueError(f"Unknown endpoint {endpoint!r}, expected one of {', '.join(GENERATORS)}")
+        median, _, jitter = spec.partition(":")
+        overrides[endpoint] = LatencyModel(float(median), float(jitter or default.jitter_ms), default.distribution)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8099, help="Port to listen on")
+    parser.add_argument("--cities", type=int, default=100, help="Number of cities to serve")
+    parser.add_argument("--fixtures", help="Directory of recorded fixtures")
+    parser.add_argument("--record", action="store_true", help="Record missing fixtures from the public APIs")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Median response delay")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Spread of the response delay")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="uniform",
+                        help="Shape of the response delay distribution")
+    parser.add_argument("--endpoint-latency", action="append", default=[], metavar="ENDPOINT=MS[:JITTER]",
+                        help="Per-endpoint delay override, e.g. forecast=250:100")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503, help="Status of injected errors")
+    parser.add_argument("--burst-every", type=int, default=0, help="Start a 429 burst every N requests")
+    parser.add_argument("--burst-length", type=int, default=0, help="Requests rejected with 429 per burst")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and fault injection")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+
+    latency = LatencyModel(args.latency_ms, args.jitter_ms, args.distribution)
+    config = StandinConfig(
+        cities=args.cities, fixtures_dir=args.fixtures, record=args.record, latency=latency,
+        endpoint_latency=parse_endpoint_latency(args.endpoint_latency, latency),
+        error_rate=args.error_rate, error_status=args.error_status,
+        burst_every=args.burst_every, burst_length=args.burst_length,
+        retry_after=args.retry_after, seed=args.seed,
+    )
+    server = start_standin_server(config, args.host, args.port)
+    logger.info(f"OPENWEATHER_BASE_URL={server.openweather_base_url}")
+    logger.info(f"TIMEZONEDB_URL={server.timezonedb_url}")
+    try:
+        while True:
+            time.sleep(60)
+            logger.info(f"Stand-in stats: {server.stats()}")
+    except KeyboardInterrupt:
+        logger.info(f"Stopping stand-in: {server.stats()}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# This script soaks the in-process weather caches with a large synthetic city list.
+#
+# See this guide on how to implement these action:
+# https://rasa.com/docs/rasa/custom-actions
+
+"""
+Check that the byte budgets keep the caches' memory flat over a long run.
+
+A simulated clock advances through `--simulated-hours` of traffic about
+`--cities` synthetic cities with Zipf-like popularity. Every lookup goes
+through the geocode, observation and forecast caches; a miss decodes a
+fresh copy of the recorded /forecast fixture (as an upstream response
+would be) and stores its compact model, as the caches do. The process's resident set size is sampled every
+simulated hour, together with the bytes and entries each cache holds.
+
+Once the caches are full RSS should stop growing: the script exits with
+status 1 if RSS in the last hour exceeds the RSS halfway through by more
+than `--tolerance`.
+
+Usage:
+    python scripts/soak_cache_memory.py --simulated-hours 24 --cities 200000 --requests-per-hour 20000
+"""
+import os
+import sys
+import random
+import itertools
+import logging
+import argparse
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from actions import weather_utils  # noqa: E402
+from actions.logging_config import setup_logging  # noqa: E402
+from actions.weather_models import compact_payload  # noqa: E402
+from actions.weather_payloads import decode_json  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "openweather", "forecast.json")
+MIB = 1024 * 1024
+
+
+def resident_bytes() -> int:
+    """Current RSS from /proc, or the peak RSS where /proc is not available."""
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class SimulatedClock:
+    """Clock the caches read instead of time.time, advanced by the soak loop."""
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def city_sampler(cities: int, seed: int) -> Callable[[int], List[int]]:
+    """Draw `k` city indexes at a time with Zipf-like popularity."""
+    rng = random.Random(seed)
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(cities)))
+    population = range(cities)
+    return lambda k: rng.choices(population, cum_weights=cumulative, k=k)
+
+
+def soak(args: argparse.Namespace) -> List[Dict[str, float]]:
+    """Run the simulated traffic and return one sample per simulated hour."""
+    clock = SimulatedClock(1_700_000_000.0)
+    geocodes = weather_utils.GeocodeCache()
+    observations = weather_utils.ObservationCache(clock=clock)
+    forecasts = weather_utils.ForecastCache(clock=clock)
+    with open(FIXTURE, "rb") as f:
+        raw_forecast = f.read()
+    sample = city_sampler(args.cities, args.seed)
+    step = 3600 / args.requests_per_hour
+    samples = []
+    for hour in range(args.simulated_hours):
+        for city in sample(args.requests_per_hour):
+            clock.now += step
+            name = f"Town {city}, XX"
+            lat, lon = (city % 1800) / 10 - 90, (city // 1800 % 3600) / 10 - 180
+            if geocodes.get(name) is None:
+                geocodes.put(name, weather_utils.GeocodeEntry(lat, lon, 0, city))
+            if observations.get(name, "soak") is None:
+                observations.put(name, compact_payload("current_weather", {
+                    "dt": int(clock.now), "main": {"temp": 10.0 + city % 20}, "name": name}))
+            if forecasts.get(lat, lon, "soak") is None:
+                forecasts.put(lat, lon, compact_payload("forecast", decode_json(raw_forecast)))
+        stats = {
+            "geocoding": geocodes.stats(),
+            "observations": observations.stats(),
+            "forecasts": forecasts.stats(),
+        }
+        samples.append({
+            "hour": hour + 1,
+            "rss": resident_bytes(),
+            "bytes": sum(s["bytes"] for s in stats.values()),
+            "entries": sum(s["size"] for s in stats.values()),
+            "evictions": sum(s["evictions"] for s in stats.values()),
+            "rejections": sum(s["rejections"] for s in stats.values()),
+            "forecast_hit_ratio": stats["forecasts"]["hit_ratio"],
+        })
+        current = samples[-1]
+        logger.info(f"hour {current['hour']:>3}: RSS {current['rss'] / MIB:7.1f} MiB, "
+                    f"cached {current['bytes'] / MIB:6.1f} MiB in {current['entries']} entries, "
+                    f"{current['evictions']} evictions, {current['rejections']} rejected, "
+                    f"forecast hit ratio {current['forecast_hit_ratio']:.2f}")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--simulated-hours", type=int, default=24, help="Hours of traffic to simulate")
+    parser.add_argument("--cities", type=int, default=200_000, help="Distinct synthetic cities")
+    parser.add_argument("--requests-per-hour", type=int, default=20_000, help="Lookups per simulated hour")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed RSS growth over the second half")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for the city stream")
+    args = parser.parse_args()
+
+    setup_logging()
+    samples = soak(args)
+    halfway = samples[max(0, len(samples) // 2 - 1)]["rss"]
+    final = samples[-1]["rss"]
+    growth = final / halfway - 1 if halfway else 0.0
+    logger.info(f"RSS {halfway / MIB:.1f} MiB at the halfway point, {final / MIB:.1f} MiB at the end "
+                f"({growth:+.1%}, tolerance {args.tolerance:.0%})")
+    if growth > args.tolerance:
+        logger.error("RSS kept growing after the caches filled up")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,3 +6,27 @@ def pytest_runtest_setup(item):
     if "unit" in item.nodeid:
         os.environ["OPENWEATHER_API_KEY"] = "test_api_key"
         os.environ["TIMEZONE_API_KEY"] = "test_timezone_key"
+
+@pytest.fixture(autouse=True)
+def reset_upstream_state(tmp_path):
+    """Start every test with closed circuit breakers, no remembered responses and empty response caches."""
+    from actions.weather_utils import (
+        configure_air_quality_cache, configure_circuit_breakers, configure_forecast_cache, configure_geocode_cache,
+        configure_location_store, configure_observation_cache, configure_shared_cache,
+        configure_unresolved_location_cache, configure_uv_cache
+    )
+    from actions.prewarm import configure_popularity, stop_prewarming
+    configure_circuit_breakers()
+    configure_geocode_cache()
+    configure_observation_cache()
+    configure_forecast_cache()
+    configure_air_quality_cache()
+    configure_uv_cache()
+    configure_unresolved_location_cache()
+    configure_location_store(str(tmp_path / "locations.sqlite3"))
+    configure_shared_cache("")
+    configure_popularity()
+    stop_prewarming()
+    yield
+    configure_location_store("")
+    configure_shared_cache("")
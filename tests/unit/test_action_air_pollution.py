@@ -1,4 +1,5 @@
 # tests/test_action_air_pollution.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import requests
@@ -18,7 +19,7 @@ class TestActionAirPollution:
         tracker.get_slot.return_value = None
         
         # Run the action
-        result = action.run(dispatcher, tracker, domain)
+        result = asyncio.run(action.run(dispatcher, tracker, domain))
         
         # Check that the appropriate message was sent
         dispatcher.utter_message.assert_called_once_with(
@@ -44,7 +45,7 @@ class TestActionAirPollution:
             mock_env_get.return_value = None
             
             # Run the action
-            result = action.run(dispatcher, tracker, domain)
+            result = asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the appropriate message was sent
             dispatcher.utter_message.assert_called_once_with(
@@ -63,7 +64,7 @@ class TestActionAirPollution:
         # Mock the API responses
         with patch('actions.actions_air_pollution.load_dotenv'), \
              patch('actions.actions_air_pollution.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -100,7 +101,7 @@ class TestActionAirPollution:
             tracker.get_slot.return_value = "London"
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent
             dispatcher.utter_message.assert_called_once()
@@ -120,7 +121,7 @@ class TestActionAirPollution:
         
         with patch('actions.actions_air_pollution.load_dotenv'), \
              patch('actions.actions_air_pollution.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -129,7 +130,7 @@ class TestActionAirPollution:
             mock_requests_get.return_value = geo_response
             
             tracker.get_slot.return_value = "NonExistentCity"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -145,7 +146,7 @@ class TestActionAirPollution:
         
         with patch('actions.actions_air_pollution.load_dotenv'), \
              patch('actions.actions_air_pollution.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -162,7 +163,7 @@ class TestActionAirPollution:
             mock_requests_get.side_effect = [geo_response, air_response]
             
             tracker.get_slot.return_value = "London"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -179,7 +180,7 @@ class TestActionAirPollution:
         # Mock the API responses
         with patch('actions.actions_air_pollution.load_dotenv'), \
              patch('actions.actions_air_pollution.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -215,7 +216,7 @@ class TestActionAirPollution:
             tracker.get_slot.return_value = "London"
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent with the correct pollutant values
             dispatcher.utter_message.assert_called_once()
@@ -1,9 +1,12 @@
 # tests/test_action_air_pollution_forecast.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
 import requests
 from actions.actions_air_pollution_forecast import ActionGetAirPollutionForecast
+from actions.weather_payloads import materialize_air_quality_series
+from actions.weather_utils import clear_geocodes, configure_air_quality_cache
 
 class TestActionAirPollutionForecast:
     """Tests for the ActionGetAirPollutionForecast class."""
@@ -19,7 +22,7 @@ class TestActionAirPollutionForecast:
         tracker.get_slot.return_value = None
         
         # Run the action
-        result = action.run(dispatcher, tracker, domain)
+        result = asyncio.run(action.run(dispatcher, tracker, domain))
         
         # Check that the appropriate message was sent
         dispatcher.utter_message.assert_called_once_with(
@@ -45,7 +48,7 @@ class TestActionAirPollutionForecast:
             mock_env_get.return_value = None
             
             # Run the action
-            result = action.run(dispatcher, tracker, domain)
+            result = asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the appropriate message was sent
             dispatcher.utter_message.assert_called_once_with(
@@ -64,7 +67,7 @@ class TestActionAirPollutionForecast:
         # Mock the API responses
         with patch('actions.actions_air_pollution_forecast.load_dotenv'), \
              patch('actions.actions_air_pollution_forecast.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution_forecast.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions_air_pollution_forecast.datetime') as mock_datetime:
             
             # Set up datetime mock
@@ -126,7 +129,7 @@ class TestActionAirPollutionForecast:
             tracker.get_slot.return_value = "London"
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent
             dispatcher.utter_message.assert_called_once()
@@ -147,7 +150,7 @@ class TestActionAirPollutionForecast:
         
         with patch('actions.actions_air_pollution_forecast.load_dotenv'), \
              patch('actions.actions_air_pollution_forecast.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution_forecast.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -165,7 +168,7 @@ class TestActionAirPollutionForecast:
             mock_requests_get.side_effect = [geo_response, forecast_response]
             
             tracker.get_slot.return_value = "London"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -181,7 +184,7 @@ class TestActionAirPollutionForecast:
         
         with patch('actions.actions_air_pollution_forecast.load_dotenv'), \
              patch('actions.actions_air_pollution_forecast.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution_forecast.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -198,7 +201,7 @@ class TestActionAirPollutionForecast:
             mock_requests_get.side_effect = [geo_response, forecast_response]
             
             tracker.get_slot.return_value = "London"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -214,7 +217,7 @@ class TestActionAirPollutionForecast:
         
         with patch('actions.actions_air_pollution_forecast.load_dotenv'), \
              patch('actions.actions_air_pollution_forecast.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution_forecast.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -223,7 +226,7 @@ class TestActionAirPollutionForecast:
             mock_requests_get.return_value = geo_response
             
             tracker.get_slot.return_value = "NonExistentLocation"
-            result = action.run(dispatcher, tracker, domain)
+            result = asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once_with(
@@ -242,7 +245,7 @@ class TestActionAirPollutionForecast:
         # Mock the API responses
         with patch('actions.actions_air_pollution_forecast.load_dotenv'), \
              patch('actions.actions_air_pollution_forecast.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution_forecast.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions_air_pollution_forecast.datetime') as mock_datetime:
             
             # Set up datetime mock
@@ -309,7 +312,7 @@ class TestActionAirPollutionForecast:
             tracker.get_slot.return_value = "London"
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent with the most common AQI (2 - Fair)
             dispatcher.utter_message.assert_called_once()
@@ -342,7 +345,7 @@ class TestActionAirPollutionForecast:
     
     @patch('actions.actions_air_pollution_forecast.load_dotenv')
     @patch('actions.actions_air_pollution_forecast.os.environ.get')
-    @patch('actions.actions_air_pollution_forecast.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions_air_pollution_forecast.datetime')
     def test_aqi_level_mapping(self, mock_datetime, mock_get, mock_env_get, mock_load_dotenv):
         """Test AQI level mapping """
@@ -371,7 +374,9 @@ class TestActionAirPollutionForecast:
             {"aqi": 5, "expected_level": "Very Poor", "expected_desc": "Health warnings of emergency conditions"}
         ]
         
+        configure_air_quality_cache(ttl=0)  # each case serves London a new forecast
         for test_case in aqi_test_cases:
+            clear_geocodes()  # each case geocodes London afresh
             # Reset mocks
             mock_get.reset_mock()
             self.dispatcher.reset_mock()
@@ -401,7 +406,7 @@ class TestActionAirPollutionForecast:
             self.tracker.get_slot.return_value = "London"
             
             # Run the action
-            self.action.run(self.dispatcher, self.tracker, self.domain)
+            asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
             
             # Check the message contains the expected level and description
             message = self.dispatcher.utter_message.call_args[1]['text']
@@ -410,7 +415,7 @@ class TestActionAirPollutionForecast:
     
     @patch('actions.actions_air_pollution_forecast.load_dotenv')
     @patch('actions.actions_air_pollution_forecast.os.environ.get')
-    @patch('actions.actions_air_pollution_forecast.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_no_forecast_data_handling(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test handling of missing forecast data """
         # Setup mocks
@@ -433,7 +438,7 @@ class TestActionAirPollutionForecast:
         self.tracker.get_slot.return_value = "London"
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -441,7 +446,7 @@ class TestActionAirPollutionForecast:
     
     @patch('actions.actions_air_pollution_forecast.load_dotenv')
     @patch('actions.actions_air_pollution_forecast.os.environ.get')
-    @patch('actions.actions_air_pollution_forecast.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_api_error_handling(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test API error handling (related to lines 115-120)."""
         # Setup mocks
@@ -463,8 +468,71 @@ class TestActionAirPollutionForecast:
         self.tracker.get_slot.return_value = "London"
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
         assert "couldn't fetch the air quality forecast" in message.lower()
+
+    @patch('actions.actions_air_pollution_forecast.load_dotenv')
+    @patch('actions.actions_air_pollution_forecast.os.environ.get')
+    @patch('actions.fetch_planner.async_http_get')
+    @patch('actions.actions_air_pollution_forecast.datetime')
+    def test_other_days_from_cached_series(self, mock_datetime, mock_get, mock_env_get, mock_load_dotenv):
+        """Any day the forecast covers is answered from the cached series, in the city's local time."""
+        mock_env_get.return_value = "fake_api_key"
+        # Friday 2023-07-14, 23:30 UTC: already Saturday in a city at UTC+2
+        mock_datetime.datetime.now.return_value = datetime.datetime(2023, 7, 14, 23, 30)
+        geo_response = MagicMock(status_code=200)
+        geo_response.json.return_value = {"coord": {"lat": 37.98, "lon": 23.73}, "timezone": 7200}
+        start = int(datetime.datetime(2023, 7, 14, 22, 0).timestamp())
+        pollution_response = MagicMock(status_code=200)
+        pollution_response.json.return_value = {"list": [
+            {"dt": start + hour * 3600, "main": {"aqi": 1 + hour // 24}, "components": {"pm2_5": 4.0, "pm10": 7.0}}
+            for hour in range(96)
+        ]}
+        mock_get.side_effect = [geo_response, pollution_response]
+
+        messages = []
+        for time_period in ("today", "Monday", None):
+            self.dispatcher.reset_mock()
+            self.tracker.get_slot.side_effect = {"location": "Athens", "time_period": time_period}.get
+            asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
+            messages.append(self.dispatcher.utter_message.call_args[1]['text'])
+
+        assert mock_get.call_count == 2  # the geocode and the forecast, once
+        assert "Athens today (Saturday, July 15) is Good (AQI: 1)" in messages[0]
+        assert "Athens on Monday (Monday, July 17) is Moderate (AQI: 3)" in messages[1]
+        assert "Athens tomorrow (Sunday, July 16) is Fair (AQI: 2)" in messages[2]
+        assert "NO₂: 0.0" in messages[2]  # not reported
+
+    @patch('actions.actions_air_pollution_forecast.load_dotenv')
+    @patch('actions.actions_air_pollution_forecast.os.environ.get')
+    @patch('actions.fetch_planner.async_http_get')
+    @patch('actions.actions_air_pollution_forecast.datetime')
+    def test_cached_at_location_offset(self, mock_datetime, mock_get, mock_env_get, mock_load_dotenv):
+        """A forecast for a city in another timezone is reduced once, at the city's offset, not again per turn."""
+        mock_env_get.return_value = "fake_api_key"
+        mock_datetime.datetime.now.return_value = datetime.datetime(2023, 7, 14, 10, 0)
+        geo_response = MagicMock(status_code=200)
+        geo_response.json.return_value = {"coord": {"lat": 35.68, "lon": 139.69}, "timezone": 32400}
+        start = int(datetime.datetime(2023, 7, 14, 0, 0).timestamp())
+        pollution_response = MagicMock(status_code=200)
+        pollution_response.json.return_value = {"list": [
+            {"dt": start + hour * 3600, "main": {"aqi": 2}, "components": {"pm2_5": 4.0}} for hour in range(96)
+        ]}
+        mock_get.side_effect = [geo_response, pollution_response]
+        self.tracker.get_slot.side_effect = {"location": "Tokyo", "time_period": None}.get
+
+        with patch('actions.weather_utils.materialize_air_quality_series',
+                   wraps=materialize_air_quality_series) as cached, \
+             patch('actions.weather_payloads.materialize_air_quality_series',
+                   wraps=materialize_air_quality_series) as rematerialized:
+            for _ in range(2):
+                self.dispatcher.reset_mock()
+                asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
+                assert "Tokyo tomorrow" in self.dispatcher.utter_message.call_args[1]['text']
+
+        assert cached.call_count == 1
+        assert cached.call_args[1]["utc_offset"] == 32400
+        assert rematerialized.call_count == 0
@@ -1,9 +1,11 @@
 # tests/test_action_fetch_weather_forecast.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
 import requests
 from actions.actions import ActionFetchWeatherForecast
+from actions.weather_utils import CircuitOpenError, clear_geocodes, configure_forecast_cache, configure_uv_cache
 
 class TestActionFetchWeatherForecast:
     """Tests for the ActionFetchWeatherForecast class."""
@@ -18,7 +20,7 @@ class TestActionFetchWeatherForecast:
         # Mock the API responses
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions.datetime') as mock_datetime:
             
             # Set up datetime mock
@@ -63,7 +65,7 @@ class TestActionFetchWeatherForecast:
             tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 1
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent
             dispatcher.utter_message.assert_called_once()
@@ -75,6 +77,50 @@ class TestActionFetchWeatherForecast:
             assert "UV index: 5.2" in message
             assert "Moderate" in message  # UV 5.2 = Moderate
     
+    def test_forecast_when_uv_circuit_open(self):
+        """The forecast is still given when the UV forecast endpoint fails fast."""
+        action = ActionFetchWeatherForecast()
+        dispatcher = MagicMock()
+        tracker = MagicMock()
+        
+        with patch('actions.actions.load_dotenv'), \
+             patch('actions.actions.os.environ.get') as mock_env_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
+             patch('actions.actions.datetime') as mock_datetime:
+            
+            today = datetime.datetime(2023, 6, 15, 12, 0, 0)
+            mock_datetime.datetime.now.return_value = today
+            mock_datetime.datetime.fromtimestamp.side_effect = lambda x: datetime.datetime.fromtimestamp(x)
+            mock_env_get.return_value = "fake_api_key"
+            
+            geo_response = MagicMock(status_code=200)
+            geo_response.json.return_value = {"coord": {"lat": 51.5074, "lon": -0.1278}}
+            forecast_response = MagicMock(status_code=200)
+            forecast_response.json.return_value = {
+                "list": [
+                    {
+                        "dt": int(today.timestamp()),
+                        "main": {"temp": 22.5},
+                        "weather": [{"description": "clear sky"}]
+                    }
+                ]
+            }
+            
+            def mock_get_side_effect(url, timeout):
+                if "uvi/forecast" in url:
+                    raise CircuitOpenError("Circuit for uv_forecast is open, retry in 30s")
+                return forecast_response if "forecast" in url else geo_response
+            
+            mock_requests_get.side_effect = mock_get_side_effect
+            tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 1
+            
+            asyncio.run(action.run(dispatcher, tracker, MagicMock()))
+            
+            message = dispatcher.utter_message.call_args[1]['text']
+            assert "Weather forecast for London" in message
+            assert "22.5°C" in message
+            assert "UV index" not in message
+    
     def test_forecast_without_uv_data(self):
         """Test forecast without UV data."""
         action = ActionFetchWeatherForecast()
@@ -85,7 +131,7 @@ class TestActionFetchWeatherForecast:
         # Mock the API responses
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions.datetime') as mock_datetime:
             
             # Set up datetime mock
@@ -132,7 +178,7 @@ class TestActionFetchWeatherForecast:
             tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 2
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent
             dispatcher.utter_message.assert_called_once()
@@ -160,13 +206,16 @@ class TestActionFetchWeatherForecast:
             (10, 3)  # Integer exceeding max (should be capped at 3)
         ]
         
+        configure_forecast_cache(max_entries=0)  # each case serves London a new forecast
+        configure_uv_cache(ttl=0)
         for days_input, expected_days in test_cases:
+            clear_geocodes()  # each case geocodes London afresh
             # Reset mocks
             dispatcher.reset_mock()
             
             with patch('actions.actions.load_dotenv'), \
                  patch('actions.actions.os.environ.get') as mock_env_get, \
-                 patch('actions.actions.requests.get') as mock_requests_get, \
+                 patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
                  patch('actions.actions.datetime') as mock_datetime:
                 
                 # Set up datetime mock
@@ -208,9 +257,76 @@ class TestActionFetchWeatherForecast:
                 tracker.get_slot.side_effect = lambda name: "London" if name == "location" else days_input
                 
                 # Run the action
-                action.run(dispatcher, tracker, domain)
+                asyncio.run(action.run(dispatcher, tracker, domain))
                 
                 # Check that the message was sent with correct number of days
                 dispatcher.utter_message.assert_called_once()
                 message = dispatcher.utter_message.call_args[1]['text']
-                assert f"Weather forecast for London for the next {expected_days} day(s)" in message
\ No newline at end of file
+                assert f"Weather forecast for London for the next {expected_days} day(s)" in message
+    def test_later_day_without_noon_entry_skipped(self):
+        """A later day with no entry around noon is left out; today falls back to its first entry."""
+        action = ActionFetchWeatherForecast()
+        dispatcher = MagicMock()
+        tracker = MagicMock()
+
+        with patch('actions.actions.load_dotenv'), \
+             patch('actions.actions.os.environ.get', return_value="fake_api_key"), \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
+             patch('actions.actions.datetime') as mock_datetime:
+            today = datetime.datetime(2023, 6, 15, 15, 0, 0)
+            mock_datetime.datetime.now.return_value = today
+            mock_datetime.datetime.fromtimestamp.side_effect = lambda x: datetime.datetime.fromtimestamp(x)
+
+            geo_response = MagicMock(status_code=200)
+            geo_response.json.return_value = {"coord": {"lat": 51.5074, "lon": -0.1278}}
+            forecast_response = MagicMock(status_code=200)
+            forecast_response.json.return_value = {"list": [
+                {"dt": int(today.timestamp()), "main": {"temp": 22.5}, "weather": [{"description": "clear sky"}]},
+                {"dt": int((today + datetime.timedelta(hours=12)).timestamp()), "main": {"temp": 11.0},
+                 "weather": [{"description": "mist"}]},
+                {"dt": int((today + datetime.timedelta(hours=45)).timestamp()), "main": {"temp": 25.0},
+                 "weather": [{"description": "few clouds"}]},
+            ]}
+            uv_response = MagicMock(status_code=200)
+            uv_response.json.return_value = []
+            mock_requests_get.side_effect = [geo_response, forecast_response, uv_response]
+            tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 3
+
+            asyncio.run(action.run(dispatcher, tracker, {}))
+
+        message = dispatcher.utter_message.call_args[1]['text']
+        assert "clear sky, temperature around 22.5°C" in message
+        assert "mist" not in message  # tomorrow only has a 03:00 entry
+        assert "few clouds, temperature around 25.0°C" in message
+
+    def test_uv_keyed_by_city_date(self):
+        """UV readings are matched to forecast days by the city's local date, not the server's."""
+        action = ActionFetchWeatherForecast()
+        dispatcher = MagicMock()
+        tracker = MagicMock()
+        # 23:00 UTC on June 14 is 13:00 on June 15 in Kiritimati (UTC+14)
+        timestamp = int(datetime.datetime(2023, 6, 14, 23, 0, tzinfo=datetime.timezone.utc).timestamp())
+
+        with patch('actions.actions.load_dotenv'), \
+             patch('actions.actions.os.environ.get', return_value="fake_api_key"), \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
+             patch('actions.actions.datetime') as mock_datetime:
+            mock_datetime.datetime.now.return_value = datetime.datetime.fromtimestamp(timestamp)
+
+            geo_response = MagicMock(status_code=200)
+            geo_response.json.return_value = {"coord": {"lat": 1.87, "lon": -157.43}}
+            forecast_response = MagicMock(status_code=200)
+            forecast_response.json.return_value = {
+                "city": {"timezone": 14 * 3600},
+                "list": [{"dt": timestamp, "main": {"temp": 28.0}, "weather": [{"description": "light rain"}]}],
+            }
+            uv_response = MagicMock(status_code=200)
+            uv_response.json.return_value = [{"date": timestamp, "value": 11.3}]
+            mock_requests_get.side_effect = [geo_response, forecast_response, uv_response]
+            tracker.get_slot.side_effect = lambda name: "Kiritimati" if name == "location" else 1
+
+            asyncio.run(action.run(dispatcher, tracker, {}))
+
+        message = dispatcher.utter_message.call_args[1]['text']
+        assert "Thursday, June 15 (Today): light rain" in message
+        assert "UV index: 11.3" in message
@@ -1,4 +1,5 @@
 # tests/test_action_get_air_pollution.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import requests
@@ -17,7 +18,7 @@ class TestActionGetAirPollution:
         # Mock the API responses
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -54,7 +55,7 @@ class TestActionGetAirPollution:
             tracker.get_slot.return_value = "London"
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent
             dispatcher.utter_message.assert_called_once()
@@ -76,7 +77,7 @@ class TestActionGetAirPollution:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -85,7 +86,7 @@ class TestActionGetAirPollution:
             mock_requests_get.return_value = geo_response
             
             tracker.get_slot.return_value = "NonExistentCity"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -101,7 +102,7 @@ class TestActionGetAirPollution:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -118,7 +119,7 @@ class TestActionGetAirPollution:
             mock_requests_get.side_effect = [geo_response, air_response]
             
             tracker.get_slot.return_value = "London"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -134,7 +135,7 @@ class TestActionGetAirPollution:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -154,7 +155,7 @@ class TestActionGetAirPollution:
             mock_requests_get.side_effect = [geo_response, air_response]
             
             tracker.get_slot.return_value = "London"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -1,9 +1,11 @@
 # tests/test_action_get_uv_index_forecast.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
 import requests
 from actions.actions import ActionGetUVIndexForecast
+from actions.weather_utils import clear_geocodes
 
 class TestActionGetUVIndexForecast:
     """Tests for the ActionGetUVIndexForecast class."""
@@ -18,7 +20,7 @@ class TestActionGetUVIndexForecast:
         # Mock the API responses
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions.datetime') as mock_datetime:
             
             # Set up datetime mock
@@ -58,7 +60,7 @@ class TestActionGetUVIndexForecast:
             tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 1
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent
             dispatcher.utter_message.assert_called_once()
@@ -78,7 +80,7 @@ class TestActionGetUVIndexForecast:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -99,7 +101,7 @@ class TestActionGetUVIndexForecast:
             tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 1
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -115,7 +117,7 @@ class TestActionGetUVIndexForecast:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -135,7 +137,7 @@ class TestActionGetUVIndexForecast:
             tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 1
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -158,12 +160,13 @@ class TestActionGetUVIndexForecast:
         ]
         
         for days_input, expected_days in test_cases:
+            clear_geocodes()  # each case geocodes London afresh
             # Reset mocks
             dispatcher.reset_mock()
             
             with patch('actions.actions.load_dotenv'), \
                  patch('actions.actions.os.environ.get') as mock_env_get, \
-                 patch('actions.actions.requests.get') as mock_requests_get:
+                 patch('actions.fetch_planner.async_http_get') as mock_requests_get:
                 
                 mock_env_get.return_value = "fake_api_key"
                 
@@ -194,7 +197,7 @@ class TestActionGetUVIndexForecast:
                 tracker.get_slot.side_effect = lambda name: "London" if name == "location" else days_input
                 
                 # Run the action
-                action.run(dispatcher, tracker, domain)
+                asyncio.run(action.run(dispatcher, tracker, domain))
                 
                 # Check that the message was sent
                 dispatcher.utter_message.assert_called_once()
@@ -1,5 +1,6 @@
 """Unit tests for Rasa custom actions that handle weather, time, and random facts."""
 
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock
 import datetime
@@ -9,6 +10,7 @@ from actions.actions import (
     ActionFetchWeatherForecast, ActionGetLocalTime, ActionGetHumidity,
     ActionGetUVIndex, ActionGetUVIndexForecast
 )
+from actions.weather_utils import clear_geocodes, configure_uv_cache
 
 # Test data constants
 FORECAST_RESPONSE = {
@@ -71,7 +73,7 @@ class TestActionRandomFact(unittest.TestCase):
     
     def test_run(self):
         """Verify random fact is selected and returned."""
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once()
         
         facts = [
@@ -93,7 +95,7 @@ class TestActionCompareWeather(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     @patch('actions.actions.datetime')
     def test_run_with_location_warmer(self, mock_datetime, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test weather comparison when temperature is warmer than average."""
@@ -108,7 +110,7 @@ class TestActionCompareWeather(unittest.TestCase):
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "London"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         mock_requests_get.assert_called_once()
         self.assertIn("London", mock_requests_get.call_args[0][0])
@@ -120,13 +122,13 @@ class TestActionCompareWeather(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of API errors."""
         mock_requests_get.side_effect = requests.exceptions.RequestException()
         self.tracker.get_slot.return_value = "London"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once()
         self.assertIn("sorry", self.dispatcher.utter_message.call_args[1]['text'].lower())
 
@@ -141,7 +143,7 @@ class TestActionFetchWeather(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.weather_utils.async_http_get')
     def test_run_with_location(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test successful weather fetch for a location."""
         mock_env_get.return_value = "fake_api_key"
@@ -150,7 +152,7 @@ class TestActionFetchWeather(unittest.TestCase):
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "Paris"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         mock_requests_get.assert_called_once()
         self.assertIn("Paris", mock_requests_get.call_args[0][0])
@@ -165,7 +167,7 @@ class TestActionFetchWeather(unittest.TestCase):
     def test_run_without_location(self, mock_env_get, mock_load_dotenv):
         """Test handling of missing location."""
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="I couldn't find the location. Could you please provide it?"
         )
@@ -176,14 +178,14 @@ class TestActionFetchWeather(unittest.TestCase):
         """Test handling of missing API key."""
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "Paris"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="Weather service is currently unavailable."
         )
         
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.weather_utils.async_http_get')
     def test_run_with_api_error_status(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of API error status."""
         mock_env_get.return_value = "fake_api_key"
@@ -191,7 +193,7 @@ class TestActionFetchWeather(unittest.TestCase):
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "NonExistentCity"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         self.dispatcher.utter_message.assert_called_once()
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -208,7 +210,7 @@ class TestActionGetLocalTime(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions.datetime')
     def test_run_with_location_timezone_api(self, mock_datetime, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test successful timezone fetch using timezone API."""
@@ -230,7 +232,7 @@ class TestActionGetLocalTime(unittest.TestCase):
         mock_requests_get.side_effect = [weather_response, timezone_response]
         self.tracker.get_slot.return_value = "London"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         self.assertEqual(mock_requests_get.call_count, 2)
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -240,7 +242,7 @@ class TestActionGetLocalTime(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions.datetime')
     def test_timezone_api_fallback(self, mock_datetime, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test fallback to timezone offset when timezone API is not available."""
@@ -256,7 +258,7 @@ class TestActionGetLocalTime(unittest.TestCase):
         mock_requests_get.return_value = weather_response
         self.tracker.get_slot.return_value = "London"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Should fall back to using timezone offset
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -266,19 +268,19 @@ class TestActionGetLocalTime(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of API errors."""
         mock_requests_get.side_effect = requests.exceptions.RequestException()
         self.tracker.get_slot.return_value = "London"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once()
         self.assertIn("sorry", self.dispatcher.utter_message.call_args[1]['text'].lower())
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions.datetime')
     def test_timezone_api_error(self, mock_datetime, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of timezone API errors."""
@@ -294,7 +296,7 @@ class TestActionGetLocalTime(unittest.TestCase):
         mock_requests_get.return_value = weather_response
         self.tracker.get_slot.return_value = "London"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Should fall back to using timezone offset
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -314,7 +316,7 @@ class TestActionFetchWeatherForecast(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_run_with_location_and_uv_index(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test successful forecast fetch with UV index for a location."""
         
@@ -358,7 +360,7 @@ class TestActionFetchWeatherForecast(unittest.TestCase):
         mock_requests_get.side_effect = [geo_response, forecast_response, uv_response]
         
         self.tracker.get_slot.return_value = "Tokyo"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that all three API calls were made
         self.assertEqual(mock_requests_get.call_count, 3)
@@ -374,7 +376,7 @@ class TestActionFetchWeatherForecast(unittest.TestCase):
         
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_run_with_location_without_uv_data(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test forecast fetch when UV data is unavailable."""
         
@@ -406,7 +408,7 @@ class TestActionFetchWeatherForecast(unittest.TestCase):
         mock_requests_get.side_effect = [geo_response, forecast_response, uv_response]
         
         self.tracker.get_slot.return_value = "Tokyo"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that all three API calls were made
         self.assertEqual(mock_requests_get.call_count, 3)
@@ -424,7 +426,7 @@ class TestActionFetchWeatherForecast(unittest.TestCase):
         """Test handling of missing API key."""
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "Tokyo"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="Weather forecast service is currently unavailable."
         )
@@ -434,26 +436,26 @@ class TestActionFetchWeatherForecast(unittest.TestCase):
     def test_run_without_location(self, mock_env_get, mock_load_dotenv):
         """Test handling of missing location."""
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="I couldn't find the location. Could you please provide it?"
         )
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of API errors."""
         mock_requests_get.side_effect = requests.exceptions.RequestException()
         self.tracker.get_slot.return_value = "Tokyo"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once()
         self.assertIn("sorry", self.dispatcher.utter_message.call_args[1]['text'].lower())
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_run_with_invalid_days(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of invalid days parameter."""
         mock_env_get.return_value = "fake_api_key"
@@ -486,7 +488,7 @@ class TestActionFetchWeatherForecast(unittest.TestCase):
         # Set up invalid days value
         self.tracker.get_slot.side_effect = lambda name: "Tokyo" if name == "location" else "invalid" if name == "days" else None
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the message contains "3 day(s)" since invalid days should default to 3
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -504,7 +506,7 @@ class TestActionGetHumidity(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_run_with_location(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test successful humidity fetch for a location."""
         mock_env_get.return_value = "fake_api_key"
@@ -515,7 +517,7 @@ class TestActionGetHumidity(unittest.TestCase):
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "Berlin"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         mock_requests_get.assert_called_once()
         self.assertIn("Berlin", mock_requests_get.call_args[0][0])
@@ -529,20 +531,20 @@ class TestActionGetHumidity(unittest.TestCase):
     def test_run_without_location(self, mock_env_get, mock_load_dotenv):
         """Test handling of missing location."""
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="I couldn't find the location. Could you please provide it?"
         )
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of API errors."""
         mock_requests_get.side_effect = requests.exceptions.RequestException()
         self.tracker.get_slot.return_value = "Berlin"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once()
         self.assertIn("sorry", self.dispatcher.utter_message.call_args[1]['text'].lower())
 
@@ -558,7 +560,7 @@ class TestActionGetUVIndex(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_run_with_location(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test successful UV index fetch for a location."""
         mock_env_get.return_value = "fake_api_key"
@@ -579,7 +581,7 @@ class TestActionGetUVIndex(unittest.TestCase):
         mock_requests_get.side_effect = [geo_response, uv_response]
         
         self.tracker.get_slot.return_value = "Miami"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that both API calls were made
         self.assertEqual(mock_requests_get.call_count, 2)
@@ -593,7 +595,7 @@ class TestActionGetUVIndex(unittest.TestCase):
         
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_uv_api_error_status(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of UV API error status."""
         mock_env_get.return_value = "fake_api_key"
@@ -611,7 +613,7 @@ class TestActionGetUVIndex(unittest.TestCase):
         mock_requests_get.side_effect = [geo_response, uv_response]
         
         self.tracker.get_slot.return_value = "Miami"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -619,7 +621,7 @@ class TestActionGetUVIndex(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_uv_level_categorization(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test UV index level categorization."""
         mock_env_get.return_value = "fake_api_key"
@@ -633,7 +635,9 @@ class TestActionGetUVIndex(unittest.TestCase):
             {"value": 11.5, "expected_level": "Extreme", "expected_advice": "Take all precautions"}
         ]
         
+        configure_uv_cache(ttl=0)  # each case serves London a new UV index
         for test_case in uv_test_cases:
+            clear_geocodes()  # each case geocodes London afresh
             # Reset mocks
             mock_requests_get.reset_mock()
             self.dispatcher.reset_mock()
@@ -654,7 +658,7 @@ class TestActionGetUVIndex(unittest.TestCase):
             mock_requests_get.side_effect = [geo_response, uv_response]
             
             self.tracker.get_slot.return_value = "TestCity"
-            self.action.run(self.dispatcher, self.tracker, self.domain)
+            asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
             
             # Check the message content for expected level and advice
             message = self.dispatcher.utter_message.call_args[1]['text']
@@ -664,19 +668,19 @@ class TestActionGetUVIndex(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of API errors."""
         mock_requests_get.side_effect = requests.exceptions.RequestException()
         self.tracker.get_slot.return_value = "Miami"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once()
         self.assertIn("sorry", self.dispatcher.utter_message.call_args[1]['text'].lower())
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_uv_api_error_status(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of UV API error status."""
         mock_env_get.return_value = "fake_api_key"
@@ -694,7 +698,7 @@ class TestActionGetUVIndex(unittest.TestCase):
         mock_requests_get.side_effect = [geo_response, uv_response]
         
         self.tracker.get_slot.return_value = "Miami"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -714,7 +718,7 @@ class TestActionGetUVIndexForecast(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions.datetime')
     def test_run_with_location_tomorrow(self, mock_datetime, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test successful UV index forecast for tomorrow."""
@@ -742,7 +746,7 @@ class TestActionGetUVIndexForecast(unittest.TestCase):
         # Default to tomorrow (days=1)
         self.tracker.get_slot.side_effect = lambda name: "Miami" if name == "location" else None
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that both API calls were made
         self.assertEqual(mock_requests_get.call_count, 2)
@@ -757,7 +761,7 @@ class TestActionGetUVIndexForecast(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions.datetime')
     def test_run_with_specific_days(self, mock_datetime, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test UV index forecast for a specific number of days ahead."""
@@ -785,7 +789,7 @@ class TestActionGetUVIndexForecast(unittest.TestCase):
         # Request 2 days ahead
         self.tracker.get_slot.side_effect = lambda name: "Miami" if name == "location" else 2 if name == "days" else None
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the message content
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -796,30 +800,30 @@ class TestActionGetUVIndexForecast(unittest.TestCase):
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_run_without_location(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of missing location."""
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="I couldn't find the location. Could you please provide it?"
         )
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of API errors."""
         mock_requests_get.side_effect = requests.exceptions.RequestException()
         self.tracker.get_slot.return_value = "Miami"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once()
         self.assertIn("sorry", self.dispatcher.utter_message.call_args[1]['text'].lower())
 
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_no_forecast_data(self, mock_requests_get, mock_env_get, mock_load_dotenv):
         """Test handling of missing forecast data."""
         mock_env_get.return_value = "fake_api_key"
@@ -838,7 +842,7 @@ class TestActionGetUVIndexForecast(unittest.TestCase):
         mock_requests_get.side_effect = [geo_response, uv_response]
         
         self.tracker.get_slot.return_value = "Miami"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -1,4 +1,5 @@
 # tests/test_actions_air_pollution.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import requests
@@ -45,7 +46,7 @@ class TestActionGetAirPollution:
     
     @patch('actions.actions_air_pollution.load_dotenv')
     @patch('actions.actions_air_pollution.os.environ.get')
-    @patch('actions.actions_air_pollution.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_run_with_valid_data(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetAirPollution run method with valid data."""
         # Setup mocks
@@ -81,7 +82,7 @@ class TestActionGetAirPollution:
         self.tracker.get_slot.return_value = "London"
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the message contains the expected level and description
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -91,7 +92,7 @@ class TestActionGetAirPollution:
     
     @patch('actions.actions_air_pollution.load_dotenv')
     @patch('actions.actions_air_pollution.os.environ.get')
-    @patch('actions.actions_air_pollution.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_run_with_api_error(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetAirPollution run method with API error."""
         # Setup mocks
@@ -102,7 +103,7 @@ class TestActionGetAirPollution:
         self.tracker.get_slot.return_value = "London"
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
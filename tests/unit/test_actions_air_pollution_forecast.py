@@ -1,4 +1,5 @@
 # tests/test_actions_air_pollution_forecast.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
@@ -31,7 +32,7 @@ class TestActionGetAirPollutionForecast:
     # Test for lines 115-120 (ActionGetAirPollutionForecast no forecast data handling)
     @patch('actions.actions_air_pollution_forecast.load_dotenv')
     @patch('actions.actions_air_pollution_forecast.os.environ.get')
-    @patch('actions.actions_air_pollution_forecast.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_no_forecast_data_handling(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test handling of missing forecast data """
         # Setup mocks
@@ -54,7 +55,7 @@ class TestActionGetAirPollutionForecast:
         self.tracker.get_slot.return_value = "London"
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -74,7 +75,7 @@ class TestActionGetAirPollutionForecast:
     # Test for successful forecast with valid data
     @patch('actions.actions_air_pollution_forecast.load_dotenv')
     @patch('actions.actions_air_pollution_forecast.os.environ.get')
-    @patch('actions.actions_air_pollution_forecast.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions_air_pollution_forecast.datetime')
     def test_run_with_valid_forecast_data(self, mock_datetime, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetAirPollutionForecast run method with valid forecast data."""
@@ -119,7 +120,7 @@ class TestActionGetAirPollutionForecast:
         self.tracker.get_slot.return_value = "London"
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the message contains the expected level and description
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -1,4 +1,5 @@
 # tests/test_actions_comprehensive.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
@@ -22,7 +23,7 @@ class TestActionsComprehensive:
     def test_action_random_fact_run(self):
         """Test ActionRandomFact run method """
         action = ActionRandomFact()
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that a fact was returned
         self.dispatcher.utter_message.assert_called_once()
@@ -45,7 +46,7 @@ class TestActionsComprehensive:
     # Test for lines 118-119 (ActionCompareWeather error handling)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_action_compare_weather_api_error(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionCompareWeather API error handling """
         action = ActionCompareWeather()
@@ -53,7 +54,7 @@ class TestActionsComprehensive:
         mock_get.side_effect = requests.exceptions.RequestException("Connection error")
         
         self.tracker.get_slot.return_value = "London"
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -63,7 +64,7 @@ class TestActionsComprehensive:
     # Test for lines 220-222 (ActionFetchWeatherForecast days validation)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_action_fetch_weather_forecast_days_validation(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionFetchWeatherForecast days validation """
         action = ActionFetchWeatherForecast()
@@ -84,7 +85,7 @@ class TestActionsComprehensive:
         # Test with string days value
         self.tracker.get_slot.side_effect = lambda name: "London" if name == "location" else "5" if name == "days" else None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that days was limited to 3
         # This is hard to test directly, but we can verify the API was called
@@ -102,7 +103,7 @@ class TestActionsComprehensive:
         action = ActionGetUVIndex()
         self.tracker.get_slot.return_value = None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -121,7 +122,7 @@ class TestActionsComprehensive:
         action = ActionGetTemperatureRange()
         self.tracker.get_slot.return_value = None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -137,7 +138,7 @@ class TestActionsComprehensive:
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "London"
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -147,7 +148,7 @@ class TestActionsComprehensive:
     # Test for lines 375-376 (ActionGetTemperatureRange today's temperature min)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_action_get_temperature_range_today_min(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetTemperatureRange today's min temperature """
         action = ActionGetTemperatureRange()
@@ -172,7 +173,7 @@ class TestActionsComprehensive:
         }.get(name)
         
         # Run the action
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the response
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -183,7 +184,7 @@ class TestActionsComprehensive:
     # Test for lines 397-398 (ActionGetTemperatureRange API error)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_action_get_temperature_range_api_error(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetTemperatureRange API error handling """
         action = ActionGetTemperatureRange()
@@ -196,7 +197,7 @@ class TestActionsComprehensive:
             "temp_type": "range"
         }.get(name)
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -212,7 +213,7 @@ class TestActionsComprehensive:
     # Test for lines 486-487 (ActionGetUVIndexForecast days validation)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_action_get_uv_index_forecast_days_validation(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetUVIndexForecast days validation """
         action = ActionGetUVIndexForecast()
@@ -230,7 +231,7 @@ class TestActionsComprehensive:
         # Test with string days value
         self.tracker.get_slot.side_effect = lambda name: "London" if name == "location" else "6" if name == "days" else None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that days was limited to 5
         # This is hard to test directly, but we can verify the API was called
@@ -242,7 +243,7 @@ class TestActionsComprehensive:
         action = ActionGetUVIndexForecast()
         self.tracker.get_slot.return_value = None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -307,7 +308,7 @@ class TestActionsComprehensive:
         action = ActionGetHumidity()
         self.tracker.get_slot.return_value = None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -324,7 +325,7 @@ class TestActionsComprehensive:
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "London"
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -334,7 +335,7 @@ class TestActionsComprehensive:
     # Test for lines 730-731 (ActionGetHumidity API error)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_action_get_humidity_api_error(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetHumidity API error handling """
         from actions.actions import ActionGetHumidity
@@ -343,7 +344,7 @@ class TestActionsComprehensive:
         mock_get.side_effect = requests.exceptions.RequestException("Connection error")
         
         self.tracker.get_slot.return_value = "London"
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -1,4 +1,5 @@
 # tests/test_actions_coverage.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
@@ -27,7 +28,7 @@ class TestActionsCoverage:
     # Test for lines 51-53 (ActionFetchWeather error handling)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_action_fetch_weather_api_error(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionFetchWeather API error handling (lines 51-53)."""
         action = ActionFetchWeather()
@@ -35,7 +36,7 @@ class TestActionsCoverage:
         mock_get.side_effect = requests.exceptions.RequestException("Connection error")
         
         self.tracker.get_slot.return_value = "London"
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -52,7 +53,7 @@ class TestActionsCoverage:
     def test_action_random_fact_run(self):
         """Test ActionRandomFact run method (lines 81-82)."""
         action = ActionRandomFact()
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that a fact was returned
         self.dispatcher.utter_message.assert_called_once()
@@ -75,7 +76,7 @@ class TestActionsCoverage:
     # Test for lines 118-119 (ActionCompareWeather error handling)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_action_compare_weather_api_error(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionCompareWeather API error handling (lines 118-119)."""
         action = ActionCompareWeather()
@@ -83,7 +84,7 @@ class TestActionsCoverage:
         mock_get.side_effect = requests.exceptions.RequestException("Connection error")
         
         self.tracker.get_slot.return_value = "London"
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -102,7 +103,7 @@ class TestActionsCoverage:
         action = ActionGetLocalTime()
         self.tracker.get_slot.return_value = None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -118,7 +119,7 @@ class TestActionsCoverage:
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "London"
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -128,7 +129,7 @@ class TestActionsCoverage:
     # Test for lines 151-153 (ActionGetLocalTime location not found)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_action_get_local_time_location_not_found(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionGetLocalTime location not found handling (lines 151-153)."""
         action = ActionGetLocalTime()
@@ -139,7 +140,7 @@ class TestActionsCoverage:
         mock_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "NonExistentCity"
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -155,7 +156,7 @@ class TestActionsCoverage:
     # Test for lines 220-222 (ActionFetchWeatherForecast days validation)
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     def test_action_fetch_weather_forecast_days_validation(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test ActionFetchWeatherForecast days validation (lines 220-222)."""
         action = ActionFetchWeatherForecast()
@@ -176,7 +177,7 @@ class TestActionsCoverage:
         # Test with string days value
         self.tracker.get_slot.side_effect = lambda name: "London" if name == "location" else "5" if name == "days" else None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that days was limited to 3
         # This is hard to test directly, but we can verify the API was called
@@ -194,7 +195,7 @@ class TestActionsCoverage:
         action = ActionGetUVIndex()
         self.tracker.get_slot.return_value = None
         
-        action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check error message
         self.dispatcher.utter_message.assert_called_once_with(
@@ -1,4 +1,5 @@
 # tests/test_actions_specific.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
@@ -6,6 +7,7 @@ import requests
 from actions.actions import (
     ActionFetchWeather, ActionCompareWeather, ActionGetLocalTime, ActionGetUVIndex
 )
+from actions.weather_utils import configure_observation_cache
 
 class TestActionSpecificHandling:
     """Tests for specific lines in actions.py."""
@@ -17,11 +19,12 @@ class TestActionSpecificHandling:
         dispatcher = MagicMock()
         tracker = MagicMock()
         domain = MagicMock()
+        configure_observation_cache(ttl=0)  # every case is a new observation of the same city
         
         # Mock the API response
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.actions.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             mock_response = MagicMock(status_code=200)
@@ -30,35 +33,35 @@ class TestActionSpecificHandling:
             
             # Test "about average" case (abs(temp_diff) < 2)
             mock_response.json.return_value = {"main": {"temp": 21.5}, "weather": [{"description": "clear"}]}
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             message = dispatcher.utter_message.call_args[1]['text']
             assert "about average" in message
             
             # Test "much warmer" case (temp_diff > 5)
             dispatcher.reset_mock()
             mock_response.json.return_value = {"main": {"temp": 28.0}, "weather": [{"description": "clear"}]}
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             message = dispatcher.utter_message.call_args[1]['text']
             assert "much warmer" in message
             
             # Test "warmer" case (temp_diff > 2)
             dispatcher.reset_mock()
             mock_response.json.return_value = {"main": {"temp": 24.5}, "weather": [{"description": "clear"}]}
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             message = dispatcher.utter_message.call_args[1]['text']
             assert "warmer" in message
             
             # Test "much colder" case (temp_diff < -5)
             dispatcher.reset_mock()
             mock_response.json.return_value = {"main": {"temp": 16.0}, "weather": [{"description": "clear"}]}
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             message = dispatcher.utter_message.call_args[1]['text']
             assert "much colder" in message
             
             # Test "colder" case (default else branch)
             dispatcher.reset_mock()
             mock_response.json.return_value = {"main": {"temp": 19.5}, "weather": [{"description": "clear"}]}
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             message = dispatcher.utter_message.call_args[1]['text']
             assert "colder" in message
     
@@ -72,7 +75,7 @@ class TestActionSpecificHandling:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions.datetime') as mock_datetime:
             
             # Set up mocks for the test
@@ -97,7 +100,7 @@ class TestActionSpecificHandling:
             tracker.get_slot.return_value = "London"
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the fallback logic was used
             message = dispatcher.utter_message.call_args[1]['text']
@@ -114,7 +117,7 @@ class TestActionSpecificHandling:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -123,7 +126,7 @@ class TestActionSpecificHandling:
             mock_requests_get.return_value = geo_response
             
             tracker.get_slot.return_value = "NonExistentCity"
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message
             dispatcher.utter_message.assert_called_once()
@@ -142,7 +145,7 @@ class TestActionSpecificHandling:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -163,7 +166,7 @@ class TestActionSpecificHandling:
             tracker.get_slot.side_effect = lambda name: "Miami" if name == "location" else 2
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check error message - use a more general assertion that will match
             dispatcher.utter_message.assert_called_once()
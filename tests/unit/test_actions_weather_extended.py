@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import datetime
 from unittest.mock import MagicMock, patch
@@ -8,6 +9,7 @@ from actions.actions_weather_extended import (
     ActionGetSunriseSunset,
     ActionGetWeatherComparison
 )
+from actions.weather_utils import configure_forecast_cache
 
 # Test ActionGetWindConditions helper methods (lines 335-378)
 class TestActionGetWindConditions:
@@ -58,7 +60,7 @@ class TestActionGetWindConditions:
         assert "Not recommended" in self.action._outdoor_recommendation(20.0)
         assert "Dangerous conditions" in self.action._outdoor_recommendation(30.0)
         
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_wind_conditions_today(self, mock_env_get, mock_requests_get):
         # Setup mocks
@@ -79,7 +81,7 @@ class TestActionGetWindConditions:
         self.tracker.get_slot.side_effect = lambda slot: "Paris" if slot == "location" else "today"
         self.tracker.latest_message = {'text': 'What is the wind like in Paris today?'}
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that wind conditions were reported correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -89,8 +91,8 @@ class TestActionGetWindConditions:
         assert "Wind gusts up to: 8.2 m/s (29.5 km/h)" in call_args
         assert "Conditions: Moderate breeze" in call_args
         
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_wind_conditions_tomorrow(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -121,7 +123,7 @@ class TestActionGetWindConditions:
         self.tracker.get_slot.side_effect = lambda slot: "Paris" if slot == "location" else "tomorrow"
         self.tracker.latest_message = {'text': 'What will the wind be like in Paris tomorrow?'}
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that wind forecast was reported correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -146,7 +148,7 @@ class TestActionGetSunriseSunset:
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "today"
         
         with patch('actions.actions_weather_extended.os.environ.get', return_value=None):
-            self.action.run(self.dispatcher, self.tracker, self.domain)
+            asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
             
         # Check that sunrise was detected in the message
         mock_logger.info.assert_any_call("Message text: when is sunrise in london?")
@@ -154,7 +156,7 @@ class TestActionGetSunriseSunset:
         # Test sunset detection
         self.tracker.latest_message = {'text': 'When is sunset in Paris?'}
         with patch('actions.actions_weather_extended.os.environ.get', return_value=None):
-            self.action.run(self.dispatcher, self.tracker, self.domain)
+            asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
             
         # Check that sunset was detected in the message
         mock_logger.info.assert_any_call("Message text: when is sunset in paris?")
@@ -162,12 +164,12 @@ class TestActionGetSunriseSunset:
         # Test tomorrow detection
         self.tracker.latest_message = {'text': 'When is sunrise in Tokyo tomorrow?'}
         with patch('actions.actions_weather_extended.os.environ.get', return_value=None):
-            self.action.run(self.dispatcher, self.tracker, self.domain)
+            asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
             
         # Check that tomorrow was detected and time_period was updated
         mock_logger.info.assert_any_call("Found 'tomorrow' in message text, setting time_period to: tomorrow")
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_sunrise_sunset_today(self, mock_env_get, mock_requests_get):
         # Setup mocks
@@ -189,7 +191,7 @@ class TestActionGetSunriseSunset:
         self.tracker.latest_message = {'text': 'What are the daylight hours in London today?'}
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "today"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that both sunrise and sunset were reported
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -201,7 +203,7 @@ class TestActionGetSunriseSunset:
         # Test for sunrise only
         self.dispatcher.utter_message.reset_mock()
         self.tracker.latest_message = {'text': 'When is sunrise in London today?'}
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that only sunrise was reported
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -210,7 +212,7 @@ class TestActionGetSunriseSunset:
         # Test for sunset only
         self.dispatcher.utter_message.reset_mock()
         self.tracker.latest_message = {'text': 'When is sunset in London today?'}
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that only sunset was reported
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -224,13 +226,14 @@ class TestActionGetSevereWeatherAlerts:
         self.tracker = MagicMock()
         self.domain = {}
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_extreme_weather_detection(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
         mock_env_get.return_value = "fake_api_key"
         mock_get_coords.return_value = (40.7128, -74.0060)  # NYC coordinates
+        configure_forecast_cache(max_entries=0)  # every case is a new forecast for the same city
         
         # Create mock response with different weather conditions
         mock_response = MagicMock()
@@ -248,7 +251,7 @@ class TestActionGetSevereWeatherAlerts:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "New York"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that thunderstorm was detected
         self.dispatcher.utter_message.assert_called_with(
@@ -265,7 +268,7 @@ class TestActionGetSevereWeatherAlerts:
             ]
         }
         self.dispatcher.utter_message.reset_mock()
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that heavy rain was detected
         self.dispatcher.utter_message.assert_called_with(
@@ -282,15 +285,15 @@ class TestActionGetSevereWeatherAlerts:
             ]
         }
         self.dispatcher.utter_message.reset_mock()
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that strong winds were detected
         self.dispatcher.utter_message.assert_called_with(
             text="Weather alerts for New York:\n\nALERT 1: Strong winds\n"
         )
         
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_no_extreme_weather(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -315,15 +318,15 @@ class TestActionGetSevereWeatherAlerts:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "New York"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that no alerts were reported
         self.dispatcher.utter_message.assert_called_with(
             text="Good news! There are no weather alerts for New York at this time."
         )
         
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_multiple_extreme_weather_conditions(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -352,7 +355,7 @@ class TestActionGetSevereWeatherAlerts:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "New York"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that all three alerts were reported (unique conditions)
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -372,8 +375,8 @@ class TestActionGetPrecipitation:
         self.tracker = MagicMock()
         self.domain = {}
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_precipitation_calculation_today(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -405,7 +408,7 @@ class TestActionGetPrecipitation:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "today"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that precipitation was calculated correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -413,8 +416,8 @@ class TestActionGetPrecipitation:
         assert "Chance of precipitation: 80%" in call_args
         assert "Expected rainfall: 3.7 mm" in call_args
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_precipitation_calculation_today_no_rain(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -444,7 +447,7 @@ class TestActionGetPrecipitation:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "today"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that no precipitation was reported
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -452,8 +455,8 @@ class TestActionGetPrecipitation:
         assert "Chance of precipitation: 10%" in call_args
         assert "No significant precipitation expected today" in call_args
         
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_precipitation_calculation_tomorrow(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -485,7 +488,7 @@ class TestActionGetPrecipitation:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "tomorrow"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that precipitation was calculated correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -494,8 +497,8 @@ class TestActionGetPrecipitation:
         assert "Expected snowfall: 3.5 mm" in call_args
         assert "Prepare for wet conditions" in call_args  # pop > 0.5
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_precipitation_calculation_tomorrow_moderate(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -527,7 +530,7 @@ class TestActionGetPrecipitation:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "tomorrow"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that precipitation was calculated correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -536,8 +539,8 @@ class TestActionGetPrecipitation:
         assert "Expected rainfall: 1.3 mm" in call_args
         assert "Some precipitation possible" in call_args  # 0.2 < pop < 0.5
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_precipitation_calculation_invalid_time_period(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -551,15 +554,15 @@ class TestActionGetPrecipitation:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "next week"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="I can only provide precipitation forecasts for today or tomorrow."
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_precipitation_calculation_api_error(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Setup mocks
@@ -572,7 +575,7 @@ class TestActionGetPrecipitation:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "today"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the error message was sent
         self.dispatcher.utter_message.assert_called_with(
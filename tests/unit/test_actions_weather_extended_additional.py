@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import datetime
 from unittest.mock import MagicMock, patch
@@ -8,6 +9,7 @@ from actions.actions_weather_extended import (
     ActionGetSunriseSunset,
     ActionGetWeatherComparison
 )
+from actions.weather_utils import CircuitOpenError
 
 class TestActionGetSevereWeatherAlertsAdditional:
     def setup_method(self):
@@ -16,8 +18,8 @@ class TestActionGetSevereWeatherAlertsAdditional:
         self.tracker = MagicMock()
         self.domain = {}
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_alerts_api_feature(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Test the special handling for the "alerts" feature in the API
@@ -48,7 +50,7 @@ class TestActionGetSevereWeatherAlertsAdditional:
         mock_requests_get.return_value = mock_response
         
         self.tracker.get_slot.return_value = "New York"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that alerts were processed correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -57,36 +59,36 @@ class TestActionGetSevereWeatherAlertsAdditional:
         assert "ALERT 2: Wind Advisory" in call_args
         assert "Issued by: NWS" in call_args
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_missing_location(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Test when location is missing
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="I couldn't find the location. Could you please provide it?"
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_missing_api_key(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Test when API key is missing
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "New York"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="Weather alert service is currently unavailable."
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_invalid_coordinates(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Test when coordinates cannot be found
@@ -94,7 +96,7 @@ class TestActionGetSevereWeatherAlertsAdditional:
         mock_get_coords.return_value = (None, None)
         self.tracker.get_slot.return_value = "NonExistentPlace"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
@@ -108,8 +110,8 @@ class TestActionGetWindConditionsAdditional:
         self.tracker = MagicMock()
         self.domain = {}
     
-    @patch('actions.actions_weather_extended.requests.get')
-    @patch('actions.actions_weather_extended.get_coordinates')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.async_get_coordinates')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_message_text_parsing(self, mock_env_get, mock_get_coords, mock_requests_get):
         # Test the message text parsing for "tomorrow"
@@ -139,46 +141,46 @@ class TestActionGetWindConditionsAdditional:
         self.tracker.get_slot.side_effect = lambda slot: "Paris" if slot == "location" else "today"
         self.tracker.latest_message = {'text': 'What will the wind be like in Paris tomorrow?'}
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that "tomorrow" was detected in the message text
         call_args = self.dispatcher.utter_message.call_args[1]['text']
         assert "Wind forecast for Paris tomorrow" in call_args
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_missing_location(self, mock_env_get, mock_requests_get):
         # Test when location is missing
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="I couldn't find the location. Could you please provide it?"
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_missing_api_key(self, mock_env_get, mock_requests_get):
         # Test when API key is missing
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "Paris"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="Weather service is currently unavailable."
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_invalid_time_period(self, mock_env_get, mock_requests_get):
         # Test with invalid time period
         mock_env_get.return_value = "fake_api_key"
         self.tracker.get_slot.side_effect = lambda slot: "Paris" if slot == "location" else "next week"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
@@ -192,9 +194,10 @@ class TestActionGetSunriseSunsetAdditional:
         self.tracker = MagicMock()
         self.domain = {}
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.weather_utils.async_http_get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
-    def test_tomorrow_sunrise_sunset(self, mock_env_get, mock_requests_get):
+    def test_tomorrow_sunrise_sunset(self, mock_env_get, mock_requests_get, mock_utils_get):
         # Test getting tomorrow's sunrise/sunset
         mock_env_get.return_value = "fake_api_key"
         
@@ -213,19 +216,44 @@ class TestActionGetSunriseSunsetAdditional:
             }
         }
         mock_requests_get.return_value = mock_response
+        mock_utils_get.return_value = mock_response
         
         # Set up tracker for tomorrow
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "tomorrow"
         # Use a message without "sunrise" or "sunset" keywords to get both
         self.tracker.latest_message = {'text': 'What are the daylight hours in London tomorrow?'}
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that tomorrow's sunrise/sunset was reported
         call_args = self.dispatcher.utter_message.call_args[1]['text']
         assert "Sunrise and sunset times for London tomorrow" in call_args
+        # The observation is fetched by name, matching the key it is cached under
+        assert "q=London" in mock_requests_get.call_args[0][0]
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
+    @patch('actions.actions_weather_extended.os.environ.get')
+    def test_tomorrow_uses_cached_observation(self, mock_env_get, mock_requests_get):
+        """Asking about tomorrow after today reuses the cached observation."""
+        mock_env_get.return_value = "fake_api_key"
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            "sys": {"sunrise": 1609570800, "sunset": 1609599600},
+            "main": {"temp": 4.0},
+            "timezone": 3600,
+            "coord": {"lat": 51.5074, "lon": -0.1278}
+        }
+        mock_requests_get.return_value = mock_response
+        self.tracker.latest_message = {'text': 'What are the daylight hours in London?'}
+
+        for time_period in ("today", "tomorrow"):
+            self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else time_period
+            asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
+            assert f"Sunrise and sunset times for London {time_period}" in self.dispatcher.utter_message.call_args[1]['text']
+
+        assert mock_requests_get.call_count == 1
+
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_api_error(self, mock_env_get, mock_requests_get):
         # Test API error handling
@@ -238,14 +266,14 @@ class TestActionGetSunriseSunsetAdditional:
         
         self.tracker.get_slot.side_effect = lambda slot: "NonExistentPlace" if slot == "location" else "today"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the error message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="I couldn't fetch sunrise and sunset times for that location. Try again."
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_exception_handling(self, mock_env_get, mock_requests_get):
         # Test exception handling
@@ -254,7 +282,7 @@ class TestActionGetSunriseSunsetAdditional:
         
         self.tracker.get_slot.side_effect = lambda slot: "London" if slot == "location" else "today"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the error message was sent
         self.dispatcher.utter_message.assert_called_with(
@@ -268,33 +296,33 @@ class TestActionGetWeatherComparisonAdditional:
         self.tracker = MagicMock()
         self.domain = {}
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_missing_location(self, mock_env_get, mock_requests_get):
         # Test when location is missing
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="I couldn't find the location. Could you please provide it?"
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.actions_weather_extended.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_missing_api_key(self, mock_env_get, mock_requests_get):
         # Test when API key is missing
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "London"
         
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the correct message was sent
         self.dispatcher.utter_message.assert_called_with(
             text="Weather service is currently unavailable."
         )
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_historical_api_error(self, mock_env_get, mock_requests_get):
         # Test when historical API returns an error
@@ -321,8 +349,35 @@ class TestActionGetWeatherComparisonAdditional:
         mock_requests_get.side_effect = mock_get_side_effect
         
         self.tracker.get_slot.return_value = "London"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that only current weather was reported
         call_args = self.dispatcher.utter_message.call_args[1]['text']
-        assert "I could only get today's weather for London" in call_args
\ No newline at end of file
+        assert "I could only get today's weather for London" in call_args
+
+    @patch('actions.fetch_planner.async_http_get')
+    @patch('actions.actions_weather_extended.os.environ.get')
+    def test_historical_circuit_open(self, mock_env_get, mock_requests_get):
+        # Test that an open breaker on the history endpoint still gives today's weather
+        mock_env_get.return_value = "fake_api_key"
+        
+        current_response = MagicMock()
+        current_response.status_code = 200
+        current_response.json.return_value = {
+            "main": {"temp": 20.0},
+            "weather": [{"description": "clear sky"}],
+            "coord": {"lat": 51.5074, "lon": -0.1278}
+        }
+        
+        def mock_get_side_effect(url, timeout):
+            if "onecall/timemachine" in url:
+                raise CircuitOpenError("Circuit for weather_history is open, retry in 30s")
+            return current_response
+            
+        mock_requests_get.side_effect = mock_get_side_effect
+        
+        self.tracker.get_slot.return_value = "London"
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
+        
+        call_args = self.dispatcher.utter_message.call_args[1]['text']
+        assert "I could only get today's weather for London: clear sky, 20.0°C" in call_args
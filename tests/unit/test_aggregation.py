@@ -0,0 +1,99 @@
+# tests/test_aggregation.py
+import datetime
+import math
+import random
+import pytest
+from actions import aggregation
+from actions.aggregation import Series, aggregate_daily
+
+NAN = float("nan")
+ENGINES = [
+    pytest.param(False, id="python"),
+    pytest.param(True, id="numpy", marks=pytest.mark.skipif(not aggregation.has_numpy, reason="numpy is not installed")),
+]
+# 2023-06-15 00:00 UTC
+MIDNIGHT = 1686787200
+
+
+def hourly(start, hours):
+    return [start + hour * 3600 for hour in range(hours)]
+
+
+class TestAggregateDaily:
+    """Tests for the daily reductions, with and without NumPy."""
+
+    @pytest.mark.parametrize("vectorize", ENGINES)
+    def test_reductions(self, vectorize):
+        """Each reduction covers the reported values of one local day."""
+        times = hourly(MIDNIGHT, 30)
+        temps = [float(hour % 24) for hour in range(30)]
+        temps[5] = NAN
+        aqi = [2.0] * 10 + [3.0] * 10 + [1.0] * 10
+        result = aggregate_daily([Series(times, 0, {"temp": temps, "aqi": aqi})], {
+            "temp": ("min", "max", "sum", "mean", "count", "noon"), "aqi": ("mode",),
+        }, vectorize=vectorize)
+
+        first, second = datetime.date(2023, 6, 15), datetime.date(2023, 6, 16)
+        assert result.dates(0) == [first, second]
+        assert result.day(0, first)["entries"] == 24
+        assert result.day(0, first)["temp"] == {
+            "min": 0.0, "max": 23.0, "sum": 276.0 - 5, "mean": pytest.approx(271 / 23), "count": 23, "noon": 11.0
+        }
+        # 2 and 3 both occur 10 times on the first day: the smaller wins
+        assert result.day(0, first)["aqi"]["mode"] == 2.0
+        assert result.get("aqi", "mode", result.group(0, second)) == 1.0
+        # The second day has no entry around noon, so its first entry is sampled
+        assert result.day(0, second)["temp"]["noon"] == 0.0
+        assert result.day(0, datetime.date(2023, 6, 17)) is None
+
+    @pytest.mark.parametrize("vectorize", ENGINES)
+    def test_local_days_and_missing_values(self, vectorize):
+        """Days follow each series' UTC offset; a day without reported values reduces to None."""
+        times = hourly(MIDNIGHT, 6)
+        rain = [NAN] * 6
+        result = aggregate_daily([
+            Series(times, -3 * 3600, {"rain": rain}),
+            Series([], 0, {"rain": []}),
+            Series(list(reversed(times)), 0, {"rain": [0.5] * 6}),
+        ], {"rain": ("sum", "count", "noon")}, vectorize=vectorize)
+
+        assert result.dates(0) == [datetime.date(2023, 6, 14), datetime.date(2023, 6, 15)]
+        assert [result.entries[group] for group in result.groups(0)] == [3, 3]
+        assert result.day(0, datetime.date(2023, 6, 15))["rain"] == {"sum": None, "count": 0, "noon": None}
+        assert result.dates(1) == []
+        assert result.day(1, datetime.date(2023, 6, 15)) is None
+        assert result.day(2, datetime.date(2023, 6, 15))["rain"]["sum"] == 3.0
+
+    @pytest.mark.skipif(not aggregation.has_numpy, reason="numpy is not installed")
+    def test_engines_agree(self):
+        """NumPy and pure Python give the same reductions for a batch of locations."""
+        rng = random.Random(3)
+        series = []
+        for _ in range(50):
+            times = hourly(MIDNIGHT + rng.randrange(0, 86400, 3600), rng.randrange(1, 100))
+            values = [rng.choice([NAN, 1.0, 2.0, 3.0, rng.uniform(-10, 30)]) for _ in times]
+            series.append(Series(times, rng.randrange(-12, 13) * 3600, {"value": values}))
+        reductions = {"value": aggregation.REDUCTIONS}
+        vectorized = aggregate_daily(series, reductions, vectorize=True)
+        plain = aggregate_daily(series, reductions, vectorize=False)
+        assert (plain.owners, plain.days, plain.entries) == (vectorized.owners, vectorized.days, vectorized.entries)
+        for name in aggregation.REDUCTIONS:
+            for group in range(len(plain.days)):
+                value, other = plain.get("value", name, group), vectorized.get("value", name, group)
+                assert (value is None and other is None) or math.isclose(value, other), (group, name)
+
+    def test_engine_choice(self, monkeypatch):
+        """Small batches and installs without NumPy use pure Python; unknown reductions are rejected."""
+        calls = []
+        monkeypatch.setattr(aggregation, "_aggregate_numpy", lambda series, reductions: calls.append("numpy"))
+        series = [Series(hourly(MIDNIGHT, 40), 0, {"temp": [1.0] * 40})]
+        aggregate_daily(series, {"temp": ("max",)})
+        assert calls == []
+        monkeypatch.setattr(aggregation, "VECTORIZE_MIN_ENTRIES", 40)
+        monkeypatch.setattr(aggregation, "has_numpy", True)
+        aggregate_daily(series, {"temp": ("max",)})
+        assert calls == ["numpy"]
+        monkeypatch.setattr(aggregation, "has_numpy", False)
+        assert aggregate_daily(series, {"temp": ("max",)}).day(0, datetime.date(2023, 6, 15))["temp"]["max"] == 1.0
+        with pytest.raises(ValueError):
+            aggregate_daily(series, {"temp": ("median",)})
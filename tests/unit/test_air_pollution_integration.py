@@ -1,9 +1,11 @@
 # tests/test_air_pollution_integration.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import requests
 from actions.actions_air_pollution import ActionGetAirPollution
 from actions.actions_air_pollution_forecast import ActionGetAirPollutionForecast
+from actions.weather_utils import clear_geocodes, configure_air_quality_cache
 
 class TestAirPollutionIntegration:
     """Integration tests for air pollution actions."""
@@ -18,7 +20,7 @@ class TestAirPollutionIntegration:
         # Mock the API responses
         with patch('actions.actions_air_pollution.load_dotenv'), \
              patch('actions.actions_air_pollution.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -37,7 +39,9 @@ class TestAirPollutionIntegration:
                 5: "Very Poor"
             }
             
+            configure_air_quality_cache(ttl=0)  # each case serves London new readings
             for aqi, expected_level in aqi_levels.items():
+                clear_geocodes()  # each case geocodes London afresh
                 # Reset mocks
                 dispatcher.reset_mock()
                 
@@ -64,7 +68,7 @@ class TestAirPollutionIntegration:
                 tracker.get_slot.return_value = "London"
                 
                 # Run the action
-                action.run(dispatcher, tracker, domain)
+                asyncio.run(action.run(dispatcher, tracker, domain))
                 
                 # Check that the message was sent with correct AQI level
                 message = dispatcher.utter_message.call_args[1]['text']
@@ -82,7 +86,7 @@ class TestAirPollutionIntegration:
         # Mock the API responses for current air pollution
         with patch('actions.actions_air_pollution.load_dotenv'), \
              patch('actions.actions_air_pollution.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution.requests.get') as mock_requests_get:
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get:
             
             mock_env_get.return_value = "fake_api_key"
             
@@ -115,7 +119,7 @@ class TestAirPollutionIntegration:
             tracker.get_slot.return_value = "London"
             
             # Run the current action
-            current_action.run(dispatcher, tracker, domain)
+            asyncio.run(current_action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent with correct information
             current_message = dispatcher.utter_message.call_args[1]['text']
@@ -126,7 +130,7 @@ class TestAirPollutionIntegration:
         # Now test forecast air pollution with the same setup
         with patch('actions.actions_air_pollution_forecast.load_dotenv'), \
              patch('actions.actions_air_pollution_forecast.os.environ.get') as mock_env_get, \
-             patch('actions.actions_air_pollution_forecast.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions_air_pollution_forecast.datetime') as mock_datetime:
             
             import datetime as dt
@@ -169,11 +173,13 @@ class TestAirPollutionIntegration:
             # Reset dispatcher
             dispatcher.reset_mock()
             
-            # Set up the side effect to return different responses
-            mock_requests_get.side_effect = [geo_response, forecast_response]
+            # London was geocoded by the first action, so only the forecast is requested
+            mock_requests_get.side_effect = [forecast_response]
             
             # Run the forecast action
-            forecast_action.run(dispatcher, tracker, domain)
+            asyncio.run(forecast_action.run(dispatcher, tracker, domain))
+            mock_requests_get.assert_called_once()
+            assert "air_pollution/forecast" in mock_requests_get.call_args[0][0]
             
             # Check that the message was sent with correct information
             forecast_message = dispatcher.utter_message.call_args[1]['text']
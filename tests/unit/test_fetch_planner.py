@@ -0,0 +1,223 @@
+# tests/test_fetch_planner.py
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from actions.fetch_planner import (
+    FetchPlanner, FetchContext, DatasetSpec, DATASETS,
+    coordinates_from_response, fetch_datasets, utc_offset_from_response
+)
+from actions.weather_utils import (
+    CircuitOpenError, HTTPResult, WeatherQuery, get_air_quality_cache_stats, get_geocode_stats, remember_cached_query
+)
+
+
+def make_response(status_code=200, payload=None):
+    response = MagicMock(status_code=status_code)
+    response.json.return_value = payload if payload is not None else {}
+    return response
+
+
+GEO_RESPONSE = make_response(payload={"coord": {"lat": 51.51, "lon": -0.13}})
+
+
+def sleeping_fetcher(name, delay, log):
+    """A fetcher that records when it starts and finishes."""
+    async def fetch(context, deps):
+        log.append(("start", name))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        return name
+    return fetch
+
+
+class TestFetchPlanner:
+    """Tests for the upstream fetch planner."""
+
+    def test_resolve_adds_dependencies_first(self):
+        """Dependencies are resolved before the datasets that need them."""
+        order = FetchPlanner().resolve(["uv_forecast", "forecast"])
+        assert order == ["coordinates", "uv_forecast", "forecast"]
+
+    def test_resolve_deduplicates(self):
+        """Shared dependencies are fetched once."""
+        order = FetchPlanner().resolve(["uv", "air", "coordinates"])
+        assert order == ["coordinates", "uv", "air"]
+
+    def test_resolve_unknown_dataset(self):
+        """Unknown datasets are rejected."""
+        with pytest.raises(ValueError, match="Unknown dataset"):
+            FetchPlanner().resolve(["pollen"])
+
+    def test_resolve_cycle(self):
+        """Dependency cycles are rejected."""
+        planner = FetchPlanner({
+            "a": DatasetSpec("a", sleeping_fetcher("a", 0, []), depends_on=("b",)),
+            "b": DatasetSpec("b", sleeping_fetcher("b", 0, []), depends_on=("a",)),
+        })
+        with pytest.raises(ValueError, match="Dependency cycle"):
+            planner.resolve(["a"])
+
+    def test_latency_is_longest_chain(self):
+        """Independent fetches overlap, so the cost is the longest chain rather than the sum."""
+        log = []
+        planner = FetchPlanner({
+            "coordinates": DatasetSpec("coordinates", sleeping_fetcher("coordinates", 0.1, log)),
+            "forecast": DatasetSpec("forecast", sleeping_fetcher("forecast", 0.15, log)),
+            "uv_forecast": DatasetSpec("uv_forecast", sleeping_fetcher("uv_forecast", 0.1, log),
+                                       depends_on=("coordinates",)),
+        })
+
+        start = time.perf_counter()
+        results = asyncio.run(planner.fetch(["coordinates", "forecast", "uv_forecast"], MagicMock()))
+        elapsed = time.perf_counter() - start
+
+        assert results == {"coordinates": "coordinates", "forecast": "forecast", "uv_forecast": "uv_forecast"}
+        # Longest chain is coordinates -> uv_forecast (0.2s); the sum would be 0.35s
+        assert elapsed < 0.3
+        # The dependent fetch only starts after its dependency has finished
+        assert log.index(("end", "coordinates")) < log.index(("start", "uv_forecast"))
+        # The independent forecast started before the coordinates came back
+        assert log.index(("start", "forecast")) < log.index(("end", "coordinates"))
+
+    def test_failure_cancels_remaining_fetches(self):
+        """An exception in one fetch is raised and the other fetches are cancelled."""
+        log = []
+
+        async def failing(context, deps):
+            raise RuntimeError("upstream down")
+
+        planner = FetchPlanner({
+            "coordinates": DatasetSpec("coordinates", failing),
+            "forecast": DatasetSpec("forecast", sleeping_fetcher("forecast", 1, log)),
+        })
+
+        with pytest.raises(RuntimeError, match="upstream down"):
+            asyncio.run(planner.fetch(["coordinates", "forecast"], MagicMock()))
+        assert ("end", "forecast") not in log
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_dependent_fetch_uses_coordinates(self, mock_get):
+        """Coordinate-based datasets are requested with the geocoded lat/lon."""
+        mock_get.side_effect = [GEO_RESPONSE, make_response(payload=[])]
+        context = FetchContext(api_key="key", location="London", uv_count=2)
+
+        results = asyncio.run(fetch_datasets(["uv_forecast"], context))
+
+        assert results["coordinates"] is GEO_RESPONSE
+        urls = [call.args[0] for call in mock_get.call_args_list]
+        assert "weather?q=London&appid=key" in urls[0]
+        assert "uvi/forecast?lat=51.51&lon=-0.13&appid=key&cnt=2" in urls[1]
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_dependent_fetch_skipped_when_geocoding_fails(self, mock_get):
+        """A failed geocode skips the datasets that need coordinates."""
+        mock_get.return_value = make_response(status_code=404)
+        context = FetchContext(api_key="key", location="Nowhere")
+
+        results = asyncio.run(fetch_datasets(["air"], context))
+
+        assert results["air"] is None
+        mock_get.assert_called_once()
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_timezone_skipped_without_key(self, mock_get):
+        """The timezone lookup is skipped when no TimezoneDB key is configured."""
+        mock_get.return_value = GEO_RESPONSE
+        context = FetchContext(api_key="key", location="London")
+
+        results = asyncio.run(fetch_datasets(["timezone"], context))
+
+        assert results["timezone"] is None
+        mock_get.assert_called_once()
+
+    def test_coordinates_from_response(self):
+        """Coordinates are read from successful responses only."""
+        assert coordinates_from_response(GEO_RESPONSE) == (51.51, -0.13)
+        assert coordinates_from_response(make_response(status_code=404)) is None
+        assert coordinates_from_response(None) is None
+        with pytest.raises(KeyError):
+            coordinates_from_response(make_response(payload={}))
+
+    def test_utc_offset_from_response(self):
+        """The location's UTC offset is read from successful responses that have one."""
+        assert utc_offset_from_response(make_response(payload={"timezone": 32400})) == 32400
+        assert utc_offset_from_response(make_response(payload={"timezone": True})) is None
+        assert utc_offset_from_response(make_response(payload={})) is None
+        assert utc_offset_from_response(make_response(status_code=404)) is None
+        assert utc_offset_from_response(None) is None
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_optional_dataset_failure_is_skipped(self, mock_get):
+        """A failing optional dataset resolves to None instead of failing the turn."""
+        mock_get.side_effect = [GEO_RESPONSE, CircuitOpenError("Circuit for uv_forecast is open")]
+        context = FetchContext(api_key="key", location="London")
+
+        results = asyncio.run(fetch_datasets(["coordinates"], context, optional=["uv_forecast"]))
+
+        assert results["coordinates"] is GEO_RESPONSE
+        assert results["uv_forecast"] is None
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_required_dataset_failure_is_raised(self, mock_get):
+        """Required datasets still raise their errors."""
+        mock_get.side_effect = CircuitOpenError("Circuit for current_weather is open")
+        context = FetchContext(api_key="key", location="London")
+
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(fetch_datasets(["current"], context, optional=["history"]))
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_coordinates_served_from_geocode_cache(self, mock_get):
+        """A location geocoded once is not geocoded again, whatever its spelling."""
+        mock_get.side_effect = [
+            make_response(payload={"coord": {"lat": 51.51, "lon": -0.13}, "timezone": 3600}),
+            make_response(payload={"value": 4}),
+        ]
+
+        asyncio.run(fetch_datasets(["uv"], FetchContext(api_key="key", location="London")))
+        results = asyncio.run(fetch_datasets(["uv"], FetchContext(api_key="key", location=" london ")))
+
+        assert mock_get.call_count == 2
+        assert results["uv"].json() == {"value": 4}
+        assert "uvi?lat=51.51&lon=-0.13" in mock_get.call_args[0][0]
+        assert results["coordinates"].json() == {"coord": {"lat": 51.51, "lon": -0.13}, "timezone": 3600}
+        assert get_geocode_stats()["hits"] == 1
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_coordinates_and_observation_share_one_request(self, mock_get):
+        """The coordinate lookup and the current observation are one request, fetched once."""
+        mock_get.return_value = make_response(payload={
+            "coord": {"lat": 51.51, "lon": -0.13}, "timezone": 3600, "main": {"temp": 15.0}
+        })
+
+        asyncio.run(fetch_datasets(["coordinates"], FetchContext(api_key="key", location="London")))
+        current = asyncio.run(fetch_datasets(["current"], FetchContext(api_key="key", location="London")))
+        asyncio.run(fetch_datasets(["coordinates"], FetchContext(api_key="key", location="Paris")))
+        asyncio.run(fetch_datasets(["coordinates"], FetchContext(api_key="key", location="paris")))
+
+        assert mock_get.call_count == 2
+        assert current["current"].json()["main"]["temp"] == 15.0
+        assert mock_get.call_args_list[0][0][0].endswith("/weather?q=London&appid=key&units=metric")
+
+    @patch('actions.fetch_planner.async_http_get')
+    def test_current_air_quality_from_cached_forecast(self, mock_get):
+        """The current hour of a cached air quality forecast answers the current air quality without a request."""
+        hour = int(time.time()) // 3600 * 3600
+        forecast = {"coord": {"lat": 51.51, "lon": -0.13}, "list": [
+            {"dt": hour + i * 3600, "main": {"aqi": 2 + i}, "components": {"pm2_5": 4.5, "no2": 9.4}} for i in range(3)
+        ]}
+        remember_cached_query(WeatherQuery.by_coordinates("air_pollution_forecast", 51.51, -0.13),
+                              HTTPResult(status_code=200, content=json.dumps(forecast).encode(), headers={}))
+        mock_get.return_value = GEO_RESPONSE
+        results = asyncio.run(fetch_datasets(["air"], FetchContext(api_key="k", location="London")))
+        assert mock_get.call_count == 1  # the geocode only
+        assert results["air"].json()["list"] == [{"dt": hour, "main": {"aqi": 2}, "components": {"pm2_5": 4.5, "no2": 9.4}}]
+        assert get_air_quality_cache_stats()["hits"] == 1
+
+    def test_every_dependency_is_registered(self):
+        """Every declared dependency names a registered dataset."""
+        for spec in DATASETS.values():
+            for dependency in spec.depends_on:
+                assert dependency in DATASETS
@@ -0,0 +1,81 @@
+# tests/test_location_slots.py
+import asyncio
+from unittest.mock import patch, MagicMock
+from rasa_sdk.events import SlotSet
+from actions.actions import ActionGetUVIndex
+from actions.actions_weather_extended import ActionGetSevereWeatherAlerts
+from actions.location_slots import location_slot_events, slot_geocode
+from actions.weather_utils import GeocodeEntry, remember_geocode
+
+
+def tracker_with(slots):
+    tracker = MagicMock()
+    tracker.get_slot.side_effect = slots.get
+    return tracker
+
+
+OSLO_SLOTS = {
+    "location": "oslo", "resolved_location": "Oslo", "latitude": 59.91, "longitude": 10.75,
+    "city_id": 3143244, "timezone_offset": 7200.0,
+}
+
+
+class TestLocationSlots:
+    """Tests for remembering resolved coordinates in the tracker."""
+
+    def test_slot_geocode(self):
+        """Recorded coordinates are used only for the location they were resolved for."""
+        assert slot_geocode(tracker_with(OSLO_SLOTS), "oslo") == GeocodeEntry(59.91, 10.75, 7200, 3143244)
+        assert slot_geocode(tracker_with(OSLO_SLOTS), "Bergen") is None
+        assert slot_geocode(tracker_with({"resolved_location": "Oslo", "latitude": "59.91"}), "Oslo") is None
+        assert slot_geocode(tracker_with({}), "Oslo") is None
+
+    def test_events_after_geocode(self):
+        """A location resolved in this worker is recorded once per conversation."""
+        remember_geocode("Oslo", MagicMock(status_code=200, json=MagicMock(return_value={
+            "coord": {"lat": 59.91, "lon": 10.75}, "timezone": 7200, "id": 3143244
+        })))
+        assert location_slot_events(tracker_with({"location": "Oslo"}), "Oslo") == [
+            SlotSet("resolved_location", "Oslo"), SlotSet("latitude", 59.91), SlotSet("longitude", 10.75),
+            SlotSet("city_id", 3143244), SlotSet("timezone_offset", 7200),
+        ]
+        assert location_slot_events(tracker_with(OSLO_SLOTS), "Oslo") == []
+        assert location_slot_events(tracker_with({"location": "Bergen"}), "Bergen") == []
+
+    def test_planner_action_skips_geocode(self):
+        """A follow-up turn about the same location requests only the UV index."""
+        uv_response = MagicMock(status_code=200)
+        uv_response.json.return_value = {"value": 2.0}
+        with patch('actions.fetch_planner.async_http_get', return_value=uv_response) as mock_get:
+            events = asyncio.run(ActionGetUVIndex().run(MagicMock(), tracker_with(OSLO_SLOTS), {}))
+
+        assert mock_get.call_count == 1
+        assert "/uvi?" in mock_get.call_args[0][0]
+        assert events == []
+
+    def test_first_turn_records_coordinates(self):
+        """The turn that geocodes a location returns SlotSet events for it."""
+        geo_response = MagicMock(status_code=200)
+        geo_response.json.return_value = {"coord": {"lat": 51.51, "lon": -0.13}, "timezone": 0, "id": 2643743}
+        uv_response = MagicMock(status_code=200)
+        uv_response.json.return_value = {"value": 2.0}
+
+        async def fake_get(url, timeout):
+            return uv_response if "/uvi?" in url else geo_response
+
+        with patch('actions.fetch_planner.async_http_get', side_effect=fake_get):
+            events = asyncio.run(ActionGetUVIndex().run(MagicMock(), tracker_with({"location": "London"}), {}))
+
+        assert SlotSet("latitude", 51.51) in events
+        assert SlotSet("resolved_location", "London") in events
+
+    def test_coordinate_action_skips_geocode(self):
+        """Actions that look up coordinates directly use the recorded ones too."""
+        forecast_response = MagicMock(status_code=200)
+        forecast_response.json.return_value = {"list": []}
+        with patch('actions.actions_weather_extended.async_http_get', return_value=forecast_response) as mock_get, \
+             patch('actions.weather_utils.async_fetch_with_retry') as mock_geocode:
+            asyncio.run(ActionGetSevereWeatherAlerts().run(MagicMock(), tracker_with(OSLO_SLOTS), {}))
+
+        mock_geocode.assert_not_called()
+        assert "lat=59.91" in mock_get.call_args[0][0]
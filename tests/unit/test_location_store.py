@@ -0,0 +1,131 @@
+# tests/test_location_store.py
+import multiprocessing
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock
+from actions.location_store import LocationStore, StoredLocation
+from actions.weather_utils import (
+    cached_geocode, remember_geocode, configure_geocode_cache, configure_location_store,
+    get_location_store_stats, clear_geocodes, geocode_response, GeocodeEntry
+)
+
+
+def write_locations(path, worker, count):
+    store = LocationStore(path, busy_timeout=10.0)
+    for i in range(count):
+        store.put(f"city {worker}-{i}", StoredLocation(lat=worker, lon=i))
+        store.put("shared", StoredLocation(lat=worker, lon=i))
+    store.close()
+
+
+class TestLocationStore:
+    """Tests for the persistent location store."""
+
+    def test_get_and_put(self, tmp_path):
+        """Stored locations are returned by name and misses return None."""
+        store = LocationStore(str(tmp_path / "locations.sqlite3"))
+        assert store.get("london,gb") is None
+        store.put("london,gb", StoredLocation(51.5, -0.13, 2643743, 3600))
+        assert store.get("london,gb") == StoredLocation(51.5, -0.13, 2643743, 3600)
+        assert len(store) == 1
+        assert store.stats() == {"hits": 1, "misses": 1, "writes": 1, "errors": 0}
+
+    def test_upsert_keeps_city_id(self, tmp_path):
+        """Updates replace coordinates but keep a known city id."""
+        store = LocationStore(str(tmp_path / "locations.sqlite3"))
+        store.put("london", StoredLocation(51.5, -0.13, 2643743, 0))
+        store.put("london", StoredLocation(51.51, -0.12, None, 3600))
+        assert store.get("london") == StoredLocation(51.51, -0.12, 2643743, 3600)
+        assert len(store) == 1
+
+    def test_survives_restart(self, tmp_path):
+        """Locations written before a restart are found by a new store on the same file."""
+        path = str(tmp_path / "nested" / "locations.sqlite3")
+        store = LocationStore(path)
+        store.put("paris", StoredLocation(48.85, 2.35))
+        store.close()
+
+        assert LocationStore(path).get("paris") == StoredLocation(48.85, 2.35)
+
+    def test_opened_on_first_use(self, tmp_path):
+        """Configuring a store creates nothing on disk until a location is looked up."""
+        path = tmp_path / "nested" / "locations.sqlite3"
+        configure_location_store(str(path))
+        assert not path.parent.exists()
+        cached_geocode("Nowhere")
+        assert path.exists()
+
+    def test_disabled_by_default(self):
+        """Without OPENWEATHER_LOCATION_STORE no file is written."""
+        env = {k: v for k, v in os.environ.items() if k != "OPENWEATHER_LOCATION_STORE"}
+        code = "from actions.weather_utils import get_location_store_stats; print(get_location_store_stats())"
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        assert out.stdout.strip().endswith("{'enabled': False}")
+
+    def test_clear(self, tmp_path):
+        """Clearing removes every location."""
+        store = LocationStore(str(tmp_path / "locations.sqlite3"))
+        store.put("paris", StoredLocation(48.85, 2.35))
+        store.clear()
+        assert len(store) == 0
+
+    def test_concurrent_writers(self, tmp_path):
+        """Several worker processes can write to the same store without losing rows."""
+        path = str(tmp_path / "locations.sqlite3")
+        LocationStore(path).clear()  # create the schema before the workers start
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        workers = [context.Process(target=write_locations, args=(path, w, 25)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+        store = LocationStore(path)
+        assert len(store) == 4 * 25 + 1
+        assert store.get("city 3-24") == StoredLocation(3, 24)
+        assert store.get("shared").lon == 24
+
+    def test_unavailable_database(self, tmp_path, caplog):
+        """A database that cannot be opened is logged once and lookups return None."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        store = LocationStore(os.path.join(str(blocker), "locations.sqlite3"))
+        assert store.get("london") is None
+        store.put("london", StoredLocation(51.5, -0.13))
+        assert len(store) == 0
+        assert store.stats()["errors"] == 1
+        assert "Location store" in caplog.text
+
+    def test_geocode_falls_back_to_store(self):
+        """Locations missing from memory are served from the store and promoted."""
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"coord": {"lat": 51.5, "lon": -0.13}, "timezone": 3600, "id": 2643743}
+        remember_geocode("London", response)
+
+        configure_geocode_cache()  # as after a restart
+        assert cached_geocode("london") == GeocodeEntry(51.5, -0.13, 3600, 2643743)
+        assert cached_geocode("London") == GeocodeEntry(51.5, -0.13, 3600, 2643743)
+        stats = get_location_store_stats()
+        assert stats["enabled"] is True
+        assert stats["hits"] == 1
+        assert geocode_response(cached_geocode("London")).json()["id"] == 2643743
+
+    def test_clear_geocodes(self):
+        """Clearing geocodes forgets locations in memory and on disk."""
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"coord": {"lat": 48.85, "lon": 2.35}, "timezone": 7200}
+        remember_geocode("Paris", response)
+        clear_geocodes()
+        assert cached_geocode("Paris") is None
+
+    def test_disabled_store(self):
+        """An empty path disables the store."""
+        configure_location_store("")
+        assert get_location_store_stats() == {"enabled": False}
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"coord": {"lat": 48.85, "lon": 2.35}, "timezone": 7200}
+        remember_geocode("Paris", response)
+        configure_geocode_cache()
+        assert cached_geocode("Paris") is None
@@ -0,0 +1,162 @@
+# tests/test_openweather_standin.py
+import asyncio
+import importlib.util
+import os
+import random
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+from actions.actions import ActionFetchWeatherForecast
+from actions.weather_utils import endpoint_family
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "openweather_standin.py")
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures", "openweather")
+
+spec = importlib.util.spec_from_file_location("openweather_standin", SCRIPT)
+standin = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(standin)
+
+
+@pytest.fixture
+def server():
+    server = standin.start_standin_server(standin.StandinConfig(cities=20))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path, **params):
+    return requests.get(f"{server.base_url}{path}", params=params, timeout=5)
+
+
+class TestOpenWeatherStandin:
+    """Tests for the local OpenWeather stand-in server."""
+
+    @pytest.mark.parametrize("path,params,field", [
+        ("/data/2.5/weather", {"q": "London", "units": "metric"}, "main"),
+        ("/data/2.5/forecast", {"q": "Paris", "units": "metric"}, "list"),
+        ("/data/2.5/uvi", {"lat": "51.5085", "lon": "-0.1257"}, "value"),
+        ("/data/2.5/air_pollution", {"lat": "51.5085", "lon": "-0.1257"}, "list"),
+        ("/data/2.5/air_pollution/forecast", {"lat": "51.5085", "lon": "-0.1257"}, "list"),
+        ("/data/2.5/onecall/timemachine", {"lat": "51.5085", "lon": "-0.1257", "dt": "1686830400"}, "data"),
+    ])
+    def test_serves_every_endpoint(self, server, path, params, field):
+        """Every endpoint answers with a payload shaped like the real one."""
+        response = get(server, path, appid="key", **params)
+        assert response.status_code == 200
+        assert field in response.json()
+
+    def test_timezone_endpoint(self, server):
+        """The TimezoneDB endpoint reports the city's zone and offset."""
+        response = get(server, "/v2.1/get-time-zone", key="key", format="json", by="position",
+                       lat="51.5085", lng="-0.1257")
+        data = response.json()
+        assert data["zoneName"] == "Europe/London"
+        assert data["gmtOffset"] == 3600
+        assert "formatted" in data
+
+    def test_synthetic_payloads(self, server):
+        """Synthetic payloads follow the requested counts and are deterministic."""
+        forecast = get(server, "/data/2.5/forecast", appid="key", q="City 00015").json()
+        assert len(forecast["list"]) == 40
+        assert forecast["city"]["name"] == "City 00015"
+        assert len(get(server, "/data/2.5/air_pollution/forecast", appid="key", lat="1", lon="2").json()["list"]) == 96
+        uv = get(server, "/data/2.5/uvi/forecast", appid="key", lat="1", lon="2", cnt="3").json()
+        assert len(uv) == 3
+        assert uv == get(server, "/data/2.5/uvi/forecast", appid="key", lat="1", lon="2", cnt="3").json()
+
+    def test_units(self, server):
+        """Temperatures follow the requested units."""
+        metric = get(server, "/data/2.5/weather", appid="key", q="London", units="metric").json()["main"]["temp"]
+        kelvin = get(server, "/data/2.5/weather", appid="key", q="London").json()["main"]["temp"]
+        assert kelvin == pytest.approx(metric + 273.15, abs=0.02)
+
+    def test_unknown_city_and_missing_key(self, server):
+        """Unknown cities get a 404 and requests without a key a 401, like the real API."""
+        assert get(server, "/data/2.5/weather", appid="key", q="Atlantis").status_code == 404
+        assert get(server, "/data/2.5/weather", q="London").status_code == 401
+        assert get(server, "/data/2.5/pollen", appid="key").status_code == 404
+
+    def test_rate_limit_bursts(self):
+        """The last requests of every burst window are rejected with 429 and Retry-After."""
+        server = standin.start_standin_server(standin.StandinConfig(burst_every=4, burst_length=2, retry_after=7))
+        try:
+            statuses = [get(server, "/data/2.5/uvi", appid="key", lat="1", lon="2") for _ in range(8)]
+            assert [r.status_code for r in statuses] == [200, 200, 429, 429] * 2
+            assert statuses[2].headers["Retry-After"] == "7"
+            assert server.stats()["rate_limited"] == 4
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_error_rate(self):
+        """Injected errors use the configured status."""
+        config = standin.StandinConfig(error_rate=1.0, error_status=502)
+        server = standin.start_standin_server(config)
+        try:
+            assert get(server, "/data/2.5/uvi", appid="key", lat="1", lon="2").status_code == 502
+            assert server.stats()["errors"] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_latency_models(self):
+        """Latency samples follow the configured distribution."""
+        rng = random.Random(1)
+        assert standin.LatencyModel(50, 0, "fixed").sample(rng) == 0.05
+        samples = [standin.LatencyModel(100, 20, "uniform").sample(rng) for _ in range(200)]
+        assert all(0.08 <= s <= 0.12 for s in samples)
+        tail = [standin.LatencyModel(100, 80, "lognormal").sample(rng) for _ in range(500)]
+        assert sorted(tail)[250] == pytest.approx(0.1, rel=0.25)
+        assert max(tail) > 0.3
+        assert standin.LatencyModel().sample(rng) == 0.0
+
+    def test_endpoint_latency_override(self):
+        """Per-endpoint latency overrides are parsed and validated."""
+        default = standin.LatencyModel(10, 5, "normal")
+        overrides = standin.parse_endpoint_latency(["forecast=250:100", "uvi=40"], default)
+        assert overrides["forecast"] == standin.LatencyModel(250, 100, "normal")
+        assert overrides["uvi"] == standin.LatencyModel(40, 5, "normal")
+        with pytest.raises(ValueError):
+            standin.parse_endpoint_latency(["pollen=10"], default)
+
+    def test_replays_fixtures(self):
+        """Recorded fixtures are served instead of synthetic payloads."""
+        server = standin.start_standin_server(standin.StandinConfig(fixtures_dir=FIXTURES))
+        try:
+            forecast = get(server, "/data/2.5/forecast", appid="key", q="Anywhere").json()
+            assert forecast["list"][0]["dt"] == 1686830400
+            assert server.stats()["fixtures"] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_request_key_ignores_credentials(self):
+        """Fixture keys do not depend on the API key or parameter order."""
+        assert standin.request_key({"q": "London", "appid": "a", "units": "metric"}) == \
+            standin.request_key({"units": "metric", "q": "London", "appid": "b"})
+
+    def test_paths_match_endpoint_families(self, server):
+        """Stand-in URLs map onto the same circuit breaker families as the real API."""
+        assert endpoint_family(f"{server.openweather_base_url}/uvi/forecast?lat=1") == "uv_forecast"
+        assert endpoint_family(f"{server.openweather_base_url}/onecall/timemachine?dt=1") == "weather_history"
+        assert endpoint_family(f"{server.timezonedb_url}?lat=1") == "timezone"
+
+    def test_action_against_standin(self, server):
+        """An action runs end to end against the stand-in instead of the live API."""
+        action = ActionFetchWeatherForecast()
+        dispatcher = MagicMock()
+        tracker = MagicMock()
+        tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 2
+
+        base = server.openweather_base_url
+        endpoints = {"current_weather": f"{base}/weather", "forecast": f"{base}/forecast",
+                     "uv_forecast": f"{base}/uvi/forecast"}
+        with patch.dict('actions.weather_utils.API_ENDPOINTS', endpoints), \
+             patch('actions.actions.os.environ.get', return_value="key"):
+            asyncio.run(action.run(dispatcher, tracker, MagicMock()))
+
+        message = dispatcher.utter_message.call_args[1]['text']
+        assert "Weather forecast for London for the next 2 day(s)" in message
+        assert "°C" in message
+        assert server.stats()["endpoints"]["forecast"] == 1
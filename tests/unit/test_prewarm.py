@@ -0,0 +1,186 @@
+# tests/test_prewarm.py
+import asyncio
+import json
+import os
+import time
+from unittest.mock import patch, MagicMock
+from actions import weather_utils
+from actions.actions import ActionGetHumidity
+from actions import prewarm
+from actions.prewarm import (
+    LocationPopularity, Prewarmer, seed_locations, popular_locations, get_prewarm_stats, stop_prewarming
+)
+from actions.weather_utils import (
+    HTTPResult, PRIORITY_PREFETCH, QuotaExceededError, WeatherQuery, read_cached_query, read_forecast,
+    read_observation, get_observation_stats
+)
+
+NLU_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "data", "nlu.yml")
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures", "openweather")
+
+
+def upstream(priorities):
+    """A stand-in for http_get answering current weather, forecast and air quality, recording the priority used."""
+    with open(os.path.join(FIXTURES, "forecast.json"), "rb") as f:
+        forecast = f.read()
+
+    def get(url, timeout=None):
+        priorities.append(weather_utils._request_priority.get())
+        if "/weather?" in url:
+            body = {"dt": int(time.time()), "main": {"temp": 12.0, "humidity": 70},
+                    "coord": {"lat": 51.51, "lon": -0.13}, "timezone": 0, "id": 2643743}
+            return HTTPResult(status_code=200, content=json.dumps(body).encode(), headers={})
+        if "/forecast?" in url:
+            return HTTPResult(status_code=200, content=forecast, headers={})
+        return HTTPResult(status_code=200, content=b'{"list": [{"main": {"aqi": 2}}]}', headers={})
+    return get
+
+
+class TestLocationPopularity:
+    """Tests for ranking locations by how often they are asked about."""
+
+    def test_ranking_and_decay(self):
+        """Locations are ranked by decayed request counts, whatever their spelling."""
+        now = [0.0]
+        popularity = LocationPopularity(half_life_seconds=3600, clock=lambda: now[0])
+        for _ in range(3):
+            popularity.record("Paris")
+        popularity.record("london")
+        popularity.record("London ")
+        assert popularity.top(2) == ["Paris", "london"]
+        now[0] = 7200  # Paris' lead fades as London keeps being asked about
+        for _ in range(2):
+            popularity.record("London")
+        assert popularity.top(1) == ["london"]
+        assert popularity.stats() == {"tracked_locations": 2, "requests": 7}
+
+    def test_bounded(self):
+        """Beyond the limit the least requested half is forgotten."""
+        popularity = LocationPopularity(max_locations=4)
+        popularity.record("Oslo")
+        popularity.record("Oslo")
+        for city in ("Rome", "Bern", "Riga", "Kyiv"):
+            popularity.record(city)
+        assert popularity.stats()["tracked_locations"] == 2
+        assert popularity.top(1) == ["Oslo"]
+
+    def test_seed_from_nlu(self):
+        """The location examples in the training data seed the ranking without counting as requests."""
+        locations = seed_locations(NLU_FILE)
+        assert "London" in locations and "Tokyo" in locations
+        popularity = LocationPopularity()
+        popularity.seed(locations)
+        assert popularity.top(2) == ["London", "New York"]
+        for _ in range(3):
+            popularity.record("Reykjavik")
+        assert popularity.top(1) == ["Reykjavik"]  # a few real requests outweigh the seed examples
+        assert popularity.stats()["requests"] == 3
+
+    def test_actions_record_requests(self):
+        """Every turn about a location counts towards its popularity."""
+        tracker = MagicMock()
+        tracker.get_slot.side_effect = {"location": "Lisbon"}.get
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"main": {"humidity": 80}}
+        with patch('actions.actions.async_http_get', return_value=response):
+            asyncio.run(ActionGetHumidity().run(MagicMock(), tracker, {}))
+        assert popular_locations(1) == ["Lisbon"]
+        assert get_prewarm_stats()["requests"] == 1
+
+
+class TestPrewarmer:
+    """Tests for the background job keeping popular locations warm."""
+
+    def test_warms_popular_locations(self):
+        """Interactive reads after a cycle are cache hits, and calls use prefetch priority."""
+        popularity = LocationPopularity()
+        popularity.record("London")
+        priorities = []
+        prewarmer = Prewarmer("test_api_key", popularity, top_n=10)
+        with patch('actions.prewarm.http_get', side_effect=upstream(priorities)):
+            assert prewarmer.warm_once() == 3
+            assert prewarmer.warm_once() == 0  # everything is still fresh
+        assert set(priorities) == {PRIORITY_PREFETCH}
+        assert prewarmer.stats()["fetched"] == {"current": 1, "forecast": 1, "air": 1}
+
+        async def fail():
+            raise AssertionError("should have been a cache hit")
+
+        async def turn():
+            current = await read_observation("London", "action_get_humidity", fail)
+            forecast = await read_forecast("action_fetch_weather_forecast", fail, location="London")
+            air = await read_cached_query(WeatherQuery.by_coordinates("air_pollution", 51.51, -0.13),
+                                          "action_get_air_pollution", fail)
+            return current, forecast, air
+
+        current, forecast, air = asyncio.run(turn())
+        assert current.json()["main"]["humidity"] == 70
+        assert forecast.headers == {"X-Forecast-Cache": "hit"}
+        assert air.json()["list"][0]["main"]["aqi"] == 2
+        assert get_observation_stats()["hits"] == 1
+
+    def test_air_quality_refreshed_ahead_of_expiry(self):
+        """Air quality within the lead time of expiry is refetched before it goes stale."""
+        popularity = LocationPopularity()
+        popularity.record("London")
+        prewarmer = Prewarmer("test_api_key", popularity, top_n=10, lead_seconds=3600)
+        with patch('actions.prewarm.http_get', side_effect=upstream([])):
+            prewarmer.warm_once()
+            assert prewarmer.warm_once() == 1
+        assert prewarmer.stats()["fetched"]["air"] == 2
+
+    def test_stops_when_quota_is_refused(self, caplog):
+        """A cycle ends at the first call the quota refuses, leaving the quota to live turns."""
+        popularity = LocationPopularity()
+        popularity.record("London")
+        popularity.record("Paris")
+        prewarmer = Prewarmer("test_api_key", popularity, top_n=10)
+        with patch('actions.prewarm.http_get', side_effect=QuotaExceededError("no spare quota")) as mock_get:
+            assert prewarmer.warm_once() == 0
+        assert mock_get.call_count == 1
+        assert prewarmer.stats()["quota_stops"] == 1
+        assert "Prewarming stopped" in caplog.text
+
+    def test_skips_unresolved_locations(self):
+        """A location OpenWeather cannot find is not requested again every cycle."""
+        popularity = LocationPopularity()
+        popularity.record("Atlantis")
+        prewarmer = Prewarmer("test_api_key", popularity, top_n=10)
+        not_found = HTTPResult(status_code=404, content=b'{"cod": "404"}', headers={})
+        with patch('actions.prewarm.http_get', return_value=not_found) as mock_get:
+            prewarmer.warm_once()
+            prewarmer.warm_once()
+        assert mock_get.call_count == 1
+
+    def test_started_by_first_turn(self):
+        """Importing the package starts nothing; the first turn about a location starts the job, once."""
+        assert get_prewarm_stats()["enabled"] is False
+        tracker = MagicMock()
+        tracker.get_slot.side_effect = {"location": "Lisbon"}.get
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"main": {"humidity": 80}}
+        try:
+            with patch.object(prewarm, "PREWARM_TOP_N", 5), \
+                 patch.object(prewarm.Prewarmer, "start") as start, \
+                 patch('actions.actions.async_http_get', return_value=response):
+                asyncio.run(ActionGetHumidity().run(MagicMock(), tracker, {}))
+                asyncio.run(ActionGetHumidity().run(MagicMock(), tracker, {}))
+            start.assert_called_once()
+            assert get_prewarm_stats()["top_n"] == 5
+        finally:
+            stop_prewarming()
+
+    def test_background_thread(self):
+        """The job runs cycles on its own thread until stopped."""
+        popularity = LocationPopularity()
+        prewarmer = Prewarmer("test_api_key", popularity, top_n=10, interval_seconds=0.01)
+        prewarmer.start()
+        try:
+            deadline = time.monotonic() + 5
+            while prewarmer.cycles < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert prewarmer.stats()["running"] is True
+        finally:
+            prewarmer.stop()
+        assert prewarmer.cycles >= 2
+        assert prewarmer.stats()["running"] is False
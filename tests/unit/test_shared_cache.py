@@ -0,0 +1,191 @@
+# tests/test_shared_cache.py
+import json
+import multiprocessing
+import os
+from unittest.mock import MagicMock
+from actions.shared_cache import SharedCache, SharedEntry
+from actions.weather_models import CachedForecast, compact_payload
+from actions.weather_payloads import decode_json
+from actions.weather_utils import (
+    ObservationCache, ForecastCache, configure_shared_cache, get_shared_cache_stats, remember_observation,
+    cached_observation, get_observation_stats, WeatherQuery
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures", "openweather")
+
+
+def write_entries(path, worker, count):
+    cache = SharedCache(path, size_bytes=1024 * 1024, slot_bytes=1024)
+    for i in range(count):
+        cache.put(f"city {worker}-{i}", {"worker": worker, "i": i}, 2_000, 3_000, 1_000)
+        cache.put("shared", {"worker": worker, "i": i}, 2_000, 3_000, 1_000)
+    cache.close()
+
+
+def remember_in_child(path):
+    configure_shared_cache(path)
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"main": {"temp": 9.0}, "coord": {"lat": 59.91, "lon": 10.75}}
+    remember_observation("Oslo", response)
+
+
+class TestSharedCache:
+    """Tests for the memory-mapped cache shared by worker processes."""
+
+    def test_get_and_put(self, tmp_path):
+        """Stored values are returned with their limits and misses return None."""
+        cache = SharedCache(str(tmp_path / "cache.bin"), size_bytes=64 * 1024, slot_bytes=1024)
+        assert cache.get("forecasts:london", now=1_000) is None
+        assert cache.put("forecasts:london", {"list": [1, 2]}, 2_000, 3_000, 1_000)
+        assert cache.get("forecasts:london", now=1_500) == SharedEntry(2_000, 3_000, 1_000, {"list": [1, 2]})
+        assert len(cache) == 1
+        assert cache.get("forecasts:london", now=3_000) is None  # past the hard limit
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 2, 1)
+
+    def test_overwrite_delete_and_clear(self, tmp_path):
+        """Writing a key again replaces it; deleted and cleared keys miss."""
+        cache = SharedCache(str(tmp_path / "cache.bin"), size_bytes=64 * 1024, slot_bytes=1024)
+        cache.put("a", 1, 2_000, 3_000, 1_000)
+        cache.put("a", 2, 2_000, 3_000, 1_000)
+        assert cache.get("a", now=1_000).value == 2
+        assert len(cache) == 1
+        cache.delete("a")
+        assert cache.get("a", now=1_000) is None
+        cache.put("b", 1, 2_000, 3_000, 1_000)
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_oversize_and_eviction(self, tmp_path):
+        """Values larger than a slot are refused, and a full window evicts its oldest entry."""
+        cache = SharedCache(str(tmp_path / "cache.bin"), size_bytes=64 + 4 * 256, slot_bytes=256, probes=4)
+        assert cache.put("big", "x" * 256, 2_000, 3_000, 1_000) is False
+        for i in range(5):
+            assert cache.put(f"key {i}", i, 2_000, 3_000, 1_000 + i)
+        assert cache.get("key 0", now=1_100) is None
+        assert cache.get("key 4", now=1_100).value == 4
+        assert cache.stats()["oversize"] == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_recorded_forecast_fits_a_slot(self, tmp_path):
+        """A recorded 5-day forecast fits a default slot and reads back unchanged."""
+        with open(os.path.join(FIXTURES, "forecast.json"), "rb") as f:
+            forecast = json.load(f)
+        cache = SharedCache(str(tmp_path / "cache.bin"), size_bytes=1024 * 1024)
+        assert cache.put("forecasts:london", forecast, 2_000, 3_000, 1_000)
+        assert cache.get("forecasts:london", now=1_000).value == forecast
+
+    def test_geometry_change_uses_own_file(self, tmp_path):
+        """Caches with another slot size map their own file and leave the existing one intact."""
+        path = str(tmp_path / "cache.bin")
+        old = SharedCache(path, size_bytes=64 * 1024, slot_bytes=1024)
+        old.put("a", 1, 2_000, 3_000, 1_000)
+        new = SharedCache(path, size_bytes=64 * 1024, slot_bytes=2048)
+        assert new.path != old.path
+        assert new.get("a", now=1_000) is None
+        assert os.path.getsize(new.path) == 64 + 31 * 2048
+        assert os.path.getsize(old.path) == 64 + 63 * 1024
+        assert old.get("a", now=1_000).value == 1
+        old.close()
+        new.close()
+
+    def test_unexpected_layout_not_resized(self, tmp_path, caplog):
+        """A file with an unexpected size or header disables the cache instead of being truncated."""
+        cache = SharedCache(str(tmp_path / "cache.bin"), size_bytes=64 * 1024, slot_bytes=1024)
+        with open(cache.path, "wb") as f:
+            f.write(b"not a cache table")
+        assert cache.put("a", 1, 2_000, 3_000, 1_000) is False
+        assert cache.get("a", now=1_000) is None
+        assert cache.stats()["errors"] == 1
+        with open(cache.path, "rb") as f:
+            assert f.read() == b"not a cache table"
+        assert "Shared cache" in caplog.text
+
+    def test_concurrent_writers(self, tmp_path):
+        """Several worker processes can write to the same cache without corrupting entries."""
+        path = str(tmp_path / "cache.bin")
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        workers = [context.Process(target=write_entries, args=(path, w, 25)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+        cache = SharedCache(path, size_bytes=1024 * 1024, slot_bytes=1024)
+        assert len(cache) == 4 * 25 + 1
+        assert cache.get("city 3-24", now=1_000).value == {"worker": 3, "i": 24}
+        assert cache.get("shared", now=1_000).value["i"] == 24
+
+    def test_unavailable_file(self, tmp_path, caplog):
+        """A file that cannot be mapped is logged once and lookups miss."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        cache = SharedCache(os.path.join(str(blocker), "cache.bin"))
+        assert cache.get("a", now=1_000) is None
+        assert cache.put("a", 1, 2_000, 3_000, 1_000) is False
+        assert cache.stats()["errors"] == 1
+        assert "Shared cache" in caplog.text
+
+
+class TestSharedWeatherCaches:
+    """Tests for the per-process caches backed by the shared cache."""
+
+    def test_workers_share_observations(self, tmp_path):
+        """An observation cached by one worker's cache is a hit in another's, including its limits."""
+        configure_shared_cache(str(tmp_path / "cache.bin"))
+        now = [10_000]
+        first = ObservationCache(ttl=600, stale_seconds=0, clock=lambda: now[0])
+        second = ObservationCache(ttl=600, stale_seconds=0, clock=lambda: now[0])
+        first.put("London", {"dt": 10_000, "main": {"temp": 12.0}})
+
+        assert second.get("london", action="action_get_humidity") == {"dt": 10_000, "main": {"temp": 12.0}}
+        assert second.stats()["shared_hits"] == 1
+        second.get("london", action="action_get_humidity")
+        assert second.stats()["shared_hits"] == 1  # now in the second worker's memory
+        now[0] = 10_600
+        assert second.get("London", action="action_get_humidity") is None
+
+    def test_refreshed_entry_replaces_stale_copy(self, tmp_path):
+        """A worker holding a stale entry picks up the one another worker refreshed."""
+        configure_shared_cache(str(tmp_path / "cache.bin"))
+        now = [10_000]
+        first = ForecastCache(stale_seconds=1800, clock=lambda: now[0])
+        second = ForecastCache(stale_seconds=1800, clock=lambda: now[0])
+        first.put(51.5, -0.13, {"list": ["old"]})
+        assert second.get(51.5, -0.13) == {"list": ["old"]}
+
+        now[0] = 10_900
+        first.put(51.5, -0.13, {"list": ["new"]})
+        hit = second.lookup_entry(WeatherQuery.by_coordinates("forecast", 51.5, -0.13).cache_key(), "test")
+        assert hit.value == {"list": ["new"]}
+        assert (hit.stale, hit.shared) == (False, True)
+
+    def test_models_shared(self, tmp_path):
+        """A cached forecast model is shared as JSON and is a model again in the other worker."""
+        configure_shared_cache(str(tmp_path / "cache.bin"))
+        with open(os.path.join(FIXTURES, "forecast.json"), "rb") as f:
+            model = compact_payload("forecast", decode_json(f.read()))
+        first, second = ForecastCache(), ForecastCache()
+        first.put(51.5, -0.13, model)
+        shared = second.get(51.5, -0.13)
+        assert isinstance(shared, CachedForecast) and shared is not model
+        assert shared.to_payload() == model.to_payload()
+
+    def test_forked_worker_fills_parent_cache(self, tmp_path):
+        """An observation fetched in another process is served without a request here."""
+        path = str(tmp_path / "cache.bin")
+        configure_shared_cache(path)
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        worker = context.Process(target=remember_in_child, args=(path,))
+        worker.start()
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+        assert cached_observation("Oslo", "action_fetch_weather").json()["main"]["temp"] == 9.0
+        assert get_observation_stats()["shared_hits"] == 1
+        assert get_shared_cache_stats()["enabled"] is True
+
+    def test_disabled_by_default(self):
+        """Without a path the caches stay per process."""
+        assert get_shared_cache_stats() == {"enabled": False}
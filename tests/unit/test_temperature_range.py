@@ -1,4 +1,5 @@
 # tests/test_temperature_range.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
@@ -21,11 +22,11 @@ class TestActionGetTemperatureRange:
     
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_run_without_location(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test handling of missing location."""
         self.tracker.get_slot.return_value = None
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="I couldn't find the location. Could you please provide it?"
         )
@@ -36,14 +37,14 @@ class TestActionGetTemperatureRange:
         """Test handling of missing API key."""
         mock_env_get.return_value = None
         self.tracker.get_slot.return_value = "London"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         self.dispatcher.utter_message.assert_called_once_with(
             text="Weather service is currently unavailable."
         )
     
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_run_today_range(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test temperature range for today."""
         mock_env_get.return_value = "fake_api_key"
@@ -67,7 +68,7 @@ class TestActionGetTemperatureRange:
         }.get(name)
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the response
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -78,7 +79,7 @@ class TestActionGetTemperatureRange:
     
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_run_today_min(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test minimum temperature for today."""
         mock_env_get.return_value = "fake_api_key"
@@ -102,7 +103,7 @@ class TestActionGetTemperatureRange:
         }.get(name)
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the response
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -112,7 +113,7 @@ class TestActionGetTemperatureRange:
     
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_run_today_max(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test maximum temperature for today."""
         mock_env_get.return_value = "fake_api_key"
@@ -136,7 +137,7 @@ class TestActionGetTemperatureRange:
         }.get(name)
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the response
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -146,7 +147,7 @@ class TestActionGetTemperatureRange:
     
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     @patch('actions.actions.datetime')
     def test_run_tomorrow_range(self, mock_datetime, mock_get, mock_env_get, mock_load_dotenv):
         """Test temperature range for tomorrow."""
@@ -189,7 +190,7 @@ class TestActionGetTemperatureRange:
         }.get(name)
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the response
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -199,7 +200,7 @@ class TestActionGetTemperatureRange:
     
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test handling of API errors."""
         mock_env_get.return_value = "fake_api_key"
@@ -213,7 +214,7 @@ class TestActionGetTemperatureRange:
         }.get(name)
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the error message
         message = self.dispatcher.utter_message.call_args[1]['text']
@@ -222,7 +223,7 @@ class TestActionGetTemperatureRange:
     
     @patch('actions.actions.load_dotenv')
     @patch('actions.actions.os.environ.get')
-    @patch('actions.actions.requests.get')
+    @patch('actions.actions.async_http_get')
     def test_api_error_status(self, mock_get, mock_env_get, mock_load_dotenv):
         """Test handling of API error status codes."""
         mock_env_get.return_value = "fake_api_key"
@@ -239,7 +240,7 @@ class TestActionGetTemperatureRange:
         }.get(name)
         
         # Run the action
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check the error message
         message = self.dispatcher.utter_message.call_args[1]['text']
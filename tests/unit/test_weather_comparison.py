@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from unittest.mock import MagicMock, patch
 from actions.actions_weather_extended import ActionGetWeatherComparison
@@ -9,7 +10,7 @@ class TestActionGetWeatherComparison:
         self.tracker = MagicMock()
         self.domain = {}
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_weather_comparison_warmer(self, mock_env_get, mock_requests_get):
         # Setup mocks
@@ -53,7 +54,7 @@ class TestActionGetWeatherComparison:
         mock_requests_get.side_effect = mock_get_side_effect
         
         self.tracker.get_slot.return_value = "London"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the comparison was reported correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -62,7 +63,7 @@ class TestActionGetWeatherComparison:
         assert "Yesterday: cloudy, 20.0°C" in call_args
         assert "Today is 5.0°C warmer than yesterday" in call_args
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_weather_comparison_cooler(self, mock_env_get, mock_requests_get):
         # Setup mocks
@@ -106,7 +107,7 @@ class TestActionGetWeatherComparison:
         mock_requests_get.side_effect = mock_get_side_effect
         
         self.tracker.get_slot.return_value = "London"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the comparison was reported correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -115,7 +116,7 @@ class TestActionGetWeatherComparison:
         assert "Yesterday: sunny, 22.0°C" in call_args
         assert "Today is 7.0°C cooler than yesterday" in call_args
     
-    @patch('actions.actions_weather_extended.requests.get')
+    @patch('actions.fetch_planner.async_http_get')
     @patch('actions.actions_weather_extended.os.environ.get')
     def test_weather_comparison_same(self, mock_env_get, mock_requests_get):
         # Setup mocks
@@ -159,7 +160,7 @@ class TestActionGetWeatherComparison:
         mock_requests_get.side_effect = mock_get_side_effect
         
         self.tracker.get_slot.return_value = "London"
-        self.action.run(self.dispatcher, self.tracker, self.domain)
+        asyncio.run(self.action.run(self.dispatcher, self.tracker, self.domain))
         
         # Check that the comparison was reported correctly
         call_args = self.dispatcher.utter_message.call_args[1]['text']
@@ -1,4 +1,5 @@
 # tests/test_weather_forecast_uv_integration.py
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 import datetime
@@ -38,7 +39,7 @@ class TestWeatherForecastUVIntegration:
         
         with patch('actions.actions.load_dotenv'), \
              patch('actions.actions.os.environ.get') as mock_env_get, \
-             patch('actions.actions.requests.get') as mock_requests_get, \
+             patch('actions.fetch_planner.async_http_get') as mock_requests_get, \
              patch('actions.actions.datetime') as mock_datetime:
             
             # Set up datetime mock
@@ -95,7 +96,7 @@ class TestWeatherForecastUVIntegration:
             tracker.get_slot.side_effect = lambda name: "London" if name == "location" else 2
             
             # Run the action
-            action.run(dispatcher, tracker, domain)
+            asyncio.run(action.run(dispatcher, tracker, domain))
             
             # Check that the message was sent with correct UV information
             dispatcher.utter_message.assert_called_once()
@@ -0,0 +1,192 @@
+# tests/test_weather_models.py
+import datetime
+import json
+import math
+import os
+import asyncio
+from array import array
+from unittest.mock import patch
+from actions.weather_models import (
+    CachedForecast, CurrentObservation, UVSeries, compact_payload, expand_payload, from_shared, to_shared
+)
+from actions.weather_payloads import (
+    AirQualitySeries, DAILY_SUMMARIES_KEY, PackedDays, air_quality_series, decode_json, encode_json,
+    forecast_summary, materialize_air_quality_series
+)
+from actions.weather_utils import (
+    WeatherQuery, cached_forecast, estimate_size, parsed_response, read_cached_query, remember_cached_query,
+    remember_forecast, response_data
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures", "openweather")
+
+OBSERVATION = {
+    "coord": {"lon": -0.1257, "lat": 51.5085},
+    "weather": [{"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}],
+    "base": "stations",
+    "main": {"temp": 14.2, "feels_like": 13.9, "temp_min": 13.0, "temp_max": 15.1, "pressure": 1012, "humidity": 81},
+    "visibility": 10000,
+    "wind": {"speed": 4.6, "deg": 240},
+    "rain": {"1h": 0.3},
+    "clouds": {"all": 75},
+    "dt": 1686830400,
+    "sys": {"type": 2, "id": 2075535, "country": "GB", "sunrise": 1686800591, "sunset": 1686860446},
+    "timezone": 3600,
+    "id": 2643743,
+    "name": "London",
+    "cod": 200,
+}
+UV_FORECAST = [{"lat": 51.51, "lon": -0.13, "date_iso": "2023-06-16T12:00:00Z", "date": 1686916800, "value": 6.5},
+               {"lat": 51.51, "lon": -0.13, "date_iso": "2023-06-17T12:00:00Z", "date": 1687003200, "value": 5.8}]
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return decode_json(f.read())
+
+
+class TestWeatherModels:
+    """Tests for the compact models the caches hold."""
+
+    def test_observation_round_trip(self):
+        """An observation keeps the fields the actions read, in the /weather layout, and drops the rest."""
+        model = compact_payload("current_weather", json.loads(json.dumps(OBSERVATION)))
+        assert isinstance(model, CurrentObservation)
+        assert not hasattr(model, "__dict__")
+        body = model.to_payload()
+        assert body["main"] == OBSERVATION["main"]
+        assert body["weather"] == OBSERVATION["weather"]
+        assert body["wind"] == OBSERVATION["wind"]
+        assert body["sys"] == {"country": "GB", "sunrise": 1686800591, "sunset": 1686860446}
+        assert (body["name"], body["dt"], body["rain"]) == ("London", 1686830400, {"1h": 0.3})
+        assert "base" not in body and "cod" not in body and "snow" not in body
+        assert CurrentObservation.from_payload({"main": {}}).to_payload() == {"main": {}}
+
+    def test_strings_interned(self):
+        """Repeated strings are held once, however many cities are cached."""
+        first = CurrentObservation.from_payload(json.loads(json.dumps(OBSERVATION)))
+        second = CurrentObservation.from_payload(json.loads(json.dumps(OBSERVATION)))
+        assert first.description is second.description
+        assert first.name is second.name
+        forecasts = [CachedForecast.from_payload(load_fixture("forecast.json")) for _ in range(2)]
+        assert forecasts[0].index.description[0] is forecasts[1].index.description[0]
+        assert forecasts[0].city.name is forecasts[1].city.name
+
+    def test_forecast_round_trip(self):
+        """A forecast is rebuilt with the fields the actions read and the same daily summaries."""
+        payload = load_fixture("forecast.json")
+        model = compact_payload("forecast", payload)
+        assert isinstance(model, CachedForecast)
+        assert isinstance(model.index.temp, array)
+        body = model.to_payload()
+        assert body[DAILY_SUMMARIES_KEY] == payload[DAILY_SUMMARIES_KEY]
+        assert body["city"]["name"] == payload["city"]["name"]
+        assert body["city"]["coord"] == payload["city"]["coord"]
+        first, original = body["list"][0], payload["list"][0]
+        assert first["dt"] == original["dt"]
+        assert first["main"]["temp"] == original["main"]["temp"]
+        assert first["weather"] == [{"id": original["weather"][0]["id"],
+                                     "description": original["weather"][0]["description"]}]
+        assert first["wind"] == original["wind"]
+        assert len(body["list"]) == len(payload["list"])
+        # Summarising the rebuilt body again gives the same days
+        rebuilt = decode_json(encode_json(body))
+        del rebuilt[DAILY_SUMMARIES_KEY]
+        date = datetime.date(2023, 6, 16)
+        assert forecast_summary(rebuilt).day(date) == forecast_summary(payload).day(date)
+
+    def test_uv_round_trip(self):
+        """Current UV and the UV forecast keep their shapes."""
+        forecast = compact_payload("uv_forecast", json.loads(json.dumps(UV_FORECAST)))
+        assert isinstance(forecast, UVSeries)
+        assert forecast.to_payload() == UV_FORECAST
+        current = compact_payload("uv_index", dict(UV_FORECAST[0]))
+        assert current.to_payload() == UV_FORECAST[0]
+        assert math.isnan(UVSeries.from_payload([{"date": 1686916800}]).value[0])
+        assert UVSeries.from_payload([{"date": 1686916800}]).to_payload() == [
+            {"date_iso": "2023-06-16T12:00:00Z", "date": 1686916800}]
+
+    def test_air_quality_round_trip(self):
+        """An air quality forecast keeps its series and days; current air quality its hour."""
+        payload = load_fixture("air_pollution_forecast.json")
+        series = materialize_air_quality_series(payload, utc_offset=3600)
+        body = decode_json(encode_json(series.to_payload()))
+        assert body == {"coord": payload["coord"], "hourly_series": payload["hourly_series"]}
+        date = datetime.date(2023, 6, 16)
+        assert AirQualitySeries.from_payload(body).day(date) == series.day(date)
+
+        current = compact_payload("air_pollution", {"coord": payload["coord"], "list": payload["list"][:1]})
+        assert current.dates() == []
+        assert current.to_payload()["list"][0]["main"] == payload["list"][0]["main"]
+        assert AirQualitySeries.from_payload({"list": [{"main": {"aqi": 2}}]}).to_payload() == {
+            "list": [{"main": {"aqi": 2}, "components": {}}]}
+
+    def test_unexpected_bodies_kept(self):
+        """Bodies that are not shaped like the endpoint's response are cached as they are."""
+        assert compact_payload("forecast", {"cod": "404"}) == {"cod": "404"}
+        assert compact_payload("uv_forecast", {"value": 1}) == {"value": 1}
+        assert compact_payload("timemachine", {"data": []}) == {"data": []}
+        assert expand_payload({"list": []}) == {"list": []}
+
+    def test_shared_encoding(self):
+        """Models travel between workers as tagged JSON and come back as models."""
+        model = CachedForecast.from_payload(load_fixture("forecast.json"))
+        shared = decode_json(encode_json(to_shared(model)))
+        assert shared["__model__"] == "forecast"
+        restored = from_shared(shared)
+        assert isinstance(restored, CachedForecast)
+        assert restored.to_payload() == model.to_payload()
+        assert from_shared({"list": []}) == {"list": []}
+
+    def test_packed_days(self):
+        """Daily records are packed one column per field and unpacked with their types."""
+        days = {"2023-06-15": {"hours": 9, "mean": 2.5, "peak": None, "label": "fair", "nested": {"noon": 1.5}},
+                "2023-06-16": {"hours": 24, "mean": 3.0, "peak": 4, "label": "poor", "nested": {"noon": None}}}
+        packed = PackedDays(days)
+        assert "2023-06-16" in packed
+        assert packed.to_dict() == days
+        assert isinstance(packed.record("2023-06-16")["hours"], int)
+        assert packed.record("2023-06-17") is None
+        assert list(packed) == list(days)
+        assert packed.get("2023-06-15") == days["2023-06-15"]
+        assert packed.get("2023-06-17") is None
+
+    def test_forecast_hits_read_as_models(self):
+        """A forecast hit is summarised from its packed days; the body is only rebuilt if asked for."""
+        payload = load_fixture("forecast.json")
+        expected = forecast_summary(load_fixture("forecast.json"))
+        remember_forecast(parsed_response(payload), lat=51.51, lon=-0.13)
+        hit = cached_forecast("test", lat=51.51, lon=-0.13)
+        date = datetime.date(2023, 6, 16)
+        with patch.object(CachedForecast, "to_payload", side_effect=AssertionError("body rebuilt")):
+            summary = forecast_summary(response_data(hit))
+            assert summary.day(date) == expected.day(date)
+            assert summary.dates(date, 3) == expected.dates(date, 3)
+            assert summary.first_date == expected.first_date
+            assert summary.alerts == expected.alerts
+        assert hit.json()[DAILY_SUMMARIES_KEY] == payload[DAILY_SUMMARIES_KEY]
+
+    def test_air_quality_hits_read_as_models(self):
+        """An air quality hit at the requested UTC offset is used as it is; another offset re-reduces it."""
+        query = WeatherQuery.by_coordinates("air_pollution_forecast", 51.51, -0.13)
+        remember_cached_query(query, parsed_response(load_fixture("air_pollution_forecast.json")), utc_offset=3600)
+
+        async def fail():
+            raise AssertionError("fetched")
+
+        hit = asyncio.run(read_cached_query(query, "test", fail, utc_offset=3600))
+        series = response_data(hit)
+        assert isinstance(series, AirQualitySeries)
+        with patch.object(AirQualitySeries, "to_payload", side_effect=AssertionError("body rebuilt")):
+            assert air_quality_series(series, utc_offset=3600) is series
+        other = air_quality_series(series, utc_offset=-18000)
+        assert other.utc_offset == -18000 and len(other) == len(series)
+
+    def test_models_are_smaller(self):
+        """Models are a fraction of the decoded bodies, and estimate_size sizes their slots and arrays."""
+        payload = load_fixture("forecast.json")
+        model = compact_payload("forecast", payload)
+        assert estimate_size(model) > estimate_size(model.index.temp) + estimate_size(model.city.name)
+        assert estimate_size(model) * 3 < estimate_size(payload)
+        observation = CurrentObservation.from_payload(OBSERVATION)
+        assert estimate_size(observation) * 2 < estimate_size(OBSERVATION)
@@ -0,0 +1,224 @@
+# tests/test_weather_payloads.py
+import datetime
+import json
+from dataclasses import asdict
+import math
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+import requests
+from actions import aggregation, weather_payloads
+from actions.weather_payloads import (
+    decode_json, decode_response, encode_json, index_forecast,
+    materialize_daily_summaries, forecast_summary, summarize_forecasts, DAILY_SUMMARIES_KEY,
+    air_quality_series, materialize_air_quality_series, AIR_QUALITY_SERIES_KEY
+)
+from actions.weather_utils import HTTPResult
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures", "openweather")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class TestWeatherPayloads:
+    """Tests for JSON decoding and field projection."""
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_decode_json(self, use_orjson):
+        """Both parsers decode bodies to the same structure."""
+        if use_orjson and not weather_payloads.has_orjson:
+            pytest.skip("orjson is not installed")
+        body = load_fixture("forecast.json")
+        with patch.object(weather_payloads, "has_orjson", use_orjson):
+            assert decode_json(body) == json.loads(body)
+
+    def test_decode_requests_response(self):
+        """requests responses are decoded from their raw content."""
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"list": []}'
+        assert decode_response(response) == {"list": []}
+
+    def test_decode_other_responses(self):
+        """Other responses are decoded through their json() method."""
+        result = HTTPResult(status_code=200, content=b'{"cnt": 40}', headers={})
+        assert decode_response(result) == {"cnt": 40}
+        assert decode_response(result) is result.json()
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"list": [1]}
+        assert decode_response(mock_response) == {"list": [1]}
+
+
+class TestForecastIndex:
+    """Tests for the columnar forecast index."""
+
+    def test_days_match_a_scan(self):
+        """Day and noon lookups find what scanning the list at the same offset finds."""
+        payload = decode_json(load_fixture("forecast.json"))
+        offset = payload["city"]["timezone"]
+        forecast = index_forecast(payload, utc_offset=offset)
+        assert len(forecast) == 40
+        assert forecast.first_date == datetime.date(2023, 6, 15)
+
+        def local(item):
+            return datetime.datetime.fromtimestamp(item["dt"] + offset, datetime.timezone.utc)
+
+        for date in forecast.dates(forecast.first_date, 10):
+            expected = [item["dt"] for item in payload["list"] if local(item).date() == date]
+            assert [forecast.dt[i] for i in forecast.day(date)] == expected
+            noon = [item["dt"] for item in payload["list"] if local(item).date() == date and 11 <= local(item).hour <= 13]
+            position = forecast.noon(date)
+            assert (forecast.dt[position] if position is not None else None) == (noon[0] if noon else None)
+        assert len(forecast.dates(forecast.first_date, 10)) == 6
+        assert forecast.day(datetime.date(2023, 6, 14)) == range(0)
+        assert forecast.noon(datetime.date(2023, 7, 1)) is None
+
+    def test_columns(self):
+        """Columns hold each entry's values; missing ones are marked rather than guessed."""
+        forecast = index_forecast({"list": [
+            {"dt_txt": "2024-01-02 12:00:00", "pop": 0.4, "snow": {"3h": 1.5}, "wind": {"speed": 3.0, "deg": 90}},
+            {"dt": 1704110400, "main": {"temp": 22.5, "temp_min": 20.0, "temp_max": 23.0},
+             "weather": [{"id": 500, "description": "light rain"}], "rain": {"3h": 0.5},
+             "wind": {"speed": 4.0, "deg": 180, "gust": 6.5}},
+        ]}, utc_offset=0)
+        # Sorted by time; dt_txt is read as UTC
+        assert list(forecast.dt) == [1704110400, 1704196800]
+        assert forecast.temp[0] == 22.5 and math.isnan(forecast.temp[1])
+        assert list(forecast.pop) == [0.0, 0.4]
+        assert forecast.rain[0] == 0.5 and math.isnan(forecast.rain[1])
+        assert forecast.reported(forecast.snow, range(2)) == [1.5]
+        assert list(forecast.wind_deg) == [180, 90]
+        assert forecast.wind_gust[0] == 6.5 and math.isnan(forecast.wind_gust[1])
+        assert list(forecast.condition_id) == [500, 0]
+        assert forecast.description == ["light rain", ""]
+        assert forecast.noon(datetime.date(2024, 1, 2)) == 1
+
+    def test_untimed_entries(self):
+        """Entries without a time keep their order but are not placed on any day."""
+        forecast = index_forecast({"list": [{"weather": [{"id": 800}]}, {"weather": [{"id": 211}]}]}, utc_offset=0)
+        assert list(forecast.condition_id) == [800, 211]
+        assert forecast.first_date is None
+        assert forecast.day(datetime.date(2024, 1, 1)) == range(0)
+        assert index_forecast({"list": []}).dates(datetime.date(2024, 1, 1), 3) == []
+
+
+class TestDailySummary:
+    """Tests for the per-day forecast summaries."""
+
+    def test_fixture_days(self):
+        """Each day of the city's local calendar is summarised from its own entries."""
+        payload = decode_json(load_fixture("forecast.json"))
+        summary = materialize_daily_summaries(payload)
+        assert summary.utc_offset == 3600
+        assert summary.first_date == datetime.date(2023, 6, 15)
+
+        date = datetime.date(2023, 6, 16)
+        local = datetime.timezone(datetime.timedelta(seconds=3600))
+        items = [item for item in payload["list"]
+                 if datetime.datetime.fromtimestamp(item["dt"], local).date() == date]
+        noon = next(item for item in items if 11 <= datetime.datetime.fromtimestamp(item["dt"], local).hour <= 13)
+        day = summary.day(date)
+        assert day.entries == len(items) == 8
+        assert day.temp_min == min(item["main"]["temp_min"] for item in items)
+        assert day.temp_max == max(item["main"]["temp_max"] for item in items)
+        assert day.noon_temp == noon["main"]["temp"]
+        assert day.noon_description == noon["weather"][0]["description"]
+        assert day.noon_wind_deg == noon["wind"]["deg"]
+        assert day.pop_mean == pytest.approx(sum(item.get("pop", 0) for item in items) / 8)
+        assert day.wind_speed_max == max(item["wind"]["speed"] for item in items)
+        rain = [item["rain"]["3h"] for item in items if "rain" in item]
+        assert day.rain == (pytest.approx(sum(rain)) if rain else None)
+        assert summary.dates(datetime.date(2023, 6, 15), 10) == [datetime.date(2023, 6, d) for d in range(15, 21)]
+        assert summary.day(datetime.date(2023, 6, 21)) is None
+
+    def test_stored_in_payload(self):
+        """The summaries are plain JSON in the payload, read back without summarising again."""
+        payload = decode_json(load_fixture("forecast.json"))
+        materialize_daily_summaries(payload)
+        cached = decode_json(encode_json(payload))
+        with patch.object(weather_payloads, "materialize_daily_summaries", side_effect=AssertionError):
+            summary = forecast_summary(cached)
+        assert summary.day(datetime.date(2023, 6, 17)) == forecast_summary(payload).day(datetime.date(2023, 6, 17))
+        assert DAILY_SUMMARIES_KEY not in decode_json(load_fixture("forecast.json"))
+
+    @pytest.mark.skipif(not aggregation.has_numpy, reason="numpy is not installed")
+    def test_batch_matches_single(self, monkeypatch):
+        """Summarising many forecasts at once (vectorised) gives each the summaries it gets on its own."""
+        single = materialize_daily_summaries(decode_json(load_fixture("forecast.json")))
+        monkeypatch.setattr(aggregation, "VECTORIZE_MIN_ENTRIES", 0)
+        batch = summarize_forecasts([decode_json(load_fixture("forecast.json")) for _ in range(3)])
+        for summary in batch:
+            for date in single.dates(single.first_date, 10):
+                expected, actual = asdict(single.day(date)), asdict(summary.day(date))
+                assert actual == pytest.approx(expected)
+
+    def test_alerts_and_local_today(self):
+        """Severe weather is collected from the first 24 hours, and today is the city's date."""
+        items = [{"dt": 1686830400 + i * 10800, "weather": [{"id": condition, "description": f"id {condition}"}],
+                  "wind": {"speed": 25.0 if condition == 800 else 3.0}}
+                 for i, condition in enumerate([211, 211, 800, 741, 701, 803, 503, 804, 602])]
+        summary = forecast_summary({"city": {"timezone": -14400}, "list": items})
+        assert summary.alerts == ["Thunderstorm", "Strong winds", "id 741", "Heavy rain"]
+        assert summary.day(datetime.date(2023, 6, 15)).condition == "id 211"
+
+        now = datetime.datetime(2023, 6, 16, 2, 30, tzinfo=datetime.timezone.utc)
+        assert summary.today(now) == datetime.date(2023, 6, 15)
+        assert summary.today(now, days=1) == datetime.date(2023, 6, 16)
+
+
+class TestAirQualitySeries:
+    """Tests for the hourly air quality series and its daily reductions."""
+
+    def test_fixture_days(self):
+        """Every local day gets the AQI mode, mean and peak and each pollutant's noon, mean and peak."""
+        payload = decode_json(load_fixture("air_pollution_forecast.json"))
+        series = materialize_air_quality_series(payload, utc_offset=3600)
+        assert len(series) == 96
+        assert series.dates()[0] == datetime.date(2023, 6, 15)
+
+        date = datetime.date(2023, 6, 16)
+        local = datetime.timezone(datetime.timedelta(seconds=3600))
+        items = [item for item in payload["list"]
+                 if datetime.datetime.fromtimestamp(item["dt"], local).date() == date]
+        aqi = [item["main"]["aqi"] for item in items]
+        noon = next(item for item in items if datetime.datetime.fromtimestamp(item["dt"], local).hour == 11)
+        day = series.day(date)
+        assert day.hours == len(items) == 24
+        assert day.aqi_mode == min(set(aqi), key=lambda value: (-aqi.count(value), value))
+        assert day.aqi_mean == pytest.approx(sum(aqi) / 24)
+        assert day.aqi_max == max(aqi)
+        assert day.pollutants["pm2_5"]["noon"] == noon["components"]["pm2_5"]
+        assert day.pollutants["so2"]["max"] == max(item["components"]["so2"] for item in items)
+        assert series.day(datetime.date(2023, 6, 25)) is None
+
+    def test_current_hour(self):
+        """The hour containing a time is found by bisection and read back as an /air_pollution entry."""
+        payload = decode_json(load_fixture("air_pollution_forecast.json"))
+        series = air_quality_series(payload)
+        first = payload["list"][0]
+        assert series.hour(first["dt"] + 1800) == 0
+        assert series.hour(first["dt"] - 1) is None
+        assert series.hour(payload["list"][-1]["dt"] + 3600) is None
+        assert series.entry(series.hour(payload["list"][5]["dt"])) == {
+            "dt": payload["list"][5]["dt"], "main": payload["list"][5]["main"],
+            "components": {name: payload["list"][5]["components"][name] for name in weather_payloads.AIR_COMPONENTS},
+        }
+
+    def test_stored_series_re_reduced(self):
+        """The series is plain JSON; asked for another UTC offset it is reduced again from its own columns."""
+        payload = {"list": [{"dt": 1686787200 + hour * 3600, "main": {"aqi": 1 if hour < 20 else 5},
+                             "components": {"pm2_5": float(hour)}} for hour in range(48)]}
+        materialize_air_quality_series(payload, utc_offset=0)
+        cached = decode_json(encode_json({AIR_QUALITY_SERIES_KEY: payload[AIR_QUALITY_SERIES_KEY]}))
+        with patch.object(weather_payloads, "materialize_air_quality_series", side_effect=AssertionError):
+            assert air_quality_series(cached, utc_offset=0).day(datetime.date(2023, 6, 15)).aqi_max == 5
+        shifted = air_quality_series(cached, utc_offset=6 * 3600)
+        assert shifted.day(datetime.date(2023, 6, 15)).aqi_max == 1
+        assert shifted.day(datetime.date(2023, 6, 15)).pollutants["no2"] == {"noon": None, "mean": None, "max": None}
+        assert cached[AIR_QUALITY_SERIES_KEY]["utc_offset"] == 6 * 3600
+        with pytest.raises(KeyError):
+            materialize_air_quality_series({"list": [{"dt": 1686787200, "main": {}}]})
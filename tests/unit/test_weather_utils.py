@@ -1,4 +1,9 @@
 # tests/test_weather_utils.py
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pytest
 from unittest.mock import patch, MagicMock
 import logging
@@ -8,8 +13,27 @@ from actions.weather_utils import (
     WeatherService, WeatherAPIError, UVInfo, fetch_with_retry,
     get_coordinates, get_uv_level, get_protection_advice,
     validate_env_vars, get_api_key, fetch_current_weather,
-    fetch_weather_forecast, has_tenacity, API_ENDPOINTS
+    fetch_weather_forecast, has_tenacity, API_ENDPOINTS,
+    create_http_session, get_http_session, close_http_session, http_get,
+    AsyncWeatherService, async_http_get, async_get_coordinates,
+    close_async_http_session, SingleFlight, canonical_request_key,
+    get_coalescing_stats, HTTPResult, WeatherAPIDeadlineError, LatencyBudget,
+    latency_budget, current_latency_budget, with_latency_budget,
+    async_fetch_with_retry, EndpointLatencyTracker, QuotaManager, QuotaExceededError,
+    quota_priority, parse_retry_after, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND,
+    PRIORITY_PREFETCH, CircuitBreaker, CircuitOpenError, endpoint_family,
+    get_circuit_breaker, get_circuit_stats, get_upstream_diagnostics,
+    CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN, GeocodeCache, GeocodeEntry,
+    normalize_location, cached_geocode, remember_geocode, geocode_response,
+    get_geocode_stats, ObservationCache, cached_observation, remember_observation,
+    get_observation_stats, ForecastCache, canonical_coordinates, cached_forecast, remember_forecast,
+    get_forecast_cache_stats, WeatherQuery, convert_temperature, ExpiringCache, read_cached_query,
+    read_observation, configure_air_quality_cache, configure_observation_cache, get_air_quality_cache_stats,
+    UnresolvedLocationCache, unresolved_location, get_unresolved_location_stats, CacheBudget, FrequencySketch,
+    estimate_size, get_cache_memory_stats, QueryCache, remember_cached_query, configure_circuit_breakers,
+    LastGoodResponses
 )
+from actions.weather_payloads import materialize_daily_summaries
 
 class TestWeatherUtils:
     """Tests for the weather_utils.py module."""
@@ -46,9 +70,9 @@ class TestWeatherUtils:
         coords = get_coordinates("NonExistentCity", "test_key")
         assert coords is None
         
-        # Test exception
+        # Test exception (London is cached by now, so use a location that is not)
         mock_fetch.side_effect = Exception("Test error")
-        coords = get_coordinates("London", "test_key")
+        coords = get_coordinates("Paris", "test_key")
         assert coords is None
     
     def test_weather_service_methods(self):
@@ -130,7 +154,7 @@ class TestWeatherUtils:
     def test_fetch_weather_functions(self):
         """Test the fetch_current_weather and fetch_weather_forecast functions."""
         with patch('actions.weather_utils.get_api_key') as mock_get_key, \
-             patch('actions.weather_utils.requests.get') as mock_get:
+             patch('actions.weather_utils.http_get') as mock_get:
             
             # Test with missing API key
             mock_get_key.return_value = None
@@ -168,8 +192,24 @@ class TestWeatherUtils:
             assert status == 500
             assert data is None
     
+    def test_fetch_weather_functions_cached(self):
+        """fetch_current_weather and fetch_weather_forecast share the observation and forecast caches."""
+        observation = MagicMock(status_code=200)
+        observation.json.return_value = {"coord": {"lat": 48.85, "lon": 2.35}, "main": {"temp": 18.0}, "name": "Paris"}
+        forecast = MagicMock(status_code=200)
+        forecast.json.return_value = {"list": [{"dt": 1686830400, "main": {"temp": 19.0}}],
+                                      "city": {"coord": {"lat": 48.85, "lon": 2.35}, "timezone": 7200}}
+        with patch('actions.weather_utils.get_api_key', return_value="test_key"), \
+             patch('actions.weather_utils.http_get', side_effect=[observation, forecast]) as mock_get:
+            for _ in range(2):
+                status, data = fetch_current_weather("Paris")
+                assert (status, data["main"]["temp"]) == (200, 18.0)
+                status, data = fetch_weather_forecast("Paris")
+                assert (status, data["list"][0]["main"]["temp"]) == (200, 19.0)
+        assert mock_get.call_count == 2
+
     @patch('actions.weather_utils.has_tenacity', False)
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_without_tenacity(self, mock_get):
         """Test the fetch_with_retry function when tenacity is not available."""
         mock_response = MagicMock()
@@ -183,7 +223,7 @@ class TestWeatherUtils:
             assert response == mock_response
             mock_get.assert_called_once_with("http://example.com", timeout=10)
 
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_with_retry_success(self, mock_get):
         """Test successful API request with retry logic."""
         # Setup mock response
@@ -198,7 +238,7 @@ class TestWeatherUtils:
         assert result == mock_response
         mock_get.assert_called_once_with("http://test-url.com", timeout=10)
     
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     @patch('actions.weather_utils.has_tenacity', True)
     @patch('tenacity.retry')
     def test_fetch_with_retry_with_tenacity(self, mock_retry, mock_get):
@@ -216,7 +256,7 @@ class TestWeatherUtils:
         mock_get.assert_called_once_with("http://test-url.com", timeout=10)
     
     @patch('actions.weather_utils.has_tenacity', False)
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_without_tenacity(self, mock_get):
         """Test the fetch_with_retry function when tenacity is not available."""
         mock_response = MagicMock()
@@ -226,7 +266,7 @@ class TestWeatherUtils:
         assert response == mock_response
         mock_get.assert_called_once_with("http://example.com", timeout=10)
 
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_with_retry_timeout(self, mock_get):
         """Test handling of timeout errors."""
         # Setup mock to raise timeout exception
@@ -241,7 +281,7 @@ class TestWeatherUtils:
             # With tenacity, we'd need more complex mocking to test retries
             pass
     
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_with_retry_connection_error(self, mock_get):
         """Test handling of connection errors."""
         # Setup mock to raise connection exception
@@ -256,7 +296,7 @@ class TestWeatherUtils:
             pass
 
     @patch('actions.weather_utils.has_tenacity', True)
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_with_tenacity(self, mock_get):
         """Test fetch_with_retry with tenacity enabled."""
         mock_response = MagicMock()
@@ -289,7 +329,7 @@ class TestWeatherUtils:
             assert "openweathermap.org" in endpoint
     
     # Test for line 43 (fetch_with_retry function)
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_with_retry(self, mock_get):
         """Test fetch_with_retry function (line 43)."""
         # Setup mock
@@ -304,7 +344,7 @@ class TestWeatherUtils:
         mock_get.assert_called_once_with("http://test-url.com", timeout=10)
     
     # Test for line 45 (fetch_with_retry error handling)
-    @patch('actions.weather_utils.requests.get')
+    @patch('actions.weather_utils.http_get')
     def test_fetch_with_retry_error(self, mock_get):
         """Test fetch_with_retry error handling (line 45)."""
         # Setup mock to raise exception
@@ -356,3 +396,1336 @@ class TestWeatherUtils:
         # Test with API key missing
         mock_env_get.return_value = None
         assert get_api_key() is None
+
+
+class TestHttpSessionPool:
+    """Tests for the shared keep-alive HTTP session."""
+
+    def teardown_method(self):
+        close_http_session()
+
+    def test_get_http_session_is_shared(self):
+        """The same session object is returned on every call."""
+        session = get_http_session()
+        assert isinstance(session, requests.Session)
+        assert get_http_session() is session
+
+    def test_close_http_session_recreates(self):
+        """Closing the session makes the next call build a fresh one."""
+        session = get_http_session()
+        close_http_session()
+        assert get_http_session() is not session
+
+    def test_create_http_session_pool_size(self):
+        """The mounted adapters use the requested pool size."""
+        session = create_http_session(pool_maxsize=7, pool_connections=2)
+        adapter = session.get_adapter("http://api.openweathermap.org/data/2.5/weather")
+        assert adapter._pool_maxsize == 7
+        assert adapter._pool_connections == 2
+        assert session.get_adapter("https://api.openweathermap.org") is adapter
+        assert session.headers["Connection"] == "keep-alive"
+
+    def test_http_get_uses_shared_session(self):
+        """http_get sends the request through the shared session with a timeout."""
+        mock_response = MagicMock(status_code=200)
+        with patch.object(get_http_session(), "get", return_value=mock_response) as mock_get:
+            assert http_get("http://test-url.com") is mock_response
+            mock_get.assert_called_once_with("http://test-url.com", timeout=10)
+
+
+class TestAsyncWeatherClient:
+    """Tests for the non-blocking OpenWeather client."""
+
+    @patch('actions.weather_utils.has_aiohttp', False)
+    @patch('actions.weather_utils._send_get')
+    def test_async_http_get_thread_fallback(self, mock_get):
+        """Without aiohttp the request runs on the shared session in a worker thread."""
+        mock_response = MagicMock(status_code=200)
+        mock_get.return_value = mock_response
+
+        result = asyncio.run(async_http_get("http://test-url.com"))
+
+        assert result is mock_response
+        mock_get.assert_called_once_with("http://test-url.com", 10)
+
+    def test_async_http_get_aiohttp(self):
+        """With aiohttp the response is read into an HTTPResult."""
+        pytest.importorskip("aiohttp")
+        payload = json.dumps({"coord": {"lat": 1.5, "lon": 2.5}}).encode("utf-8")
+
+        class StubHandler(BaseHTTPRequestHandler):
+            def handle_get(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = handle_get
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        async def fetch():
+            try:
+                return await async_http_get(f"http://127.0.0.1:{server.server_address[1]}/weather")
+            finally:
+                await close_async_http_session()
+
+        try:
+            with patch('actions.weather_utils.has_aiohttp', True):
+                result = asyncio.run(fetch())
+        finally:
+            server.shutdown()
+
+        assert result.status_code == 200
+        assert result.json() == {"coord": {"lat": 1.5, "lon": 2.5}}
+        assert result.headers["Content-Type"] == "application/json"
+
+    @patch('actions.weather_utils.async_http_get')
+    def test_async_weather_service_methods(self, mock_get):
+        """AsyncWeatherService mirrors the WeatherService API."""
+        service = AsyncWeatherService("test_key")
+        mock_response = MagicMock(status_code=200)
+        mock_get.return_value = mock_response
+
+        mock_response.json.return_value = {"main": {"temp": 20}, "weather": [{"description": "clear"}]}
+        assert "main" in asyncio.run(service.get_current_weather("London"))
+        assert "units=metric" in mock_get.call_args[0][0]
+
+        mock_response.json.return_value = {"list": []}
+        assert "list" in asyncio.run(service.get_forecast("Paris"))
+
+        mock_response.json.return_value = {"value": 7.0}
+        uv_info = asyncio.run(service.get_uv_index(35.6, 139.6))
+        assert isinstance(uv_info, UVInfo)
+        assert uv_info.level == "High"
+
+        mock_response.json.return_value = [{"date": 1234567890, "value": 7.8}]
+        assert asyncio.run(service.get_uv_forecast(35.6, 139.6, days=2))[0]["value"] == 7.8
+        assert "cnt=3" in mock_get.call_args[0][0]
+
+    @patch('actions.weather_utils.async_http_get')
+    def test_async_weather_service_error_handling(self, mock_get):
+        """Non-200 responses raise WeatherAPIError."""
+        service = AsyncWeatherService("test_key")
+        mock_get.return_value = MagicMock(status_code=404)
+
+        with pytest.raises(WeatherAPIError):
+            asyncio.run(service.get_current_weather("NonExistentCity"))
+        with pytest.raises(WeatherAPIError):
+            asyncio.run(service.get_uv_index(0, 0))
+
+    @patch('actions.weather_utils.async_http_get')
+    def test_async_get_coordinates(self, mock_get):
+        """async_get_coordinates returns (lat, lon) or None on failure."""
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {"coord": {"lat": 51.5074, "lon": -0.1278}}
+        mock_get.return_value = mock_response
+        assert asyncio.run(async_get_coordinates("London", "test_key")) == (51.5074, -0.1278)
+
+        mock_response.status_code = 404
+        assert asyncio.run(async_get_coordinates("Nowhere", "test_key")) is None
+
+
+class TestSingleFlight:
+    """Tests for coalescing of identical in-flight upstream requests."""
+
+    def test_canonical_request_key(self):
+        """Host case and query parameter order do not change the key."""
+        assert canonical_request_key("http://API.example.com/weather?q=London&appid=k") == \
+            canonical_request_key("http://api.example.com/weather?appid=k&q=London")
+        assert canonical_request_key("http://api.example.com/weather?q=London") != \
+            canonical_request_key("http://api.example.com/weather?q=Paris")
+
+    def test_threads_share_one_call(self):
+        """Threads asking for the same key while it is in flight wait for the one call."""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch(value):
+            calls.append(value)
+            release.wait(5)
+            return {"value": value}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.call("key", slow_fetch, 1)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for _ in range(500):
+            if flight.stats()["coalesced_calls"] == 4:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert calls == [1]
+        assert len(results) == 5
+        assert all(result is results[0] for result in results)
+        assert flight.stats() == {"upstream_calls": 1, "coalesced_calls": 4}
+
+    def test_thread_call_not_cached_after_completion(self):
+        """Once a call has finished the next caller starts a new one."""
+        flight = SingleFlight()
+        assert flight.call("key", lambda: 1) == 1
+        assert flight.call("key", lambda: 2) == 2
+        assert flight.stats() == {"upstream_calls": 2, "coalesced_calls": 0}
+
+    def test_thread_call_shares_exception(self):
+        """An exception from the shared call is raised to the caller and the key is released."""
+        flight = SingleFlight()
+
+        def failing():
+            raise requests.exceptions.Timeout("slow upstream")
+
+        with pytest.raises(requests.exceptions.Timeout):
+            flight.call("key", failing)
+        assert flight.call("key", lambda: "ok") == "ok"
+
+    def test_coroutines_share_one_call(self):
+        """Coroutines asking for the same key on one loop share one upstream call."""
+        flight = SingleFlight()
+        calls = []
+
+        async def slow_fetch(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return {"value": value}
+
+        async def run_all():
+            return await asyncio.gather(
+                *(flight.call_async("key", slow_fetch, 1) for _ in range(5)),
+                flight.call_async("other", slow_fetch, 2),
+            )
+
+        results = asyncio.run(run_all())
+
+        assert calls == [1, 2]
+        assert all(result is results[0] for result in results[:5])
+        assert results[5] == {"value": 2}
+        assert flight.stats() == {"upstream_calls": 2, "coalesced_calls": 4}
+
+    def test_coroutine_cancellation_does_not_cancel_shared_call(self):
+        """A caller giving up does not cancel the call the other callers are waiting on."""
+        flight = SingleFlight()
+
+        async def slow_fetch():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run_all():
+            first = asyncio.ensure_future(flight.call_async("key", slow_fetch))
+            second = asyncio.ensure_future(flight.call_async("key", slow_fetch))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run_all()) == "done"
+
+    @patch('actions.weather_utils._send_get')
+    def test_http_get_is_coalesced(self, mock_send):
+        """http_get goes through the process-wide coalescing layer and counts upstream calls."""
+        mock_send.return_value = MagicMock(status_code=200)
+        before = get_coalescing_stats()
+
+        assert http_get("http://test-url.com?b=2&a=1").status_code == 200
+
+        mock_send.assert_called_once_with("http://test-url.com?b=2&a=1", 10)
+        assert get_coalescing_stats()["upstream_calls"] == before["upstream_calls"] + 1
+
+    @patch('actions.weather_utils._async_send_get')
+    def test_async_http_get_is_coalesced(self, mock_send):
+        """Concurrent identical async_http_get calls make one upstream request."""
+        async def slow_send(url, timeout):
+            await asyncio.sleep(0.05)
+            return HTTPResult(status_code=200, content=b'{"name": "London"}', headers={})
+
+        mock_send.side_effect = slow_send
+        before = get_coalescing_stats()
+
+        async def run_all():
+            return await asyncio.gather(*(async_http_get("http://test-url.com/weather?q=London") for _ in range(3)))
+
+        results = asyncio.run(run_all())
+
+        mock_send.assert_called_once()
+        assert results[0].json() is results[2].json()
+        assert get_coalescing_stats()["coalesced_calls"] == before["coalesced_calls"] + 2
+
+
+class TestLatencyBudget:
+    """Tests for the per-turn latency budget, deadline-aware retries and hedging."""
+
+    def test_timeout_is_clamped_to_remaining_budget(self):
+        """Request timeouts never exceed the time left in the budget."""
+        budget = LatencyBudget(3)
+        assert budget.timeout_for(10) <= 3
+        assert budget.timeout_for(1) == 1
+
+    def test_spent_budget_fails_fast(self):
+        """A spent budget raises a WeatherAPIError that actions also see as a request timeout."""
+        budget = LatencyBudget(0)
+        with pytest.raises(WeatherAPIDeadlineError) as excinfo:
+            budget.timeout_for(10)
+        assert isinstance(excinfo.value, WeatherAPIError)
+        assert isinstance(excinfo.value, requests.exceptions.Timeout)
+
+    def test_latency_budget_scope(self):
+        """A budget is only active inside its block and nested blocks reuse it unless told otherwise."""
+        assert current_latency_budget() is None
+        with latency_budget(5) as outer:
+            assert current_latency_budget() is outer
+            with latency_budget(1) as inner:
+                assert inner is outer
+            with latency_budget(1, reuse=False) as fresh:
+                assert fresh is not outer
+                assert current_latency_budget() is fresh
+            assert current_latency_budget() is outer
+        assert current_latency_budget() is None
+
+    def test_with_latency_budget_starts_budget_per_turn(self):
+        """Decorated action runs see a fresh budget that covers tasks they start."""
+        seen = []
+
+        @with_latency_budget
+        async def run():
+            async def fetch():
+                seen.append(current_latency_budget())
+            await asyncio.gather(fetch(), fetch())
+            return current_latency_budget()
+
+        budget = asyncio.run(run())
+        assert isinstance(budget, LatencyBudget)
+        assert seen == [budget, budget]
+
+    @patch('actions.weather_utils._async_send_get')
+    def test_async_http_get_uses_budget(self, mock_send):
+        """The transport timeout is clamped and a spent budget fails before sending."""
+        mock_send.return_value = MagicMock(status_code=200)
+
+        async def fetch(seconds):
+            with latency_budget(seconds):
+                return await async_http_get("http://test-url.com/budget")
+
+        asyncio.run(fetch(2))
+        assert mock_send.call_args[0][1] <= 2
+
+        mock_send.reset_mock()
+        with pytest.raises(WeatherAPIDeadlineError):
+            asyncio.run(fetch(0))
+        mock_send.assert_not_called()
+
+    @patch('actions.weather_utils.async_http_get')
+    def test_no_retry_without_budget_for_backoff(self, mock_get):
+        """A failure is not retried when the backoff would not leave time for another attempt."""
+        mock_get.side_effect = requests.exceptions.ConnectionError("Connection reset")
+
+        async def fetch():
+            with latency_budget(2.5):
+                return await async_fetch_with_retry("http://test-url.com")
+
+        start = time.monotonic()
+        with pytest.raises(WeatherAPIDeadlineError):
+            asyncio.run(fetch())
+        assert time.monotonic() - start < 1
+        mock_get.assert_called_once()
+
+    @patch('actions.weather_utils.http_get')
+    def test_sync_retry_respects_budget(self, mock_get):
+        """fetch_with_retry uses the same budget rules for thread callers."""
+        mock_get.side_effect = requests.exceptions.Timeout("Upstream timed out")
+
+        with latency_budget(2.5):
+            with pytest.raises(WeatherAPIDeadlineError):
+                fetch_with_retry("http://test-url.com")
+        mock_get.assert_called_once()
+
+    def test_latency_tracker_p95(self):
+        """p95 is only reported once enough samples were recorded."""
+        tracker = EndpointLatencyTracker(min_samples=20)
+        for i in range(19):
+            tracker.record("/data/2.5/weather", 0.01)
+        assert tracker.p95("/data/2.5/weather") is None
+        tracker.record("/data/2.5/weather", 1.0)
+        assert tracker.p95("/data/2.5/weather") == 1.0
+        assert tracker.p95("/data/2.5/forecast") is None
+
+    @patch('actions.weather_utils._async_send_get')
+    def test_slow_request_is_hedged(self, mock_send):
+        """A request slower than the endpoint's p95 is hedged and the faster answer wins."""
+        tracker = EndpointLatencyTracker(min_samples=20)
+        for _ in range(20):
+            tracker.record("/data/2.5/hedge", 0.02)
+        answers = iter([(1.0, "slow"), (0.0, "fast")])
+
+        async def send(url, timeout):
+            delay, body = next(answers)
+            await asyncio.sleep(delay)
+            return HTTPResult(status_code=200, content=json.dumps(body).encode(), headers={})
+
+        mock_send.side_effect = send
+
+        with patch('actions.weather_utils._endpoint_latency', tracker):
+            start = time.monotonic()
+            response = asyncio.run(async_http_get("http://test-url.com/data/2.5/hedge"))
+
+        assert response.json() == "fast"
+        assert time.monotonic() - start < 0.5
+        assert mock_send.call_count == 2
+        assert tracker.stats()["hedged_requests"] == 1
+
+    @patch('actions.weather_utils._async_send_get')
+    def test_fast_request_is_not_hedged(self, mock_send):
+        """Requests answering before the p95 are not duplicated."""
+        tracker = EndpointLatencyTracker(min_samples=20)
+        for _ in range(20):
+            tracker.record("/data/2.5/nohedge", 0.5)
+        mock_send.return_value = HTTPResult(status_code=200, content=b"{}", headers={})
+
+        with patch('actions.weather_utils._endpoint_latency', tracker):
+            asyncio.run(async_http_get("http://test-url.com/data/2.5/nohedge"))
+
+        mock_send.assert_called_once()
+        assert tracker.stats()["hedged_requests"] == 0
+
+
+class TestQuotaManager:
+    """Tests for the client-side OpenWeather quota manager."""
+
+    def test_lower_priorities_keep_reserve(self):
+        """Background and prefetch calls stop before they eat into the quota kept for user turns."""
+        quota = QuotaManager(per_minute=10, per_day=0)
+        for _ in range(5):
+            quota.acquire(PRIORITY_PREFETCH)
+        with pytest.raises(QuotaExceededError):
+            quota.acquire(PRIORITY_PREFETCH)
+        for _ in range(3):
+            quota.acquire(PRIORITY_BACKGROUND)
+        assert quota.stats()["remaining"]["per_minute"] == 2
+        quota.acquire(PRIORITY_INTERACTIVE)
+        quota.acquire(PRIORITY_INTERACTIVE)
+        assert quota.stats()["granted"] == {PRIORITY_PREFETCH: 5, PRIORITY_BACKGROUND: 3, PRIORITY_INTERACTIVE: 2}
+        assert quota.stats()["rejected"] == {PRIORITY_PREFETCH: 1}
+
+    def test_interactive_waits_for_refill(self):
+        """With the bucket empty an interactive call waits (bounded) for the next token."""
+        quota = QuotaManager(per_minute=600, per_day=0)
+        for _ in range(600):
+            quota.acquire()
+        start = time.monotonic()
+        quota.acquire()
+        assert 0.05 < time.monotonic() - start < 1
+        assert quota.stats()["throttled"] == {PRIORITY_INTERACTIVE: 1}
+
+    def test_wait_is_bounded_by_turn_budget(self):
+        """A call is rejected at once if the next token would arrive after the turn's deadline."""
+        quota = QuotaManager(per_minute=1, per_day=0)
+        quota.acquire()
+        with latency_budget(1):
+            start = time.monotonic()
+            with pytest.raises(QuotaExceededError):
+                quota.acquire()
+        assert time.monotonic() - start < 0.5
+
+    def test_async_acquire(self):
+        """Coroutines wait for tokens without blocking the event loop."""
+        quota = QuotaManager(per_minute=600, per_day=0)
+        for _ in range(600):
+            quota.acquire()
+
+        async def acquire_two():
+            await asyncio.gather(quota.acquire_async(), quota.acquire_async())
+
+        asyncio.run(acquire_two())
+        assert quota.stats()["granted"][PRIORITY_INTERACTIVE] == 602
+
+    def test_daily_limit(self):
+        """The per-day bucket limits calls even when the per-minute one has tokens."""
+        quota = QuotaManager(per_minute=100, per_day=2)
+        quota.acquire()
+        quota.acquire()
+        with pytest.raises(QuotaExceededError):
+            quota.acquire()
+        assert quota.stats()["remaining"] == {"per_minute": 98, "per_day": 0}
+
+    def test_rate_limit_pauses_calls(self):
+        """A 429 pauses every call for the Retry-After period."""
+        quota = QuotaManager(per_minute=100, per_day=0)
+        quota.observe(429, {"Retry-After": "30"})
+        stats = quota.stats()
+        assert stats["rate_limited"] == 1
+        assert 29 < stats["paused_for_seconds"] <= 30
+        with pytest.raises(QuotaExceededError):
+            quota.acquire(PRIORITY_BACKGROUND)
+        quota.observe(200, {"Retry-After": "300"})
+        assert quota.stats()["paused_for_seconds"] <= 30
+
+    def test_parse_retry_after(self):
+        """Retry-After may be given in seconds or as an HTTP date."""
+        assert parse_retry_after("120") == 120
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+    def test_quota_priority_scope(self):
+        """quota_priority sets the class used by calls in its block."""
+        quota = QuotaManager(per_minute=10, per_day=0)
+        with quota_priority(PRIORITY_BACKGROUND):
+            quota.acquire()
+        quota.acquire()
+        assert quota.stats()["granted"] == {PRIORITY_BACKGROUND: 1, PRIORITY_INTERACTIVE: 1}
+        with pytest.raises(ValueError):
+            with quota_priority("urgent"):
+                pass
+
+    def test_send_get_goes_through_quota(self):
+        """Upstream requests take a token and a 429 response starts a pause."""
+        quota = QuotaManager(per_minute=10, per_day=0)
+        mock_response = MagicMock(status_code=429, headers={"Retry-After": "5"})
+        with patch('actions.weather_utils._quota', quota), \
+             patch.object(get_http_session(), "get", return_value=mock_response):
+            assert http_get("http://test-url.com/quota").status_code == 429
+
+        stats = quota.stats()
+        assert stats["granted"] == {PRIORITY_INTERACTIVE: 1}
+        assert stats["rate_limited"] == 1
+        assert stats["paused_for_seconds"] > 4
+
+
+class TestCircuitBreaker:
+    """Tests for the per-endpoint circuit breakers."""
+
+    def test_opens_after_consecutive_failures(self):
+        """The breaker opens once the failure threshold is reached and then rejects calls."""
+        breaker = CircuitBreaker("uv_forecast", failure_threshold=3, reset_seconds=30)
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure("Timeout")
+        breaker.record_success()
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure("Timeout")
+        assert breaker.state == CIRCUIT_OPEN
+        assert not breaker.allow()
+        assert breaker.stats()["rejected_calls"] == 1
+
+    def test_half_open_trial_closes_on_success(self):
+        """After the reset period one trial call is let through and its success closes the breaker."""
+        breaker = CircuitBreaker("forecast", failure_threshold=1, reset_seconds=0.05, half_open_calls=1)
+        breaker.record_failure("HTTP 503")
+        assert not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CIRCUIT_CLOSED
+        transitions = [(t["from"], t["to"]) for t in breaker.stats()["transitions"]]
+        assert transitions == [(CIRCUIT_CLOSED, CIRCUIT_OPEN), (CIRCUIT_OPEN, CIRCUIT_HALF_OPEN),
+                               (CIRCUIT_HALF_OPEN, CIRCUIT_CLOSED)]
+
+    def test_half_open_trial_failure_reopens(self):
+        """A failed trial call opens the breaker again."""
+        breaker = CircuitBreaker("forecast", failure_threshold=1, reset_seconds=0.05)
+        breaker.record_failure("HTTP 503")
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_failure("Timeout")
+        assert breaker.state == CIRCUIT_OPEN
+        assert not breaker.allow()
+
+    def test_released_trial_can_be_retried(self):
+        """A trial call that ended without an outcome frees its slot."""
+        breaker = CircuitBreaker("forecast", failure_threshold=1, reset_seconds=0.05)
+        breaker.record_failure("HTTP 503")
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+    def test_endpoint_family(self):
+        """URLs map to their API_ENDPOINTS family, or to their path."""
+        assert endpoint_family("http://api.openweathermap.org/data/2.5/weather?q=London") == "current_weather"
+        assert endpoint_family("http://api.openweathermap.org/data/2.5/uvi/forecast?lat=1&lon=2") == "uv_forecast"
+        assert endpoint_family("https://api.openweathermap.org/data/2.5/onecall/timemachine?dt=1") == "weather_history"
+        assert endpoint_family("http://example.com/other") == "/other"
+
+    @patch('actions.weather_utils._send_get')
+    def test_http_get_fails_fast_when_open(self, mock_send):
+        """Once open, calls fail fast without reaching upstream."""
+        mock_send.side_effect = requests.exceptions.ConnectionError("Connection refused")
+        url = "http://api.openweathermap.org/data/2.5/uvi/forecast?lat=1&lon=2"
+        for _ in range(5):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                http_get(url)
+        assert get_circuit_breaker("uv_forecast").state == CIRCUIT_OPEN
+
+        with pytest.raises(CircuitOpenError):
+            http_get(url)
+        assert mock_send.call_count == 5
+
+    @patch('actions.weather_utils._send_get')
+    def test_open_circuit_serves_last_good_response(self, mock_send):
+        """Required calls to an open endpoint get its last good response when there is one."""
+        good = MagicMock(status_code=200)
+        url = "http://api.openweathermap.org/data/2.5/forecast?q=London"
+        mock_send.return_value = good
+        http_get(url)
+
+        mock_send.return_value = MagicMock(status_code=503)
+        for _ in range(5):
+            http_get(url)
+        assert get_circuit_breaker("forecast").state == CIRCUIT_OPEN
+
+        assert http_get(url) is good
+        assert mock_send.call_count == 6
+
+    @patch('actions.weather_utils._send_get')
+    def test_client_errors_do_not_trip(self, mock_send):
+        """4xx answers and client-side quota errors say nothing about the endpoint's health."""
+        mock_send.return_value = MagicMock(status_code=404)
+        url = "http://api.openweathermap.org/data/2.5/weather?q=Nowhere"
+        for _ in range(6):
+            http_get(url)
+        mock_send.side_effect = QuotaExceededError("quota exhausted")
+        for _ in range(6):
+            with pytest.raises(QuotaExceededError):
+                http_get(url)
+        assert get_circuit_stats()["current_weather"]["state"] == CIRCUIT_CLOSED
+
+    @patch('actions.weather_utils._hedged_send_get')
+    def test_async_calls_use_breaker(self, mock_send):
+        """async_http_get goes through the same breakers."""
+        mock_send.side_effect = requests.exceptions.Timeout("slow")
+        url = "https://api.openweathermap.org/data/2.5/onecall/timemachine?dt=1"
+
+        async def call():
+            return await async_http_get(url)
+
+        for _ in range(5):
+            with pytest.raises(requests.exceptions.Timeout):
+                asyncio.run(call())
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(call())
+        assert mock_send.call_count == 5
+
+    @patch('actions.weather_utils._send_get')
+    def test_configured_thresholds_apply(self, mock_send):
+        """Breakers created after configure_circuit_breakers use its thresholds."""
+        configure_circuit_breakers(failure_threshold=1, reset_seconds=60)
+        breaker = get_circuit_breaker("uv_index")
+        assert (breaker.failure_threshold, breaker.reset_seconds) == (1, 60)
+
+        mock_send.side_effect = requests.exceptions.ConnectionError("refused")
+        url = "http://api.openweathermap.org/data/2.5/uvi?lat=1&lon=2"
+        with pytest.raises(requests.exceptions.ConnectionError):
+            http_get(url)
+        with pytest.raises(CircuitOpenError, match="retry in (59|60)s"):
+            http_get(url)
+
+    @pytest.mark.skipif(not has_tenacity, reason="retries need tenacity")
+    @patch('actions.weather_utils._send_get')
+    @patch('actions.weather_utils._hedged_send_get')
+    def test_open_circuit_not_retried(self, mock_async_send, mock_send):
+        """An open circuit fails fast instead of being retried with backoff."""
+        configure_circuit_breakers(failure_threshold=1)
+        mock_send.side_effect = mock_async_send.side_effect = requests.exceptions.ConnectionError("refused")
+        url = "http://api.openweathermap.org/data/2.5/weather?q=Lima"
+        with pytest.raises(requests.exceptions.ConnectionError):
+            http_get(url)
+
+        start = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            fetch_with_retry(url)
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(async_fetch_with_retry(url))
+        assert time.monotonic() - start < 1
+        assert mock_send.call_count == 1 and mock_async_send.call_count == 0
+
+    @pytest.mark.skipif(not has_tenacity, reason="retries need tenacity")
+    @patch('actions.weather_utils._send_get')
+    def test_quota_errors_not_retried(self, mock_send):
+        """A request the quota turns away is not retried either."""
+        mock_send.side_effect = QuotaExceededError("quota exhausted")
+        start = time.monotonic()
+        with pytest.raises(QuotaExceededError):
+            fetch_with_retry("http://api.openweathermap.org/data/2.5/weather?q=Lima")
+        assert time.monotonic() - start < 1
+        assert mock_send.call_count == 1
+
+    def test_last_good_responses_bounded(self):
+        """Last good responses expire with their age limit and are held within the byte budget."""
+        now = [0.0]
+        store = LastGoodResponses(max_entries=10, max_bytes=3 * LastGoodResponses.OVERHEAD_BYTES + 300,
+                                  clock=lambda: now[0])
+        for i in range(5):
+            store.put(f"k{i}", HTTPResult(status_code=200, content=b"x" * 100, headers={}))
+        stats = store.stats()
+        assert stats["size"] == 3 and stats["bytes"] <= stats["max_bytes"]
+        assert store.get("k4", max_age=60) is not None
+
+        now[0] = 61
+        assert store.get("k4", max_age=60) is None
+        assert store.stats()["size"] == 2
+
+    @patch('actions.weather_utils._send_get')
+    def test_open_circuit_skips_old_last_good(self, mock_send):
+        """A last good response older than the endpoint's stale limit is not served."""
+        configure_circuit_breakers(failure_threshold=1)
+        url = "http://api.openweathermap.org/data/2.5/forecast?q=London"
+        good = MagicMock(status_code=200)
+        mock_send.return_value = good
+        http_get(url)
+        mock_send.return_value = MagicMock(status_code=503)
+        http_get(url)
+
+        assert http_get(url) is good
+        with patch('actions.weather_utils.last_good_max_age', return_value=-1.0):
+            with pytest.raises(CircuitOpenError):
+                http_get(url)
+        assert mock_send.call_count == 2
+
+    def test_upstream_diagnostics(self):
+        """Diagnostics report breakers, quota, latency and coalescing together."""
+        get_circuit_breaker("forecast")
+        diagnostics = get_upstream_diagnostics()
+        assert diagnostics["circuit_breakers"]["forecast"]["state"] == CIRCUIT_CLOSED
+        assert set(diagnostics) == {
+            "circuit_breakers", "quota", "latency", "coalescing", "geocoding", "location_store", "observations",
+            "forecasts", "air_quality", "uv", "unresolved_locations",
+            "shared_cache", "cache_memory"
+        }
+
+
+class TestGeocodeCache:
+    """Tests for the geocode cache in front of coordinate lookups."""
+
+    @pytest.mark.parametrize("location,expected", [
+        ("London", "london"),
+        ("  LONDON  ", "london"),
+        ("New   York", "new york"),
+        ("New York , US", "new york,us"),
+        ("new york,us", "new york,us"),
+        ("London, UK", "london,gb"),
+        ("London,GB", "london,gb"),
+        ("Springfield, IL, USA", "springfield,il,us"),
+        ("Straße", "strasse"),
+    ])
+    def test_normalize_location(self, location, expected):
+        """Case, whitespace and country suffixes are normalised."""
+        assert normalize_location(location) == expected
+
+    def test_hits_and_misses(self):
+        """Lookups of the same normalised location hit the cache."""
+        cache = GeocodeCache(max_entries=10)
+        assert cache.get("London, UK") is None
+        cache.put("London, UK", GeocodeEntry(51.5, -0.13, 3600))
+        assert cache.get("london,gb") == GeocodeEntry(51.5, -0.13, 3600)
+        assert cache.get("London") is None
+        stats = cache.stats()
+        assert {k: stats[k] for k in ("hits", "misses", "evictions", "size", "max_entries")} == \
+            {"hits": 1, "misses": 2, "evictions": 0, "size": 1, "max_entries": 10}
+        assert stats["rejections"] == 0 and 0 < stats["bytes"] <= stats["max_bytes"]
+
+    def test_bounded_lru(self):
+        """The least recently used location is evicted once the cache is full."""
+        cache = GeocodeCache(max_entries=2)
+        cache.put("London", GeocodeEntry(1, 1))
+        cache.put("Paris", GeocodeEntry(2, 2))
+        cache.get("London")
+        cache.put("Berlin", GeocodeEntry(3, 3))
+        assert cache.get("Paris") is None
+        assert cache.get("London") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["size"] == 2
+
+    def test_disabled_cache(self):
+        """A cache without room stores nothing."""
+        cache = GeocodeCache(max_entries=0)
+        cache.put("London", GeocodeEntry(1, 1))
+        assert cache.get("London") is None
+
+    def test_remember_geocode(self):
+        """Only successful responses with coordinates are cached."""
+        assert remember_geocode("Nowhere", MagicMock(status_code=404)) is None
+        no_coord = MagicMock(status_code=200)
+        no_coord.json.return_value = {"cod": 200}
+        assert remember_geocode("Nowhere", no_coord) is None
+
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"coord": {"lat": 51.5, "lon": -0.13}, "timezone": 3600}
+        assert remember_geocode("London", response) == GeocodeEntry(51.5, -0.13, 3600)
+        assert cached_geocode(" london ") == GeocodeEntry(51.5, -0.13, 3600)
+
+    def test_geocode_response(self):
+        """A cache hit is returned as a /weather-shaped response."""
+        response = geocode_response(GeocodeEntry(51.5, -0.13, 3600))
+        assert response.status_code == 200
+        assert response.json() == {"coord": {"lat": 51.5, "lon": -0.13}, "timezone": 3600}
+
+    @patch('actions.weather_utils.fetch_with_retry')
+    def test_get_coordinates_uses_cache(self, mock_fetch):
+        """Repeated lookups of a location only call the API once."""
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {"coord": {"lat": 51.5074, "lon": -0.1278}}
+        mock_fetch.return_value = mock_response
+
+        assert get_coordinates("London", "key") == (51.5074, -0.1278)
+        assert get_coordinates("LONDON ", "key") == (51.5074, -0.1278)
+        mock_fetch.assert_called_once()
+        assert get_geocode_stats()["hits"] == 1
+
+    @patch('actions.weather_utils.async_fetch_with_retry')
+    def test_async_get_coordinates_uses_cache(self, mock_fetch):
+        """The async lookup shares the cache with the sync one."""
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {"coord": {"lat": 48.85, "lon": 2.35}}
+        mock_fetch.return_value = mock_response
+
+        assert asyncio.run(async_get_coordinates("Paris", "key")) == (48.85, 2.35)
+        assert get_coordinates("paris", "key") == (48.85, 2.35)
+        mock_fetch.assert_called_once()
+
+
+class TestObservationCache:
+    """Tests for the TTL cache of current observations."""
+
+    def test_expiry_follows_observation_time(self):
+        """An observation expires one refresh interval after it was observed, within bounds."""
+        cache = ObservationCache(ttl=600, clock=lambda: 10_000)
+        assert cache.expires_at({"dt": 9_800}) == 10_400
+        assert cache.expires_at({"dt": 5_000}) == 10_060  # late station: minimum TTL
+        assert cache.expires_at({"dt": 11_000}) == 10_600  # clock skew: never beyond the TTL
+        assert cache.expires_at({}) == 10_600
+
+    def test_hits_until_expired(self):
+        """Observations are served until they expire and keyed by normalised location."""
+        now = [10_000]
+        cache = ObservationCache(ttl=600, stale_seconds=0, clock=lambda: now[0])
+        data = {"dt": 10_000, "main": {"temp": 12.0}}
+        cache.put("London, UK", data)
+        assert cache.get("london,gb", action="action_get_humidity") is data
+        assert cache.get("london", action="action_get_humidity") is None
+        now[0] = 10_600
+        assert cache.get("London, UK", action="action_get_humidity") is None
+        stats = cache.stats()
+        assert stats["expirations"] == 1
+        assert stats["size"] == 0
+
+    def test_per_action_hit_ratio(self):
+        """Hits and misses are counted per action."""
+        cache = ObservationCache(ttl=600)
+        assert cache.get("Paris", action="action_fetch_weather") is None
+        cache.put("Paris", {"main": {"temp": 20.0}})
+        cache.get("Paris", action="action_get_humidity")
+        cache.get("Paris", action="action_get_wind_conditions")
+        cache.get("Paris", action="action_get_wind_conditions")
+
+        stats = cache.stats()
+        assert stats["hits"] == 3
+        assert stats["hit_ratio"] == 0.75
+        assert stats["actions"]["action_fetch_weather"] == {"hits": 0, "misses": 1, "stale_hits": 0, "hit_ratio": 0.0}
+        assert stats["actions"]["action_get_wind_conditions"]["hit_ratio"] == 1.0
+
+    def test_bounded_and_disabled(self):
+        """The least recently used observation is evicted, and a zero TTL caches nothing."""
+        cache = ObservationCache(ttl=600, max_entries=1)
+        cache.put("London", {"main": {}})
+        cache.put("Paris", {"main": {}})
+        assert cache.get("London") is None
+        assert cache.stats()["evictions"] == 1
+
+        disabled = ObservationCache(ttl=0)
+        disabled.put("London", {"main": {}})
+        assert disabled.get("London") is None
+
+    def test_remember_observation(self):
+        """Only successful responses with measurements are cached, and hits are /weather-shaped."""
+        assert remember_observation("Nowhere", MagicMock(status_code=404)) is None
+        error = MagicMock(status_code=200)
+        error.json.return_value = {"cod": 200}
+        remember_observation("Nowhere", error)
+        assert cached_observation("Nowhere", "test") is None
+
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"main": {"temp": 18.5, "humidity": 70}}
+        remember_observation("Berlin", response)
+        cached = cached_observation(" berlin ", "test")
+        assert cached.status_code == 200
+        assert cached.json()["main"]["humidity"] == 70
+        assert cached.headers["X-Observation-Cache"] == "hit"
+
+    def test_weather_service_uses_cache(self):
+        """The weather services share the cache with the actions."""
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {"main": {"temp": 18.5}, "weather": [{"description": "cloudy"}]}
+        with patch('actions.weather_utils.fetch_with_retry', return_value=mock_response) as mock_fetch:
+            WeatherService("key").get_current_weather("Madrid")
+            assert WeatherService("key").get_current_weather("madrid")["main"]["temp"] == 18.5
+            mock_fetch.assert_called_once()
+        assert asyncio.run(AsyncWeatherService("key").get_current_weather("Madrid", action="test"))["main"]["temp"] == 18.5
+        assert get_observation_stats()["actions"]["test"]["hits"] == 1
+
+    def test_actions_share_observations(self):
+        """Weather, humidity, wind and sunrise questions about one city cost one upstream call."""
+        from actions.actions import ActionCompareWeather, ActionGetHumidity
+        from actions.actions_weather_extended import ActionGetWindConditions, ActionGetSunriseSunset
+
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = {
+            "dt": int(time.time()), "timezone": 3600,
+            "main": {"temp": 20.0, "humidity": 55},
+            "weather": [{"description": "clear"}],
+            "wind": {"speed": 3.0, "deg": 90},
+            "sys": {"sunrise": 1686801600, "sunset": 1686861600},
+        }
+        tracker = MagicMock()
+        tracker.get_slot.side_effect = lambda name: "London" if name == "location" else None
+        tracker.latest_message = {"text": "when is sunrise"}
+        dispatcher = MagicMock()
+
+        with patch('actions.actions.os.environ.get', return_value="key"), \
+             patch('actions.actions_weather_extended.os.environ.get', return_value="key"), \
+             patch('actions.actions.async_http_get', return_value=mock_response) as first_get, \
+             patch('actions.actions_weather_extended.async_http_get', return_value=mock_response) as later_get:
+            for action in [ActionCompareWeather(), ActionGetHumidity(), ActionGetWindConditions(),
+                           ActionGetSunriseSunset()]:
+                asyncio.run(action.run(dispatcher, tracker, {}))
+
+        assert first_get.call_count + later_get.call_count == 1
+        stats = get_observation_stats()
+        assert stats["actions"]["action_compare_weather"]["misses"] == 1
+        assert stats["actions"]["action_get_humidity"]["hits"] == 1
+        assert stats["actions"]["action_get_sunrise_sunset"]["hits"] == 1
+
+
+class TestForecastCache:
+    """Tests for the forecast cache keyed by coordinates and issuance."""
+
+    FIXTURE = os.path.join(os.path.dirname(__file__), "..", "fixtures", "openweather", "forecast.json")
+
+    def forecast_response(self):
+        response = MagicMock(status_code=200)
+        with open(self.FIXTURE) as f:
+            response.json.return_value = json.load(f)
+        return response
+
+    def test_canonical_coordinates(self):
+        """Coordinates are rounded so geocoded and forecast coordinates of a city agree."""
+        assert canonical_coordinates(51.5085, -0.1257) == (51.51, -0.13)
+        assert canonical_coordinates("51.5074", "-0.1278") == (51.51, -0.13)
+
+    def test_expires_at_next_issuance(self):
+        """Forecasts expire at the next 3-hour issuance, however long ago they were fetched."""
+        now = [10_000]
+        cache = ForecastCache(stale_seconds=0, clock=lambda: now[0])
+        assert cache.expires_at() == 10_800
+        now[0] = 10_800
+        assert cache.expires_at() == 21_600
+
+        now[0] = 10_799
+        cache.put(51.5, -0.13, {"list": []})
+        assert cache.get(51.5, -0.13) == {"list": []}
+        now[0] = 10_800
+        assert cache.get(51.5, -0.13) is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_shared_between_name_and_coordinates(self):
+        """A forecast fetched by name serves lookups by coordinates and the name resolves afterwards."""
+        remember_forecast(self.forecast_response(), location="London")
+
+        assert cached_forecast("action_get_precipitation", lat=51.5074, lon=-0.1278) is not None
+        hit = cached_forecast("action_get_temperature_range", location="london")
+        assert hit.json()["city"]["name"] == "London"
+        assert hit.headers["X-Forecast-Cache"] == "hit"
+        assert cached_forecast("action_get_precipitation", lat=51.52, lon=-0.13) is None
+        assert cached_geocode("London").city_id == 2643743
+
+    def test_daily_summaries_cached_with_forecast(self):
+        """A fetched forecast is summarised once and cache hits carry the summaries."""
+        with patch('actions.weather_utils.materialize_daily_summaries',
+                   wraps=materialize_daily_summaries) as materialize:
+            remember_forecast(self.forecast_response(), lat=51.5085, lon=-0.1257)
+            hit = cached_forecast("action_get_precipitation", lat=51.5085, lon=-0.1257)
+        assert materialize.call_count == 1
+        summaries = hit.json()["daily_summaries"]
+        assert summaries["utc_offset"] == 3600
+        assert "2023-06-16" in summaries["days"]
+
+    def test_unknown_location_is_a_miss(self):
+        """Names without known coordinates are counted as misses."""
+        assert cached_forecast("action_fetch_weather_forecast", location="Paris") is None
+        remember_forecast(MagicMock(status_code=404), location="Paris")
+        assert cached_forecast("action_fetch_weather_forecast", location="Paris") is None
+        assert get_forecast_cache_stats()["actions"]["action_fetch_weather_forecast"] == {
+            "hits": 0, "misses": 2, "stale_hits": 0, "hit_ratio": 0.0
+        }
+
+    def test_conversation_costs_one_forecast(self):
+        """Forecast, temperature, precipitation, wind and alert questions about one city share one fetch."""
+        from actions.actions import ActionFetchWeatherForecast, ActionGetTemperatureRange
+        from actions.actions_weather_extended import (
+            ActionGetPrecipitation, ActionGetWindConditions, ActionGetSevereWeatherAlerts
+        )
+
+        geocode = MagicMock(status_code=200)
+        geocode.json.return_value = {"coord": {"lat": 51.5085, "lon": -0.1257}, "timezone": 3600, "id": 2643743}
+        forecast = self.forecast_response()
+        uv = MagicMock(status_code=200)
+        uv.json.return_value = []
+
+        def upstream(url, **kwargs):
+            if "/forecast" in url and "/uvi" not in url:
+                return forecast
+            return uv if "/uvi" in url else geocode
+
+        tracker = MagicMock()
+        tracker.get_slot.side_effect = lambda name: {"location": "London", "time_period": "tomorrow"}.get(name)
+        tracker.latest_message = {"text": "and tomorrow?"}
+        dispatcher = MagicMock()
+
+        with patch('actions.actions.os.environ.get', return_value="key"), \
+             patch('actions.actions_weather_extended.os.environ.get', return_value="key"), \
+             patch('actions.fetch_planner.async_http_get', side_effect=upstream) as planner_get, \
+             patch('actions.actions.async_http_get', side_effect=upstream) as actions_get, \
+             patch('actions.actions_weather_extended.async_http_get', side_effect=upstream) as extended_get, \
+             patch('actions.weather_utils.async_fetch_with_retry', side_effect=upstream) as geocode_get:
+            for action in [ActionFetchWeatherForecast(), ActionGetTemperatureRange(), ActionGetPrecipitation(),
+                           ActionGetWindConditions(), ActionGetSevereWeatherAlerts()]:
+                asyncio.run(action.run(dispatcher, tracker, {}))
+            calls = [c.args[0] for m in (planner_get, actions_get, extended_get, geocode_get) for c in m.call_args_list]
+
+        assert len([url for url in calls if "/forecast?" in url and "/uvi" not in url]) == 1
+        stats = get_forecast_cache_stats()
+        assert stats["hits"] == 4
+        assert stats["actions"]["action_get_severe_weather_alerts"]["hits"] == 1
+
+
+class TestAirQualityForecastCache:
+    """Tests for caching air quality forecasts as hourly series."""
+
+    def test_expires_at_next_hourly_update(self):
+        """Air quality forecasts expire at the next hourly update; other queries after the TTL."""
+        now = [10_000]
+        cache = QueryCache(ttl=3600, max_entries=8, clock=lambda: now[0])
+        forecast = WeatherQuery.by_coordinates("air_pollution_forecast", 51.5, -0.13)
+        current = WeatherQuery.by_coordinates("air_pollution", 51.5, -0.13)
+        assert cache.expires_at(forecast) == 10_800
+        assert cache.expires_at(current) == 13_600
+        assert QueryCache(ttl=60, max_entries=8, clock=lambda: now[0]).expires_at(forecast) == 10_060
+
+    def test_only_series_cached(self):
+        """A fetched forecast is cached as its hourly series rather than the entry list."""
+        with open(os.path.join(os.path.dirname(__file__), "..", "fixtures", "openweather",
+                               "air_pollution_forecast.json"), "rb") as f:
+            response = HTTPResult(status_code=200, content=f.read(), headers={})
+        query = WeatherQuery.by_coordinates("air_pollution_forecast", 51.5085, -0.1257)
+        remember_cached_query(query, response)
+        cached = asyncio.run(read_cached_query(query, "test", MagicMock(side_effect=AssertionError))).json()
+        assert set(cached) == {"coord", "hourly_series"}
+        assert len(cached["hourly_series"]["dt"]) == 96
+        assert "hourly_series" in response.json()  # the fetching turn reads the series it parsed
+
+
+class TestUnresolvedLocations:
+    """Tests for the negative cache of locations that failed to resolve."""
+
+    def test_expires_and_clears_on_resolution(self):
+        """Unresolved locations are remembered for the TTL, by normalised name, until they resolve."""
+        now = [1_000]
+        cache = UnresolvedLocationCache(ttl=300, clock=lambda: now[0])
+        cache.put("Londn, UK")
+        assert cache.get("londn,gb") is True
+        now[0] = 1_300
+        assert cache.get("Londn, UK") is False
+        cache.put("Londn")
+        cache.discard(" londn ")
+        assert cache.get("Londn") is False
+
+        remember_observation("Tmrw", MagicMock(status_code=404))
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"coord": {"lat": 1.0, "lon": 2.0}}
+        remember_geocode("Tmrw", response)
+        assert unresolved_location("Tmrw") is None
+
+    def test_only_not_found_is_cached(self):
+        """5xx answers say nothing about the location and are not cached."""
+        remember_observation("Londn", MagicMock(status_code=404))
+        remember_observation("Paris", MagicMock(status_code=503))
+        remember_forecast(MagicMock(status_code=404), lat=1.0, lon=2.0)
+
+        assert unresolved_location("londn").status_code == 404
+        assert unresolved_location("Paris") is None
+        assert get_unresolved_location_stats()["size"] == 1
+
+    def test_retries_skip_the_network(self):
+        """Asking again about a location that was not found makes no upstream call."""
+        from actions.actions import ActionGetUVIndex
+
+        tracker = MagicMock()
+        tracker.get_slot.return_value = "Londn"
+        dispatcher = MagicMock()
+        with patch('actions.actions.os.environ.get', return_value="key"), \
+             patch('actions.fetch_planner.async_http_get', return_value=MagicMock(status_code=404)) as mock_get:
+            for _ in range(3):
+                asyncio.run(ActionGetUVIndex().run(dispatcher, tracker, {}))
+
+        assert mock_get.call_count == 1
+        assert dispatcher.utter_message.call_count == 3
+        assert "couldn't find that location" in dispatcher.utter_message.call_args[1]["text"]
+        assert get_unresolved_location_stats()["hits"] == 2
+
+    @patch('actions.weather_utils.async_fetch_with_retry')
+    def test_transient_failures_are_retried(self, mock_fetch):
+        """Timeouts and server errors while geocoding are tried again on the next turn."""
+        mock_fetch.side_effect = [requests.exceptions.Timeout("slow"), MagicMock(status_code=500),
+                                  MagicMock(status_code=404)]
+        for _ in range(4):
+            assert asyncio.run(async_get_coordinates("Paris", "key")) is None
+        assert mock_fetch.call_count == 3
+
+
+class TestWeatherQuery:
+    """Tests for building upstream requests from structured queries."""
+
+    def test_location_url(self):
+        """Requests by name always carry the configured units."""
+        url = WeatherQuery.by_location("current_weather", "New  York").url("key")
+        assert url == f"{API_ENDPOINTS['current_weather']}?q=New+York&appid=key&units=metric"
+
+    def test_coordinates_url(self):
+        """Requests by coordinates use canonical coordinates and a fixed parameter order."""
+        assert WeatherQuery.by_coordinates("uv_forecast", 51.5085, -0.1257, cnt=3).url("key") == \
+            f"{API_ENDPOINTS['uv_forecast']}?lat=51.51&lon=-0.13&appid=key&cnt=3"
+        assert WeatherQuery.by_coordinates("air_pollution", 51.51, -0.13).url("key") == \
+            f"{API_ENDPOINTS['air_pollution']}?lat=51.51&lon=-0.13&appid=key"
+
+    def test_other_endpoints(self):
+        """History and timezone requests follow their own parameter names."""
+        history = WeatherQuery.by_coordinates("weather_history", 48.85, 2.35, dt=1686830400).url("key")
+        assert history.endswith("/onecall/timemachine?lat=48.85&lon=2.35&appid=key&units=metric&dt=1686830400")
+        timezone = WeatherQuery.by_coordinates("timezone", 48.85, 2.35).url("tz")
+        assert timezone.endswith("?lat=48.85&lng=2.35&key=tz&format=json&by=position")
+
+    def test_cache_keys(self):
+        """Equivalent queries share a cache key that holds no credentials."""
+        key = WeatherQuery.by_location("forecast", "London, UK").cache_key()
+        assert key == WeatherQuery.by_location("forecast", " london , gb").cache_key()
+        assert key == "forecast?q=london%2Cgb&units=metric"
+        assert WeatherQuery.by_coordinates("forecast", 51.5085, -0.1257).cache_key() == \
+            WeatherQuery.by_coordinates("forecast", 51.5074, -0.1278).cache_key()
+        assert WeatherQuery.by_coordinates("uv_forecast", 1, 2, cnt=2).cache_key() != \
+            WeatherQuery.by_coordinates("uv_forecast", 1, 2, cnt=3).cache_key()
+
+    def test_convert_temperature(self):
+        """Temperatures are converted locally from Celsius."""
+        assert convert_temperature(20.0, "metric") == 20.0
+        assert convert_temperature(20.0, "standard") == pytest.approx(293.15)
+        assert convert_temperature(20.0, "imperial") == pytest.approx(68.0)
+
+
+class TestStaleWhileRevalidate:
+    """Tests for serving stale cache entries while they are refreshed."""
+
+    @staticmethod
+    def air_response(aqi):
+        return HTTPResult(status_code=200, content=json.dumps({"list": [{"main": {"aqi": aqi}}]}).encode(), headers={})
+
+    def test_soft_and_hard_limits(self):
+        """Entries are fresh until the soft limit, stale until the hard limit and gone after it."""
+        now = [1_000]
+        cache = ExpiringCache(max_entries=8, stale_seconds=60, clock=lambda: now[0])
+        cache.store("key", "value", expires_at=1_100)
+        assert cache.lookup_entry("key", "test").stale is False
+        now[0] = 1_130
+        hit = cache.lookup_entry("key", "test")
+        assert (hit.value, hit.age, hit.stale) == ("value", 130, True)
+        assert cache.lookup("key", "test") is None  # fresh-only lookups miss
+        now[0] = 1_160
+        assert cache.lookup_entry("key", "test") is None
+        cache.store("old", "value", expires_at=1_090)  # already past its hard limit
+        assert cache.stats()["size"] == 0
+
+    def test_stale_metrics(self):
+        """Stale hits are counted per action with the age of what was served."""
+        now = [1_000]
+        cache = ExpiringCache(max_entries=8, stale_seconds=600, clock=lambda: now[0])
+        cache.store("key", "value", expires_at=1_100)
+        cache.lookup_entry("key", "action_get_air_pollution")
+        now[0] = 1_200
+        cache.lookup_entry("key", "action_get_air_pollution")
+        now[0] = 1_400
+        cache.lookup_entry("key", "action_get_uv_index")
+
+        stats = cache.stats()
+        assert stats["stale_hits"] == 2
+        assert stats["stale_ratio"] == pytest.approx(2 / 3)
+        assert stats["stale_age_mean_seconds"] == 300
+        assert stats["stale_age_max_seconds"] == 400
+        assert stats["actions"]["action_get_air_pollution"]["stale_hits"] == 1
+
+    def test_stale_value_served_while_one_refresh_runs(self):
+        """Stale entries are returned at once and concurrent readers start a single refresh."""
+        configure_air_quality_cache(ttl=0.1, stale_seconds=60)
+        query = WeatherQuery.by_coordinates("air_pollution", 51.5, -0.13)
+        fetches = []
+
+        async def fetch():
+            fetches.append(1)
+            await asyncio.sleep(0.02)
+            return self.air_response(len(fetches))
+
+        async def conversation():
+            await read_cached_query(query, "action_get_air_pollution", fetch)
+            await asyncio.sleep(0.12)
+            started = time.monotonic()
+            stale = await asyncio.gather(*(read_cached_query(query, "action_get_air_pollution", fetch)
+                                           for _ in range(3)))
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(0.04)
+            return stale, elapsed, await read_cached_query(query, "action_get_air_pollution", fetch)
+
+        stale, elapsed, refreshed = asyncio.run(conversation())
+
+        assert elapsed < 0.02
+        assert all(r.json()["list"][0]["main"]["aqi"] == 1 for r in stale)
+        assert stale[0].headers["X-Cache"] == "stale"
+        assert refreshed.json()["list"][0]["main"]["aqi"] == 2
+        assert refreshed.headers["X-Cache"] == "hit"
+        assert len(fetches) == 2
+        stats = get_air_quality_cache_stats()
+        assert stats["stale_hits"] == 3
+        assert stats["refreshes"] == 1
+        assert stats["refresh_failures"] == 0
+
+    def test_past_hard_limit_caller_waits(self):
+        """Past the hard limit the caller waits for a new response as without a cache."""
+        configure_air_quality_cache(ttl=0.02, stale_seconds=0.02)
+        query = WeatherQuery.by_coordinates("air_pollution", 51.5, -0.13)
+        responses = iter([self.air_response(1), self.air_response(4)])
+
+        async def fetch():
+            return next(responses)
+
+        async def conversation():
+            await read_cached_query(query, "test", fetch)
+            await asyncio.sleep(0.05)
+            return await read_cached_query(query, "test", fetch)
+
+        assert asyncio.run(conversation()).json()["list"][0]["main"]["aqi"] == 4
+        assert get_air_quality_cache_stats()["stale_hits"] == 0
+
+    def test_failed_refresh_keeps_stale_value(self, caplog):
+        """A refresh that fails is logged and counted, and the stale observation stays available."""
+        configure_observation_cache(ttl=0.01, stale_seconds=600)
+        remember_observation("Oslo", MagicMock(status_code=200, json=MagicMock(return_value={"main": {"temp": 3.0}})))
+        time.sleep(0.02)
+
+        async def failing_fetch():
+            raise requests.exceptions.ConnectionError("down")
+
+        async def conversation():
+            response = await read_observation("Oslo", "action_fetch_weather", failing_fetch)
+            await asyncio.sleep(0.01)
+            return response
+
+        assert asyncio.run(conversation()).json()["main"]["temp"] == 3.0
+        stats = get_observation_stats()
+        assert stats["refresh_failures"] == 1
+        assert stats["size"] == 1
+        assert "Background refresh" in caplog.text
+
+
+class TestCacheBudget:
+    """Tests for the byte budgets and TinyLFU admission of the in-process caches."""
+
+    def test_frequency_sketch(self):
+        """Counts never under-estimate, saturate at 15 and fade over time."""
+        sketch = FrequencySketch(16)
+        for _ in range(20):
+            sketch.increment("london")
+        sketch.increment("oslo")
+        assert sketch.frequency("london") >= 7  # halved once after 10 * width additions
+        assert sketch.frequency("oslo") >= 1
+        assert sketch.frequency("london") <= FrequencySketch.MAX_COUNT
+
+    def test_byte_budget_is_respected(self):
+        """Entries are evicted from the LRU end until the new one fits the byte budget."""
+        value = {"list": ["x" * 100]}
+        size = estimate_size("city 0") + estimate_size(value)
+        cache = ExpiringCache(max_entries=100, max_bytes=3 * size + size // 2, clock=lambda: 1_000)
+        for i in range(10):
+            cache.store(f"city {i}", value, expires_at=2_000)
+        stats = cache.stats()
+        assert stats["size"] == 3
+        assert stats["bytes"] <= stats["max_bytes"]
+        assert stats["evictions"] == 7
+        assert cache.lookup("city 9", "test") == value
+        assert cache.lookup("city 0", "test") is None
+
+    def test_large_entry_displaces_several_small_ones(self):
+        """A forecast-sized entry evicts as many small entries as it needs; one larger than the budget is refused."""
+        small, large = "x", "x" * 2_000
+        budget = estimate_size("small 0") + estimate_size(large) + 100
+        cache = ExpiringCache(max_entries=100, max_bytes=budget, clock=lambda: 1_000)
+        for i in range(20):
+            cache.store(f"small {i}", small, expires_at=2_000)
+        cache.store("large", large, expires_at=2_000)
+        assert cache.lookup("large", "test") == large
+        assert cache.stats()["bytes"] <= budget
+        cache.store("huge", "x" * budget, expires_at=2_000)
+        assert cache.lookup("huge", "test") is None
+        assert cache.stats()["rejections"] == 1
+
+    def test_popular_entries_survive_a_scan(self):
+        """A long tail of cities asked about once does not flush the ones asked about all the time."""
+        cache = GeocodeCache(max_entries=10)
+        popular = [f"capital {i}" for i in range(5)]
+        for city in popular:
+            cache.get(city)
+            cache.put(city, GeocodeEntry(1.0, 2.0))
+        for i in range(500):
+            for city in popular:
+                cache.get(city)
+            tail = f"village {i}"
+            if cache.get(tail) is None:
+                cache.put(tail, GeocodeEntry(3.0, 4.0))
+        assert all(cache.get(city) == GeocodeEntry(1.0, 2.0) for city in popular)
+        stats = cache.stats()
+        assert stats["size"] == 10
+        assert stats["rejections"] > 0
+
+    def test_expired_entries_make_way(self):
+        """An expired entry makes way for a new one however popular it was, without counting as an eviction."""
+        now = [1_000]
+        cache = ExpiringCache(max_entries=2, clock=lambda: now[0])
+        cache.store("popular", 1, expires_at=1_010)
+        for _ in range(10):
+            cache.lookup("popular", "test")
+        cache.store("long", 2, expires_at=5_000)
+        now[0] = 1_020
+        cache.store("new", 3, expires_at=5_000)
+        assert cache.lookup("new", "test") == 3
+        assert cache.lookup("long", "test") == 2
+        assert cache.stats()["evictions"] == 0
+
+    def test_cache_memory_stats(self):
+        """Each cache reports its entries, bytes, hit ratio, evictions and rejections."""
+        remember_observation("Oslo", MagicMock(status_code=200, json=MagicMock(return_value={"main": {"temp": 3.0}})))
+        cached_observation("Oslo", "action_fetch_weather")
+        memory = get_cache_memory_stats()
+        assert set(memory) == {"geocoding", "unresolved_locations", "observations", "forecasts", "air_quality", "uv",
+                               "last_good_responses"}
+        observations = memory["observations"]
+        assert observations["size"] == 1
+        assert 0 < observations["bytes"] <= observations["max_bytes"]
+        assert observations["hit_ratio"] == 1.0
+        assert (observations["evictions"], observations["rejections"]) == (0, 0)